@@ -28,11 +28,55 @@ import subprocess
 import sys
 import os
 import argparse
+import difflib
+import grp
+import heapq
+import glob
+import gzip
+import hashlib
+import io
+import json
 import logging
+import math
+import mmap
+import pwd
+import queue
+import re
+import resource
+import shlex
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import time
 
+try:
+    import pymysql  # Optional: persistent connections instead of mysql CLI
+except ImportError:
+    pymysql = None
+
+try:
+    import zstandard  # Optional: decode compressed binlog transaction payloads
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame  # Optional: lz4 compression for --backup
+except ImportError:
+    lz4 = None
+
 # ══════════════════════════════════════════════════════════════════════════════
 #                           CONFIGURATION
 # ══════════════════════════════════════════════════════════════════════════════
@@ -49,6 +93,11 @@ class Config:
     
     # MySQL Instance Name (systemd service)
     MYSQL_INSTANCE = "mysqld@mysql1"
+    SYSTEMCTL_CMD = ["systemctl"]   # Service manager command (argv prefix)
+    
+    # Execution
+    USE_SUDO = True                 # Prefix privileged commands with sudo
+    ASSUME_YES = False              # Answer confirmation prompts with "yes"
     
     # Directory Paths
     DATA_DIR = "/u01/data"
@@ -57,6 +106,60 @@ class Config:
     BACKUP_DIR = "/u01/data/mysqldata/backup-tmp1"
     BACKUP_PATH = "/u01/data/mysqldata/"
     
+    # Staged Restore (--staged): restore next to the live datadir while
+    # mysqld keeps serving, then stop, swap by rename and start
+    STAGED_RESTORE = False
+    STAGED_SUFFIX = ".staged"       # /u01/data.staged
+    PREVIOUS_SUFFIX = ".previous"   # /u01/data.previous (old tree after swap)
+    STAGED_KEEP_PREVIOUS = False    # Keep the old tree for --rollback
+    
+    # Restore Engine: "meb" (Enterprise Backup image), "xtrabackup" (prepared
+    # or unprepared XtraBackup directory), "logical" (SQL dump file/directory),
+    # "clone" (clone plugin, straight from the donor)
+    RESTORE_ENGINE = "meb"
+    MEB_PHASED_RESTORE = False      # image-to-backup-dir / apply-log / copy-back
+                                    # as separate, resumable phases (needs room
+                                    # for the extracted backup in BACKUP_DIR)
+    
+    # XtraBackup Restore
+    XTRABACKUP_DIR = "/u01/data/mysqldata/xtrabackup"
+    XTRABACKUP_USE_MEMORY = "4G"    # --use-memory for --prepare
+    XTRABACKUP_PARALLEL = 8         # --parallel for --prepare/--copy-back
+    XTRABACKUP_MOVE_BACK = False    # --move-back: same filesystem, consumes backup
+    
+    # Compressed Backups (--backup): streamed from the local instance by the
+    # RESTORE_ENGINE tool, compressed in parallel chunks, described by a
+    # manifest.json; BACKUP_MANIFEST makes the restore unpack one first
+    BACKUP_OUTPUT_DIR = "/u01/backup"
+    BACKUP_COMPRESSION = "zstd"     # "zstd", "lz4" or "gzip" (fallback)
+    BACKUP_COMPRESSION_LEVEL = None  # None = codec default (zstd 3, lz4 0, gzip 1)
+    BACKUP_CHUNK_BYTES = 16 << 20   # Independently compressed and checksummed
+    BACKUP_WORKERS = 8              # Compression/decompression threads
+    BACKUP_MANIFEST = ""            # Restore from this manifest ("" = off)
+    
+    # Backup Verification: read the whole backup before anything is stopped
+    # or deleted (against a manifest, backup-checksums.json, or mysqlbackup
+    # validate)
+    VERIFY_BACKUP = True
+    VERIFY_CHUNK_BYTES = 64 << 20   # Unit of parallel reads and checksums
+    VERIFY_WORKERS = 8              # Reader/hasher threads
+    
+    # Logical Restore (mysqldump file or mydumper-style directory)
+    LOGICAL_DUMP_PATH = "/u01/data/mysqldata/dump"
+    LOGICAL_LOAD_WORKERS = 8
+    LOADER_BATCH_BYTES = 16 << 20   # INSERT bytes per transaction
+    LOADER_MAX_BUFFER_BYTES = 256 << 20  # Parsed-but-unloaded data in memory
+    MYSQLD_BINARY = "mysqld"
+    
+    # Clone Provisioning (RESTORE_ENGINE = "clone"): CLONE INSTANCE from a
+    # live donor into a freshly initialized datadir, no backup copy
+    CLONE_DONOR = ""                # host:port ("" = PRIMARY_HOST:PRIMARY_PORT)
+    CLONE_USER = "clone_user"       # Donor account used by CLONE INSTANCE
+    CLONE_PASSWORD = os.environ.get("MYSQL_CLONE_PASSWORD", "********")
+    CLONE_USER_HOST = "%"
+    CLONE_MANAGE_DONOR = True       # Install the plugin, create/grant CLONE_USER
+    CLONE_POLL_INTERVAL = 5         # Seconds between clone_progress polls
+    
     # MySQL User/Group
     MYSQL_USER = "mysql"
     MYSQL_GROUP = "mysql"
@@ -65,8 +168,135 @@ class Config:
     REPLICATION_USER = "replicationuser"
     REPLICATION_PASSWORD = "********"  # Replace with actual password
     
+    # Directory Deletion (throttled so neighbouring instances keep their I/O)
+    DELETE_TOMBSTONE = True         # Rename at once, delete while the restore runs
+    TOMBSTONE_SUFFIX = ".deleting"  # /u01/data.deleting-<timestamp>
+    DELETE_BYTES_PER_SEC = 512 << 20  # Freed bytes per second (0 = unlimited)
+    DELETE_OPS_PER_SEC = 500        # unlink/truncate/rmdir calls per second
+    DELETE_TRUNCATE_STEP = 1 << 30  # Big files are shrunk this much per step
+    
     # Permissions
     DIR_PERMISSIONS = "750"
+    PERMISSION_WORKERS = 16         # Threads walking/chowning the datadir
+    PERMISSION_CHUNK = 2048         # Directory entries per worker task
+    
+    # Runtime Files (used for readiness checks)
+    PID_FILE = "/u01/data/mysqld.pid"
+    SOCKET_FILE = "/u01/data/mysql.sock"
+    
+    # Local Admin Account (readiness/status queries on the secondary)
+    ADMIN_USER = "root"
+    ADMIN_PASSWORD = os.environ.get("MYSQL_ADMIN_PASSWORD", "")
+    
+    # Readiness Polling (seconds)
+    STOP_TIMEOUT = 600              # Clean shutdown flushes dirty pages
+    START_TIMEOUT = 1800            # Crash recovery / buffer pool load
+    POLL_INITIAL_INTERVAL = 0.2
+    POLL_MAX_INTERVAL = 5.0
+    POLL_BACKOFF = 1.5
+    READY_CHECKS = ["pid_file", "port", "sql"]
+    WAIT_FOR_BUFFER_POOL_LOAD = True
+    
+    # Buffer Pool Warm-up: dump the donor's buffer pool, copy ib_buffer_pool
+    # into the restored datadir before startup, track the load afterwards
+    BUFFER_POOL_WARMUP = False
+    WARMUP_DONOR = ""               # host:port ("" = PRIMARY_HOST:PRIMARY_PORT)
+    WARMUP_FETCH_CMD = ["ssh", "{host}", "sudo", "cat", "{path}"]  # Donor file to stdout
+    WARMUP_TIMEOUT = 3600           # Seconds for the dump and for the load
+    
+    # SQL Execution (connections kept open per target for the whole run)
+    SQL_POOL_SIZE = 2
+    
+    # Source Account (read-only status queries on the primary)
+    SOURCE_ADMIN_USER = "root"
+    SOURCE_ADMIN_PASSWORD = os.environ.get("MYSQL_SOURCE_PASSWORD", ADMIN_PASSWORD)
+    
+    # GTID Pre-flight (before START REPLICA)
+    GTID_PREFLIGHT = True           # Check backup/replica/source GTID sets, seed gtid_purged
+    
+    # Replication Lag Monitor (--watch-lag)
+    LAG_SAMPLE_INTERVAL = 5         # Seconds between samples
+    LAG_RING_SIZE = 720             # Samples kept (1 hour at 5s)
+    LAG_RATE_WINDOW = 60            # Seconds of samples used for rates/trend
+    LAG_READY_SECONDS = 5           # Lag at or below this counts as caught up
+    
+    # Parallel Applier Tuning (--tune-applier, optional post-setup step)
+    APPLIER_MAX_WORKERS = 32
+    APPLIER_TUNE_ON_SETUP = False   # Also persist the worker count in the replication SQL
+    APPLIER_TUNE_STEP = False       # Run the tuner after configure_replication
+    APPLIER_BENCHMARK_SECONDS = 60  # Measurement window per candidate
+    APPLIER_BENCHMARK_WARMUP = 10   # Seconds after restart before measuring
+    
+    # Switchover (--switchover): the secondary becomes the primary
+    SWITCHOVER_MAX_BACKLOG = 1000   # Refuse if the replica is further behind (GTIDs)
+    SWITCHOVER_LOCK_TIMEOUT = 2     # lock_wait_timeout for the read-only freeze (s)
+    SWITCHOVER_SYNC_TIMEOUT = 10    # WAIT_FOR_EXECUTED_GTID_SET limit, then roll back (s)
+    
+    # Binlog Analyzer (--analyze-binlogs)
+    BINLOG_ANALYZE_WORKERS = 4      # Files parsed in parallel (processes)
+    BINLOG_TOP_TRANSACTIONS = 10    # Largest transactions listed
+    
+    # Slow Query Log Digest (--digest-slow-log, optional post-start step)
+    SLOW_LOG_DIGEST = False         # Digest the slow log once the rebuilt instance is up
+    SLOW_LOG_FILE = ""              # Default: the server's slow_query_log_file
+    SLOW_LOG_WORKERS = 4            # Processes, one byte range each
+    SLOW_LOG_CHUNK_BYTES = 64 << 20  # Smallest byte range worth a process
+    SLOW_LOG_MAX_FINGERPRINTS = 10000  # Further fingerprints are pooled as "(other)"
+    SLOW_LOG_TOP = 20               # Fingerprints listed, by total Query_time
+    
+    # Long-running Commands (streamed output)
+    PROGRESS_INTERVAL = 30          # Seconds between progress events
+    STALL_TIMEOUT = 900             # Warn if no progress for this long
+    OUTPUT_TAIL_LINES = 200         # Output lines kept for error reports
+    
+    # Workflow Scheduler
+    MAX_PARALLEL_STEPS = 4          # Independent steps run concurrently
+    JOURNAL_DIR = "/var/tmp/mysql_replication"  # Step journals for --resume
+    CONNECT_TIMEOUT = 5             # Seconds for TCP reachability checks
+    REPLICATION_SQL_FILE = "/tmp/configure_replication.sql"
+    
+    # Run Reports (per-step/per-command wall, CPU, RSS, block I/O)
+    REPORT_DIR = "/var/tmp/mysql_replication/reports"   # JSONL, one per run
+    PROMETHEUS_TEXTFILE = ""        # e.g. /var/lib/node_exporter/textfile/mysql_rebuild.prom
+    
+    # Dry-run Planner (--dry-run cost estimate)
+    PLAN_COPY_BYTES_PER_SEC = 200 << 20     # Assumed restore throughput
+    PLAN_DELETE_BYTES_PER_SEC = 1 << 30     # Assumed delete speed when DELETE_BYTES_PER_SEC is 0
+    PLAN_READ_BYTES_PER_SEC = 1 << 30       # Assumed backup verification speed
+    
+    # Fleet Mode (--fleet INVENTORY)
+    FLEET_MAX_PARALLEL = 8          # Targets rebuilt at the same time
+    FLEET_PER_HOST = 2              # Concurrent rebuilds per secondary host
+    FLEET_PER_SOURCE = 4            # Concurrent rebuilds per primary/backup store
+    FLEET_LOG_DIR = "/var/tmp/mysql_fleet"
+
+
+def apply_config_overrides(overrides: Dict[str, object], origin: str = "config"):
+    """
+    Override Config attributes from a mapping such as a JSON config file.
+    
+    Only existing upper-case settings may be set, so a typo fails loudly
+    instead of being silently ignored.
+    
+    Raises:
+        ValueError: If a key is not a known setting
+    """
+    for key, value in overrides.items():
+        if not key.isupper() or not hasattr(Config, key):
+            raise ValueError(f"{origin}: unknown setting '{key}'")
+        setattr(Config, key, value)
+
+
+def load_config_file(path: str) -> Dict[str, object]:
+    """Read a JSON object of Config overrides from a file ("-" for stdin)."""
+    if path == "-":
+        overrides = json.load(sys.stdin)
+    else:
+        with open(path) as f:
+            overrides = json.load(f)
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{path}: expected a JSON object of settings")
+    return overrides
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -100,461 +330,6520 @@ logger = setup_logging()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#                           UTILITY FUNCTIONS
+#                      RESOURCE INSTRUMENTATION
 # ══════════════════════════════════════════════════════════════════════════════
 
-def run_command(cmd: str, description: str, check: bool = True, 
-                sudo: bool = True) -> Tuple[int, str, str]:
-    """
-    Execute a shell command with logging.
+_RUSAGE_THREAD = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+
+
+@dataclass
+class ResourceUsage:
+    """Wall/CPU time, peak memory and block I/O of a command or step."""
+    wall: float = 0.0
+    cpu_user: float = 0.0
+    cpu_sys: float = 0.0
+    max_rss_kb: int = 0
+    inblock: int = 0                # 512-byte blocks read from disk
+    oublock: int = 0                # 512-byte blocks written to disk
     
-    Args:
-        cmd: Command to execute
-        description: Human-readable description
-        check: Raise exception on non-zero exit
-        sudo: Prefix command with sudo
-        
-    Returns:
-        Tuple of (return_code, stdout, stderr)
-    """
-    if sudo and not cmd.startswith("sudo"):
-        cmd = f"sudo {cmd}"
+    @classmethod
+    def from_rusage(cls, ru, wall: float) -> "ResourceUsage":
+        return cls(wall, ru.ru_utime, ru.ru_stime, ru.ru_maxrss,
+                   ru.ru_inblock, ru.ru_oublock)
     
-    logger.info(f"🔧 {description}")
-    logger.debug(f"   Command: {cmd}")
+    @classmethod
+    def between(cls, before, after, wall: float) -> "ResourceUsage":
+        """Usage between two getrusage() snapshots (peak RSS: the later one)."""
+        return cls(wall, after.ru_utime - before.ru_utime,
+                   after.ru_stime - before.ru_stime, after.ru_maxrss,
+                   after.ru_inblock - before.ru_inblock,
+                   after.ru_oublock - before.ru_oublock)
     
-    try:
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode == 0:
-            logger.info(f"   ✅ Success")
-        else:
-            logger.error(f"   ❌ Failed (exit code: {result.returncode})")
-            if result.stderr:
-                logger.error(f"   Error: {result.stderr.strip()}")
-        
-        if check and result.returncode != 0:
-            raise subprocess.CalledProcessError(
-                result.returncode, cmd, result.stdout, result.stderr
-            )
-        
-        return result.returncode, result.stdout, result.stderr
-        
-    except Exception as e:
-        logger.error(f"   💥 Exception: {e}")
-        if check:
-            raise
-        return -1, "", str(e)
-
-
-def print_section(title: str):
-    """Print a section header."""
-    print("\n" + "=" * 70)
-    print(f"  {title}")
-    print("=" * 70)
-
+    def add(self, other: "ResourceUsage"):
+        """Accumulate another usage (times and I/O add up, peak RSS is the max)."""
+        self.wall += other.wall
+        self.cpu_user += other.cpu_user
+        self.cpu_sys += other.cpu_sys
+        self.max_rss_kb = max(self.max_rss_kb, other.max_rss_kb)
+        self.inblock += other.inblock
+        self.oublock += other.oublock
+    
+    @property
+    def cpu(self) -> float:
+        return self.cpu_user + self.cpu_sys
+    
+    @property
+    def bytes_read(self) -> int:
+        return self.inblock * 512
+    
+    @property
+    def bytes_written(self) -> int:
+        return self.oublock * 512
+    
+    def to_dict(self) -> Dict[str, object]:
+        record = {key: round(value, 3) if isinstance(value, float) else value
+                  for key, value in asdict(self).items()}
+        record.update(bytes_read=self.bytes_read, bytes_written=self.bytes_written)
+        return record
 
-def confirm_action(message: str) -> bool:
-    """Ask user for confirmation."""
-    response = input(f"\n⚠️  {message} (y/n): ").strip().lower()
-    return response == 'y'
 
+def _human_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TiB"
 
-# ══════════════════════════════════════════════════════════════════════════════
-#                      STEP 1: STOP MYSQL INSTANCE
-# ══════════════════════════════════════════════════════════════════════════════
 
-def stop_mysql_instance():
+class RunReport:
     """
-    Stop the MySQL instance on the secondary server.
+    Machine-readable run report: a JSONL file with one record per command,
+    one per workflow step and a final one for the run, written as they
+    happen. Optionally mirrored into a Prometheus node_exporter textfile.
     
-    Commands:
-        sudo systemctl status mysqld@mysql1
-        sudo systemctl stop mysqld@mysql1
-        sudo systemctl status mysqld@mysql1
+    Records:
+        {"type": "command", "step": ..., "description": ..., "command": ...,
+         "returncode": ..., "start": ..., "wall": ..., "cpu_user": ..., ...}
+        {"type": "step", "name": ..., "status": ..., "start": ..., "wall": ...,
+         "self": {usage of the step's own thread}, "children": {its commands}}
+        {"type": "run", "status": ..., "wall": ..., "self": ..., "children": ...}
     """
-    print_section("STEP 1: STOP MYSQL INSTANCE")
-    
-    logger.info(f"Stopping MySQL instance on secondary server ({Config.SECONDARY_HOST})")
     
-    # Check current status
-    run_command(
-        f"systemctl status {Config.MYSQL_INSTANCE}",
-        "Checking MySQL instance status (before stop)",
-        check=False
-    )
+    def __init__(self, path: str):
+        self.path = path
+        self.t0 = time.monotonic()
+        self.records: List[Dict[str, object]] = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "w")
     
-    # Stop the instance
-    run_command(
-        f"systemctl stop {Config.MYSQL_INSTANCE}",
-        "Stopping MySQL instance"
-    )
+    def write(self, record: Dict[str, object]):
+        record.setdefault("ts", round(time.time(), 3))
+        with self._lock:
+            self.records.append(record)
+            if not self._file.closed:
+                self._file.write(json.dumps(record, sort_keys=True) + "\n")
+                self._file.flush()
     
-    # Wait for shutdown
-    time.sleep(3)
+    def command(self, argv: Sequence[str], description: str, usage: ResourceUsage,
+                returncode: int, started: float, step: Optional[str]):
+        self.write({"type": "command", "step": step, "description": description,
+                    "command": _format_argv(argv)[:500], "returncode": returncode,
+                    "start": round(started - self.t0, 3), **usage.to_dict()})
     
-    # Verify stopped
-    run_command(
-        f"systemctl status {Config.MYSQL_INSTANCE}",
-        "Verifying MySQL instance is stopped",
-        check=False
-    )
+    def step(self, name: str, status: str, started: float,
+             own: ResourceUsage, children: ResourceUsage):
+        self.write({"type": "step", "name": name, "status": status,
+                    "start": round(started - self.t0, 3), "wall": round(own.wall, 3),
+                    "self": own.to_dict(), "children": children.to_dict()})
     
-    logger.info("✅ MySQL instance stopped successfully")
+    def finish(self, status: str):
+        """Write the run record, close the file, export Prometheus metrics."""
+        wall = time.monotonic() - self.t0
+        self.write({
+            "type": "run", "status": status, "wall": round(wall, 3),
+            "instance": Config.MYSQL_INSTANCE, "host": Config.SECONDARY_HOST,
+            "self": ResourceUsage.from_rusage(
+                resource.getrusage(resource.RUSAGE_SELF), wall).to_dict(),
+            "children": ResourceUsage.from_rusage(
+                resource.getrusage(resource.RUSAGE_CHILDREN), wall).to_dict(),
+        })
+        with self._lock:
+            self._file.close()
+        logger.info(f"📊 Run report: {self.path}")
+        if Config.PROMETHEUS_TEXTFILE:
+            write_prometheus_textfile(Config.PROMETHEUS_TEXTFILE, self.records)
+            logger.info(f"📊 Prometheus metrics: {Config.PROMETHEUS_TEXTFILE}")
 
 
-# ══════════════════════════════════════════════════════════════════════════════
-#                 STEP 2: DELETE OLD DATA AND BINLOG DIRECTORIES
-# ══════════════════════════════════════════════════════════════════════════════
+_report: Optional[RunReport] = None
+_instrument = threading.local()
 
-def delete_old_directories():
+
+def get_report() -> Optional[RunReport]:
+    """Report of the current run (None outside --full/--step)."""
+    return _report
+
+
+def open_report() -> RunReport:
+    """Start a new run report in Config.REPORT_DIR and make it current."""
+    global _report
+    instance = re.sub(r"[^\w.-]", "_", Config.MYSQL_INSTANCE)
+    _report = RunReport(os.path.join(
+        Config.REPORT_DIR, f"{instance}-{datetime.now():%Y%m%d-%H%M%S}.jsonl"))
+    return _report
+
+
+def wait_with_usage(proc: subprocess.Popen, started: float) -> ResourceUsage:
     """
-    Delete existing mysql1_binlog and mysql_data directories.
-    
-    ⚠️  WARNING: This is a destructive operation!
+    Reap a child with wait4() instead of Popen.wait() to get its rusage.
     
-    Commands:
-        sudo rm -rf /u01/data/mysql1_binlog
-        sudo rm -rf /u01/data
+    The rusage covers the child and the descendants it waited for, so a
+    `sudo mysqlbackup ...` is measured as a whole.
     """
-    print_section("STEP 2: DELETE OLD DATA DIRECTORIES")
+    _, status, ru = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return ResourceUsage.from_rusage(ru, time.monotonic() - started)
+
+
+def communicate_with_usage(proc: subprocess.Popen, started: float,
+                           input: Optional[Union[str, bytes]] = None
+                           ) -> Tuple[object, object, ResourceUsage]:
+    """Popen.communicate() that reaps the child with wait_with_usage()."""
+    outputs = {}
     
-    logger.warning("⚠️  This will DELETE all existing MySQL data!")
+    def _read(name, stream):
+        outputs[name] = stream.read()
     
-    if not confirm_action("Delete all data in binlog and data directories?"):
-        logger.info("Skipping deletion - user cancelled")
-        return False
+    readers = [threading.Thread(target=_read, args=(name, stream), daemon=True)
+               for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))
+               if stream is not None]
+    for reader in readers:
+        reader.start()
+    if proc.stdin is not None:
+        try:
+            if input:
+                proc.stdin.write(input)
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    for reader in readers:
+        reader.join()
+    usage = wait_with_usage(proc, started)
+    return outputs.get("stdout"), outputs.get("stderr"), usage
+
+
+def record_command(argv: Sequence[str], description: str, usage: ResourceUsage,
+                   returncode: int, started: float):
+    """Account a finished command to the running step and the run report."""
+    children = getattr(_instrument, "children", None)
+    if children is not None:
+        children.add(usage)
+    logger.debug(f"   {description}: {usage.wall:.1f}s wall, {usage.cpu:.1f}s CPU, "
+                 f"max RSS {_human_bytes(usage.max_rss_kb * 1024)}, "
+                 f"wrote {_human_bytes(usage.bytes_written)}")
+    if _report:
+        _report.command(argv, description, usage, returncode, started,
+                        getattr(_instrument, "step", None))
+
+
+@contextmanager
+def instrument_step(name: str):
+    """
+    Measure a workflow step: wall time, CPU and block I/O of the thread
+    running it, and the summed usage of the commands it ran.
+    """
+    before = resource.getrusage(_RUSAGE_THREAD)
+    started = time.monotonic()
+    _instrument.step, _instrument.children = name, ResourceUsage()
+    status = "failed"
+    try:
+        yield
+        status = "ok"
+    finally:
+        own = ResourceUsage.between(before, resource.getrusage(_RUSAGE_THREAD),
+                                    time.monotonic() - started)
+        children = _instrument.children
+        _instrument.step = _instrument.children = None
+        if _report:
+            _report.step(name, status, started, own, children)
+
+
+def _prometheus_labels(**labels: object) -> str:
+    def _escape(value: object) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def write_prometheus_textfile(path: str, records: List[Dict[str, object]]):
+    """
+    Export a run's step and run records for node_exporter's textfile
+    collector (written atomically: temp file + rename).
+    """
+    run = next((r for r in records if r["type"] == "run"), {})
+    base = {"instance": Config.MYSQL_INSTANCE, "host": Config.SECONDARY_HOST}
+    metrics = {
+        "mysql_rebuild_step_seconds": ("Wall-clock seconds per workflow step", []),
+        "mysql_rebuild_step_cpu_seconds": ("CPU seconds per step (own thread + commands)", []),
+        "mysql_rebuild_step_max_rss_bytes": ("Peak RSS of the step's commands", []),
+        "mysql_rebuild_step_read_bytes": ("Block I/O read by the step", []),
+        "mysql_rebuild_step_written_bytes": ("Block I/O written by the step", []),
+        "mysql_rebuild_step_success": ("1 if the step succeeded", []),
+        "mysql_rebuild_run_seconds": ("Wall-clock seconds of the whole run", []),
+        "mysql_rebuild_run_success": ("1 if the run succeeded", []),
+        "mysql_rebuild_run_timestamp_seconds": ("Unix time the run finished", []),
+    }
+    for record in records:
+        if record["type"] != "step":
+            continue
+        labels = _prometheus_labels(**base, step=record["name"])
+        own, children = record["self"], record["children"]
+        for mode in ("user", "sys"):
+            metrics["mysql_rebuild_step_cpu_seconds"][1].append(
+                (_prometheus_labels(**base, step=record["name"], mode=mode),
+                 own[f"cpu_{mode}"] + children[f"cpu_{mode}"]))
+        metrics["mysql_rebuild_step_seconds"][1].append((labels, record["wall"]))
+        metrics["mysql_rebuild_step_max_rss_bytes"][1].append(
+            (labels, children["max_rss_kb"] * 1024))
+        metrics["mysql_rebuild_step_read_bytes"][1].append(
+            (labels, own["bytes_read"] + children["bytes_read"]))
+        metrics["mysql_rebuild_step_written_bytes"][1].append(
+            (labels, own["bytes_written"] + children["bytes_written"]))
+        metrics["mysql_rebuild_step_success"][1].append(
+            (labels, int(record["status"] == "ok")))
+    if run:
+        labels = _prometheus_labels(**base)
+        metrics["mysql_rebuild_run_seconds"][1].append((labels, run["wall"]))
+        metrics["mysql_rebuild_run_success"][1].append((labels, int(run["status"] == "ok")))
+        metrics["mysql_rebuild_run_timestamp_seconds"][1].append((labels, run["ts"]))
     
-    # Delete binlog directory
-    run_command(
-        f"rm -rf {Config.BINLOG_DIR}",
-        f"Deleting binlog directory: {Config.BINLOG_DIR}"
-    )
+    lines = []
+    for name, (help_text, samples) in metrics.items():
+        if samples:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{labels} {value}" for labels, value in samples]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+
+def load_run_report(path: str) -> List[Dict[str, object]]:
+    """Read the records of a JSONL run report."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def print_run_report(records: List[Dict[str, object]], width: int = 32):
+    """
+    Print a flame-style summary: one timeline bar per step (position and
+    length on the run's time axis) with its commands nested below, plus
+    wall, CPU, peak RSS and bytes written.
+    """
+    steps = sorted((r for r in records if r["type"] == "step"), key=lambda r: r["start"])
+    commands = sorted((r for r in records if r["type"] == "command"), key=lambda r: r["start"])
+    run = next((r for r in records if r["type"] == "run"), None)
+    wall = run["wall"] if run else max((r["start"] + r["wall"] for r in steps + commands),
+                                       default=0.0)
     
-    # Delete data directory
-    run_command(
-        f"rm -rf {Config.DATA_DIR}",
-        f"Deleting data directory: {Config.DATA_DIR}"
-    )
+    def _bar(start: float, duration: float) -> str:
+        if wall <= 0:
+            return "·" * width
+        first = min(int(start / wall * width), width - 1)
+        last = max(first + 1, min(width, round((start + duration) / wall * width)))
+        return "·" * first + "█" * (last - first) + "·" * (width - last)
     
-    logger.info("✅ Old directories deleted successfully")
-    return True
+    def _row(label: str, record: Dict[str, object], usage: Dict[str, object], cpu: float,
+             written: int):
+        print(f"  {label[:34]:<34} {_bar(record['start'], record['wall'])} "
+              f"{record['wall']:>8.1f}s {cpu:>7.1f}s "
+              f"{_human_bytes(usage['max_rss_kb'] * 1024):>9} {_human_bytes(written):>9}")
+    
+    print_section("RUN REPORT")
+    print(f"  {'Step / command':<34} {'Timeline (0 - ' + f'{wall:.0f}s)':<{width}} "
+          f"{'Wall':>9} {'CPU':>8} {'MaxRSS':>9} {'Written':>9}")
+    print("  " + "-" * (width + 76))
+    groups = [(step["name"], step) for step in steps]
+    if any(c["step"] is None for c in commands):
+        groups.append((None, None))
+    for name, step in groups:
+        if step is not None:
+            own, children = step["self"], step["children"]
+            marker = "" if step["status"] == "ok" else " ✗"
+            _row(step["name"] + marker, step, children,
+                 own["cpu_user"] + own["cpu_sys"] + children["cpu_user"] + children["cpu_sys"],
+                 own["bytes_written"] + children["bytes_written"])
+        else:
+            print("  (outside steps)")
+        for command in (c for c in commands if c["step"] == name):
+            _row("  └ " + command["description"], command, command,
+                 command["cpu_user"] + command["cpu_sys"], command["bytes_written"])
+    print("  " + "-" * (width + 76))
+    if run:
+        children = run["children"]
+        print(f"  Run {run['status']}: {run['wall']:.1f}s wall, "
+              f"{run['self']['cpu_user'] + run['self']['cpu_sys']:.1f}s CPU in this process, "
+              f"{children['cpu_user'] + children['cpu_sys']:.1f}s in commands, "
+              f"{_human_bytes(run['self']['bytes_written'] + children['bytes_written'])} written")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#              STEP 3: CREATE DIRECTORIES WITH PERMISSIONS
+#                      EXECUTION PLAN (DRY RUN)
 # ══════════════════════════════════════════════════════════════════════════════
 
-def create_directories():
-    """
-    Create fresh directories with proper ownership and permissions.
+_MASK_SECRETS = re.compile(r"(PASSWORD\s*=\s*)'(?:[^'\\]|\\.)*'", re.I)
+
+
+@dataclass
+class PlannedOp:
+    """One operation a step would perform."""
+    step: Optional[str]
+    kind: str                       # command, file, sql, wait, write, delete, copy, ...
+    description: str
+    detail: str = ""                # argv, paths or statements
+    size: int = 0                   # Bytes deleted/copied/written (estimate)
     
-    Commands:
-        sudo mkdir /u01/data
-        sudo chown -R mysql:mysql /u01/data
-        sudo chmod 750 /u01/data
-        sudo mkdir /u01/data/mysql1_binlog
-        sudo chmod 750 /u01/data/mysql1_binlog
-        sudo chown -R mysql:mysql /u01/data/mysql1_binlog
+    def key(self) -> str:
+        """Stable text for diffing plans (timestamps masked)."""
+        detail = re.sub(re.escape(Config.TOMBSTONE_SUFFIX) + r"-\d{14}",
+                        Config.TOMBSTONE_SUFFIX + "-<time>", self.detail)
+        return f"[{self.step or '-'}] {self.kind}: {' '.join(detail.split()) or self.description}"
+
+
+class ExecutionPlan:
     """
-    print_section("STEP 3: CREATE DIRECTORIES WITH PERMISSIONS")
+    What a run would do, recorded by the same step code that executes it.
     
-    # Create main data directory
-    run_command(
-        f"mkdir -p {Config.DATA_DIR}",
-        f"Creating data directory: {Config.DATA_DIR}"
-    )
+    While a plan is active (see plan_workflow()), run_command(),
+    stream_command(), run_file_ops(), purge_paths(), SQL execution, waits
+    and prompts record a PlannedOp instead of acting. Directories that
+    would be renamed, created or deleted are tracked in an overlay, so
+    later steps see the tree as it would be at that point (e.g. the
+    tombstone left for purge_tombstones). Deleted and copied bytes come
+    from du-style scans of the trees and of the backup.
+    """
     
-    # Set ownership
-    run_command(
-        f"chown -R {Config.MYSQL_USER}:{Config.MYSQL_GROUP} {Config.DATA_DIR}",
-        f"Setting ownership to {Config.MYSQL_USER}:{Config.MYSQL_GROUP}"
-    )
+    def __init__(self):
+        self.ops: List[PlannedOp] = []
+        self.depends: Dict[str, List[str]] = {}
+        self._paths: Dict[str, Optional[str]] = {}    # path -> real origin (None: gone, "": new)
+        self._lock = threading.Lock()
     
-    # Set permissions
-    run_command(
-        f"chmod {Config.DIR_PERMISSIONS} {Config.DATA_DIR}",
-        f"Setting permissions to {Config.DIR_PERMISSIONS}"
-    )
+    def add(self, kind: str, description: str, detail: str = "",
+            size: int = 0) -> PlannedOp:
+        op = PlannedOp(getattr(_instrument, "step", None), kind, description,
+                       _MASK_SECRETS.sub(r"\1'***'", detail), size)
+        with self._lock:
+            self.ops.append(op)
+        return op
     
-    # Create binlog directory
-    run_command(
-        f"mkdir -p {Config.BINLOG_DIR}",
-        f"Creating binlog directory: {Config.BINLOG_DIR}"
-    )
+    # ── Directory overlay ───────────────────────────────────────────────
     
-    # Set binlog permissions
-    run_command(
-        f"chmod {Config.DIR_PERMISSIONS} {Config.BINLOG_DIR}",
-        f"Setting binlog permissions to {Config.DIR_PERMISSIONS}"
-    )
+    def _origin(self, path: str) -> Optional[str]:
+        path = path.rstrip("/")
+        if path in self._paths:
+            return self._paths[path]
+        return path if os.path.lexists(path) else None
     
-    # Set binlog ownership
-    run_command(
-        f"chown -R {Config.MYSQL_USER}:{Config.MYSQL_GROUP} {Config.BINLOG_DIR}",
-        f"Setting binlog ownership"
-    )
+    def exists(self, path: str) -> bool:
+        return self._origin(path) is not None
     
-    logger.info("✅ Directories created with proper permissions")
-
-
-# ══════════════════════════════════════════════════════════════════════════════
-#                    STEP 4: RESTORE BACKUP
-# ══════════════════════════════════════════════════════════════════════════════
-
-def restore_backup():
-    """
-    Restore MySQL backup using mysqlbackup utility.
+    def size(self, path: str) -> int:
+        """Bytes under path (of the real tree it would have been renamed from)."""
+        origin = self._origin(path)
+        return _tree_bytes(origin) if origin else 0
     
-    Command:
-        sudo mysqlbackup --host=127.0.0.1 --port=3301 \\
-            --datadir=/u01/data \\
-            --log_bin=/u01/data/mysql1_binlog/mysql-bin \\
-            --backup-image=/u01/data/mysqldata/ebackup.mbi \\
-            --backup-dir=/u01/data/mysqldata/backup-tmp1 \\
-            copy-back-and-apply-log
-    """
-    print_section("STEP 4: RESTORE MYSQL BACKUP")
+    def existing(self, prefix: str) -> List[str]:
+        """Paths created or renamed by the plan that start with prefix."""
+        return [path for path, origin in self._paths.items()
+                if path.startswith(prefix) and origin is not None]
     
-    logger.info(f"Backup image: {Config.BACKUP_IMAGE}")
-    logger.info(f"Backup temp dir: {Config.BACKUP_DIR}")
+    def move(self, source: str, target: str):
+        self._paths[target.rstrip("/")] = self._origin(source)
+        self._paths[source.rstrip("/")] = None
     
-    # Build mysqlbackup command
-    mysqlbackup_cmd = (
-        f"mysqlbackup "
-        f"--host=127.0.0.1 "
-        f"--port={Config.SECONDARY_PORT} "
-        f"--datadir={Config.DATA_DIR} "
-        f"--log_bin={Config.BINLOG_DIR}/mysql-bin "
-        f"--backup-image={Config.BACKUP_IMAGE} "
-        f"--backup-dir={Config.BACKUP_DIR} "
-        f"copy-back-and-apply-log"
-    )
+    def remove(self, path: str):
+        self._paths[path.rstrip("/")] = None
     
-    logger.info("Starting backup restoration (this may take a while)...")
+    def create(self, path: str):
+        if not self.exists(path):
+            self._paths[path.rstrip("/")] = ""
     
-    run_command(
-        mysqlbackup_cmd,
-        "Restoring backup with mysqlbackup"
-    )
+    # ── Cost estimate ───────────────────────────────────────────────────
     
-    logger.info(f"📁 Backup path: {Config.BACKUP_PATH}")
-    logger.info("✅ Backup restored successfully")
-
-
-# ══════════════════════════════════════════════════════════════════════════════
-#              STEP 5: SET FINAL PERMISSIONS
-# ══════════════════════════════════════════════════════════════════════════════
-
-def set_permissions():
-    """
-    Set final ownership and permissions on restored directories.
+    @staticmethod
+    def op_seconds(op: PlannedOp) -> float:
+        """Estimated duration of deletes, copies and reads (other operations: 0)."""
+        if op.kind == "delete":
+            rate = Config.DELETE_BYTES_PER_SEC or Config.PLAN_DELETE_BYTES_PER_SEC
+        elif op.kind == "copy":
+            rate = Config.PLAN_COPY_BYTES_PER_SEC
+        elif op.kind == "read":
+            rate = Config.PLAN_READ_BYTES_PER_SEC
+        else:
+            return 0.0
+        return op.size / rate if rate > 0 else 0.0
     
-    Commands:
-        sudo chown -R mysql:mysql /u01/data
-        sudo chmod 750 /u01/data
-        sudo chmod 750 /u01/data/mysql1_binlog
-        sudo chown -R mysql:mysql /u01/data/mysql1_binlog
-    """
-    print_section("STEP 5: SET FINAL PERMISSIONS")
+    def estimate(self) -> Dict[str, object]:
+        """
+        Bytes to delete/copy and the rebuild window: step durations from
+        op_seconds(), scheduled on the step graph as run_workflow_dag()
+        would run them, with the critical path. Same shape as
+        summarize_workflow().
+        """
+        durations = {name: 0.0 for name in self.depends}
+        for op in self.ops:
+            if op.step in durations:
+                durations[op.step] += self.op_seconds(op)
+        
+        finish, start, waited_for = {}, {}, {}
+        steps = [WorkflowStep(name, None, tuple(deps)) for name, deps in self.depends.items()]
+        for step in _topological_order(steps):
+            deps = step.depends_on
+            waited_for[step.name] = max(deps, key=finish.get) if deps else None
+            start[step.name] = max((finish[dep] for dep in deps), default=0.0)
+            finish[step.name] = start[step.name] + durations[step.name]
+        
+        # On ties the step latest in dependency order ends the path
+        path = [max(reversed(list(finish)), key=finish.get)] if finish else []
+        while path and waited_for[path[-1]]:
+            path.append(waited_for[path[-1]])
+        path.reverse()
+        return {
+            "delete_bytes": sum(op.size for op in self.ops if op.kind == "delete"),
+            "copy_bytes": sum(op.size for op in self.ops if op.kind == "copy"),
+            "wall": round(max(finish.values(), default=0.0), 3),
+            "critical_path": path,
+            "critical_path_time": round(sum(durations[name] for name in path), 3),
+            "steps": {name: {"start": round(start[name], 3),
+                             "duration": round(durations[name], 3), "resumed": False}
+                      for name in start},
+        }
     
-    # Set ownership on data directory
-    run_command(
-        f"chown -R {Config.MYSQL_USER}:{Config.MYSQL_GROUP} {Config.DATA_DIR}",
-        f"Setting ownership on {Config.DATA_DIR}"
-    )
+    # ── Persistence and diff ────────────────────────────────────────────
     
-    # Set permissions on data directory
-    run_command(
-        f"chmod {Config.DIR_PERMISSIONS} {Config.DATA_DIR}",
-        f"Setting permissions on {Config.DATA_DIR}"
-    )
+    def to_dict(self) -> Dict[str, object]:
+        return {"target": f"{Config.SECONDARY_HOST}:{Config.SECONDARY_PORT}/"
+                          f"{Config.MYSQL_INSTANCE}",
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "depends": self.depends, "ops": [asdict(op) for op in self.ops],
+                "estimate": self.estimate()}
     
-    # Set permissions on binlog directory
-    run_command(
-        f"chmod {Config.DIR_PERMISSIONS} {Config.BINLOG_DIR}",
-        f"Setting permissions on {Config.BINLOG_DIR}"
-    )
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
     
-    # Set ownership on binlog directory
-    run_command(
-        f"chown -R {Config.MYSQL_USER}:{Config.MYSQL_GROUP} {Config.BINLOG_DIR}",
-        f"Setting ownership on {Config.BINLOG_DIR}"
-    )
+    @classmethod
+    def load(cls, path: str) -> "ExecutionPlan":
+        with open(path) as f:
+            data = json.load(f)
+        plan = cls()
+        plan.depends = data.get("depends", {})
+        plan.ops = [PlannedOp(**op) for op in data.get("ops", [])]
+        return plan
     
-    logger.info("✅ Permissions set successfully")
+    def diff(self, previous: "ExecutionPlan") -> List[str]:
+        """Unified diff of the operations (sizes ignored) against an earlier plan."""
+        return list(difflib.unified_diff(
+            [op.key() for op in previous.ops], [op.key() for op in self.ops],
+            "previous", "current", lineterm="", n=1))
 
 
-# ══════════════════════════════════════════════════════════════════════════════
-#                    STEP 6: START MYSQL INSTANCE
-# ══════════════════════════════════════════════════════════════════════════════
+_plan: Optional[ExecutionPlan] = None
 
-def start_mysql_instance():
+
+def get_plan() -> Optional[ExecutionPlan]:
+    """Plan being recorded (None when running for real)."""
+    return _plan
+
+
+def planned(kind: str, description: str, detail: str = "", size: int = 0) -> bool:
     """
-    Start the MySQL instance after restoration.
+    Record an operation in the active plan.
     
-    Commands:
-        sudo systemctl start mysqld@mysql1
-        sudo systemctl status mysqld@mysql1
-    """
-    print_section("STEP 6: START MYSQL INSTANCE")
+    Helpers with side effects call this first and return early while
+    planning:
+        if planned("command", description, _format_argv(argv)):
+            return 0, "", ""
     
-    # Start the instance
-    run_command(
-        f"systemctl start {Config.MYSQL_INSTANCE}",
-        "Starting MySQL instance"
-    )
+    Returns:
+        True if a plan is being recorded (do not perform the operation)
+    """
+    if _plan is None:
+        return False
+    _plan.add(kind, description, detail, size)
+    return True
+
+
+def _lexists(path: str) -> bool:
+    """os.path.lexists(), or whether path would exist at this point of the plan."""
+    return _plan.exists(path) if _plan is not None else os.path.lexists(path)
+
+
+def print_plan(plan: ExecutionPlan):
+    """Print a plan step by step with sizes, estimated durations and window."""
+    estimate = plan.estimate()
+    print_section(f"EXECUTION PLAN (DRY RUN): {Config.MYSQL_INSTANCE} "
+                  f"on {Config.SECONDARY_HOST}")
+    steps = list(plan.depends) + [None] * any(op.step not in plan.depends for op in plan.ops)
+    for name in steps:
+        deps = plan.depends.get(name)
+        duration = estimate["steps"].get(name, {}).get("duration", 0.0)
+        print(f"\n  [{name or 'outside steps'}]"
+              + (f" after {', '.join(deps)}" if deps else "")
+              + (f"  ~{duration / 60:.1f} min" if duration else ""))
+        ops = [op for op in plan.ops if (op.step if op.step in plan.depends else None) == name]
+        if not ops:
+            print("    (nothing to do)")
+        for op in ops:
+            size = f"  ({_human_bytes(op.size)})" if op.size else ""
+            print(f"    {op.kind:<8} {op.description}{size}")
+            for line in op.detail.splitlines():
+                if line.strip() and line.strip() != op.description:
+                    print(f"             {line.strip()[:110]}")
+    
+    print("\n  " + "-" * 68)
+    print(f"  {len(plan.ops)} operations; would delete "
+          f"{_human_bytes(estimate['delete_bytes'])}, copy "
+          f"{_human_bytes(estimate['copy_bytes'])} from the backup")
+    print(f"  Estimated window: ~{estimate['wall'] / 60:.1f} min "
+          f"(critical path: {' → '.join(estimate['critical_path']) or '-'})")
+    print(f"  Assumes {_human_bytes(Config.PLAN_COPY_BYTES_PER_SEC)}/s restore, "
+          f"{_human_bytes(Config.DELETE_BYTES_PER_SEC or Config.PLAN_DELETE_BYTES_PER_SEC)}/s "
+          f"delete; stop/start/recovery time not included")
+
+
+def print_plan_diff(plan: ExecutionPlan, previous: ExecutionPlan) -> bool:
+    """Print what changed since an earlier plan; True if anything did."""
+    changes = plan.diff(previous)
+    print_section("PLAN DIFF")
+    if not changes:
+        print("  No changes")
+        return False
+    for line in changes:
+        print(f"  {line}")
+    return True
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                           UTILITY FUNCTIONS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _is_root() -> bool:
+    """True when the script already runs with root privileges."""
+    return os.geteuid() == 0
+
+
+def _needs_sudo() -> bool:
+    """True when privileged work must go through sudo."""
+    return Config.USE_SUDO and not _is_root()
+
+
+def _is_nested(path: str, parent: str) -> bool:
+    """True if path lies inside directory parent."""
+    return path.startswith(parent.rstrip("/") + "/")
+
+
+def _format_argv(argv: Sequence[str]) -> str:
+    return " ".join(shlex.quote(arg) for arg in argv)
+
+
+def _build_argv(cmd: Union[str, Sequence[str]], sudo: bool) -> List[str]:
+    """Split a command and add sudo when requested and not already root."""
+    argv = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+    if argv and argv[0] == "sudo":
+        argv = argv[1:]
+    if sudo and _needs_sudo():
+        argv = ["sudo"] + argv
+    return argv
+
+
+def run_command(cmd: Union[str, Sequence[str]], description: str,
+                check: bool = True, sudo: bool = True,
+                input: Optional[str] = None) -> Tuple[int, str, str]:
+    """
+    Execute a command with logging.
     
-    # Wait for startup
-    time.sleep(5)
+    Commands run directly from an argv list (no shell). A string is split
+    with shlex for convenience; shell syntax such as pipes is not supported.
     
-    # Check status
-    run_command(
-        f"systemctl status {Config.MYSQL_INSTANCE}",
-        "Checking MySQL instance status"
-    )
+    Args:
+        cmd: Command to execute (argv list or string)
+        description: Human-readable description
+        check: Raise exception on non-zero exit
+        sudo: Run with sudo (skipped when already root)
+        input: Text passed on stdin
+        
+    Returns:
+        Tuple of (return_code, stdout, stderr)
+    """
+    argv = _build_argv(cmd, sudo)
+    if planned("command", description, _format_argv(argv)):
+        return 0, "", ""
     
-    logger.info("✅ MySQL instance started successfully")
+    logger.info(f"🔧 {description}")
+    logger.debug(f"   Command: {_format_argv(argv)}")
+    
+    try:
+        started = time.monotonic()
+        proc = subprocess.Popen(argv, stdin=subprocess.PIPE if input is not None else None,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        stdout, stderr, usage = communicate_with_usage(proc, started, input)
+        result = subprocess.CompletedProcess(argv, proc.returncode, stdout, stderr)
+        record_command(argv, description, usage, result.returncode, started)
+        
+        if result.returncode == 0:
+            logger.info("   ✅ Success")
+        else:
+            logger.error(f"   ❌ Failed (exit code: {result.returncode})")
+            if result.stderr:
+                logger.error(f"   Error: {result.stderr.strip()}")
+        
+        if check and result.returncode != 0:
+            raise subprocess.CalledProcessError(
+                result.returncode, argv, result.stdout, result.stderr
+            )
+        
+        return result.returncode, result.stdout, result.stderr
+        
+    except Exception as e:
+        logger.error(f"   💥 Exception: {e}")
+        if check:
+            raise
+        return -1, "", str(e)
+
+
+def move_path(source: str, target: str, description: str, check: bool = True) -> int:
+    """
+    Rename a file or directory with `mv -T` (see run_command), keeping the
+    directory overlay of a dry-run plan in step.
+    
+    Returns:
+        The exit code of mv
+    """
+    returncode, _, _ = run_command(["mv", "-T", source, target], description, check=check)
+    if _plan is not None:
+        _plan.move(source, target)
+    return returncode
+
+
+@contextmanager
+def private_temp_file(prefix: str, name: str, content: str,
+                      description: str) -> Iterator[str]:
+    """
+    Yield the path of a 0600 file holding content, in a fresh 0711 temp
+    directory (another user can open the file once it is handed over with
+    chown); both are removed after the block.
+    
+    While planning, only a "write" op is recorded and a placeholder path
+    is yielded, so a dry run leaves nothing on disk.
+    """
+    placeholder = os.path.join("/tmp", f"{prefix}<tmp>", name)
+    if planned("write", description, placeholder, len(content)):
+        yield placeholder
+        return
+    with tempfile.TemporaryDirectory(prefix=prefix) as tmp:
+        os.chmod(tmp, 0o711)
+        path = os.path.join(tmp, name)
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+            f.write(content)
+        yield path
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#                 STEP 7: CONFIGURE REPLICATION
+#                      STREAMING COMMANDS WITH PROGRESS
 # ══════════════════════════════════════════════════════════════════════════════
 
-def generate_replication_sql() -> str:
+_SIZE_UNITS = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "TB": 1 << 40}
+_MEB_PROGRESS = re.compile(
+    r"Progress:\s*([\d.]+)\s*of\s*([\d.]+)\s*(B|KB|MB|GB|TB)\b", re.I
+)
+
+
+def parse_meb_progress(line: str) -> Optional[Tuple[int, Optional[int]]]:
     """
-    Generate SQL commands for configuring replication.
+    Parse a mysqlbackup --show-progress line into (bytes_done, bytes_total).
+    
+    Example:
+        mysqlbackup: INFO: Progress: 191 of 1237 MB; state: Copying...
+    """
+    match = _MEB_PROGRESS.search(line)
+    if not match:
+        return None
+    unit = _SIZE_UNITS[match.group(3).upper()]
+    return int(float(match.group(1)) * unit), int(float(match.group(2)) * unit)
+
+
+@dataclass
+class ProgressEvent:
+    """Periodic progress report for a long-running command."""
+    description: str
+    elapsed: float
+    bytes_done: Optional[int] = None
+    bytes_total: Optional[int] = None
+    throughput: Optional[float] = None     # bytes/s since the last event
+    eta: Optional[float] = None            # seconds
+    lines: int = 0
+    last_line: str = ""
+    stalled: bool = False
+    
+    def summary(self) -> str:
+        parts = [f"{self.elapsed / 60:.1f} min"]
+        if self.bytes_done is not None:
+            done = f"{self.bytes_done / (1 << 30):.2f}"
+            total = (f" of {self.bytes_total / (1 << 30):.2f}"
+                     if self.bytes_total else "")
+            percent = (f" ({100 * self.bytes_done / self.bytes_total:.1f}%)"
+                       if self.bytes_total else "")
+            parts.append(f"{done}{total} GiB{percent}")
+        if self.throughput is not None:
+            parts.append(f"{self.throughput / (1 << 20):.1f} MiB/s")
+        if self.eta is not None:
+            parts.append(f"ETA {self.eta / 60:.1f} min")
+        if self.bytes_done is None:
+            parts.append(f"{self.lines} lines, last: {self.last_line[:60]}")
+        return " | ".join(parts)
+
+
+def log_progress_event(event: ProgressEvent):
+    """Default progress sink: human-readable line plus JSON at debug level."""
+    if event.stalled:
+        logger.warning(f"   ⚠️  No progress for {Config.STALL_TIMEOUT}s: {event.summary()}")
+    else:
+        logger.info(f"   📈 {event.summary()}")
+    logger.debug(f"   progress {json.dumps(asdict(event))}")
+
+
+def stream_command(cmd: Union[str, Sequence[str]], description: str,
+                   progress_parser: Optional[Callable[[str], Optional[Tuple[int, Optional[int]]]]] = None,
+                   on_progress: Callable[[ProgressEvent], None] = log_progress_event,
+                   check: bool = True, sudo: bool = True,
+                   interval: Optional[float] = None) -> Tuple[int, str, str]:
+    """
+    Run a long command, reading its output line by line as it is produced.
+    
+    Only the last Config.OUTPUT_TAIL_LINES lines are kept in memory.
+    Every `interval` seconds (default Config.PROGRESS_INTERVAL) a
+    ProgressEvent is passed to on_progress, with bytes/throughput/ETA when
+    progress_parser recognises progress lines; events are flagged stalled
+    when nothing has progressed for Config.STALL_TIMEOUT seconds.
     
+    Args:
+        cmd: Command to execute (argv list or string)
+        description: Human-readable description
+        progress_parser: Maps an output line to (bytes_done, bytes_total)
+        on_progress: Receives periodic ProgressEvents
+        check: Raise exception on non-zero exit
+        sudo: Run with sudo (skipped when already root)
+        interval: Seconds between progress events
+        
     Returns:
-        SQL script as string
+        Tuple of (return_code, output_tail, "") - stderr is merged into stdout
     """
-    sql = f"""
--- ================================================================================
--- MySQL REPLICATION CONFIGURATION
--- Run these commands on the SECONDARY server via MySQL Workbench or CLI
--- ================================================================================
+    argv = _build_argv(cmd, sudo)
+    if planned("command", description, _format_argv(argv)):
+        return 0, "", ""
+    interval = Config.PROGRESS_INTERVAL if interval is None else interval
+    
+    logger.info(f"🔧 {description}")
+    logger.debug(f"   Command: {_format_argv(argv)}")
+    
+    try:
+        proc = subprocess.Popen(argv, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True,
+                                errors="replace", bufsize=1)
+    except Exception as e:
+        logger.error(f"   💥 Exception: {e}")
+        if check:
+            raise
+        return -1, "", str(e)
+    
+    lines = queue.Queue()
+    
+    def _reader():
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+    
+    threading.Thread(target=_reader, name="stream-reader", daemon=True).start()
+    
+    tail = deque(maxlen=Config.OUTPUT_TAIL_LINES)
+    start = last_event = last_change = time.monotonic()
+    line_count = 0
+    progress = None
+    event_progress = None
+    
+    while True:
+        try:
+            line = lines.get(timeout=max(0.1, last_event + interval - time.monotonic()))
+        except queue.Empty:
+            line = ""
+        if line is None:
+            break
+        
+        if line:
+            line = line.rstrip("\n")
+            tail.append(line)
+            line_count += 1
+            logger.debug(f"   | {line}")
+            if progress_parser is None:
+                last_change = time.monotonic()
+            else:
+                parsed = progress_parser(line)
+                if parsed and parsed != progress:
+                    progress = parsed
+                    last_change = time.monotonic()
+        
+        now = time.monotonic()
+        if now - last_event < interval:
+            continue
+        
+        event = ProgressEvent(description, now - start, lines=line_count,
+                              last_line=tail[-1] if tail else "")
+        if progress:
+            event.bytes_done, event.bytes_total = progress
+            if event_progress:
+                event.throughput = (progress[0] - event_progress[0]) / (now - last_event)
+            elif now > start:
+                event.throughput = progress[0] / (now - start)
+            if event.bytes_total and event.throughput:
+                event.eta = max(event.bytes_total - event.bytes_done, 0) / event.throughput
+        event.stalled = now - last_change >= Config.STALL_TIMEOUT
+        on_progress(event)
+        last_event, event_progress = now, progress
+    
+    usage = wait_with_usage(proc, start)
+    returncode = proc.returncode
+    record_command(argv, description, usage, returncode, start)
+    output = "\n".join(tail)
+    
+    if returncode == 0:
+        logger.info(f"   ✅ Success ({(time.monotonic() - start) / 60:.1f} min)")
+    else:
+        logger.error(f"   ❌ Failed (exit code: {returncode})")
+        for line in list(tail)[-20:]:
+            logger.error(f"   | {line}")
+        if check:
+            raise subprocess.CalledProcessError(returncode, argv, output, "")
+    
+    return returncode, output, ""
 
--- Step 7.1: Check current replica status
-SHOW REPLICA STATUS;
 
--- Step 7.2: Stop any existing replication
-STOP REPLICA;
+@dataclass
+class FileOp:
+    """
+    One filesystem operation for run_file_ops().
+    
+    action: "mkdir" (mkdir -p), "chown" (user:group), "chmod" (octal mode)
+    """
+    action: str
+    path: str
+    recursive: bool = False
+    
+    def argv(self) -> List[str]:
+        """Equivalent coreutils command."""
+        if self.action == "mkdir":
+            return ["mkdir", "-p", self.path]
+        flag = ["-R"] if self.recursive else []
+        if self.action == "chown":
+            return ["chown"] + flag + [f"{Config.MYSQL_USER}:{Config.MYSQL_GROUP}", self.path]
+        if self.action == "chmod":
+            return ["chmod"] + flag + [Config.DIR_PERMISSIONS, self.path]
+        raise ValueError(f"Unknown file operation: {self.action}")
 
--- Step 7.3: Reset replica configuration
-RESET REPLICA ALL;
 
--- Step 7.4: Configure replication source (Primary server)
-CHANGE REPLICATION SOURCE TO
-    SOURCE_HOST='{Config.PRIMARY_HOST}',
-    SOURCE_PORT={Config.PRIMARY_PORT},
-    SOURCE_USER='{Config.REPLICATION_USER}',
-    SOURCE_PASSWORD='{Config.REPLICATION_PASSWORD}',
-    SOURCE_AUTO_POSITION=1,
-    GET_SOURCE_PUBLIC_KEY=1;
+def _apply_file_op_natively(op: FileOp):
+    """Perform one FileOp with os.* calls (requires root for chown)."""
+    if op.action == "mkdir":
+        os.makedirs(op.path, exist_ok=True)
+        return
+    
+    if op.action == "chown":
+        uid = pwd.getpwnam(Config.MYSQL_USER).pw_uid
+        gid = grp.getgrnam(Config.MYSQL_GROUP).gr_gid
+        apply = lambda path: os.chown(path, uid, gid, follow_symlinks=False)
+    elif op.action == "chmod":
+        mode = int(Config.DIR_PERMISSIONS, 8)
+        apply = lambda path: os.chmod(path, mode)
+    else:
+        raise ValueError(f"Unknown file operation: {op.action}")
+    
+    if op.action == "chown" and op.recursive:
+        fix_ownership([op.path], uid, gid)
+        return
+    
+    apply(op.path)
+    if op.recursive:
+        for root, dirs, files in os.walk(op.path):
+            for name in dirs + files:
+                path = os.path.join(root, name)
+                if op.action == "chmod" and os.path.islink(path):
+                    continue
+                apply(path)
 
--- Step 7.5: Start replication
-START REPLICA;
 
--- Step 7.6: Verify replication status
-SHOW REPLICA STATUS\\G
+def run_file_ops(ops: Sequence[FileOp], description: str,
+                 check: bool = True) -> Tuple[int, str, str]:
+    """
+    Run a group of mkdir/chown/chmod operations in one go.
+    
+    As root the operations are done natively with os.makedirs/os.chown/
+    os.chmod; otherwise they are joined into a single `sudo sh -c` call so
+    the whole group pays for one sudo authentication instead of one each.
+    Logging and the return/exception contract match run_command().
+    
+    Returns:
+        Tuple of (return_code, stdout, stderr)
+    """
+    if planned("file", description, "\n".join(_format_argv(op.argv()) for op in ops)):
+        for op in ops:
+            if op.action == "mkdir":
+                _plan.create(op.path)
+        return 0, "", ""
+    
+    for op in ops:
+        logger.debug(f"   File op: {_format_argv(op.argv())}")
+    
+    if _needs_sudo():
+        script = "set -e\n" + "\n".join(_format_argv(op.argv()) for op in ops)
+        return run_command(["sh", "-c", script], description, check=check)
+    
+    logger.info(f"🔧 {description}")
+    try:
+        for op in ops:
+            _apply_file_op_natively(op)
+    except Exception as e:
+        logger.error(f"   💥 Exception: {e}")
+        if check:
+            raise
+        return -1, "", str(e)
+    
+    logger.info("   ✅ Success")
+    return 0, "", ""
 
--- ================================================================================
--- EXPECTED OUTPUT:
---   Replica_IO_Running: Yes
---   Replica_SQL_Running: Yes
---   Seconds_Behind_Source: 0 (or small number)
--- ================================================================================
-"""
-    return sql
 
+# ══════════════════════════════════════════════════════════════════════════════
+#                      THROTTLED DELETION ENGINE
+# ══════════════════════════════════════════════════════════════════════════════
 
-def configure_replication():
+class RateLimiter:
     """
-    Display and optionally execute replication configuration SQL.
+    Token bucket: acquire(n) blocks just long enough that on average no more
+    than `rate` units per second pass. A rate of 0 disables the limit.
+    """
+    
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, amount: float = 1.0):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+
+
+@dataclass
+class PurgeResult:
+    """Counters reported by purge_tree()."""
+    files: int = 0
+    dirs: int = 0
+    bytes: int = 0
+    truncations: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    
+    def summary(self) -> str:
+        rate = self.bytes / self.elapsed / (1 << 20) if self.elapsed else 0.0
+        return (f"removed {self.files:,} files, {self.dirs:,} dirs, "
+                f"{self.bytes / (1 << 30):.2f} GiB ({self.truncations:,} truncate steps), "
+                f"errors {self.errors:,} in {self.elapsed:.1f}s ({rate:.1f} MiB/s)")
+
+
+_PURGE_PROGRESS = re.compile(r"^PURGE-PROGRESS (\d+) (\d+)$")
+
+
+def parse_purge_progress(line: str) -> Optional[Tuple[int, Optional[int]]]:
+    """Parse the progress lines the --purge helper prints."""
+    match = _PURGE_PROGRESS.match(line.strip())
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def _tree_bytes(path: str) -> int:
+    """Total size of the regular files under path."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def purge_tree(path: str, on_progress: Callable[[ProgressEvent], None] = log_progress_event,
+               interval: Optional[float] = None) -> PurgeResult:
+    """
+    Delete a directory tree without saturating the disk.
+    
+    Files larger than Config.DELETE_TRUNCATE_STEP are shrunk step by step
+    with truncate() before the unlink, so the filesystem frees their
+    extents in small pieces instead of one long stall (the classic trick
+    for dropping big .ibd files). Freed bytes are limited to
+    Config.DELETE_BYTES_PER_SEC and unlink/truncate/rmdir calls to
+    Config.DELETE_OPS_PER_SEC. Files with other hard links are only
+    unlinked. A mount point itself is emptied but kept.
+    
+    Args:
+        path: Directory to delete
+        on_progress: Receives a ProgressEvent every `interval` seconds
+        interval: Seconds between progress events (default
+            Config.PROGRESS_INTERVAL)
+        
+    Returns:
+        Counters; entries that vanished meanwhile are not errors
+    """
+    interval = Config.PROGRESS_INTERVAL if interval is None else interval
+    bytes_limit = RateLimiter(Config.DELETE_BYTES_PER_SEC)
+    ops_limit = RateLimiter(Config.DELETE_OPS_PER_SEC)
+    step = max(Config.DELETE_TRUNCATE_STEP, 1)
+    result = PurgeResult()
+    total = _tree_bytes(path)
+    start = last_event = time.monotonic()
+    last_bytes = 0
+    
+    def _progress():
+        nonlocal last_event, last_bytes
+        now = time.monotonic()
+        if now - last_event < interval:
+            return
+        throughput = (result.bytes - last_bytes) / (now - last_event)
+        on_progress(ProgressEvent(
+            f"Purging {path}", now - start, result.bytes, total, throughput,
+            max(total - result.bytes, 0) / throughput if throughput else None))
+        last_event, last_bytes = now, result.bytes
+    
+    def _remove(entry: str, is_dir: bool):
+        try:
+            if is_dir:
+                ops_limit.acquire()
+                os.rmdir(entry)
+                result.dirs += 1
+                return
+            st = os.lstat(entry)
+            size = st.st_size
+            if st.st_nlink == 1 and size > step:
+                while size > step:
+                    ops_limit.acquire()
+                    bytes_limit.acquire(step)
+                    size -= step
+                    os.truncate(entry, size)
+                    result.bytes += step
+                    result.truncations += 1
+                    _progress()
+            freed = size if st.st_nlink == 1 else 0
+            ops_limit.acquire()
+            bytes_limit.acquire(freed)
+            os.unlink(entry)
+            result.files += 1
+            result.bytes += freed
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            result.errors += 1
+            logger.debug(f"   purge {entry}: {e}")
+        _progress()
+    
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            _remove(os.path.join(root, name), is_dir=False)
+        for name in dirs:
+            entry = os.path.join(root, name)
+            _remove(entry, is_dir=not os.path.islink(entry))
+    if os.path.islink(path) or not os.path.isdir(path):
+        _remove(path, is_dir=False)
+    elif not os.path.ismount(path):
+        _remove(path, is_dir=True)
+    
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+def purge_paths(paths: Sequence[str], description: str):
+    """
+    Delete directory trees with purge_tree(), one after another.
+    
+    As root (or with Config.USE_SUDO off) the trees are deleted natively;
+    otherwise the script re-runs itself under sudo (--purge) and its
+    progress is streamed back.
+    
+    Raises:
+        OSError: If any entry could not be removed
+    """
+    if _plan is not None:
+        for path in paths:
+            planned("delete", description, path, _plan.size(path))
+            _plan.remove(path)
+        return
+    
+    if _needs_sudo():
+        _, output, _ = stream_command(
+            _privileged_helper_argv("--purge", *paths, settings=(
+                "DELETE_BYTES_PER_SEC", "DELETE_OPS_PER_SEC",
+                "DELETE_TRUNCATE_STEP")),
+            f"{description} (privileged helper)",
+            progress_parser=parse_purge_progress
+        )
+        for line in output.strip().splitlines()[-1:]:
+            logger.info(f"   {line}")
+        return
+    
+    logger.info(f"🔧 {description}")
+    for path in paths:
+        result = purge_tree(path)
+        if result.errors:
+            logger.error(f"   ❌ {path}: {result.summary()}")
+            raise OSError(f"Could not remove {result.errors} entries under {path}")
+        logger.info(f"   ✅ {path}: {result.summary()}")
+
+
+def tombstone_directory(path: str) -> Optional[str]:
+    """
+    Rename a directory to a sibling tombstone so its path is free at once.
+    
+    Command:
+        sudo mv -T /u01/data /u01/data.deleting-20240101120000
+    
+    Returns:
+        The tombstone path, or None if path does not exist or cannot be
+        renamed (a mount point or another filesystem than its parent)
+    """
+    path = path.rstrip("/")
+    if not _lexists(path):
+        return None
+    if os.stat(path).st_dev != os.stat(os.path.dirname(path) or "/").st_dev:
+        return None
+    target = f"{path}{Config.TOMBSTONE_SUFFIX}-{datetime.now():%Y%m%d%H%M%S}"
+    move_path(path, target, f"Renaming {path} to {target}")
+    return target
+
+
+def tombstones_of(path: str) -> List[str]:
+    """Tombstones of path left to purge (including from earlier runs)."""
+    prefix = path.rstrip("/") + Config.TOMBSTONE_SUFFIX + "-"
+    paths = glob.glob(glob.escape(prefix) + "*")
+    if _plan is not None:
+        paths = [p for p in paths if _plan.exists(p)] + _plan.existing(prefix)
+    return sorted(set(paths))
+
+
+def _privileged_helper_argv(*args: str, settings: Sequence[str] = ()) -> List[str]:
+    """argv re-running this script (under sudo) with some settings passed on."""
+    argv = [sys.executable, os.path.abspath(__file__)]
+    if settings:
+        argv += ["--config-json", json.dumps({key: getattr(Config, key) for key in settings})]
+    return argv + list(args)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      PERMISSION FIXUP ENGINE
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class PermissionFixResult:
+    """Counters reported by fix_ownership()."""
+    scanned: int = 0
+    changed: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    
+    def summary(self) -> str:
+        rate = self.scanned / self.elapsed if self.elapsed else 0.0
+        return (f"scanned {self.scanned:,} entries, changed {self.changed:,}, "
+                f"errors {self.errors:,} in {self.elapsed:.1f}s ({rate:,.0f} entries/s)")
+
+
+def dedupe_roots(paths: Sequence[str]) -> List[str]:
+    """
+    Drop paths nested inside another path in the list.
+    
+    BINLOG_DIR lives inside DATA_DIR, so walking both would visit every
+    binlog twice.
+    """
+    roots = []
+    for path in sorted({os.path.normpath(p) for p in paths}):
+        if not any(path == r or path.startswith(r.rstrip(os.sep) + os.sep)
+                   for r in roots):
+            roots.append(path)
+    return roots
+
+
+def _chown_if_needed(path: str, uid: int, gid: int,
+                     result: PermissionFixResult, lock: threading.Lock):
+    """lstat one path and chown it only if owner or group differ."""
+    try:
+        st = os.lstat(path)
+        changed = st.st_uid != uid or st.st_gid != gid
+        if changed:
+            os.chown(path, uid, gid, follow_symlinks=False)
+    except OSError as e:
+        logger.debug(f"   chown failed: {path}: {e}")
+        with lock:
+            result.scanned += 1
+            result.errors += 1
+        return
+    with lock:
+        result.scanned += 1
+        result.changed += changed
+
+
+def fix_ownership(roots: Sequence[str], uid: int, gid: int,
+                  workers: Optional[int] = None) -> PermissionFixResult:
+    """
+    Recursively chown trees in ONE pass, issuing chown only where needed.
+    
+    Directories are listed with os.scandir; each directory and each chunk of
+    Config.PERMISSION_CHUNK entries becomes a task on a thread pool, so a
+    single schema directory with millions of .ibd files is still spread
+    across workers. Nested roots are walked once. Symlinks are chowned
+    themselves, never followed.
+    
+    Args:
+        roots: Top-level paths (chowned too)
+        uid/gid: Target owner and group
+        workers: Thread pool size (default: Config.PERMISSION_WORKERS)
+    """
+    workers = workers or Config.PERMISSION_WORKERS
+    result = PermissionFixResult()
+    lock = threading.Lock()
+    start = time.monotonic()
+    
+    def _scan(directory: str) -> Tuple[List[str], List[List[str]]]:
+        _chown_if_needed(directory, uid, gid, result, lock)
+        subdirs, files = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    else:
+                        files.append(entry.path)
+        except OSError as e:
+            logger.debug(f"   scandir failed: {directory}: {e}")
+            with lock:
+                result.errors += 1
+        chunk = Config.PERMISSION_CHUNK
+        return subdirs, [files[i:i + chunk] for i in range(0, len(files), chunk)]
+    
+    def _fix_files(paths: List[str]) -> Tuple[List[str], List[List[str]]]:
+        for path in paths:
+            _chown_if_needed(path, uid, gid, result, lock)
+        return [], []
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers),
+                            thread_name_prefix="chown") as pool:
+        pending = set()
+        for root in dedupe_roots(roots):
+            if os.path.isdir(root) and not os.path.islink(root):
+                pending.add(pool.submit(_scan, root))
+            else:
+                pending.add(pool.submit(_fix_files, [root]))
+        
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                subdirs, file_chunks = future.result()
+                pending.update(pool.submit(_scan, d) for d in subdirs)
+                pending.update(pool.submit(_fix_files, c) for c in file_chunks)
+    
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+def apply_mysql_permissions(roots: Optional[Sequence[str]] = None,
+                            create: bool = False) -> Optional[PermissionFixResult]:
+    """
+    Give DATA_DIR and BINLOG_DIR mysql ownership and DIR_PERMISSIONS.
+    
+    As root: one parallel ownership pass over the deduplicated trees plus a
+    chmod of the two top-level directories. Otherwise the script re-runs
+    itself once under sudo (--fix-permissions) to do the same.
+    
+    Args:
+        roots: Directories to fix (default: DATA_DIR and BINLOG_DIR)
+        create: Create the directories first (mkdir -p)
+        
+    Returns:
+        Counters from the ownership pass (None when run via the helper)
+    """
+    roots = list(roots or [Config.DATA_DIR, Config.BINLOG_DIR])
+    ops = [FileOp("mkdir", path) for path in roots] if create else []
+    ops += [FileOp("chmod", path) for path in roots]
+    description = (f"{'Creating and setting' if create else 'Setting'} "
+                   f"{Config.DIR_PERMISSIONS} on {', '.join(roots)}")
+    
+    if _plan is not None:
+        # Planned as the equivalent coreutils commands, whichever way it would run
+        run_file_ops(ops + [FileOp("chown", root, recursive=True)
+                            for root in dedupe_roots(roots)],
+                     f"{description}, owner {Config.MYSQL_USER}:{Config.MYSQL_GROUP}")
+        return None
+    
+    if _needs_sudo():
+        _, stdout, _ = run_command(
+            _privileged_helper_argv(
+                "--fix-permissions", *(["--create"] if create else []), *roots,
+                settings=("MYSQL_USER", "MYSQL_GROUP", "DIR_PERMISSIONS",
+                          "PERMISSION_WORKERS", "PERMISSION_CHUNK")),
+            f"Fixing ownership/permissions on {', '.join(dedupe_roots(roots))} "
+            f"(privileged helper)"
+        )
+        for line in stdout.strip().splitlines()[-1:]:
+            logger.info(f"   {line}")
+        return None
+    
+    run_file_ops(ops, description)
+    
+    logger.info(f"🔧 Setting ownership to {Config.MYSQL_USER}:{Config.MYSQL_GROUP} "
+                f"on {', '.join(dedupe_roots(roots))}")
+    result = fix_ownership(
+        roots,
+        pwd.getpwnam(Config.MYSQL_USER).pw_uid,
+        grp.getgrnam(Config.MYSQL_GROUP).gr_gid
+    )
+    if result.errors:
+        logger.error(f"   ❌ {result.summary()}")
+        raise OSError(f"Ownership fix failed for {result.errors} entries")
+    logger.info(f"   ✅ {result.summary()}")
+    return result
+
+
+def print_section(title: str):
+    """Print a section header."""
+    print("\n" + "=" * 70)
+    print(f"  {title}")
+    print("=" * 70)
+
+
+def confirm_action(message: str) -> bool:
+    """Ask user for confirmation (automatic "yes" with Config.ASSUME_YES)."""
+    if planned("prompt", message):
+        return True
+    if Config.ASSUME_YES:
+        logger.info(f"⚠️  {message} (y/n): y [--yes]")
+        return True
+    response = input(f"\n⚠️  {message} (y/n): ").strip().lower()
+    return response == 'y'
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                           SQL EXECUTION LAYER
+# ══════════════════════════════════════════════════════════════════════════════
+
+Row = Dict[str, Optional[str]]
+
+_ROW_RETURNING = re.compile(r"^\s*(SELECT|SHOW|DESCRIBE|DESC|EXPLAIN|WITH)\b", re.I)
+_XSI_NIL = "{http://www.w3.org/2001/XMLSchema-instance}nil"
+
+
+def _normalize_statement(sql: str) -> str:
+    """Strip whitespace, trailing terminators and the CLI-only \\G suffix."""
+    sql = sql.strip()
+    if sql.endswith("\\G"):
+        sql = sql[:-2]
+    return sql.rstrip().rstrip(";").rstrip()
+
+
+def _as_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+@contextmanager
+def mysql_defaults_file(password: str) -> Iterator[str]:
+    """
+    Yield the path of a private 0600 option file holding the client
+    password, for --defaults-extra-file; it is removed after the block.
+    """
+    with tempfile.NamedTemporaryFile("w", prefix="mysql-client-",
+                                     suffix=".cnf") as defaults:
+        os.chmod(defaults.name, 0o600)
+        escaped = password.replace("\\", "\\\\").replace('"', '\\"')
+        defaults.write(f'[client]\npassword="{escaped}"\n')
+        defaults.flush()
+        yield defaults.name
+
+
+def parse_mysql_xml(output: str) -> List[List[Row]]:
+    """
+    Parse `mysql --xml` output into one list of rows per result set.
+    
+    Values are strings, NULL is None.
+    """
+    result_sets = []
+    for block in re.findall(r"<resultset\b.*?</resultset>", output, re.S):
+        rows = []
+        for row in ET.fromstring(block).iter("row"):
+            rows.append({
+                field.get("name"): (None if field.get(_XSI_NIL) == "true"
+                                    else (field.text or ""))
+                for field in row.iter("field")
+            })
+        result_sets.append(rows)
+    return result_sets
+
+
+class SQLExecutor:
+    """
+    Runs SQL against one MySQL target, reusing connections across calls.
+    
+    With PyMySQL installed, up to `pool_size` connections are opened lazily
+    and kept for the lifetime of the executor, so every statement in the
+    workflow shares the same authenticated sessions. Without a driver each
+    call becomes ONE `mysql` invocation with the statements on stdin and the
+    password in a private defaults file (never on the command line).
+    
+    All values are returned as strings (None for NULL), whichever path ran.
+    """
+    
+    POOL_WAIT = 0.5                 # Seconds between checks for a free pool slot
+    
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 pool_size: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.pool_size = max(1, pool_size or Config.SQL_POOL_SIZE)
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+    
+    def __repr__(self) -> str:
+        mode = "pymysql" if pymysql else "mysql-cli"
+        return f"SQLExecutor({self.user}@{self.host}:{self.port}, {mode})"
+    
+    # ── Driver connections ──────────────────────────────────────────────
+    
+    def _connect(self):
+        return pymysql.connect(
+            host=self.host, port=self.port, user=self.user,
+            password=self.password, connect_timeout=Config.CONNECT_TIMEOUT,
+            autocommit=True, cursorclass=pymysql.cursors.DictCursor
+        )
+    
+    @contextmanager
+    def connection(self) -> Iterator[object]:
+        """
+        Borrow a pooled driver connection (one session).
+        
+        Broken connections are discarded instead of returned to the pool.
+        """
+        if pymysql is None:
+            raise RuntimeError("connection() requires PyMySQL; use execute_many()")
+        
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception as e:
+            if isinstance(e, pymysql.err.OperationalError):
+                self._discard(conn)
+            else:
+                self._idle.put(conn)
+            raise
+        else:
+            self._idle.put(conn)
+    
+    def _acquire(self):
+        """
+        Take an idle connection, open one while the pool has room, or wait.
+        
+        Waiting re-checks for room every POOL_WAIT seconds, so a slot freed
+        by a discarded connection is used. An idle connection that fails a
+        ping (the server restarted since it was opened) is discarded and
+        replaced with a fresh one.
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._opened < self.pool_size
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        return self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                try:
+                    conn = self._idle.get(timeout=self.POOL_WAIT)
+                except queue.Empty:
+                    continue
+            try:
+                conn.ping(reconnect=False)
+                return conn
+            except pymysql.err.MySQLError as e:
+                logger.debug(f"   Discarding stale connection to {self.host}:{self.port}: {e}")
+                self._discard(conn)
+    
+    def _discard(self, conn):
+        with self._lock:
+            self._opened -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    # ── Public API ───────────────────────────────────────────────────────
+    
+    def query(self, sql: str) -> List[Row]:
+        """Run one statement and return its rows (empty if none)."""
+        return self.execute_many([sql])[0]
+    
+    def execute_many(self, statements: Sequence[str]) -> List[List[Row]]:
+        """
+        Run statements in order in ONE session.
+        
+        Returns:
+            One list of rows per statement ([] for statements without a
+            result set)
+            
+        Raises:
+            subprocess.CalledProcessError (CLI) or a PyMySQL error on the
+            first failing statement
+        """
+        statements = [_normalize_statement(sql) for sql in statements]
+        if planned("sql", f"{len(statements)} statement(s) on {self.host}:{self.port}",
+                   ";\n".join(statements)):
+            return [[] for _ in statements]
+        if pymysql is not None:
+            return self._execute_driver(statements)
+        return self._execute_cli(statements)
+    
+    def _execute_driver(self, statements: List[str]) -> List[List[Row]]:
+        results = []
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+                    rows = cursor.fetchall() if cursor.description else []
+                    results.append([
+                        {key: _as_text(value) for key, value in row.items()}
+                        for row in rows
+                    ])
+        return results
+    
+    @contextmanager
+    def client_argv(self) -> Iterator[List[str]]:
+        """
+        Yield a `mysql` client argv for this target.
+        
+        The password lives in a private 0600 defaults file for the duration
+        of the block, never on the command line.
+        """
+        with mysql_defaults_file(self.password) as defaults:
+            yield [
+                "mysql", f"--defaults-extra-file={defaults}",
+                "--protocol=TCP", "-h", self.host, "-P", str(self.port),
+                "-u", self.user, f"--connect-timeout={Config.CONNECT_TIMEOUT}",
+            ]
+    
+    def _execute_cli(self, statements: List[str]) -> List[List[Row]]:
+        # Compound statements (triggers, routines) contain ';' themselves
+        script = "".join(
+            f"DELIMITER $$\n{sql}$$\nDELIMITER ;\n" if ";" in sql else f"{sql};\n"
+            for sql in statements
+        )
+        with self.client_argv() as client:
+            cmd = client + ["--xml", "--batch"]
+            logger.debug(f"   Command: {_format_argv(cmd)}")
+            started = time.monotonic()
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, text=True)
+            stdout, stderr, usage = communicate_with_usage(proc, started, script)
+        record_command(cmd, f"{len(statements)} statement(s) on {self.host}:{self.port}",
+                       usage, proc.returncode, started)
+        
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+        
+        result_sets = iter(parse_mysql_xml(stdout))
+        return [next(result_sets, []) if _ROW_RETURNING.match(sql) else []
+                for sql in statements]
+    
+    def load_file(self, path: str, database: Optional[str] = None,
+                  init_sql: Optional[str] = None):
+        """
+        Stream a .sql file into the mysql client (one session, never in memory).
+        
+        The client, not the driver, is used because dump files rely on its
+        statement parsing (DELIMITER, conditional comments).
+        
+        Args:
+            path: SQL file
+            database: Default database for unqualified names
+            init_sql: Session statement(s) run first, e.g. "SET foreign_key_checks=0"
+        """
+        if planned("sql", f"Load {os.path.basename(path)} into {self.host}:{self.port}",
+                   path, os.path.getsize(path)):
+            return
+        with self.client_argv() as client, open(path, "rb") as source:
+            cmd = client + ["--batch"]
+            if init_sql:
+                cmd.append(f"--init-command={init_sql}")
+            if database:
+                cmd.append(database)
+            started = time.monotonic()
+            proc = subprocess.Popen(cmd, stdin=source, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE)
+            stdout, stderr, usage = communicate_with_usage(proc, started)
+        record_command(cmd, f"Loading {os.path.basename(path)}", usage,
+                       proc.returncode, started)
+        
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(
+                proc.returncode, cmd, stdout, stderr.decode(errors="replace")
+            )
+    
+    def close(self):
+        """Close all idle pooled connections."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+_executors: Dict[Tuple[str, int, str], SQLExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(host: str = "127.0.0.1", port: Optional[int] = None,
+                 user: Optional[str] = None,
+                 password: Optional[str] = None,
+                 pool_size: Optional[int] = None) -> SQLExecutor:
+    """
+    Return the shared executor for a target, creating it on first use.
+    
+    Defaults to the local admin account on the secondary. A larger
+    pool_size grows the existing pool.
+    """
+    port = Config.SECONDARY_PORT if port is None else port
+    user = Config.ADMIN_USER if user is None else user
+    password = Config.ADMIN_PASSWORD if password is None else password
+    
+    key = (host, port, user)
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None or executor.password != password:
+            executor = SQLExecutor(host, port, user, password)
+            _executors[key] = executor
+        if pool_size and pool_size > executor.pool_size:
+            executor.pool_size = pool_size
+        return executor
+
+
+def close_executors():
+    """Close every pooled connection opened during the run."""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.close()
+        _executors.clear()
+
+
+def replica_status(executor: SQLExecutor) -> Row:
+    """Return SHOW REPLICA STATUS as a dict ({} if not a replica)."""
+    rows = executor.query("SHOW REPLICA STATUS")
+    return rows[0] if rows else {}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                           READINESS POLLING
+# ══════════════════════════════════════════════════════════════════════════════
+
+def wait_for(condition: Callable[[], bool], description: str,
+             timeout: float,
+             interval: Optional[float] = None,
+             max_interval: Optional[float] = None,
+             backoff: Optional[float] = None) -> float:
+    """
+    Poll a condition with exponential backoff until it holds.
+    
+    Exceptions raised by the condition count as "not yet".
+    
+    Args:
+        condition: Callable returning True once the wait is over
+        description: Human-readable description for logging
+        timeout: Give up after this many seconds
+        interval: First poll interval (default: Config.POLL_INITIAL_INTERVAL)
+        max_interval: Upper bound for the interval (default: Config.POLL_MAX_INTERVAL)
+        backoff: Interval multiplier per poll (default: Config.POLL_BACKOFF)
+        
+    Returns:
+        Seconds waited
+        
+    Raises:
+        TimeoutError: Condition did not hold within the timeout
+    """
+    interval = Config.POLL_INITIAL_INTERVAL if interval is None else interval
+    max_interval = Config.POLL_MAX_INTERVAL if max_interval is None else max_interval
+    backoff = Config.POLL_BACKOFF if backoff is None else backoff
+    if planned("wait", description, f"timeout {timeout:g}s"):
+        return 0.0
+    
+    logger.info(f"⏳ Waiting: {description} (timeout {timeout:g}s)")
+    start = time.monotonic()
+    deadline = start + timeout
+    
+    while True:
+        try:
+            if condition():
+                elapsed = time.monotonic() - start
+                logger.info(f"   ✅ Ready after {elapsed:.1f}s")
+                return elapsed
+        except Exception as e:
+            logger.debug(f"   Poll failed: {e}")
+        
+        now = time.monotonic()
+        if now >= deadline:
+            logger.error(f"   ❌ Timed out after {timeout:g}s")
+            raise TimeoutError(f"Timed out waiting for: {description}")
+        
+        time.sleep(min(interval, deadline - now))
+        interval = min(interval * backoff, max_interval)
+
+
+def _path_exists(path: str) -> bool:
+    """
+    Return True if the path exists, even inside a directory we cannot read.
+    
+    The datadir is 750 mysql:mysql, so a non-root operator falls back to a
+    non-interactive `sudo test -e`.
+    """
+    try:
+        os.stat(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except PermissionError:
+        result = subprocess.run(["sudo", "-n", "test", "-e", path],
+                                capture_output=True)
+        return result.returncode == 0
+
+
+def path_exists(path: str) -> Callable[[], bool]:
+    """Condition: the file (pid file, socket) has appeared."""
+    return lambda: _path_exists(path)
+
+
+def path_absent(path: str) -> Callable[[], bool]:
+    """Condition: the file (pid file, socket) has disappeared."""
+    return lambda: not _path_exists(path)
+
+
+def _port_accepts(host: str, port: int) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=Config.CONNECT_TIMEOUT):
+            return True
+    except OSError:
+        return False
+
+
+def port_open(host: str, port: int) -> Callable[[], bool]:
+    """Condition: the TCP port accepts connections."""
+    return lambda: _port_accepts(host, port)
+
+
+def port_closed(host: str, port: int) -> Callable[[], bool]:
+    """Condition: the TCP port refuses connections."""
+    return lambda: not _port_accepts(host, port)
+
+
+def _status_value(executor: SQLExecutor, name: str) -> Optional[str]:
+    """Return one SHOW GLOBAL STATUS value."""
+    rows = executor.query(f"SHOW GLOBAL STATUS LIKE '{name}'")
+    return rows[0]["Value"] if rows else None
+
+
+def mysql_responds(host: str, port: int) -> Callable[[], bool]:
+    """Condition: `SELECT 1` succeeds."""
+    return lambda: get_executor(host, port).query("SELECT 1 AS ok") == [{"ok": "1"}]
+
+
+def buffer_pool_load_finished(status: Optional[str]) -> bool:
+    """
+    Interpret Innodb_buffer_pool_load_status.
+    
+    A load that completed, was aborted, or was never started (load at
+    startup disabled) no longer holds the server back.
+    """
+    if not status:
+        return False
+    status = status.lower()
+    return ("completed" in status or "not started" in status
+            or "aborted" in status)
+
+
+def buffer_pool_loaded(host: str, port: int) -> Callable[[], bool]:
+    """Condition: Innodb_buffer_pool_load_status reports the load is over."""
+    def _check() -> bool:
+        value = _status_value(get_executor(host, port),
+                              "Innodb_buffer_pool_load_status")
+        logger.debug(f"   Buffer pool load status: {value}")
+        return buffer_pool_load_finished(value)
+    return _check
+
+
+def wait_for_mysql_stopped(host: str = "127.0.0.1",
+                           port: Optional[int] = None,
+                           timeout: Optional[float] = None) -> float:
+    """
+    Wait until the instance has released its pid file, socket and port.
+    
+    Returns:
+        Seconds waited
+    """
+    port = Config.SECONDARY_PORT if port is None else port
+    deadline = time.monotonic() + (Config.STOP_TIMEOUT if timeout is None else timeout)
+    
+    checks = [
+        (path_absent(Config.PID_FILE), f"pid file removed ({Config.PID_FILE})"),
+        (path_absent(Config.SOCKET_FILE), f"socket removed ({Config.SOCKET_FILE})"),
+        (port_closed(host, port), f"port {port} closed"),
+    ]
+    start = time.monotonic()
+    for condition, description in checks:
+        wait_for(condition, description, max(deadline - time.monotonic(), 0))
+    return time.monotonic() - start
+
+
+def wait_for_mysql_ready(host: str = "127.0.0.1",
+                         port: Optional[int] = None,
+                         timeout: Optional[float] = None) -> float:
+    """
+    Wait until the instance accepts connections and answers queries.
+    
+    Checks, in order, sharing one overall timeout: pid file present, TCP
+    port open, `SELECT 1` succeeds, buffer pool load finished (if
+    Config.WAIT_FOR_BUFFER_POOL_LOAD; with Config.BUFFER_POOL_WARMUP the
+    warm_buffer_pool step tracks the load instead).
+    
+    Returns:
+        Seconds waited
+    """
+    port = Config.SECONDARY_PORT if port is None else port
+    deadline = time.monotonic() + (Config.START_TIMEOUT if timeout is None else timeout)
+    
+    available = {
+        "pid_file": (path_exists(Config.PID_FILE), f"pid file created ({Config.PID_FILE})"),
+        "port": (port_open(host, port), f"port {port} accepting connections"),
+        "sql": (mysql_responds(host, port), "SELECT 1 succeeds"),
+    }
+    checks = [available[name] for name in Config.READY_CHECKS]
+    if (Config.WAIT_FOR_BUFFER_POOL_LOAD and not Config.BUFFER_POOL_WARMUP
+            and "sql" in Config.READY_CHECKS):
+        checks.append((buffer_pool_loaded(host, port), "buffer pool load finished"))
+    
+    start = time.monotonic()
+    for condition, description in checks:
+        wait_for(condition, description, max(deadline - time.monotonic(), 0))
+    return time.monotonic() - start
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      STEP 1: STOP MYSQL INSTANCE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def stop_mysql_instance():
+    """
+    Stop the MySQL instance on the secondary server.
+    
+    Commands:
+        sudo systemctl status mysqld@mysql1
+        sudo systemctl stop mysqld@mysql1
+        sudo systemctl status mysqld@mysql1
+    """
+    print_section("STEP 1: STOP MYSQL INSTANCE")
+    
+    logger.info(f"Stopping MySQL instance on secondary server ({Config.SECONDARY_HOST})")
+    
+    # Check current status
+    run_command(
+        Config.SYSTEMCTL_CMD + ["status", Config.MYSQL_INSTANCE],
+        "Checking MySQL instance status (before stop)",
+        check=False
+    )
+    
+    # Stop the instance
+    run_command(
+        Config.SYSTEMCTL_CMD + ["stop", Config.MYSQL_INSTANCE],
+        "Stopping MySQL instance"
+    )
+    
+    # Wait for shutdown
+    wait_for_mysql_stopped()
+    
+    # Verify stopped
+    run_command(
+        Config.SYSTEMCTL_CMD + ["status", Config.MYSQL_INSTANCE],
+        "Verifying MySQL instance is stopped",
+        check=False
+    )
+    
+    logger.info("✅ MySQL instance stopped successfully")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                 STEP 2: DELETE OLD DATA AND BINLOG DIRECTORIES
+# ══════════════════════════════════════════════════════════════════════════════
+
+def delete_old_directories():
+    """
+    Delete existing mysql1_binlog and mysql_data directories.
+    
+    ⚠️  WARNING: This is a destructive operation!
+    
+    Commands (throttled equivalent, see purge_tree):
+        sudo rm -rf /u01/data/mysql1_binlog
+        sudo rm -rf /u01/data
+    """
+    print_section("STEP 2: DELETE OLD DATA DIRECTORIES")
+    
+    logger.warning("⚠️  This will DELETE all existing MySQL data!")
+    
+    if not confirm_action("Delete all data in binlog and data directories?"):
+        logger.info("Skipping deletion - user cancelled")
+        return False
+    
+    delete_binlog_directory()
+    delete_data_directory()
+    purge_tombstones()
+    
+    logger.info("✅ Old directories deleted successfully")
+    return True
+
+
+def _delete_directory(path: str, label: str):
+    """Tombstone path (Config.DELETE_TOMBSTONE) or purge it in place."""
+    if Config.DELETE_TOMBSTONE and tombstone_directory(path):
+        logger.info(f"🪦 {label} directory moved aside; purged in the background")
+        return
+    if _lexists(path):
+        purge_paths([path], f"Deleting {label} directory: {path}")
+
+
+def delete_binlog_directory():
+    """
+    Delete the binlog directory (no confirmation prompt).
+    
+    Command:
+        sudo mv -T /u01/data/mysql1_binlog /u01/data/mysql1_binlog.deleting-<time>
+    
+    A binlog directory inside DATA_DIR is left to delete_data_directory().
+    Without Config.DELETE_TOMBSTONE it is purged in place instead.
+    """
+    if _is_nested(Config.BINLOG_DIR, Config.DATA_DIR):
+        logger.info(f"⏭️  {Config.BINLOG_DIR} is removed with {Config.DATA_DIR}")
+        return
+    _delete_directory(Config.BINLOG_DIR, "Binlog")
+
+
+def delete_data_directory():
+    """
+    Delete the data directory (no confirmation prompt).
+    
+    Command:
+        sudo mv -T /u01/data /u01/data.deleting-<time>
+    
+    The path is free as soon as the rename returns; purge_tombstones()
+    deletes the tree, throttled, while the restore runs. A mount point
+    cannot be renamed and is purged in place (so is everything without
+    Config.DELETE_TOMBSTONE).
+    """
+    _delete_directory(Config.DATA_DIR, "Data")
+
+
+def purge_tombstones():
+    """
+    Delete the tombstones of DATA_DIR and BINLOG_DIR with purge_tree(),
+    including any left by an interrupted earlier run.
+    """
+    paths = tombstones_of(Config.DATA_DIR) + tombstones_of(Config.BINLOG_DIR)
+    if not paths:
+        logger.info("⏭️  No tombstoned directories to purge")
+        return
+    purge_paths(paths, f"Purging {len(paths)} tombstoned directories")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#              STEP 3: CREATE DIRECTORIES WITH PERMISSIONS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def create_directories():
+    """
+    Create fresh directories with proper ownership and permissions.
+    
+    Commands:
+        sudo mkdir /u01/data
+        sudo chown -R mysql:mysql /u01/data
+        sudo chmod 750 /u01/data
+        sudo mkdir /u01/data/mysql1_binlog
+        sudo chmod 750 /u01/data/mysql1_binlog
+        sudo chown -R mysql:mysql /u01/data/mysql1_binlog
+    """
+    print_section("STEP 3: CREATE DIRECTORIES WITH PERMISSIONS")
+    
+    apply_mysql_permissions(create=True)
+    
+    logger.info("✅ Directories created with proper permissions")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      PARALLEL DUMP LOADER
+# ══════════════════════════════════════════════════════════════════════════════
+
+def iter_sql_statements(lines) -> Iterator[str]:
+    """
+    Split SQL text into statements, streaming line by line.
+    
+    Understands quoted strings/identifiers (with backslash and doubled-quote
+    escapes), `--`/`#` comments (dropped), block and conditional comments
+    (kept as text) and the client-side DELIMITER command. Only the current
+    statement is held in memory.
+    
+    Args:
+        lines: Iterable of text lines (e.g. an open file)
+        
+    Yields:
+        Statements without their trailing delimiter
+    """
+    delimiter = ";"
+    code = re.compile(r"""['"`]|--(?=\s|$)|#|/\*|;""")
+    quote = None
+    in_comment = False
+    parts = []
+    
+    for line in lines:
+        if (quote is None and not in_comment
+                and not "".join(parts).strip()
+                and line.lstrip()[:10].upper() == "DELIMITER "):
+            delimiter = line.split(None, 1)[1].strip() or ";"
+            code = re.compile(r"""['"`]|--(?=\s|$)|#|/\*|""" + re.escape(delimiter))
+            parts = []
+            continue
+        
+        pos = 0
+        length = len(line)
+        while pos < length:
+            if quote is not None:
+                # Inside a string/identifier: find its end, honouring escapes
+                i = pos
+                while True:
+                    end = line.find(quote, i)
+                    slash = line.find("\\", i, end if end >= 0 else length) if quote != "`" else -1
+                    if slash >= 0:
+                        i = slash + 2
+                        continue
+                    break
+                if end < 0:
+                    parts.append(line[pos:])
+                    pos = length
+                elif line.startswith(quote, end + 1):
+                    parts.append(line[pos:end + 2])
+                    pos = end + 2
+                else:
+                    parts.append(line[pos:end + 1])
+                    pos = end + 1
+                    quote = None
+                continue
+            
+            if in_comment:
+                end = line.find("*/", pos)
+                if end < 0:
+                    parts.append(line[pos:])
+                    pos = length
+                else:
+                    parts.append(line[pos:end + 2])
+                    pos = end + 2
+                    in_comment = False
+                continue
+            
+            match = code.search(line, pos)
+            if match is None:
+                parts.append(line[pos:])
+                break
+            token = match.group()
+            parts.append(line[pos:match.start()])
+            pos = match.end()
+            
+            if token in ("'", '"', "`"):
+                quote = token
+                parts.append(token)
+            elif token == "/*":
+                in_comment = True
+                parts.append(token)
+            elif token in ("--", "#"):
+                parts.append("\n")
+                break
+            else:  # delimiter
+                statement = "".join(parts).strip()
+                parts = []
+                if statement:
+                    yield statement
+    
+    statement = "".join(parts).strip()
+    if statement:
+        yield statement
+
+
+_CONDITIONAL_PREFIX = re.compile(r"^(?:/\*!\d*\s*)+")
+_NAME = r"(?:`((?:[^`]|``)+)`|(\w+))"
+_INSERT = re.compile(r"^(?:INSERT|REPLACE)\s+(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE)\s+)*"
+                     r"INTO\s+(?:" + _NAME + r"\s*\.\s*)?" + _NAME, re.I)
+_TABLE_DDL = re.compile(r"^(?:CREATE|DROP)\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?"
+                        r"(?:" + _NAME + r"\s*\.\s*)?" + _NAME, re.I)
+_USE = re.compile(r"^USE\s+" + _NAME, re.I)
+_SKIPPED = re.compile(r"^(?:LOCK\s+TABLES|UNLOCK\s+TABLES|ALTER\s+TABLE\s+\S+\s+(?:DISABLE|ENABLE)\s+KEYS)\b",
+                      re.I)
+
+
+def _name(match: re.Match, group: int) -> Optional[str]:
+    quoted, bare = match.group(group), match.group(group + 1)
+    return quoted.replace("``", "`") if quoted else bare
+
+
+def classify_dump_statement(statement: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Classify a dump statement for the loader.
+    
+    Returns:
+        (kind, database, table) where kind is one of "insert", "table_ddl",
+        "use", "set", "skip" or "other"
+    """
+    body = _CONDITIONAL_PREFIX.sub("", statement.lstrip())
+    for kind, pattern in (("insert", _INSERT), ("table_ddl", _TABLE_DDL)):
+        match = pattern.match(body)
+        if match:
+            return kind, _name(match, 1), _name(match, 3)
+    match = _USE.match(body)
+    if match:
+        return "use", _name(match, 1), None
+    if _SKIPPED.match(body):
+        return "skip", None, None
+    if body[:4].upper() == "SET ":
+        return "set", None, None
+    return "other", None, None
+
+
+class _TableBatchScheduler:
+    """
+    Runs INSERT batches on a thread pool: tables load concurrently, batches
+    of one table load in order, one at a time.
+    
+    submit() blocks while more than max_buffered_bytes of parsed data is
+    waiting, which bounds memory no matter how large the dump is.
+    """
+    
+    def __init__(self, load_batch: Callable[[Tuple[str, str], List[str]], None],
+                 workers: int, max_buffered_bytes: int):
+        self._load_batch = load_batch
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers),
+                                        thread_name_prefix="load")
+        self._max_buffered = max_buffered_bytes
+        self._cond = threading.Condition()
+        self._queues: Dict[Tuple[str, str], deque] = {}
+        self._running = set()
+        self._buffered = 0
+        self._error: Optional[BaseException] = None
+    
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+    
+    def _dispatch(self):
+        if self._error is not None:
+            return
+        for table, batches in self._queues.items():
+            if batches and table not in self._running:
+                self._running.add(table)
+                statements, size = batches.popleft()
+                self._pool.submit(self._run, table, statements, size)
+    
+    def _run(self, table: Tuple[str, str], statements: List[str], size: int):
+        error = None
+        try:
+            self._load_batch(table, statements)
+        except BaseException as e:
+            error = e
+        with self._cond:
+            if error is not None and self._error is None:
+                self._error = error
+            self._running.discard(table)
+            self._buffered -= size
+            self._dispatch()
+            self._cond.notify_all()
+    
+    def submit(self, table: Tuple[str, str], statements: List[str], size: int):
+        with self._cond:
+            while (self._buffered and self._buffered + size > self._max_buffered
+                   and self._error is None):
+                self._cond.wait()
+            self._raise_if_failed()
+            self._queues.setdefault(table, deque()).append((statements, size))
+            self._buffered += size
+            self._dispatch()
+    
+    def _busy(self, table: Optional[Tuple[str, str]]) -> bool:
+        if self._error is not None:
+            return bool(self._running)
+        if table is None:
+            return bool(self._running) or any(self._queues.values())
+        return table in self._running or bool(self._queues.get(table))
+    
+    def wait(self, table: Optional[Tuple[str, str]] = None):
+        """Wait until one table (or everything) is loaded."""
+        with self._cond:
+            while self._busy(table):
+                self._cond.wait()
+            self._raise_if_failed()
+    
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+@dataclass
+class DumpLoadResult:
+    """Counters reported by load_dump_file()."""
+    statements: int = 0
+    inserts: int = 0
+    batches: int = 0
+    insert_bytes: int = 0
+    tables: int = 0
+    elapsed: float = 0.0
+    
+    def summary(self) -> str:
+        rate = self.insert_bytes / self.elapsed / (1 << 20) if self.elapsed else 0.0
+        return (f"{self.statements:,} statements, {self.inserts:,} INSERTs in "
+                f"{self.batches:,} batches across {self.tables} tables, "
+                f"{self.insert_bytes / (1 << 20):,.1f} MiB in {self.elapsed:.1f}s "
+                f"({rate:.1f} MiB/s)")
+
+
+def load_dump_file(path: str, executor: Optional[SQLExecutor] = None,
+                   workers: Optional[int] = None,
+                   batch_bytes: Optional[int] = None) -> DumpLoadResult:
+    """
+    Load a mysqldump-style .sql (or .sql.gz) file with parallel sessions.
+    
+    The file is parsed as a stream. Schema statements run in file order;
+    INSERTs are grouped per table into transactions of about batch_bytes
+    and loaded concurrently across tables over pooled sessions, each with
+    foreign_key_checks/unique_checks off for the duration of the batch.
+    Statements that may depend on loaded data (triggers, views, routines,
+    anything unrecognised) wait for all pending batches first.
+    
+    Every session replays the dump's leading SET statements (character set,
+    time zone, sql_mode) so data is interpreted exactly as with
+    `mysql < dump.sql`.
+    
+    Args:
+        path: Dump file
+        executor: Target (default: local admin executor on the secondary)
+        workers: Concurrent table loads (default: Config.LOGICAL_LOAD_WORKERS)
+        batch_bytes: INSERT bytes per transaction (default: Config.LOADER_BATCH_BYTES)
+    """
+    workers = workers or Config.LOGICAL_LOAD_WORKERS
+    batch_bytes = batch_bytes or Config.LOADER_BATCH_BYTES
+    executor = executor or get_executor(pool_size=workers + 1)
+    if executor.pool_size < workers + 1:
+        executor.pool_size = workers + 1
+    
+    result = DumpLoadResult()
+    preamble: List[str] = []      # SETs before the first table
+    recent_sets: List[str] = []   # SETs immediately preceding a statement
+    in_header = True
+    database: Optional[str] = None
+    batches: Dict[Tuple[str, str], Tuple[List[str], int]] = {}
+    tables = set()
+    start = time.monotonic()
+    
+    def _session(db: Optional[str]) -> List[str]:
+        return preamble + ([f"USE `{db.replace('`', '``')}`"] if db else [])
+    
+    def _load_batch(table: Tuple[str, str], statements: List[str]):
+        executor.execute_many(
+            _session(table[0])
+            + ["SET SESSION foreign_key_checks=0, unique_checks=0",
+               "START TRANSACTION"]
+            + statements
+            + ["COMMIT", "SET SESSION foreign_key_checks=1, unique_checks=1"]
+        )
+    
+    def _flush(table: Tuple[str, str]):
+        statements, size = batches.pop(table, ([], 0))
+        if statements:
+            result.batches += 1
+            scheduler.submit(table, statements, size)
+    
+    scheduler = _TableBatchScheduler(_load_batch, workers,
+                                     Config.LOADER_MAX_BUFFER_BYTES)
+    opener = gzip.open if path.endswith(".gz") else open
+    
+    logger.info(f"🔧 Loading {path} with {workers} parallel sessions via {executor!r}")
+    try:
+        with opener(path, "rt", encoding="utf-8") as source:
+            for statement in iter_sql_statements(source):
+                result.statements += 1
+                kind, db, name = classify_dump_statement(statement)
+                
+                if kind == "insert":
+                    in_header = False
+                    table = (db or database or "", name)
+                    tables.add(table)
+                    statements, size = batches.get(table, ([], 0))
+                    statements.append(statement)
+                    size += len(statement)
+                    batches[table] = (statements, size)
+                    result.inserts += 1
+                    result.insert_bytes += len(statement)
+                    if size >= batch_bytes:
+                        _flush(table)
+                    recent_sets = []
+                    continue
+                
+                if kind == "set":
+                    (preamble if in_header else recent_sets).append(statement)
+                    continue
+                
+                if kind == "skip":
+                    continue
+                
+                if kind == "use":
+                    for table in list(batches):
+                        _flush(table)
+                    database = db
+                    continue
+                
+                # Schema statement: make sure nothing pending depends on it
+                for table in list(batches):
+                    _flush(table)
+                if kind == "table_ddl":
+                    in_header = False
+                    scheduler.wait((db or database or "", name))
+                else:
+                    scheduler.wait()
+                executor.execute_many(_session(db or database) + recent_sets + [statement])
+                recent_sets = []
+        
+        for table in list(batches):
+            _flush(table)
+        scheduler.wait()
+    finally:
+        scheduler.close()
+    
+    result.tables = len(tables)
+    result.elapsed = time.monotonic() - start
+    logger.info(f"   ✅ {result.summary()}")
+    return result
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                 COMPRESSED BACKUP (--backup) AND MANIFESTS
+# ══════════════════════════════════════════════════════════════════════════════
+
+BACKUP_CODECS = {"zstd": ".zst", "lz4": ".lz4", "gzip": ".gz"}
+_DEFAULT_LEVELS = {"zstd": 3, "lz4": 0, "gzip": 1}
+MANIFEST_NAME = "manifest.json"
+
+
+def backup_codec(requested: str) -> str:
+    """
+    The codec to use for Config.BACKUP_COMPRESSION: zstd and lz4 need their
+    packages, gzip (zlib) is always available and the fallback.
+    """
+    if requested not in BACKUP_CODECS:
+        raise ValueError(f"Unknown compression '{requested}' "
+                         f"(valid: {', '.join(BACKUP_CODECS)})")
+    missing = {"zstd": zstandard is None, "lz4": lz4 is None}.get(requested, False)
+    if missing:
+        package = "zstandard" if requested == "zstd" else "lz4"
+        logger.warning(f"⚠️  {requested} not available (pip install {package}); using gzip")
+        return "gzip"
+    return requested
+
+
+def compress_chunk(codec: str, data: bytes, level: int) -> bytes:
+    """One independent frame/member: concatenated chunks stay a valid stream."""
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == "lz4":
+        return lz4.frame.compress(data, compression_level=level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_chunk(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "lz4":
+        return lz4.frame.decompress(data)
+    return zlib.decompress(data, 31)
+
+
+def _ordered_map(pool: ThreadPoolExecutor, func: Callable, items: Iterable,
+                 window: int) -> Iterator[object]:
+    """pool.map() that keeps at most `window` tasks in flight (bounded memory)."""
+    pending: deque = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class _StreamTail:
+    """Drains a child's stderr in a thread, keeping the last lines for errors."""
+    
+    def __init__(self, stream):
+        self.lines = deque(maxlen=Config.OUTPUT_TAIL_LINES)
+        self._thread = threading.Thread(target=self._read, args=(stream,),
+                                        name="stderr-reader", daemon=True)
+        self._thread.start()
+    
+    def _read(self, stream):
+        for line in stream:
+            line = line.decode(errors="replace").rstrip("\n")
+            self.lines.append(line)
+            logger.debug(f"   | {line}")
+    
+    def join(self) -> str:
+        self._thread.join()
+        return "\n".join(self.lines)
+
+
+def _progress(description: str, start: float, done: int, total: Optional[int],
+              last: List[float]):
+    """Log a ProgressEvent every Config.PROGRESS_INTERVAL seconds."""
+    now = time.monotonic()
+    if now - last[0] < Config.PROGRESS_INTERVAL:
+        return
+    event = ProgressEvent(description, now - start, bytes_done=done, bytes_total=total,
+                          throughput=(done - last[1]) / (now - last[0]))
+    if total and event.throughput:
+        event.eta = max(total - done, 0) / event.throughput
+    log_progress_event(event)
+    last[:] = [now, done]
+
+
+def backup_command(tool: str, defaults_file: str, tmp_dir: str) -> List[str]:
+    """Hot backup command writing the backup stream to stdout."""
+    connection = [f"--defaults-extra-file={defaults_file}", "--host=127.0.0.1",
+                  f"--port={Config.PRIMARY_PORT}", f"--user={Config.SOURCE_ADMIN_USER}"]
+    if tool == "xtrabackup":
+        return ["xtrabackup"] + connection + [
+            "--backup", "--stream=xbstream", f"--parallel={Config.XTRABACKUP_PARALLEL}",
+            f"--target-dir={tmp_dir}"]
+    return ["mysqlbackup"] + connection + [
+        f"--backup-dir={tmp_dir}", "--backup-image=-", "backup-to-image"]
+
+
+def take_backup(output_dir: Optional[str] = None) -> str:
+    """
+    Stream a hot backup of the local instance through parallel compression.
+    
+    Commands (stdout is the backup stream, see backup_command):
+        sudo xtrabackup --defaults-extra-file=... --host=127.0.0.1 --port=3301 \\
+            --user=root --backup --stream=xbstream --parallel=8 --target-dir=<tmp>
+        sudo mysqlbackup --defaults-extra-file=... --host=127.0.0.1 --port=3301 \\
+            --user=root --backup-dir=<tmp> --backup-image=- backup-to-image
+    
+    The stream is cut into Config.BACKUP_CHUNK_BYTES chunks that
+    Config.BACKUP_WORKERS threads compress and checksum (SHA-256 of the
+    raw and of the stored bytes; zlib, zstandard, lz4 and hashlib release
+    the GIL). Chunks are appended in order to one file of independent
+    frames, so `zstd -dc backup.xbstream.zst | xbstream -x` still works.
+    manifest.json, written last, lists each chunk's offset, sizes and
+    checksums; point Config.BACKUP_MANIFEST at it to restore from it. A
+    run directory without a manifest is an incomplete backup.
+    
+    Returns:
+        Path of the manifest
+    """
+    print_section("COMPRESSED HOT BACKUP")
+    
+    tool = Config.RESTORE_ENGINE
+    if tool not in ("meb", "xtrabackup"):
+        raise ValueError(f"--backup supports the meb and xtrabackup engines, not '{tool}'")
+    codec = backup_codec(Config.BACKUP_COMPRESSION)
+    level = Config.BACKUP_COMPRESSION_LEVEL
+    level = _DEFAULT_LEVELS[codec] if level is None else level
+    instance = re.sub(r"[^\w.-]", "_", Config.MYSQL_INSTANCE)
+    run_dir = os.path.join(output_dir or Config.BACKUP_OUTPUT_DIR,
+                           f"{instance}-{datetime.now():%Y%m%d-%H%M%S}")
+    data_file = f"backup.{'xbstream' if tool == 'xtrabackup' else 'mbi'}{BACKUP_CODECS[codec]}"
+    tmp_dir = os.path.join(run_dir, "tmp")
+    os.makedirs(run_dir)
+    logger.info(f"📦 {tool} → {run_dir}/{data_file} ({codec} level {level}, "
+                f"{_human_bytes(Config.BACKUP_CHUNK_BYTES)} chunks, "
+                f"{Config.BACKUP_WORKERS} workers)")
+    
+    def _process(chunk: bytes) -> Tuple[int, bytes, str, str]:
+        stored = compress_chunk(codec, chunk, level)
+        return (len(chunk), stored, hashlib.sha256(chunk).hexdigest(),
+                hashlib.sha256(stored).hexdigest())
+    
+    chunks, offset, raw_bytes = [], 0, 0
+    start, last = time.monotonic(), [time.monotonic(), 0]
+    with mysql_defaults_file(Config.SOURCE_ADMIN_PASSWORD) as defaults:
+        argv = _build_argv(backup_command(tool, defaults, tmp_dir), sudo=True)
+        logger.debug(f"   Command: {_format_argv(argv)}")
+        proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        errors = _StreamTail(proc.stderr)
+        try:
+            with open(os.path.join(run_dir, data_file), "wb") as out, \
+                    ThreadPoolExecutor(max_workers=Config.BACKUP_WORKERS,
+                                       thread_name_prefix="compress") as pool:
+                reader = iter(lambda: proc.stdout.read(Config.BACKUP_CHUNK_BYTES), b"")
+                for size, stored, raw_sha, stored_sha in _ordered_map(
+                        pool, _process, reader, 2 * Config.BACKUP_WORKERS):
+                    out.write(stored)
+                    chunks.append({"offset": offset, "size": len(stored), "raw_size": size,
+                                   "sha256": stored_sha, "raw_sha256": raw_sha})
+                    offset += len(stored)
+                    raw_bytes += size
+                    _progress("Backup", start, raw_bytes, None, last)
+        finally:
+            proc.stdout.close()
+            usage = wait_with_usage(proc, start)
+            record_command(argv, f"Hot backup with {tool}", usage, proc.returncode, start)
+    output = errors.join()
+    run_command(["rm", "-rf", tmp_dir], "Removing backup temp directory", check=False)
+    if proc.returncode != 0:
+        for line in output.splitlines()[-20:]:
+            logger.error(f"   | {line}")
+        raise subprocess.CalledProcessError(proc.returncode, argv, "", output)
+    
+    elapsed = time.monotonic() - start
+    manifest = {
+        "format": 1, "tool": tool, "data_file": data_file,
+        "compression": codec, "level": level, "chunk_bytes": Config.BACKUP_CHUNK_BYTES,
+        "raw_bytes": raw_bytes, "stored_bytes": offset,
+        "source": f"{socket.gethostname()}:{Config.PRIMARY_PORT}",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(elapsed, 1), "chunks": chunks,
+    }
+    manifest_path = os.path.join(run_dir, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    
+    logger.info(f"   ✅ {_human_bytes(raw_bytes)} → {_human_bytes(offset)} "
+                f"({offset / max(raw_bytes, 1):.0%}) in {elapsed / 60:.1f} min, "
+                f"{_human_bytes(raw_bytes / max(elapsed, 1e-9))}/s")
+    logger.info(f"📄 Manifest: {manifest_path}")
+    return manifest_path
+
+
+def manifest_file(path: str) -> str:
+    """A manifest path given as the file or the backup directory."""
+    return os.path.join(path, MANIFEST_NAME) if os.path.isdir(path) else path
+
+
+def load_backup_manifest(path: str) -> Dict[str, object]:
+    """
+    Read a --backup manifest (a manifest.json or the directory holding it).
+    
+    Raises:
+        ValueError: If it is not a supported manifest
+    """
+    path = manifest_file(path)
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != 1 or manifest.get("compression") not in BACKUP_CODECS:
+        raise ValueError(f"{path}: not a backup manifest")
+    manifest["data_path"] = os.path.join(os.path.dirname(os.path.abspath(path)),
+                                         manifest["data_file"])
+    return manifest
+
+
+def unpack_backup(manifest_path: str, tool: str, cmd: List[str], description: str):
+    """
+    Feed a --backup data file, decompressed, into cmd's stdin (e.g.
+    `xbstream -x -C <dir>`). Chunks are read with pread, checked against
+    both manifest checksums and decompressed in parallel, and written in
+    order.
+    
+    Raises:
+        ValueError: If the backup was not taken with `tool`
+        RuntimeError: On a checksum mismatch (the command is stopped)
+        subprocess.CalledProcessError: If the command fails
+    """
+    manifest = load_backup_manifest(manifest_path)
+    if manifest["tool"] != tool:
+        raise ValueError(f"{manifest_path} is a {manifest['tool']} backup, "
+                         f"not {tool} (RESTORE_ENGINE)")
+    argv = _build_argv(cmd, sudo=True)
+    if planned("command", description, _format_argv(argv), manifest["raw_bytes"]):
+        return
+    codec = manifest["compression"]
+    if codec != backup_codec(codec):
+        raise RuntimeError(f"Backup is {codec}-compressed; install its Python package")
+    logger.info(f"🔧 {description}")
+    logger.debug(f"   Command: {_format_argv(argv)}")
+    
+    def _chunk(indexed: Tuple[int, Dict[str, object]]) -> bytes:
+        index, entry = indexed
+        stored = os.pread(fd, entry["size"], entry["offset"])
+        if hashlib.sha256(stored).hexdigest() != entry["sha256"]:
+            raise RuntimeError(f"Backup chunk {index} is corrupt (stored checksum)")
+        raw = decompress_chunk(codec, stored)
+        if hashlib.sha256(raw).hexdigest() != entry["raw_sha256"]:
+            raise RuntimeError(f"Backup chunk {index} is corrupt (raw checksum)")
+        return raw
+    
+    start, last, done = time.monotonic(), [time.monotonic(), 0], 0
+    proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE)
+    errors = _StreamTail(proc.stderr)
+    fd = os.open(manifest["data_path"], os.O_RDONLY)
+    try:
+        with ThreadPoolExecutor(max_workers=Config.BACKUP_WORKERS,
+                                thread_name_prefix="decompress") as pool:
+            for raw in _ordered_map(pool, _chunk, enumerate(manifest["chunks"]),
+                                    2 * Config.BACKUP_WORKERS):
+                proc.stdin.write(raw)
+                done += len(raw)
+                _progress(description, start, done, manifest["raw_bytes"], last)
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        os.close(fd)
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        usage = wait_with_usage(proc, start)
+        record_command(argv, description, usage, proc.returncode, start)
+    output = errors.join()
+    if proc.returncode != 0:
+        logger.error(f"   ❌ Failed (exit code: {proc.returncode})")
+        for line in output.splitlines()[-20:]:
+            logger.error(f"   | {line}")
+        raise subprocess.CalledProcessError(proc.returncode, argv, "", output)
+    logger.info(f"   ✅ {_human_bytes(done)} unpacked in {(time.monotonic() - start) / 60:.1f} min")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                     BACKUP VERIFICATION (PRE-FLIGHT)
+# ══════════════════════════════════════════════════════════════════════════════
+
+CHECKSUMS_NAME = "backup-checksums.json"
+_READ_BLOCK = 8 << 20               # pread size: large sequential reads
+
+
+@dataclass
+class VerifyResult:
+    """Outcome of verify_backup_source()."""
+    source: str
+    method: str                     # "manifest", "checksums" or "read"
+    files: int = 0
+    chunks: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    problems: List[str] = field(default_factory=list)
+    
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+    
+    def summary(self) -> str:
+        rate = _human_bytes(self.bytes / max(self.seconds, 1e-9))
+        return (f"{self.method}: {self.files} files, {self.chunks} chunks, "
+                f"{_human_bytes(self.bytes)} in {self.seconds:.1f}s ({rate}/s), "
+                f"{len(self.problems)} problems")
+
+
+def checksums_file(source: str) -> str:
+    """Checksum manifest of a backup: <file>.checksums.json or <dir>/backup-checksums.json."""
+    if os.path.isdir(source):
+        return os.path.join(source, CHECKSUMS_NAME)
+    return source + ".checksums.json"
+
+
+def _backup_files(source: str) -> Dict[str, str]:
+    """Files of a backup file or directory: {name relative to source: path}."""
+    if not os.path.isdir(source):
+        return {os.path.basename(source): source}
+    files = {}
+    for root, _, names in os.walk(source):
+        for name in names:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, source)
+            if rel != CHECKSUMS_NAME and not os.path.islink(path):
+                files[rel] = path
+    return dict(sorted(files.items()))
+
+
+def _hash_range(path: str, offset: int, length: int) -> Tuple[str, int]:
+    """SHA-256 of length bytes at offset and the bytes actually read."""
+    digest = hashlib.sha256()
+    done = 0
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, offset, length, os.POSIX_FADV_SEQUENTIAL)
+        while done < length:
+            block = os.pread(fd, min(_READ_BLOCK, length - done), offset + done)
+            if not block:
+                break
+            digest.update(block)
+            done += len(block)
+    finally:
+        os.close(fd)
+    return digest.hexdigest(), done
+
+
+def _gzip_intact(path: str) -> bool:
+    """Decompress a .gz file to the end: catches truncation and CRC errors."""
+    decompressor = zlib.decompressobj(31)
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_READ_BLOCK), b""):
+                while block:
+                    if decompressor.eof:    # Concatenated members (pigz, mydumper)
+                        decompressor = zlib.decompressobj(31)
+                    decompressor.decompress(block, _READ_BLOCK)
+                    block = decompressor.unconsumed_tail or decompressor.unused_data
+    except zlib.error:
+        return False
+    return decompressor.eof
+
+
+def _chunk_ranges(size: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    return [(offset, min(chunk_bytes, size - offset)) for offset in range(0, size, chunk_bytes)]
+
+
+def _hash_chunks(tasks: List[Tuple[str, int, int]], description: str,
+                 workers: Optional[int] = None) -> Iterator[Tuple[str, int]]:
+    """
+    (path, offset, length) → (sha256, bytes read), in order, hashed by
+    Config.VERIFY_WORKERS threads (pread and hashlib release the GIL, so
+    the threads use all cores and keep several reads in flight).
+    """
+    total = sum(length for _, _, length in tasks)
+    start, last, done = time.monotonic(), [time.monotonic(), 0], 0
+    workers = workers or Config.VERIFY_WORKERS
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify") as pool:
+        for digest, read in _ordered_map(pool, lambda task: _hash_range(*task),
+                                         tasks, 4 * workers):
+            done += read
+            _progress(description, start, done, total, last)
+            yield digest, read
+
+
+def write_backup_checksums(source: str, chunk_bytes: Optional[int] = None) -> str:
+    """
+    Write the checksum manifest of a backup file or directory (see
+    checksums_file()): per file its size and the SHA-256 of every
+    chunk_bytes (default Config.VERIFY_CHUNK_BYTES) chunk. Run it where
+    the backup was taken; verify_backup() then compares against it.
+    
+    Returns:
+        Path of the checksum manifest
+    """
+    chunk_bytes = chunk_bytes or Config.VERIFY_CHUNK_BYTES
+    files = _backup_files(source)
+    sizes = {rel: os.path.getsize(path) for rel, path in files.items()}
+    tasks = [(path, offset, length) for rel, path in files.items()
+             for offset, length in _chunk_ranges(sizes[rel], chunk_bytes)]
+    digests = iter([digest for digest, _ in _hash_chunks(tasks, "Checksumming backup")])
+    manifest = {
+        "format": 1, "chunk_bytes": chunk_bytes,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "files": {rel: {"size": size,
+                        "sha256": [next(digests) for _ in _chunk_ranges(size, chunk_bytes)]}
+                  for rel, size in sizes.items()},
+    }
+    if "xtrabackup_checkpoints" in files:
+        manifest["xtrabackup_prepared"] = XtraBackupRestoreEngine.is_prepared(source)
+    path = checksums_file(source)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+    logger.info(f"📄 Checksums of {len(files)} files ({_human_bytes(sum(sizes.values()))}): {path}")
+    return path
+
+
+def _verify_chunks(result: VerifyResult, tasks: List[Tuple[str, int, int]],
+                   expected: List[str], labels: List[str]):
+    """Hash tasks in parallel and record every chunk that differs from expected."""
+    start = time.monotonic()
+    for (digest, read), (_, _, length), want, label in zip(
+            _hash_chunks(tasks, f"Verifying {result.source}"), tasks, expected, labels):
+        result.chunks += 1
+        result.bytes += read
+        if read != length:
+            result.problems.append(f"{label}: truncated ({read} of {length} bytes)")
+        elif want is not None and digest != want:
+            result.problems.append(f"{label}: checksum mismatch")
+    result.seconds = time.monotonic() - start
+
+
+def verify_backup_source(source: Optional[str] = None) -> VerifyResult:
+    """
+    Read the whole backup in parallel fixed-size chunks and check it.
+    
+    - a --backup manifest (Config.BACKUP_MANIFEST): data file size and
+      the stored SHA-256 of every chunk
+    - a checksum manifest next to the backup (write_backup_checksums()):
+      every file present with its size, every chunk's SHA-256
+    - neither: every file must read to the end (I/O errors), .gz files
+      must decompress completely, an XtraBackup directory needs its
+      xtrabackup_checkpoints
+    """
+    if Config.BACKUP_MANIFEST and source is None:
+        manifest = load_backup_manifest(Config.BACKUP_MANIFEST)
+        result = VerifyResult(manifest["data_path"], "manifest", files=1)
+        size = os.path.getsize(manifest["data_path"])
+        if size != manifest["stored_bytes"]:
+            result.problems.append(f"{manifest['data_file']}: {size} bytes, manifest "
+                                   f"says {manifest['stored_bytes']}")
+        chunks = manifest["chunks"]
+        _verify_chunks(result, [(manifest["data_path"], c["offset"], c["size"]) for c in chunks],
+                       [c["sha256"] for c in chunks], [f"chunk {i}" for i in range(len(chunks))])
+        return result
+    
+    source = source or _backup_source()
+    if not os.path.exists(source):
+        return VerifyResult(source, "read", problems=[f"{source}: does not exist"])
+    files = _backup_files(source)
+    sums = None
+    if os.path.exists(checksums_file(source)):
+        with open(checksums_file(source)) as f:
+            sums = json.load(f)
+        prepared = sums.get("xtrabackup_prepared")
+        if prepared is not None and prepared != XtraBackupRestoreEngine.is_prepared(source):
+            logger.warning("⚠️  Backup was prepared after it was checksummed; "
+                           "checking that it reads instead")
+            sums = None
+    result = VerifyResult(source, "checksums" if sums else "read", files=len(files))
+    chunk_bytes = sums["chunk_bytes"] if sums else Config.VERIFY_CHUNK_BYTES
+    tasks, expected, labels = [], [], []
+    for rel, info in (sums["files"].items() if sums else []):
+        if rel not in files:
+            result.problems.append(f"{rel}: missing")
+        elif os.path.getsize(files[rel]) != info["size"]:
+            result.problems.append(f"{rel}: {os.path.getsize(files[rel])} bytes, "
+                                   f"expected {info['size']}")
+    for rel, path in files.items():
+        if sums and rel not in sums["files"]:
+            logger.warning(f"⚠️  {rel}: not in {CHECKSUMS_NAME}")
+            continue
+        ranges = _chunk_ranges(os.path.getsize(path), chunk_bytes)
+        want = sums["files"][rel]["sha256"] if sums else [None] * len(ranges)
+        for index, ((offset, length), digest) in enumerate(zip(ranges, want)):
+            tasks.append((path, offset, length))
+            expected.append(digest)
+            labels.append(f"{rel} chunk {index}")
+    _verify_chunks(result, tasks, expected, labels)
+    
+    if not sums:
+        if Config.RESTORE_ENGINE == "xtrabackup" and "xtrabackup_checkpoints" not in files:
+            result.problems.append(f"{source}: no xtrabackup_checkpoints")
+        gz = [(rel, path) for rel, path in files.items() if rel.endswith(".gz")]
+        with ThreadPoolExecutor(max_workers=Config.VERIFY_WORKERS) as pool:
+            for (rel, _), intact in zip(gz, pool.map(lambda item: _gzip_intact(item[1]), gz)):
+                if not intact:
+                    result.problems.append(f"{rel}: truncated gzip stream")
+    return result
+
+
+def _verify_method() -> str:
+    if Config.BACKUP_MANIFEST:
+        return "manifest"
+    if _path_exists(checksums_file(_backup_source())):
+        return "checksums"
+    return "mysqlbackup validate" if Config.RESTORE_ENGINE == "meb" else "read"
+
+
+def verify_backup():
+    """
+    Pre-flight: check the backup before the instance is stopped and its
+    directories deleted, so a truncated or corrupt backup costs nothing.
+    
+    Without a manifest or checksums an MEB image is checked by the tool:
+        sudo mysqlbackup --backup-image=/u01/data/mysqldata/ebackup.mbi \\
+            --show-progress=stdout validate
+    Everything else is read and checked by verify_backup_source(), in
+    Config.VERIFY_CHUNK_BYTES chunks on Config.VERIFY_WORKERS threads
+    (under sudo through the privileged helper when needed).
+    
+    Raises:
+        RuntimeError: If the backup is missing, truncated or corrupt
+    """
+    print_section("PRE-FLIGHT: VERIFY BACKUP")
+    
+    method = _verify_method()
+    source = Config.BACKUP_MANIFEST or _backup_source()
+    if planned("read", f"Verify backup ({method})", source, _backup_size()):
+        return
+    logger.info(f"🔎 Verifying {source} ({method})")
+    if not _path_exists(source):
+        raise RuntimeError(f"Backup not found: {source}")
+    
+    if method == "mysqlbackup validate":
+        stream_command(["mysqlbackup", f"--backup-image={Config.BACKUP_IMAGE}",
+                        "--show-progress=stdout", "validate"],
+                       "Validating backup image with mysqlbackup",
+                       progress_parser=parse_meb_progress)
+        logger.info("✅ Backup image is valid")
+        return
+    
+    if _needs_sudo():
+        _, output, _ = run_command(
+            _privileged_helper_argv("--verify-backup", settings=(
+                "RESTORE_ENGINE", "BACKUP_IMAGE", "XTRABACKUP_DIR", "LOGICAL_DUMP_PATH",
+                "BACKUP_MANIFEST", "VERIFY_CHUNK_BYTES", "VERIFY_WORKERS")),
+            "Verifying backup (privileged helper)")
+        for line in output.strip().splitlines()[-1:]:
+            logger.info(f"   {line}")
+        return
+    
+    result = verify_backup_source()
+    for problem in result.problems[:20]:
+        logger.error(f"   ❌ {problem}")
+    if len(result.problems) > 20:
+        logger.error(f"   ... {len(result.problems) - 20} more")
+    if not result.ok:
+        raise RuntimeError(f"Backup verification failed ({result.summary()})")
+    logger.info(f"✅ Backup verified: {result.summary()}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                    STEP 4: RESTORE BACKUP
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class RestorePhase:
+    """
+    One restartable part of a restore.
+    
+    A resumed run skips completed phases. An interrupted phase has its
+    output_dirs emptied and is run again - or, with restart_from, the run
+    goes back to that earlier phase; a phase that is not retryable makes
+    the resume fail instead.
+    """
+    name: str
+    run: Callable[[], None]
+    output_dirs: Tuple[str, ...] = ()
+    restart_from: Optional[str] = None
+    retryable: bool = True
+
+
+class RestoreEngine(ABC):
+    """
+    Base class for restore engines.
+    
+    restore() runs as step 4 and must leave a datadir in self.datadir
+    (Config.DATA_DIR, or the staging directory of a staged restore) with
+    binary logs in self.binlog_dir. Engines that need a running server to
+    finish (e.g. logical loads) set requires_running_server and implement
+    post_start(), which the workflow runs after step 6.
+    """
+    name = ""
+    requires_running_server = False
+    preserves_space_ids = True      # Physical copy: a donor's ib_buffer_pool applies
+    
+    def __init__(self, datadir: Optional[str] = None, binlog_dir: Optional[str] = None):
+        self.datadir = datadir or Config.DATA_DIR
+        self.binlog_dir = binlog_dir or Config.BINLOG_DIR
+    
+    def describe(self) -> List[str]:
+        """Lines describing the source, logged before the restore."""
+        return []
+    
+    @abstractmethod
+    def restore(self):
+        """Restore the source into self.datadir and self.binlog_dir."""
+    
+    def phases(self) -> List[RestorePhase]:
+        """restore() split into phases a resumed run can skip (default: one)."""
+        return [RestorePhase("restore", self.restore, (self.datadir, self.binlog_dir))]
+    
+    def unpack_phase(self) -> RestorePhase:
+        """Phase unpacking the Config.BACKUP_MANIFEST backup into the source path."""
+        raise ValueError(f"The {self.name} engine cannot restore a --backup manifest")
+    
+    def reset_output(self, phase: RestorePhase):
+        """Empty what an interrupted phase left behind before it is rerun."""
+        leftovers = [path for path in phase.output_dirs if os.path.lexists(path)]
+        if leftovers:
+            purge_paths(leftovers, f"Removing partial output of phase {phase.name}")
+        recreate = [path for path in phase.output_dirs
+                    if path in (self.datadir, self.binlog_dir)]
+        if recreate:
+            apply_mysql_permissions(recreate, create=True)
+    
+    def verify(self):
+        """Pre-flight check of the source before anything is stopped or deleted."""
+        verify_backup()
+    
+    def post_start(self):
+        pass
+    
+    def _initialize_datadir(self):
+        """
+        Initialize an empty datadir (root password Config.ADMIN_PASSWORD),
+        for engines that load into the running server.
+        """
+        instance = Config.MYSQL_INSTANCE.split("@", 1)[-1]
+        password = Config.ADMIN_PASSWORD.replace("\\", "\\\\").replace("'", "\\'")
+        statement = (f"ALTER USER '{Config.ADMIN_USER}'@'localhost' "
+                     f"IDENTIFIED BY '{password}';\n")
+        
+        # mysqld reads the file as the mysql user
+        with private_temp_file("mysql-init-", "init.sql", statement,
+                               "Write init file with the root password") as init_file:
+            run_command(["chown", Config.MYSQL_USER, init_file],
+                        "Handing init file to the mysql user")
+            
+            with self._empty_datadir():
+                run_command(
+                    [Config.MYSQLD_BINARY, f"--defaults-group-suffix=@{instance}",
+                     "--initialize-insecure", f"--user={Config.MYSQL_USER}",
+                     f"--datadir={self.datadir}",
+                     f"--init-file={init_file}"],
+                    f"Initializing empty datadir: {self.datadir}"
+                )
+    
+    @contextmanager
+    def _empty_datadir(self):
+        """
+        Temporarily remove the (empty) binlog directory step 3 created inside
+        the datadir, for tools that refuse a non-empty datadir.
+        """
+        nested = _is_nested(self.binlog_dir, self.datadir)
+        if nested:
+            run_command(["rmdir", self.binlog_dir],
+                        f"Removing empty {self.binlog_dir} for the restore",
+                        check=False)
+        yield
+        if nested:
+            run_command(["mkdir", "-p", self.binlog_dir],
+                        f"Recreating binlog directory: {self.binlog_dir}")
+
+
+class MEBRestoreEngine(RestoreEngine):
+    """
+    MySQL Enterprise Backup image restore.
+    
+    Command:
+        sudo mysqlbackup --host=127.0.0.1 --port=3301 \\
+            --datadir=/u01/data \\
+            --log_bin=/u01/data/mysql1_binlog/mysql-bin \\
+            --backup-image=/u01/data/mysqldata/ebackup.mbi \\
+            --backup-dir=/u01/data/mysqldata/backup-tmp1 \\
+            --show-progress=stdout \\
+            copy-back-and-apply-log
+    
+    With Config.MEB_PHASED_RESTORE the same work is done as three
+    commands - image-to-backup-dir, apply-log (in BACKUP_DIR), copy-back -
+    so a resumed run after a failed copy-back does not extract and apply
+    the log again.
+    """
+    name = "meb"
+    
+    def describe(self) -> List[str]:
+        mode = "phased" if Config.MEB_PHASED_RESTORE else "copy-back-and-apply-log"
+        return [f"Backup image: {Config.BACKUP_IMAGE}",
+                f"Backup temp dir: {Config.BACKUP_DIR}, mode: {mode}"]
+    
+    def _mysqlbackup(self, operation: str, options: List[str], description: str):
+        stream_command(
+            ["mysqlbackup"] + options + ["--show-progress=stdout", operation],
+            description,
+            progress_parser=parse_meb_progress
+        )
+    
+    def _copy_back_options(self) -> List[str]:
+        return ["--host=127.0.0.1", f"--port={Config.SECONDARY_PORT}",
+                f"--datadir={self.datadir}",
+                f"--log_bin={self.binlog_dir}/mysql-bin"]
+    
+    def restore(self):
+        self._mysqlbackup(
+            "copy-back-and-apply-log",
+            self._copy_back_options() + [f"--backup-image={Config.BACKUP_IMAGE}",
+                                         f"--backup-dir={Config.BACKUP_DIR}"],
+            "Restoring backup with mysqlbackup"
+        )
+    
+    def extract(self):
+        self._mysqlbackup(
+            "image-to-backup-dir",
+            [f"--backup-image={Config.BACKUP_IMAGE}", f"--backup-dir={Config.BACKUP_DIR}"],
+            f"Extracting backup image to {Config.BACKUP_DIR}"
+        )
+    
+    def apply_log(self):
+        self._mysqlbackup("apply-log", [f"--backup-dir={Config.BACKUP_DIR}"],
+                          "Applying the redo log in the backup directory")
+    
+    def copy_back(self):
+        self._mysqlbackup(
+            "copy-back",
+            self._copy_back_options() + [f"--backup-dir={Config.BACKUP_DIR}"],
+            "Copying the prepared backup into the datadir"
+        )
+    
+    def unpack_phase(self) -> RestorePhase:
+        return RestorePhase("unpack", lambda: unpack_backup(
+            Config.BACKUP_MANIFEST, self.name,
+            ["dd", f"of={Config.BACKUP_IMAGE}", "bs=4M", "status=none"],
+            f"Unpacking backup into {Config.BACKUP_IMAGE}"))
+    
+    def phases(self) -> List[RestorePhase]:
+        if not Config.MEB_PHASED_RESTORE:
+            return [RestorePhase("copy-back-and-apply-log", self.restore,
+                                 (self.datadir, self.binlog_dir, Config.BACKUP_DIR))]
+        # An interrupted apply-log leaves the extracted backup unusable
+        return [
+            RestorePhase("image-to-backup-dir", self.extract, (Config.BACKUP_DIR,)),
+            RestorePhase("apply-log", self.apply_log, restart_from="image-to-backup-dir"),
+            RestorePhase("copy-back", self.copy_back, (self.datadir, self.binlog_dir)),
+        ]
+
+
+class XtraBackupRestoreEngine(RestoreEngine):
+    """
+    Percona XtraBackup directory restore (see xtrabackup.md).
+    
+    Commands:
+        sudo xtrabackup --prepare --use-memory=4G --parallel=8 \\
+            --target-dir=/u01/data/mysqldata/xtrabackup
+        sudo xtrabackup --copy-back --parallel=8 \\
+            --target-dir=/u01/data/mysqldata/xtrabackup --datadir=/u01/data
+    
+    --prepare is skipped for an already prepared backup. With
+    Config.XTRABACKUP_MOVE_BACK, --move-back renames files instead of
+    copying them (same filesystem only; the backup is consumed).
+    """
+    name = "xtrabackup"
+    
+    def describe(self) -> List[str]:
+        mode = "--move-back" if Config.XTRABACKUP_MOVE_BACK else "--copy-back"
+        return [f"XtraBackup dir: {Config.XTRABACKUP_DIR}",
+                f"Prepare memory: {Config.XTRABACKUP_USE_MEMORY}, "
+                f"parallel: {Config.XTRABACKUP_PARALLEL}, mode: {mode}"]
+    
+    @staticmethod
+    def is_prepared(target_dir: Optional[str] = None) -> bool:
+        """True if xtrabackup_checkpoints says the backup is fully prepared."""
+        checkpoints = os.path.join(target_dir or Config.XTRABACKUP_DIR,
+                                   "xtrabackup_checkpoints")
+        try:
+            with open(checkpoints) as f:
+                return any(line.replace(" ", "").strip() == "backup_type=full-prepared"
+                           for line in f)
+        except OSError:
+            return False
+    
+    def prepare(self):
+        if self.is_prepared():
+            logger.info("⏭️  Backup already prepared, skipping --prepare")
+            return
+        stream_command(
+            ["xtrabackup", "--prepare",
+             f"--use-memory={Config.XTRABACKUP_USE_MEMORY}",
+             f"--parallel={Config.XTRABACKUP_PARALLEL}",
+             f"--target-dir={Config.XTRABACKUP_DIR}"],
+            "Preparing backup with xtrabackup"
+        )
+    
+    def copy_back(self):
+        mode = "--move-back" if Config.XTRABACKUP_MOVE_BACK else "--copy-back"
+        with self._empty_datadir():
+            stream_command(
+                ["xtrabackup", mode,
+                 f"--parallel={Config.XTRABACKUP_PARALLEL}",
+                 f"--target-dir={Config.XTRABACKUP_DIR}",
+                 f"--datadir={self.datadir}"],
+                f"Restoring backup with xtrabackup {mode}"
+            )
+    
+    def restore(self):
+        self.prepare()
+        self.copy_back()
+    
+    def unpack(self):
+        run_command(["mkdir", "-p", Config.XTRABACKUP_DIR],
+                    f"Creating {Config.XTRABACKUP_DIR}")
+        unpack_backup(Config.BACKUP_MANIFEST, self.name,
+                      ["xbstream", "-x", "-C", Config.XTRABACKUP_DIR],
+                      f"Unpacking backup into {Config.XTRABACKUP_DIR}")
+    
+    def unpack_phase(self) -> RestorePhase:
+        return RestorePhase("unpack", self.unpack, (Config.XTRABACKUP_DIR,))
+    
+    def phases(self) -> List[RestorePhase]:
+        # prepare works in place and skips an already prepared backup;
+        # an interrupted --move-back has consumed part of the backup
+        return [RestorePhase("prepare", self.prepare),
+                RestorePhase("copy-back", self.copy_back, (self.datadir, self.binlog_dir),
+                             retryable=not Config.XTRABACKUP_MOVE_BACK)]
+
+
+class LogicalRestoreEngine(RestoreEngine):
+    """
+    Logical restore from SQL dumps (mysqldump.md / mydumper layouts).
+    
+    Step 4 initializes an empty datadir with `mysqld --initialize-insecure`
+    (using the instance's option group, root password set to
+    Config.ADMIN_PASSWORD through --init-file); after mysqld starts,
+    post_start() loads the dump:
+    
+    - a single .sql file is loaded by load_dump_file(): parsed as a
+      stream, tables loaded concurrently over pooled sessions
+    - a directory is loaded mydumper-style: `<db>-schema-create.sql`, then
+      `<db>.<table>-schema.sql`, then all table data files
+      (`<db>.<table>.sql`, `<db>.<table>.00001.sql`, ...) in parallel
+      sessions, then views/triggers/routines (`-schema-view`,
+      `-schema-triggers`, `-schema-post`)
+    
+    Data sessions run with foreign_key_checks and unique_checks off.
+    """
+    name = "logical"
+    requires_running_server = True
+    preserves_space_ids = False
+    
+    LOAD_SESSION_SQL = "SET SESSION foreign_key_checks=0, unique_checks=0"
+    _POST_DATA_SUFFIXES = ("-schema-view", "-schema-triggers", "-schema-post")
+    
+    def describe(self) -> List[str]:
+        return [f"Dump: {Config.LOGICAL_DUMP_PATH}",
+                f"Parallel sessions: {Config.LOGICAL_LOAD_WORKERS}"]
+    
+    def restore(self):
+        self._initialize_datadir()
+    
+    @classmethod
+    def classify_dump_files(cls, directory: str) -> Dict[str, List[str]]:
+        """Split a dump directory into databases/tables/data/post phases."""
+        phases = {"databases": [], "tables": [], "data": [], "post": []}
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".sql"):
+                continue
+            stem = name[:-len(".sql")]
+            path = os.path.join(directory, name)
+            if stem.endswith("-schema-create"):
+                phases["databases"].append(path)
+            elif stem.endswith(cls._POST_DATA_SUFFIXES):
+                phases["post"].append(path)
+            elif stem.endswith("-schema"):
+                phases["tables"].append(path)
+            else:
+                phases["data"].append(path)
+        return phases
+    
+    @staticmethod
+    def _database_of(path: str) -> Optional[str]:
+        """`db.table.sql` / `db-schema-create.sql` -> db (None for plain dumps)."""
+        stem = os.path.basename(path)[:-len(".sql")]
+        if stem.endswith("-schema-create"):
+            return None
+        return stem.split(".", 1)[0] if "." in stem else None
+    
+    def _load_serially(self, executor: SQLExecutor, paths: List[str], label: str):
+        for path in paths:
+            logger.info(f"🔧 Loading {label}: {os.path.basename(path)}")
+            executor.load_file(path, self._database_of(path))
+    
+    def _load_parallel(self, executor: SQLExecutor, paths: List[str]):
+        if not paths:
+            return
+        logger.info(f"🔧 Loading {len(paths)} data files with "
+                    f"{Config.LOGICAL_LOAD_WORKERS} parallel sessions")
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=Config.LOGICAL_LOAD_WORKERS,
+                                thread_name_prefix="load") as pool:
+            futures = {
+                pool.submit(executor.load_file, path, self._database_of(path),
+                            self.LOAD_SESSION_SQL): path
+                for path in paths
+            }
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"   ❌ {os.path.basename(futures[future])}: {e}")
+                    raise
+        logger.info(f"   ✅ Data loaded in {time.monotonic() - start:.1f}s")
+    
+    def post_start(self):
+        print_section("LOAD LOGICAL DUMP")
+        executor = get_executor()
+        path = Config.LOGICAL_DUMP_PATH
+        if _plan is not None:
+            planned("sql", f"Load logical dump into {executor.host}:{executor.port}",
+                    path, _backup_size())
+            return
+        
+        if os.path.isfile(path):
+            load_dump_file(path, executor)
+            return
+        
+        phases = self.classify_dump_files(path)
+        self._load_serially(executor, phases["databases"], "database")
+        self._load_serially(executor, phases["tables"], "table schema")
+        self._load_parallel(executor, phases["data"])
+        self._load_serially(executor, phases["post"], "views/triggers/routines")
+
+
+def _mysql_error_code(error: BaseException) -> Optional[int]:
+    """MySQL error number of a failed statement (driver or mysql CLI), if any."""
+    if pymysql is not None and isinstance(error, pymysql.err.MySQLError):
+        return error.args[0] if error.args and isinstance(error.args[0], int) else None
+    if isinstance(error, subprocess.CalledProcessError):
+        match = re.search(r"ERROR (\d+)", str(error.stderr or ""))
+        return int(match.group(1)) if match else None
+    return None
+
+
+def clone_donor() -> Tuple[str, int]:
+    """(host, port) of the clone donor: Config.CLONE_DONOR or the primary."""
+    if not Config.CLONE_DONOR:
+        return Config.PRIMARY_HOST, Config.PRIMARY_PORT
+    host, _, port = Config.CLONE_DONOR.rpartition(":")
+    return host, int(port)
+
+
+def clone_versions_compatible(donor: str, recipient: str) -> bool:
+    """
+    Whether the clone plugin accepts these server versions: the same
+    release, or (from 8.0.37) the same major.minor series.
+    
+    >>> clone_versions_compatible("8.0.36-log", "8.0.36")
+    True
+    >>> clone_versions_compatible("8.0.36", "8.0.35")
+    False
+    >>> clone_versions_compatible("8.4.2", "8.4.0")
+    True
+    """
+    def _release(version: str) -> Tuple[int, ...]:
+        return tuple(int(part) for part in re.match(r"(\d+)\.(\d+)\.(\d+)", version).groups())
+    
+    donor_release, recipient_release = _release(donor), _release(recipient)
+    if donor_release == recipient_release:
+        return True
+    return (donor_release[:2] == recipient_release[:2]
+            and min(donor_release, recipient_release) >= (8, 0, 37))
+
+
+class CloneRestoreEngine(RestoreEngine):
+    """
+    Provision from a live donor with the clone plugin: no backup copy.
+    
+    The pre-flight (verify(), before the instance is stopped) only reads:
+    it checks that the donor (Config.CLONE_DONOR, default the primary)
+    runs a compatible release and can be cloned. Step 4 initializes an
+    empty datadir (as the logical engine does); after mysqld starts,
+    post_start() first prepares the donor with Config.CLONE_MANAGE_DONOR:
+        INSTALL PLUGIN clone SONAME 'mysql_clone.so';
+        CREATE USER IF NOT EXISTS 'clone_user'@'%' IDENTIFIED BY '...';
+        GRANT BACKUP_ADMIN ON *.* TO 'clone_user'@'%';
+    and then clones into the local instance:
+        INSTALL PLUGIN clone SONAME 'mysql_clone.so';
+        SET GLOBAL clone_valid_donor_list = '192.168.1.1:3301';
+        CLONE INSTANCE FROM 'clone_user'@'192.168.1.1':3301 IDENTIFIED BY '...';
+    while performance_schema.clone_progress is polled for per-stage
+    throughput. mysqld restarts on the cloned data (started again here
+    when it is not supervised) and the workflow continues with the GTID
+    pre-flight and CHANGE REPLICATION SOURCE. The cloned instance has
+    the donor's accounts: ADMIN_PASSWORD must be valid on the donor.
+    """
+    name = "clone"
+    requires_running_server = True
+    
+    PROGRESS_SQL = ("SELECT STAGE, STATE, BEGIN_TIME, END_TIME, ESTIMATE, DATA, DATA_SPEED "
+                    "FROM performance_schema.clone_progress")
+    
+    def describe(self) -> List[str]:
+        host, port = clone_donor()
+        return [f"Clone donor: {Config.CLONE_USER}@{host}:{port}"]
+    
+    def restore(self):
+        self._initialize_datadir()
+    
+    @staticmethod
+    def _ensure_plugin(executor: SQLExecutor, active: bool):
+        if not active:
+            executor.query("INSTALL PLUGIN clone SONAME 'mysql_clone.so'")
+    
+    def verify(self):
+        print_section("PRE-FLIGHT: CLONE DONOR")
+        host, port = clone_donor()
+        donor = get_executor(host, port, Config.SOURCE_ADMIN_USER, Config.SOURCE_ADMIN_PASSWORD)
+        variables, plugin, size = donor.execute_many([
+            "SELECT @@version AS version, @@version_compile_os AS os, "
+            "@@version_compile_machine AS machine, @@max_allowed_packet AS max_allowed_packet",
+            "SELECT PLUGIN_STATUS AS status FROM information_schema.PLUGINS "
+            "WHERE PLUGIN_NAME = 'clone'",
+            "SELECT COALESCE(SUM(ALLOCATED_SIZE), 0) AS bytes "
+            "FROM information_schema.INNODB_TABLESPACES",
+        ])
+        _, output, _ = run_command([Config.MYSQLD_BINARY, "--version"],
+                                   "Checking the local mysqld version", sudo=False)
+        active = bool(plugin) and plugin[0]["status"] == "ACTIVE"
+        problems = []
+        if variables:
+            donor_vars = variables[0]
+            local = re.search(r"Ver (\d+\.\d+\.\d+)", output)
+            logger.info(f"   Donor {host}:{port}: MySQL {donor_vars['version']} "
+                        f"({donor_vars['os']}/{donor_vars['machine']}), "
+                        f"~{_human_bytes(int(size[0]['bytes']))} of tablespaces")
+            if local and not clone_versions_compatible(donor_vars["version"], local.group(1)):
+                problems.append(f"donor runs {donor_vars['version']}, local mysqld is "
+                                f"{local.group(1)} (clone needs the same release)")
+            if int(donor_vars["max_allowed_packet"]) < 2 << 20:
+                problems.append("donor max_allowed_packet is below 2MB")
+            if not active and not Config.CLONE_MANAGE_DONOR:
+                problems.append("clone plugin not active on the donor "
+                                "(CLONE_MANAGE_DONOR is off)")
+        if problems:
+            for problem in problems:
+                logger.error(f"   ❌ {problem}")
+            raise RuntimeError(f"Cannot clone from {host}:{port}: {'; '.join(problems)}")
+        logger.info("✅ Donor can be cloned")
+    
+    @classmethod
+    def _prepare_donor(cls, host: str, port: int):
+        """Install the clone plugin and the clone account on the donor."""
+        donor = get_executor(host, port, Config.SOURCE_ADMIN_USER, Config.SOURCE_ADMIN_PASSWORD)
+        rows = donor.query("SELECT PLUGIN_STATUS AS status FROM information_schema.PLUGINS "
+                           "WHERE PLUGIN_NAME = 'clone'")
+        cls._ensure_plugin(donor, bool(rows) and rows[0]["status"] == "ACTIVE")
+        account = f"'{Config.CLONE_USER}'@'{Config.CLONE_USER_HOST}'"
+        password = Config.CLONE_PASSWORD.replace("\\", "\\\\").replace("'", "\\'")
+        donor.execute_many([
+            f"CREATE USER IF NOT EXISTS {account} IDENTIFIED BY '{password}'",
+            f"ALTER USER {account} IDENTIFIED BY '{password}'",
+            f"GRANT BACKUP_ADMIN ON *.* TO {account}",
+        ])
+        logger.info(f"   ✅ Clone plugin and {account} (BACKUP_ADMIN) ready on the donor")
+    
+    @staticmethod
+    def _log_progress(rows: List[Row], reported: set, start: float, last: List[float]):
+        """Log each finished stage once with its throughput, and the running one."""
+        for row in rows:
+            if row["STATE"] != "Completed" or row["STAGE"] in reported:
+                continue
+            reported.add(row["STAGE"])
+            data = int(row["DATA"] or 0)
+            try:
+                seconds = (datetime.fromisoformat(row["END_TIME"])
+                           - datetime.fromisoformat(row["BEGIN_TIME"])).total_seconds()
+            except (TypeError, ValueError):
+                seconds = 0.0
+            rate = f", {_human_bytes(data / seconds)}/s" if data and seconds > 0 else ""
+            logger.info(f"   ✅ {row['STAGE']}: {_human_bytes(data)} in {seconds:.1f}s{rate}")
+        running = [row for row in rows if row["STATE"] == "In Progress"]
+        now = time.monotonic()
+        if running and now - last[0] >= Config.PROGRESS_INTERVAL:
+            stage = running[0]
+            event = ProgressEvent(f"Clone {stage['STAGE']}", now - start,
+                                  bytes_done=int(stage["DATA"] or 0),
+                                  bytes_total=int(stage["ESTIMATE"] or 0) or None,
+                                  throughput=int(stage["DATA_SPEED"] or 0))
+            if event.bytes_total and event.throughput:
+                event.eta = max(event.bytes_total - event.bytes_done, 0) / event.throughput
+            log_progress_event(event)
+            last[0] = now
+    
+    def post_start(self):
+        print_section("CLONE FROM DONOR")
+        host, port = clone_donor()
+        if Config.CLONE_MANAGE_DONOR:
+            self._prepare_donor(host, port)
+        local = get_executor(pool_size=2)
+        rows = local.query("SELECT PLUGIN_STATUS AS status FROM information_schema.PLUGINS "
+                           "WHERE PLUGIN_NAME = 'clone'")
+        self._ensure_plugin(local, bool(rows) and rows[0]["status"] == "ACTIVE")
+        local.query(f"SET GLOBAL clone_valid_donor_list = '{host}:{port}'")
+        password = Config.CLONE_PASSWORD.replace("\\", "\\\\").replace("'", "\\'")
+        statement = (f"CLONE INSTANCE FROM '{Config.CLONE_USER}'@'{host}':{port} "
+                     f"IDENTIFIED BY '{password}'")
+        if planned("sql", f"Clone {host}:{port} into {local.host}:{local.port}",
+                   statement.replace(f"'{password}'", "'********'")):
+            return
+        
+        logger.info(f"🔧 CLONE INSTANCE FROM {Config.CLONE_USER}@{host}:{port}")
+        outcome: Dict[str, BaseException] = {}
+        
+        def _clone():
+            try:
+                local.query(statement)
+            except Exception as e:
+                outcome["error"] = e
+        
+        start, last, reported = time.monotonic(), [time.monotonic()], set()
+        thread = threading.Thread(target=_clone, name="clone", daemon=True)
+        thread.start()
+        while thread.is_alive():
+            thread.join(Config.CLONE_POLL_INTERVAL)
+            if thread.is_alive():
+                try:
+                    self._log_progress(local.query(self.PROGRESS_SQL), reported, start, last)
+                except Exception as e:
+                    logger.debug(f"   clone_progress: {e}")
+        
+        # The server restarts on the cloned data (or shuts down if nothing
+        # supervises it); sessions opened before are gone either way
+        error = outcome.get("error")
+        local.close()
+        if error is not None and _mysql_error_code(error) == 3707:
+            run_command(Config.SYSTEMCTL_CMD + ["start", Config.MYSQL_INSTANCE],
+                        "Starting MySQL instance on the cloned data")
+        wait_for_mysql_ready()
+        
+        status = local.query("SELECT STATE, ERROR_NO, ERROR_MESSAGE, GTID_EXECUTED "
+                             "FROM performance_schema.clone_status")
+        if not status or status[0]["STATE"] != "Completed":
+            reason = (f"{status[0]['ERROR_NO']}: {status[0]['ERROR_MESSAGE']}" if status
+                      else (getattr(error, "stderr", None) or str(error)).strip())
+            logger.error(f"   ❌ Clone failed: {reason}")
+            raise RuntimeError(f"Clone from {host}:{port} failed: {reason}")
+        self._log_progress(local.query(self.PROGRESS_SQL), reported, start, [0.0])
+        gtids = GtidSet.parse(status[0]["GTID_EXECUTED"] or "")
+        logger.info(f"✅ Cloned {host}:{port} in {(time.monotonic() - start) / 60:.1f} min; "
+                    f"gtid_executed has {gtids.count():,} transactions")
+
+
+RESTORE_ENGINES = {
+    engine.name: engine
+    for engine in (MEBRestoreEngine, XtraBackupRestoreEngine, LogicalRestoreEngine,
+                   CloneRestoreEngine)
+}
+
+
+def get_restore_engine(name: Optional[str] = None, datadir: Optional[str] = None,
+                       binlog_dir: Optional[str] = None) -> RestoreEngine:
+    """Instantiate the configured restore engine (Config.RESTORE_ENGINE)."""
+    name = name or Config.RESTORE_ENGINE
+    if name not in RESTORE_ENGINES:
+        raise ValueError(f"Unknown restore engine '{name}' "
+                         f"(valid: {', '.join(RESTORE_ENGINES)})")
+    return RESTORE_ENGINES[name](datadir, binlog_dir)
+
+
+def restore_backup(datadir: Optional[str] = None, binlog_dir: Optional[str] = None):
+    """
+    Restore the backup into the data directory with the configured engine.
+    
+    Config.RESTORE_ENGINE selects MySQL Enterprise Backup ("meb", default),
+    Percona XtraBackup ("xtrabackup") or a logical dump ("logical"). See
+    the engine classes for the exact commands. With Config.BACKUP_MANIFEST
+    a --backup is first unpacked into the engine's source path. Output is streamed; progress
+    is logged every Config.PROGRESS_INTERVAL seconds.
+    
+    Args:
+        datadir: Target datadir (default: Config.DATA_DIR)
+        binlog_dir: Target binlog directory (default: Config.BINLOG_DIR)
+    """
+    print_section("STEP 4: RESTORE MYSQL BACKUP")
+    
+    engine = get_restore_engine(datadir=datadir, binlog_dir=binlog_dir)
+    logger.info(f"Restore engine: {engine.name} → {engine.datadir}")
+    for line in engine.describe():
+        logger.info(line)
+    if _plan is not None:
+        planned("copy", f"Restore {engine.name} backup into {engine.datadir}",
+                _backup_source(), _backup_size())
+    
+    journal = get_journal()
+    phases = engine.phases()
+    if Config.BACKUP_MANIFEST:
+        logger.info(f"Compressed backup: {Config.BACKUP_MANIFEST}")
+        phases.insert(0, engine.unpack_phase())
+    first, interrupted = 0, False
+    if journal:
+        journal.record("restore_backup", engine=engine.name, datadir=engine.datadir,
+                       binlog_dir=engine.binlog_dir, source=backup_identity())
+        while first < len(phases) and journal.is_done("restore_backup", phases[first].name):
+            first += 1
+        interrupted = (first < len(phases) and journal.status(
+            "restore_backup", phases[first].name) in ("started", "failed"))
+    if interrupted:
+        phase = phases[first]
+        if not phase.retryable:
+            raise RuntimeError(f"Restore phase '{phase.name}' was interrupted and cannot "
+                               f"be repeated; start over without --resume")
+        if phase.restart_from:
+            first = [p.name for p in phases].index(phase.restart_from)
+            logger.info(f"⏮️  Phase {phase.name} was interrupted; restarting from "
+                        f"{phase.restart_from}")
+    
+    logger.info("Starting backup restoration (this may take a while)...")
+    for index, phase in enumerate(phases):
+        if index < first:
+            logger.info(f"⏭️  Phase {phase.name} completed in an earlier run")
+            continue
+        if index == first and interrupted:
+            engine.reset_output(phase)
+        if journal:
+            journal.start("restore_backup", phase.name)
+        start = time.monotonic()
+        try:
+            phase.run()
+        except Exception as e:
+            if journal:
+                journal.fail("restore_backup", str(e), phase.name)
+            raise
+        if journal:
+            journal.finish("restore_backup", time.monotonic() - start, phase.name)
+    
+    logger.info(f"📁 Backup path: {Config.BACKUP_PATH}")
+    logger.info("✅ Backup restored successfully")
+
+
+def verify_restore_source():
+    """Pre-flight check of the backup, or of the clone donor."""
+    get_restore_engine().verify()
+
+
+def load_backup():
+    """Finish engines that load into the running server (logical dumps, clone)."""
+    get_restore_engine().post_start()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#              STEP 5: SET FINAL PERMISSIONS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def set_permissions():
+    """
+    Set final ownership and permissions on restored directories.
+    
+    Commands:
+        sudo chown -R mysql:mysql /u01/data
+        sudo chmod 750 /u01/data
+        sudo chmod 750 /u01/data/mysql1_binlog
+        sudo chown -R mysql:mysql /u01/data/mysql1_binlog
+    """
+    print_section("STEP 5: SET FINAL PERMISSIONS")
+    
+    apply_mysql_permissions()
+    
+    logger.info("✅ Permissions set successfully")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                    STEP 6: START MYSQL INSTANCE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def start_mysql_instance():
+    """
+    Start the MySQL instance after restoration.
+    
+    Commands:
+        sudo systemctl start mysqld@mysql1
+        sudo systemctl status mysqld@mysql1
+    """
+    print_section("STEP 6: START MYSQL INSTANCE")
+    
+    # Start the instance
+    run_command(
+        Config.SYSTEMCTL_CMD + ["start", Config.MYSQL_INSTANCE],
+        "Starting MySQL instance"
+    )
+    
+    # Wait for startup (recovery, buffer pool load)
+    wait_for_mysql_ready()
+    
+    # Check status
+    run_command(
+        Config.SYSTEMCTL_CMD + ["status", Config.MYSQL_INSTANCE],
+        "Checking MySQL instance status"
+    )
+    
+    logger.info("✅ MySQL instance started successfully")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                         BUFFER POOL WARM-UP
+# ══════════════════════════════════════════════════════════════════════════════
+
+_LOADED_PAGES = re.compile(r"Loaded (\d+)/(\d+) pages")
+
+
+def warmup_donor() -> Tuple[str, int]:
+    """(host, port) whose buffer pool is copied: Config.WARMUP_DONOR or the primary."""
+    if not Config.WARMUP_DONOR:
+        return Config.PRIMARY_HOST, Config.PRIMARY_PORT
+    host, _, port = Config.WARMUP_DONOR.rpartition(":")
+    return host, int(port)
+
+
+def dump_donor_buffer_pool(donor: SQLExecutor) -> str:
+    """
+    Dump the donor's buffer pool now and wait for it to finish.
+    
+    Returns:
+        Path of the dump file on the donor
+    """
+    files, before = donor.execute_many([
+        "SELECT @@GLOBAL.datadir AS datadir, "
+        "@@GLOBAL.innodb_buffer_pool_filename AS filename",
+        "SHOW GLOBAL STATUS LIKE 'Innodb_buffer_pool_dump_status'",
+    ])
+    donor.query("SET GLOBAL innodb_buffer_pool_dump_now = ON")
+    before = before[0]["Value"] if before else None
+    
+    def _dumped() -> bool:
+        status = _status_value(donor, "Innodb_buffer_pool_dump_status") or ""
+        return status != before and "dump completed" in status.lower()
+    
+    wait_for(_dumped, f"buffer pool dump on {donor.host}:{donor.port}",
+             Config.WARMUP_TIMEOUT)
+    return os.path.join(files[0]["datadir"], files[0]["filename"]) if files else "ib_buffer_pool"
+
+
+def transfer_buffer_pool(datadir: Optional[str] = None):
+    """
+    Before startup: put the donor's hot page list into the restored datadir.
+    
+    SQL on the donor (Config.WARMUP_DONOR, default the primary):
+        SET GLOBAL innodb_buffer_pool_dump_now = ON;
+    then, once Innodb_buffer_pool_dump_status reports completion
+    (Config.WARMUP_FETCH_CMD):
+        ssh 192.168.1.1 sudo cat /u01/data/ib_buffer_pool
+        sudo install -o mysql -g mysql -m 640 <copy> /u01/data/ib_buffer_pool
+    
+    The file lists (space id, page number) pairs; a physical copy keeps the
+    donor's space ids, so innodb_buffer_pool_load_at_startup reads the
+    donor's working set. Warm-up only: problems are logged, never fail the
+    rebuild (the replica starts cold).
+    """
+    print_section("BUFFER POOL WARM-UP: TRANSFER")
+    
+    datadir = datadir or Config.DATA_DIR
+    host, port = warmup_donor()
+    target = os.path.join(datadir, "ib_buffer_pool")
+    try:
+        donor = get_executor(host, port, Config.SOURCE_ADMIN_USER, Config.SOURCE_ADMIN_PASSWORD)
+        path = dump_donor_buffer_pool(donor)
+        fetch = [arg.format(host=host, port=port, path=path) for arg in Config.WARMUP_FETCH_CMD]
+        _, content, _ = run_command(fetch, f"Fetching {path} from {host}", sudo=False)
+        pages = content.count("\n")
+        if not pages and _plan is None:
+            logger.warning(f"⚠️  {host}:{port} dumped no pages; the replica starts cold")
+            return
+        with private_temp_file("ib_buffer_pool-", "ib_buffer_pool", content,
+                               f"Write fetched dump for {target}") as copy:
+            run_command(["install", "-o", Config.MYSQL_USER, "-g", Config.MYSQL_GROUP,
+                         "-m", "640", copy, target], f"Installing {target}")
+        if _plan is None:
+            logger.info(f"✅ {pages:,} page ids from {host}:{port} ready for the startup load")
+    except Exception as e:
+        logger.warning(f"⚠️  Buffer pool dump not transferred ({e}); the replica starts cold")
+
+
+def warm_buffer_pool(load_now: bool = False):
+    """
+    After startup: track Innodb_buffer_pool_load_status until the load is
+    over, so the workflow only finishes with a warm replica. Progress
+    (pages, % and ETA) is logged every Config.PROGRESS_INTERVAL seconds.
+    
+    With load_now (the dump arrived after startup, e.g. clone), or when
+    the load did not start (innodb_buffer_pool_load_at_startup=OFF):
+        SET GLOBAL innodb_buffer_pool_load_now = ON;
+    
+    Warm-up only: problems are logged, never fail the rebuild.
+    """
+    print_section("BUFFER POOL WARM-UP: LOAD")
+    
+    executor = get_executor()
+    try:
+        rows = executor.query("SELECT @@GLOBAL.innodb_page_size AS page_size")
+        if _plan is not None:
+            planned("wait", "Buffer pool load finished", f"timeout {Config.WARMUP_TIMEOUT:g}s")
+            return
+        page_size = int(rows[0]["page_size"])
+        status = _status_value(executor, "Innodb_buffer_pool_load_status") or ""
+        if load_now or "not started" in status.lower():
+            executor.query("SET GLOBAL innodb_buffer_pool_load_now = ON")
+            status = ""
+        
+        start = time.monotonic()
+        last = [start, 0]
+        while not buffer_pool_load_finished(status):
+            if time.monotonic() - start > Config.WARMUP_TIMEOUT:
+                logger.warning(f"⚠️  Buffer pool still loading after {Config.WARMUP_TIMEOUT}s: "
+                               f"{status}")
+                return
+            time.sleep(Config.POLL_MAX_INTERVAL)
+            status = _status_value(executor, "Innodb_buffer_pool_load_status") or ""
+            match = _LOADED_PAGES.search(status)
+            if match:
+                _progress("Buffer pool load", start, int(match.group(1)) * page_size,
+                          int(match.group(2)) * page_size, last)
+        
+        if "aborted" in status.lower():
+            logger.warning(f"⚠️  {status}")
+            return
+        logger.info(f"✅ {status} (warm after {time.monotonic() - start:.0f}s)")
+    except Exception as e:
+        logger.warning(f"⚠️  Buffer pool warm-up not tracked: {e}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                 STAGED RESTORE (DATADIR SWAP)
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class DirSwap:
+    """
+    A live directory, the sibling it is restored into, and where the old
+    tree goes on swap: /u01/data, /u01/data.staged, /u01/data.previous.
+    """
+    live: str
+    staging: str
+    previous: str
+
+
+def staged_dir_swaps() -> List[DirSwap]:
+    """
+    Directories renamed by a staged restore: DATA_DIR, plus BINLOG_DIR when
+    it does not live inside DATA_DIR (a nested one moves with it).
+    """
+    swaps = []
+    for live in (Config.DATA_DIR, Config.BINLOG_DIR):
+        if live == Config.BINLOG_DIR and _is_nested(live, Config.DATA_DIR):
+            continue
+        live = live.rstrip("/")
+        swaps.append(DirSwap(live, live + Config.STAGED_SUFFIX,
+                             live + Config.PREVIOUS_SUFFIX))
+    return swaps
+
+
+def staged_restore_targets() -> Tuple[str, str]:
+    """(datadir, binlog_dir) the restore writes to in staged mode."""
+    datadir = Config.DATA_DIR.rstrip("/") + Config.STAGED_SUFFIX
+    if _is_nested(Config.BINLOG_DIR, Config.DATA_DIR):
+        binlog_dir = datadir + Config.BINLOG_DIR[len(Config.DATA_DIR.rstrip("/")):]
+    else:
+        binlog_dir = Config.BINLOG_DIR.rstrip("/") + Config.STAGED_SUFFIX
+    return datadir, binlog_dir
+
+
+def _backup_source() -> str:
+    """Path of the configured backup: MEB image, XtraBackup directory, dump or clone donor."""
+    if Config.RESTORE_ENGINE == "clone":
+        host, port = clone_donor()
+        return f"{host}:{port}"
+    return {"meb": Config.BACKUP_IMAGE, "xtrabackup": Config.XTRABACKUP_DIR,
+            "logical": Config.LOGICAL_DUMP_PATH}.get(Config.RESTORE_ENGINE, "")
+
+
+def _backup_size() -> int:
+    """Bytes of the configured backup source (0 if it cannot be read)."""
+    if Config.BACKUP_MANIFEST:
+        try:
+            return load_backup_manifest(Config.BACKUP_MANIFEST)["raw_bytes"]
+        except (OSError, ValueError):
+            return 0
+    path = _backup_source()
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return _tree_bytes(path)
+
+
+def check_staged_restore():
+    """
+    Refuse a staged restore that cannot swap atomically.
+    
+    The staging directories must be on the same filesystem as the live
+    ones (rename(2) cannot cross filesystems, and a mount point cannot be
+    renamed), there must be room for a second copy, and the engine must
+    produce a complete datadir without a running server.
+    
+    Raises:
+        RuntimeError: If any of the above does not hold
+    """
+    engine = get_restore_engine()
+    if engine.requires_running_server:
+        raise RuntimeError(f"Staged restore needs a physical backup; engine "
+                           f"'{engine.name}' loads into the running server")
+    
+    for swap in staged_dir_swaps():
+        parent = os.path.dirname(swap.live) or "/"
+        if os.path.exists(swap.live) and os.stat(swap.live).st_dev != os.stat(parent).st_dev:
+            raise RuntimeError(f"{swap.live} is a mount point or on another filesystem "
+                               f"than {parent}; it cannot be swapped by rename")
+    
+    needed = _backup_size()
+    free = shutil.disk_usage(os.path.dirname(Config.DATA_DIR.rstrip("/")) or "/").free
+    if needed > free:
+        raise RuntimeError(f"Staged restore needs ~{needed / 1e9:.1f} GB next to "
+                           f"{Config.DATA_DIR}, only {free / 1e9:.1f} GB free")
+    logger.info(f"✅ Staged restore possible: ~{needed / 1e9:.1f} GB needed, "
+                f"{free / 1e9:.1f} GB free")
+
+
+def prepare_staging():
+    """
+    Create empty staging directories next to the live ones (mysqld keeps
+    running). Leftovers of an earlier staged restore are removed first.
+    """
+    print_section("STAGED RESTORE: PREPARE STAGING DIRECTORIES")
+    
+    check_staged_restore()
+    leftovers = [path for swap in staged_dir_swaps()
+                 for path in (swap.staging, swap.previous) if _lexists(path)]
+    if leftovers:
+        purge_paths(leftovers, "Removing leftovers of an earlier staged restore")
+    apply_mysql_permissions(list(staged_restore_targets()), create=True)
+    
+    logger.info("✅ Staging directories ready")
+
+
+def restore_staged_backup():
+    """Step 4 into the staging directories while the old instance serves."""
+    restore_backup(*staged_restore_targets())
+
+
+def set_staged_permissions():
+    """Step 5 on the staging directories."""
+    print_section("STEP 5: SET FINAL PERMISSIONS (STAGING)")
+    apply_mysql_permissions(list(staged_restore_targets()))
+    logger.info("✅ Permissions set successfully")
+
+
+def _sed_literal(text: str, replacement: bool = False) -> str:
+    """Escape text for a sed s|...|...| pattern or replacement."""
+    special = "\\&|" if replacement else "\\.*[]^$|"
+    return "".join("\\" + c if c in special else c for c in text)
+
+
+def rewrite_index_paths(directory: str, old_prefix: str, new_prefix: str):
+    """
+    Rewrite absolute paths in the binlog/relay log index files (*.index) of
+    a directory after it was renamed; mysqld refuses to start when an
+    index lists files that do not exist.
+    """
+    expression = (f"s|^{_sed_literal(old_prefix.rstrip('/'))}/"
+                  f"|{_sed_literal(new_prefix.rstrip('/'), replacement=True)}/|")
+    run_command(
+        ["find", directory, "-maxdepth", "1", "-name", "*.index",
+         "-exec", "sed", "-i", expression, "{}", "+"],
+        f"Rewriting log index paths in {directory}"
+    )
+
+
+def swap_datadir():
+    """
+    Swap the restored tree in (mysqld must be stopped).
+    
+    Commands (per directory):
+        sudo mv -T /u01/data /u01/data.previous
+        sudo mv -T /u01/data.staged /u01/data
+    
+    Both are renames within one filesystem, so the swap takes milliseconds
+    regardless of size. If the second rename fails the first is undone.
+    """
+    print_section("STAGED RESTORE: SWAP DATA DIRECTORIES")
+    
+    done = []
+    try:
+        for swap in staged_dir_swaps():
+            if _lexists(swap.live):
+                move_path(swap.live, swap.previous,
+                          f"Moving {swap.live} aside to {swap.previous}")
+            done.append(swap)
+            move_path(swap.staging, swap.live, f"Moving {swap.staging} into place")
+    except subprocess.CalledProcessError:
+        logger.error("💥 Swap failed, restoring the previous directories")
+        for swap in reversed(done):
+            if os.path.lexists(swap.previous) and not os.path.lexists(swap.live):
+                move_path(swap.previous, swap.live, f"Restoring {swap.live}", check=False)
+        raise
+    
+    for swap in staged_dir_swaps():
+        rewrite_index_paths(swap.live, swap.staging, swap.live)
+    if _is_nested(Config.BINLOG_DIR, Config.DATA_DIR):
+        rewrite_index_paths(Config.BINLOG_DIR, staged_restore_targets()[0],
+                            Config.DATA_DIR)
+    
+    logger.info("✅ Restored datadir swapped in")
+
+
+def rollback_datadir():
+    """
+    Put the previous datadir back and start mysqld on it.
+    
+    The rejected tree is moved back to the staging name for inspection; it
+    is removed by the next staged restore.
+    
+    Raises:
+        RuntimeError: If there is no previous datadir to roll back to
+    """
+    print_section("STAGED RESTORE: ROLLBACK")
+    
+    swaps = staged_dir_swaps()
+    missing = [swap.previous for swap in swaps if not os.path.lexists(swap.previous)]
+    if missing:
+        raise RuntimeError(f"Nothing to roll back to: {', '.join(missing)} missing")
+    
+    run_command(Config.SYSTEMCTL_CMD + ["stop", Config.MYSQL_INSTANCE],
+                "Stopping MySQL instance", check=False)
+    wait_for_mysql_stopped()
+    for swap in swaps:
+        run_command(["rm", "-rf", swap.staging], f"Removing {swap.staging}")
+        move_path(swap.live, swap.staging, f"Moving rejected {swap.live} to {swap.staging}")
+        move_path(swap.previous, swap.live, f"Moving {swap.previous} back into place")
+    start_mysql_instance()
+    
+    journal = get_journal()
+    if journal:
+        # mysqld serves the old datadir again: a resume must stop and swap anew
+        journal.invalidate("stop_mysql", "swap_datadir", "start_mysql")
+    logger.info("✅ Rolled back to the previous datadir")
+
+
+def start_staged_instance():
+    """Step 6 on the swapped datadir, rolling back if it does not come up."""
+    try:
+        start_mysql_instance()
+    except Exception as e:
+        logger.error(f"💥 New datadir did not come up ({e}); rolling back")
+        rollback_datadir()
+        raise
+
+
+def remove_previous_datadir():
+    """
+    Delete the previous datadir, throttled (see purge_tree), once the new
+    one serves. With Config.STAGED_KEEP_PREVIOUS the tree is kept for
+    --rollback instead.
+    """
+    for swap in staged_dir_swaps():
+        if Config.STAGED_KEEP_PREVIOUS:
+            logger.info(f"⏭️  Keeping {swap.previous} for --rollback")
+        elif _lexists(swap.previous):
+            purge_paths([swap.previous], f"Deleting previous datadir {swap.previous}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                 STEP 7: CONFIGURE REPLICATION
+# ══════════════════════════════════════════════════════════════════════════════
+
+def generate_replication_sql() -> str:
+    """
+    Generate SQL commands for configuring replication.
+    
+    Returns:
+        SQL script as string
+    """
+    applier_sql = ""
+    if Config.APPLIER_TUNE_ON_SETUP:
+        applier_sql = (f"\n-- Step 7.3b: Parallel applier ({os.cpu_count()} cores on this host)\n"
+                       + "\n".join(f"{stmt};" for stmt in applier_setup_sql()) + "\n")
+    sql = f"""
+-- ================================================================================
+-- MySQL REPLICATION CONFIGURATION
+-- Run these commands on the SECONDARY server via MySQL Workbench or CLI
+-- ================================================================================
+
+-- Step 7.1: Check current replica status
+SHOW REPLICA STATUS;
+
+-- Step 7.2: Stop any existing replication
+STOP REPLICA;
+
+-- Step 7.3: Reset replica configuration
+RESET REPLICA ALL;
+{applier_sql}
+-- Step 7.4: Configure replication source (Primary server)
+CHANGE REPLICATION SOURCE TO
+    SOURCE_HOST='{Config.PRIMARY_HOST}',
+    SOURCE_PORT={Config.PRIMARY_PORT},
+    SOURCE_USER='{Config.REPLICATION_USER}',
+    SOURCE_PASSWORD='{Config.REPLICATION_PASSWORD}',
+    SOURCE_AUTO_POSITION=1,
+    GET_SOURCE_PUBLIC_KEY=1;
+
+-- Step 7.5: Start replication
+START REPLICA;
+
+-- Step 7.6: Verify replication status
+SHOW REPLICA STATUS\\G
+
+-- ================================================================================
+-- EXPECTED OUTPUT:
+--   Replica_IO_Running: Yes
+--   Replica_SQL_Running: Yes
+--   Seconds_Behind_Source: 0 (or small number)
+-- ================================================================================
+"""
+    return sql
+
+
+def configure_replication():
+    """
+    Display and optionally execute replication configuration SQL.
+    """
+    print_section("STEP 7: CONFIGURE REPLICATION")
+    
+    sql = generate_replication_sql()
+    
+    print("\n📋 SQL Commands to run on Secondary server:\n")
+    print("-" * 70)
+    print(sql)
+    print("-" * 70)
+    
+    # Save SQL to file
+    sql_file = Config.REPLICATION_SQL_FILE
+    if not planned("write", "Save replication SQL script", sql_file, len(sql)):
+        with open(sql_file, 'w') as f:
+            f.write(sql)
+    logger.info(f"📄 SQL script saved to: {sql_file}")
+    
+    journal = get_journal()
+    if journal:
+        journal.record("configure_replication", sql_file=sql_file,
+                       sql_sha256=_sha256_file(sql_file))
+    
+    print("\n" + "=" * 70)
+    print("  MANUAL STEPS REQUIRED:")
+    print("=" * 70)
+    print(f"""
+    1. Login to MySQL Workbench or mysql CLI on secondary server
+    2. Connect to: 127.0.0.1:{Config.SECONDARY_PORT}
+    3. Run the SQL commands above
+    4. Verify replication is working with: SHOW REPLICA STATUS\\G
+    5. Wait for catch-up before sending reads:
+       python mysql_replication_setup.py --watch-lag
+    
+    Expected result:
+    - Replica_IO_Running: Yes
+    - Replica_SQL_Running: Yes
+    """)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      GTID PRE-FLIGHT (BEFORE START REPLICA)
+# ══════════════════════════════════════════════════════════════════════════════
+
+_GTID_UUID = re.compile(r"[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}")
+_GTID_TAG = re.compile(r"[a-z_][a-z0-9_]{0,31}")
+
+Intervals = Tuple[array, array]     # (starts, ends): sorted, disjoint, non-adjacent
+
+
+def _coalesce(pairs: Iterable[Tuple[int, int]]) -> Intervals:
+    """Merge (start, end) pairs, sorted by start, into interval arrays."""
+    starts, ends = array("q"), array("q")
+    for start, end in pairs:
+        if ends and start <= ends[-1] + 1:
+            if end > ends[-1]:
+                ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def _union(a: Intervals, b: Intervals) -> Intervals:
+    return _coalesce(heapq.merge(zip(*a), zip(*b)))
+
+
+def _subtract(a: Intervals, b: Intervals) -> Intervals:
+    """a minus b; the first overlapping interval of b is found by bisection."""
+    b_starts, b_ends = b
+    starts, ends = array("q"), array("q")
+    for start, end in zip(*a):
+        index = bisect_left(b_ends, start)
+        current = start
+        while index < len(b_starts) and b_starts[index] <= end:
+            if b_starts[index] > current:
+                starts.append(current)
+                ends.append(b_starts[index] - 1)
+            current = b_ends[index] + 1
+            index += 1
+        if current <= end:
+            starts.append(current)
+            ends.append(end)
+    return starts, ends
+
+
+def _intersect(a: Intervals, b: Intervals) -> Intervals:
+    b_starts, b_ends = b
+    starts, ends = array("q"), array("q")
+    for start, end in zip(*a):
+        index = bisect_left(b_ends, start)
+        while index < len(b_starts) and b_starts[index] <= end:
+            starts.append(max(start, b_starts[index]))
+            ends.append(min(end, b_ends[index]))
+            index += 1
+    return starts, ends
+
+
+def _covers(b: Intervals, a: Intervals) -> bool:
+    """True if every interval of a lies inside one interval of b."""
+    b_starts, b_ends = b
+    for start, end in zip(*a):
+        index = bisect_right(b_starts, start) - 1
+        if index < 0 or b_ends[index] < end:
+            return False
+    return True
+
+
+class GtidSet:
+    """
+    A GTID set, e.g. a server's gtid_executed.
+    
+    Each source UUID (and tag, MySQL 8.3+) maps to two array('q') of
+    interval starts and ends - sorted, disjoint and non-adjacent - so
+    even values with thousands of UUIDs and fragments stay compact.
+    Parsing sorts once (O(n log n)); union, difference and intersection
+    are single merge passes, and membership and subset tests bisect
+    (O(log n) per GTID or interval).
+    
+    Example:
+        >>> a = GtidSet.parse("3e11fa47-71ca-11e1-9e33-c80aa9429562:1-5:11-18")
+        >>> b = GtidSet.parse("3E11FA47-71CA-11E1-9E33-C80AA9429562:1-12")
+        >>> str(a - b), (a | b).count(), "3e11fa47-71ca-11e1-9e33-c80aa9429562:7" in a
+        ('3e11fa47-71ca-11e1-9e33-c80aa9429562:13-18', 18, False)
+    """
+    __slots__ = ("_sets",)
+    
+    def __init__(self, intervals: Optional[Dict[Tuple[str, str], Iterable[Tuple[int, int]]]] = None):
+        self._sets: Dict[Tuple[str, str], Intervals] = {}
+        for key, pairs in (intervals or {}).items():
+            merged = _coalesce(sorted(pairs))
+            if merged[0]:
+                self._sets[key] = merged
+    
+    @classmethod
+    def _of(cls, sets: Dict[Tuple[str, str], Intervals]) -> "GtidSet":
+        gtids = cls()
+        gtids._sets = {key: pair for key, pair in sets.items() if pair[0]}
+        return gtids
+    
+    @classmethod
+    def parse(cls, text: Optional[str]) -> "GtidSet":
+        """
+        Parse MySQL's text form, e.g. "uuid:1-5:11-18,\\nuuid2:tag:1-3".
+        
+        Raises:
+            ValueError: On a malformed member, tag or interval
+        """
+        intervals: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        for member in (text or "").split(","):
+            parts = "".join(member.split()).split(":")
+            if parts == [""]:
+                continue
+            uuid, tag = parts[0].lower(), ""
+            if len(parts) < 2 or not _GTID_UUID.fullmatch(uuid):
+                raise ValueError(f"Invalid GTID set member '{member.strip()}'")
+            pairs = intervals.setdefault((uuid, tag), [])
+            for part in parts[1:]:
+                if not part[:1].isdigit():
+                    if not _GTID_TAG.fullmatch(part.lower()):
+                        raise ValueError(f"Invalid GTID tag '{part}'")
+                    tag = part.lower()
+                    pairs = intervals.setdefault((uuid, tag), [])
+                    continue
+                start, _, end = part.partition("-")
+                try:
+                    start, end = int(start), int(end or start)
+                except ValueError:
+                    raise ValueError(f"Invalid GTID interval '{part}'") from None
+                if start < 1 or end < start:
+                    raise ValueError(f"Invalid GTID interval '{part}'")
+                pairs.append((start, end))
+        return cls(intervals)
+    
+    @property
+    def intervals(self) -> Dict[Tuple[str, str], List[Tuple[int, int]]]:
+        """(uuid, tag) -> [(start, end), ...]"""
+        return {key: list(zip(*pair)) for key, pair in self._sets.items()}
+    
+    def count(self) -> int:
+        """Number of transactions in the set."""
+        return sum(sum(ends) - sum(starts) + len(starts)
+                   for starts, ends in self._sets.values())
+    
+    def contains(self, uuid: str, gno: int, tag: str = "") -> bool:
+        """True if transaction uuid[:tag]:gno is in the set."""
+        pair = self._sets.get((uuid.lower(), tag.lower()))
+        if pair is None:
+            return False
+        index = bisect_right(pair[0], gno) - 1
+        return index >= 0 and pair[1][index] >= gno
+    
+    def __contains__(self, gtid: str) -> bool:
+        """`"uuid:42" in gtids` (or "uuid:tag:42")."""
+        uuid, _, rest = gtid.strip().partition(":")
+        tag, _, gno = rest.rpartition(":")
+        return self.contains(uuid, int(gno), tag)
+    
+    def __or__(self, other: "GtidSet") -> "GtidSet":
+        union = dict(self._sets)
+        for key, pair in other._sets.items():
+            union[key] = _union(union[key], pair) if key in union else pair
+        return GtidSet._of(union)
+    
+    def __sub__(self, other: "GtidSet") -> "GtidSet":
+        return GtidSet._of({key: _subtract(pair, other._sets[key]) if key in other._sets
+                            else pair for key, pair in self._sets.items()})
+    
+    def __and__(self, other: "GtidSet") -> "GtidSet":
+        return GtidSet._of({key: _intersect(pair, other._sets[key])
+                            for key, pair in self._sets.items() if key in other._sets})
+    
+    def __le__(self, other: "GtidSet") -> bool:
+        """Subset test."""
+        return all(key in other._sets and _covers(other._sets[key], pair)
+                   for key, pair in self._sets.items())
+    
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, GtidSet) and self._sets == other._sets
+    
+    def __bool__(self) -> bool:
+        return bool(self._sets)
+    
+    def __str__(self) -> str:
+        return ",".join(
+            f"{uuid}{':' + tag if tag else ''}:" + ":".join(
+                f"{start}-{end}" if end > start else str(start) for start, end in zip(*pair))
+            for (uuid, tag), pair in sorted(self._sets.items()))
+    
+    def __repr__(self) -> str:
+        return f"GtidSet('{self}')"
+
+
+def _as_gtid_set(value: Union[str, GtidSet, None]) -> GtidSet:
+    return value if isinstance(value, GtidSet) else GtidSet.parse(value)
+
+
+@dataclass
+class GtidPreflight:
+    """Outcome of gtid_preflight_decision()."""
+    action: str                     # "ok", "seed" or "refuse"
+    reason: str
+    gtid_purged: str = ""           # Value for SET GLOBAL gtid_purged ("seed")
+    to_fetch: int = 0               # Transactions the replica will fetch from the source
+
+
+def gtid_preflight_decision(backup: Union[str, GtidSet, None],
+                            replica_executed: Union[str, GtidSet],
+                            source_executed: Union[str, GtidSet],
+                            source_purged: Union[str, GtidSet]) -> GtidPreflight:
+    """
+    Decide whether a restored replica can start with SOURCE_AUTO_POSITION=1.
+    
+    Pure function of the four GTID sets (strings or GtidSets):
+    
+    - refuse if the backup or the replica holds transactions the source
+      never executed (errant transactions, or a backup of another source)
+    - seed gtid_purged with what the backup contains but the replica's
+      gtid_executed does not (plain value when gtid_executed is empty,
+      "+set" to append otherwise)
+    - refuse if the source has purged binary logs with transactions the
+      replica would still need to fetch
+    
+    Args:
+        backup: GTID set recorded in the backup metadata (None if unknown:
+            the replica's gtid_executed is taken as is)
+        replica_executed: @@GLOBAL.gtid_executed of the restored replica
+        source_executed: @@GLOBAL.gtid_executed of the source
+        source_purged: @@GLOBAL.gtid_purged of the source
+    """
+    replica = _as_gtid_set(replica_executed)
+    backup = replica if backup is None else _as_gtid_set(backup)
+    source_executed = _as_gtid_set(source_executed)
+    
+    errant = (replica | backup) - source_executed
+    if errant:
+        return GtidPreflight("refuse", f"{errant.count():,} transactions are not on the "
+                                       f"source (errant, or a backup of another source): "
+                                       f"{errant}")
+    
+    seed = backup - replica
+    executed = replica | seed
+    missing = _as_gtid_set(source_purged) - executed
+    if missing:
+        return GtidPreflight("refuse", f"the source has purged binary logs with "
+                                       f"{missing.count():,} transactions the replica "
+                                       f"still needs ({missing}); restore a newer backup")
+    
+    to_fetch = (source_executed - executed).count()
+    if seed:
+        return GtidPreflight("seed", f"gtid_executed lacks {seed.count():,} transactions "
+                                     f"of the backup",
+                             str(seed) if not replica else f"+{seed}", to_fetch)
+    return GtidPreflight("ok", "gtid_executed covers the backup", to_fetch=to_fetch)
+
+
+def parse_xtrabackup_binlog_info(text: str) -> Optional[GtidSet]:
+    """
+    GTID set of an xtrabackup_binlog_info file (None without GTIDs).
+    
+    Format:
+        mysql-bin.000003<TAB>1234<TAB>3e11fa47-...:1-100,
+        8b8e...:1-5
+    """
+    fields = text.strip().split(None, 2)
+    return GtidSet.parse(fields[2]) if len(fields) == 3 else None
+
+
+def parse_backup_variables(text: str) -> Optional[GtidSet]:
+    """
+    GTID set of a MySQL Enterprise Backup meta/backup_variables.txt
+    (`gtid_executed=...`, possibly continued on following lines).
+    """
+    value = None
+    for line in text.splitlines():
+        key, sep, rest = line.partition("=")
+        if sep and key.strip().lower() == "gtid_executed":
+            value = rest.strip()
+        elif value is not None and not sep and line[:1].isspace():
+            value += line.strip()
+        elif value is not None:
+            break
+    return GtidSet.parse(value.strip("'\"")) if value is not None else None
+
+
+def backup_gtid_metadata() -> Tuple[Optional[str], Optional[GtidSet]]:
+    """
+    Find the GTID set of the restored backup.
+    
+    Looks in the backup first, then in the restored datadir:
+        xtrabackup: xtrabackup_binlog_info
+        meb:        meta/backup_variables.txt
+    
+    Returns:
+        (file, GTID set), or (None, None) if no metadata is found
+    """
+    names = {"xtrabackup": ("xtrabackup_binlog_info", parse_xtrabackup_binlog_info,
+                            (Config.XTRABACKUP_DIR, Config.DATA_DIR)),
+             "meb": (os.path.join("meta", "backup_variables.txt"), parse_backup_variables,
+                     (Config.BACKUP_DIR, Config.DATA_DIR))}
+    if Config.RESTORE_ENGINE not in names:
+        return None, None
+    name, parse, directories = names[Config.RESTORE_ENGINE]
+    for directory in directories:
+        path = os.path.join(directory, name)
+        try:
+            with open(path) as f:
+                gtids = parse(f.read())
+        except OSError:
+            continue
+        if gtids is not None:
+            return path, gtids
+    return None, None
+
+
+def gtid_preflight(replica: Optional[SQLExecutor] = None,
+                   seed: bool = True) -> GtidPreflight:
+    """
+    Check the restored replica's GTID position before START REPLICA.
+    
+    Compares the backup's GTID set, the replica's gtid_executed and the
+    source's gtid_executed/gtid_purged (gtid_preflight_decision), seeds
+    gtid_purged on the replica when needed:
+        STOP REPLICA;
+        SET GLOBAL gtid_purged = '+3e11fa47-...:1-100';
+    and refuses to continue otherwise, before the replica re-fetches a
+    huge binlog range or stops on errant transactions.
+    
+    Args:
+        replica: Executor for the replica (default: the admin account)
+        seed: Run the SET GLOBAL gtid_purged here; False leaves it to the
+            caller's own batch (decision.gtid_purged)
+    
+    Raises:
+        RuntimeError: If replication cannot start from this backup
+    """
+    print_section("PRE-CHECK: GTID POSITION")
+    
+    metadata, backup = backup_gtid_metadata()
+    if planned("sql", "Compare backup/replica/source GTID sets, seed gtid_purged",
+               metadata or ""):
+        return GtidPreflight("ok", "planned")
+    if backup is None:
+        logger.warning("⚠️  No GTID set in the backup metadata; checking the replica's "
+                       "gtid_executed against the source only")
+    else:
+        logger.info(f"📄 Backup GTID set ({metadata}): {backup.count():,} transactions")
+    
+    replica = replica or get_executor()
+    replica_executed = replica.query("SELECT @@GLOBAL.gtid_executed AS gtid_executed")
+    source = get_source_executor().query(
+        "SELECT @@GLOBAL.gtid_executed AS gtid_executed, @@GLOBAL.gtid_purged AS gtid_purged")
+    decision = gtid_preflight_decision(backup, replica_executed[0]["gtid_executed"],
+                                       source[0]["gtid_executed"], source[0]["gtid_purged"])
+    
+    if decision.action == "refuse":
+        logger.error(f"   ❌ Cannot start replication: {decision.reason}")
+        raise RuntimeError(f"GTID pre-flight failed: {decision.reason}")
+    if decision.action == "seed":
+        logger.info(f"🔧 {decision.reason}; SET GLOBAL gtid_purged = '{decision.gtid_purged}'")
+    if decision.action == "seed" and seed:
+        replica.execute_many(["STOP REPLICA",
+                              f"SET GLOBAL gtid_purged = '{decision.gtid_purged}'"])
+    logger.info(f"   ✅ GTID position verified; {decision.to_fetch:,} transactions "
+                f"to fetch from the source")
+    
+    journal = get_journal()
+    if journal:
+        journal.record("gtid_preflight", action=decision.action,
+                       gtid_purged=decision.gtid_purged, to_fetch=decision.to_fetch)
+    return decision
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      EXECUTE REPLICATION SQL
+# ══════════════════════════════════════════════════════════════════════════════
+
+def execute_replication_sql(mysql_password: str) -> Row:
+    """
+    Execute replication SQL commands in one session on the secondary.
+    
+    The GTID pre-flight reads through the same executor, and its
+    gtid_purged seed runs inside the batch, right after STOP REPLICA.
+    
+    Args:
+        mysql_password: MySQL root/admin password
+        
+    Returns:
+        SHOW REPLICA STATUS after START REPLICA, as a dict
+    """
+    print_section("EXECUTING REPLICATION SQL")
+    
+    executor = get_executor(port=Config.SECONDARY_PORT, password=mysql_password)
+    
+    seed = []
+    if Config.GTID_PREFLIGHT:
+        decision = gtid_preflight(executor, seed=False)
+        if decision.action == "seed":
+            seed = [f"SET GLOBAL gtid_purged = '{decision.gtid_purged}';"]
+    
+    commands = [
+        "STOP REPLICA;",
+        *seed,
+        "RESET REPLICA ALL;",
+        *(f"{stmt};" for stmt in applier_setup_sql()),
+        f"""CHANGE REPLICATION SOURCE TO
+            SOURCE_HOST='{Config.PRIMARY_HOST}',
+            SOURCE_PORT={Config.PRIMARY_PORT},
+            SOURCE_USER='{Config.REPLICATION_USER}',
+            SOURCE_PASSWORD='{Config.REPLICATION_PASSWORD}',
+            SOURCE_AUTO_POSITION=1,
+            GET_SOURCE_PUBLIC_KEY=1;""",
+        "START REPLICA;",
+        "SHOW REPLICA STATUS\\G"
+    ]
+    
+    logger.info(f"🔧 Executing {len(commands)} statements via {executor!r}")
+    for cmd in commands:
+        logger.debug(f"   SQL: {' '.join(cmd.split())[:50]}...")
+    
+    try:
+        results = executor.execute_many(commands)
+    except Exception as e:
+        logger.error(f"   ❌ Failed: {e}")
+        raise
+    logger.info("   ✅ Success")
+    
+    status = results[-1][0] if results[-1] else {}
+    for field in ("Replica_IO_Running", "Replica_SQL_Running",
+                  "Seconds_Behind_Source", "Last_IO_Error", "Last_SQL_Error"):
+        logger.info(f"   {field}: {status.get(field)}")
+    return status
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      REPLICATION LAG MONITOR
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class LagSample:
+    """One observation of replica progress."""
+    at: float                               # time.monotonic()
+    io_running: str
+    sql_running: str
+    seconds_behind: Optional[int]
+    retrieved: int                          # GTIDs received (this channel)
+    executed: int                           # GTIDs applied on the replica
+    source_executed: Optional[int] = None   # GTIDs committed on the source
+    pending: Optional[int] = None           # Source GTIDs missing on the replica
+    applier_lag: Optional[float] = None     # Commit-to-apply delay, seconds
+    workers: int = 0
+    busy_workers: int = 0
+
+
+def _slope(points: List[Tuple[float, float]]) -> float:
+    """Least-squares slope of (x, y) points (0 if undefined)."""
+    n = len(points)
+    if n < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+
+class LagMonitor:
+    """
+    Samples replica progress into a bounded ring buffer and derives rates.
+    
+    Apply rate is the growth of the replica's gtid_executed; source write
+    rate is the growth of the source's gtid_executed (or, when the source
+    cannot be queried, of Retrieved_Gtid_Set). The catch-up ETA is
+    backlog / (apply rate - source rate).
+    """
+    
+    WORKER_SQL = """
+        SELECT COUNT(*) AS workers,
+               SUM(APPLYING_TRANSACTION <> '') AS busy,
+               MAX(TIMESTAMPDIFF(MICROSECOND,
+                       LAST_APPLIED_TRANSACTION_ORIGINAL_COMMIT_TIMESTAMP,
+                       LAST_APPLIED_TRANSACTION_END_APPLY_TIMESTAMP)) / 1000000
+                   AS applier_lag
+          FROM performance_schema.replication_applier_status_by_worker
+         WHERE LAST_APPLIED_TRANSACTION <> ''
+    """
+    
+    def __init__(self, replica: SQLExecutor, source: Optional[SQLExecutor] = None,
+                 ring_size: Optional[int] = None):
+        self.replica = replica
+        self.source = source
+        self.samples: deque = deque(maxlen=ring_size or Config.LAG_RING_SIZE)
+    
+    def sample(self) -> LagSample:
+        """Take one sample and append it to the ring buffer."""
+        status_rows, executed_rows, worker_rows = self.replica.execute_many([
+            "SHOW REPLICA STATUS",
+            "SELECT @@GLOBAL.gtid_executed AS gtid_executed",
+            self.WORKER_SQL,
+        ])
+        status = status_rows[0] if status_rows else {}
+        workers = worker_rows[0] if worker_rows else {}
+        
+        executed = GtidSet.parse(executed_rows[0]["gtid_executed"])
+        source_executed = pending = None
+        if self.source is not None:
+            try:
+                row = self.source.query("SELECT @@GLOBAL.gtid_executed AS gtid_executed")
+                source_set = GtidSet.parse(row[0]["gtid_executed"])
+                source_executed = source_set.count()
+                pending = (source_set - executed).count()
+            except Exception as e:
+                logger.debug(f"   Source not queryable, using retrieved set: {e}")
+                self.source = None
+        
+        applier_lag = workers.get("applier_lag")
+        sample = LagSample(
+            at=time.monotonic(),
+            io_running=status.get("Replica_IO_Running") or "No",
+            sql_running=status.get("Replica_SQL_Running") or "No",
+            seconds_behind=_to_int(status.get("Seconds_Behind_Source")),
+            retrieved=GtidSet.parse(status.get("Retrieved_Gtid_Set")).count(),
+            executed=executed.count(),
+            source_executed=source_executed,
+            pending=pending,
+            applier_lag=float(applier_lag) if applier_lag is not None else None,
+            workers=_to_int(workers.get("workers")) or 0,
+            busy_workers=_to_int(workers.get("busy")) or 0,
+        )
+        self.samples.append(sample)
+        return sample
+    
+    def _window(self, seconds: float) -> List[LagSample]:
+        if not self.samples:
+            return []
+        cutoff = self.samples[-1].at - seconds
+        return [s for s in self.samples if s.at >= cutoff]
+    
+    def backlog(self, sample: Optional[LagSample] = None) -> int:
+        """Transactions not yet applied (source or retrieved minus executed)."""
+        sample = sample or self.samples[-1]
+        if sample.pending is not None:
+            return sample.pending
+        # Retrieved_Gtid_Set only covers this channel; compare its growth
+        # with the growth of gtid_executed since the first sample.
+        first = self.samples[0]
+        return max((sample.retrieved - first.retrieved)
+                   - (sample.executed - first.executed), 0)
+    
+    def rates(self, seconds: Optional[float] = None) -> Tuple[float, float]:
+        """(apply rate, source write rate) in GTIDs/s over the window."""
+        seconds = seconds or Config.LAG_RATE_WINDOW
+        window = self._window(seconds)
+        if len(window) < 2:
+            return 0.0, 0.0
+        first, last = window[0], window[-1]
+        elapsed = last.at - first.at
+        apply_rate = (last.executed - first.executed) / elapsed
+        if first.source_executed is not None and last.source_executed is not None:
+            source_rate = (last.source_executed - first.source_executed) / elapsed
+        else:
+            source_rate = (last.retrieved - first.retrieved) / elapsed
+        return apply_rate, source_rate
+    
+    def eta(self) -> Optional[float]:
+        """Seconds until the backlog reaches zero (None if not converging)."""
+        apply_rate, source_rate = self.rates()
+        backlog = self.backlog()
+        if backlog == 0:
+            return 0.0
+        if apply_rate <= source_rate:
+            return None
+        return backlog / (apply_rate - source_rate)
+    
+    def is_diverging(self, seconds: Optional[float] = None) -> bool:
+        """
+        True when, over a full window, the backlog trends up and the applier
+        is slower than the source.
+        """
+        seconds = seconds or Config.LAG_RATE_WINDOW
+        window = self._window(seconds)
+        if len(window) < 3 or window[-1].at - window[0].at < seconds * 0.9:
+            return False
+        apply_rate, source_rate = self.rates(seconds)
+        trend = _slope([(s.at, self.backlog(s)) for s in window])
+        return trend > 0 and apply_rate < source_rate
+    
+    def is_caught_up(self) -> bool:
+        sample = self.samples[-1]
+        return (sample.io_running == "Yes" and sample.sql_running == "Yes"
+                and sample.seconds_behind is not None
+                and sample.seconds_behind <= Config.LAG_READY_SECONDS
+                and self.backlog() == 0)
+    
+    def format(self, sample: LagSample) -> str:
+        apply_rate, source_rate = self.rates()
+        eta = self.eta()
+        eta_text = "-" if eta is None else f"{eta / 60:.1f} min"
+        applier = "-" if sample.applier_lag is None else f"{sample.applier_lag:.1f}s"
+        return (f"IO={sample.io_running:<3} SQL={sample.sql_running:<3} "
+                f"lag={sample.seconds_behind if sample.seconds_behind is not None else 'NULL':>6}s "
+                f"applier={applier:>7} backlog={self.backlog(sample):>9,} trx "
+                f"apply={apply_rate:>8.1f}/s source={source_rate:>8.1f}/s "
+                f"workers={sample.busy_workers}/{sample.workers} ETA={eta_text}")
+
+
+def get_source_executor() -> SQLExecutor:
+    """Executor for status queries on the primary."""
+    return get_executor(Config.PRIMARY_HOST, Config.PRIMARY_PORT,
+                        Config.SOURCE_ADMIN_USER, Config.SOURCE_ADMIN_PASSWORD)
+
+
+def watch_replication_lag(timeout: Optional[float] = None,
+                          interval: Optional[float] = None) -> int:
+    """
+    Sample replication progress until the replica has caught up.
+    
+    Prints one line per sample with lag, backlog, apply vs. source rate and
+    the ETA to zero lag.
+    
+    Returns:
+        Exit code: 0 caught up, 1 replication threads stopped or timeout,
+        2 lag diverging (the applier cannot keep up with the source)
+    """
+    print_section("REPLICATION LAG MONITOR")
+    
+    interval = interval or Config.LAG_SAMPLE_INTERVAL
+    monitor = LagMonitor(get_executor(), get_source_executor())
+    deadline = time.monotonic() + timeout if timeout else None
+    
+    while True:
+        sample = monitor.sample()
+        logger.info(f"📊 {monitor.format(sample)}")
+        
+        if sample.io_running != "Yes" or sample.sql_running != "Yes":
+            if len(monitor.samples) > 1:
+                logger.error("❌ Replication threads are not running")
+                return 1
+        elif monitor.is_caught_up():
+            logger.info("✅ Replica has caught up and can take read traffic")
+            return 0
+        elif monitor.is_diverging():
+            logger.error("❌ Lag is diverging: the applier is slower than the source")
+            return 2
+        
+        if deadline and time.monotonic() >= deadline:
+            logger.error(f"❌ Not caught up after {timeout:g}s")
+            return 1
+        time.sleep(interval)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      PARALLEL APPLIER TUNING
+# ══════════════════════════════════════════════════════════════════════════════
+
+def recommended_applier_workers(cores: Optional[int] = None) -> int:
+    """One applier worker per core, at least 4, at most APPLIER_MAX_WORKERS."""
+    cores = cores or os.cpu_count() or 1
+    return min(max(4, cores), Config.APPLIER_MAX_WORKERS)
+
+
+def applier_setup_sql() -> List[str]:
+    """Parallel applier statements for the replication SQL (APPLIER_TUNE_ON_SETUP)."""
+    if not Config.APPLIER_TUNE_ON_SETUP:
+        return []
+    return [f"SET PERSIST replica_parallel_workers = {recommended_applier_workers()}",
+            "SET PERSIST replica_preserve_commit_order = ON"]
+
+
+def _variable(executor: SQLExecutor, name: str) -> Optional[str]:
+    """SHOW GLOBAL VARIABLES value, None if the variable does not exist."""
+    rows = executor.query(f"SHOW GLOBAL VARIABLES LIKE '{name}'")
+    return rows[0]["Value"] if rows else None
+
+
+def set_applier_workers(executor: SQLExecutor, workers: int, restart: bool = True):
+    """
+    Restart the SQL thread with a new worker count (persisted).
+    
+    SQL:
+        STOP REPLICA SQL_THREAD;
+        SET PERSIST replica_parallel_workers = N;
+        SET PERSIST replica_preserve_commit_order = ON;
+        START REPLICA SQL_THREAD;
+    
+    Without restart only the SET PERSIST statements run; they take effect
+    at the next START REPLICA.
+    """
+    statements = [f"SET PERSIST replica_parallel_workers = {int(workers)}",
+                  "SET PERSIST replica_preserve_commit_order = ON"]
+    if restart:
+        statements = ["STOP REPLICA SQL_THREAD"] + statements + ["START REPLICA SQL_THREAD"]
+    executor.execute_many(statements)
+
+
+def inspect_applier_settings(replica: SQLExecutor,
+                             source: Optional[SQLExecutor]) -> Dict[str, Optional[str]]:
+    """Collect the settings that decide how parallel the applier can be."""
+    settings = {
+        "replica_parallel_workers": _variable(replica, "replica_parallel_workers"),
+        "replica_preserve_commit_order": _variable(replica, "replica_preserve_commit_order"),
+        "replica_parallel_type": _variable(replica, "replica_parallel_type"),
+        "source_dependency_tracking": None,
+    }
+    if source is not None:
+        try:
+            tracking = _variable(source, "binlog_transaction_dependency_tracking")
+            # Removed in 8.4, where WRITESET is always used
+            settings["source_dependency_tracking"] = tracking or "WRITESET"
+        except Exception as e:
+            logger.warning(f"   ⚠️  Cannot query source settings: {e}")
+    return settings
+
+
+def benchmark_applier(replica: SQLExecutor, source: Optional[SQLExecutor],
+                      candidates: Sequence[int]) -> Dict[int, float]:
+    """
+    Measure apply throughput (GTIDs/s) for each worker count.
+    
+    Each candidate restarts the SQL thread, waits APPLIER_BENCHMARK_WARMUP
+    seconds and then samples with LagMonitor for APPLIER_BENCHMARK_SECONDS.
+    Stops early if the backlog runs out (numbers would be meaningless).
+    """
+    results = {}
+    for workers in candidates:
+        logger.info(f"🔧 Benchmarking replica_parallel_workers = {workers}")
+        set_applier_workers(replica, workers)
+        time.sleep(Config.APPLIER_BENCHMARK_WARMUP)
+        
+        monitor = LagMonitor(replica, source)
+        end = time.monotonic() + Config.APPLIER_BENCHMARK_SECONDS
+        while True:
+            monitor.sample()
+            if time.monotonic() >= end:
+                break
+            time.sleep(Config.LAG_SAMPLE_INTERVAL)
+        
+        apply_rate, _ = monitor.rates(Config.APPLIER_BENCHMARK_SECONDS)
+        results[workers] = apply_rate
+        logger.info(f"   📊 {workers} workers: {apply_rate:,.1f} GTIDs/s "
+                    f"(backlog {monitor.backlog():,})")
+        if monitor.backlog() == 0:
+            logger.warning("   ⚠️  Backlog exhausted, stopping benchmark")
+            break
+    return results
+
+
+def tune_parallel_applier(benchmark: bool = False) -> int:
+    """
+    Inspect source/replica settings and configure the parallel applier.
+    
+    Warns when the source tracks dependencies by COMMIT_ORDER (little
+    parallelism for the replica to exploit); applies one worker per core
+    with replica_preserve_commit_order=ON; with benchmark, measures
+    catch-up throughput for half/1x/2x the core count (never above
+    APPLIER_MAX_WORKERS) and keeps the fastest. If the SQL thread is not
+    running (replication not started yet), the settings are only
+    persisted and there is nothing to benchmark.
+    
+    Returns:
+        The worker count left in place
+    """
+    print_section("PARALLEL APPLIER TUNING")
+    
+    replica = get_executor()
+    source = get_source_executor()
+    cores = os.cpu_count() or 1
+    
+    settings = inspect_applier_settings(replica, source)
+    logger.info(f"Replica cores: {cores}")
+    for name, value in settings.items():
+        logger.info(f"   {name}: {value}")
+    
+    tracking = settings["source_dependency_tracking"]
+    if tracking and tracking.upper() != "WRITESET":
+        logger.warning(f"⚠️  Source binlog_transaction_dependency_tracking = {tracking}: "
+                       "set WRITESET on the source for better replica parallelism")
+    
+    workers = recommended_applier_workers(cores)
+    running = replica_status(replica).get("Replica_SQL_Running") == "Yes"
+    if benchmark and not running:
+        logger.warning("⚠️  Replica SQL thread is not running: nothing to benchmark")
+    elif benchmark:
+        candidates = sorted({max(1, workers // 2), workers,
+                             min(workers * 2, Config.APPLIER_MAX_WORKERS)})
+        results = benchmark_applier(replica, source, candidates)
+        if results:
+            workers = max(results, key=results.get)
+            logger.info(f"🏁 Fastest: {workers} workers ({results[workers]:,.1f} GTIDs/s)")
+    
+    logger.info(f"🔧 Setting replica_parallel_workers = {workers}, "
+                "replica_preserve_commit_order = ON")
+    set_applier_workers(replica, workers, restart=running)
+    logger.info("   ✅ Parallel applier configured" if running
+                else "   ✅ Parallel applier settings persisted for START REPLICA")
+    return workers
+
+
+def tune_applier_step():
+    """
+    Post-setup step (Config.APPLIER_TUNE_STEP): inspect the applier
+    settings and persist one worker per core with
+    replica_preserve_commit_order=ON (tune_parallel_applier(), without
+    the benchmark).
+    
+    Advisory: problems are logged, never fail the rebuild.
+    """
+    try:
+        tune_parallel_applier()
+    except Exception as e:
+        logger.warning(f"⚠️  Parallel applier tuning failed: {e}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      SWITCHOVER (PLANNED ROLE SWAP)
+# ══════════════════════════════════════════════════════════════════════════════
+
+_SWITCHOVER_VARIABLES = """
+    SELECT @@GLOBAL.gtid_executed AS gtid_executed, @@GLOBAL.gtid_mode AS gtid_mode,
+           @@GLOBAL.log_bin AS log_bin, @@GLOBAL.read_only AS read_only,
+           @@GLOBAL.event_scheduler AS event_scheduler
+"""
+
+
+@dataclass
+class SwitchoverResult:
+    """Timings of a switchover, in seconds (monotonic clock, this host)."""
+    window: float = 0.0                     # Old primary read-only → new primary writable
+    phases: Dict[str, float] = field(default_factory=dict)
+    synced: int = 0                         # Transactions applied during the sync wait
+
+
+def switchover_precheck(old: SQLExecutor, new: SQLExecutor) -> Row:
+    """
+    Refuse a switchover that would lose transactions or hold the primary
+    read-only for longer than the sync timeout allows.
+    
+    Both servers need gtid_mode=ON, the new primary binary logging and
+    running replication threads, no transactions the old primary lacks
+    (errant), and a backlog of at most Config.SWITCHOVER_MAX_BACKLOG.
+    Running it also opens the pooled sessions used for the switchover.
+    
+    Returns:
+        The old primary's settings (restored on rollback)
+        
+    Raises:
+        RuntimeError: If any of the above does not hold
+    """
+    old_vars = old.query(_SWITCHOVER_VARIABLES)[0]
+    new_vars, status = new.execute_many([_SWITCHOVER_VARIABLES, "SHOW REPLICA STATUS"])
+    new_vars, status = new_vars[0], (status[0] if status else {})
+    
+    problems = []
+    for role, values in (("old", old_vars), ("new", new_vars)):
+        if values["gtid_mode"] != "ON":
+            problems.append(f"gtid_mode is {values['gtid_mode']} on the {role} primary")
+    if old_vars["read_only"] != "0":
+        problems.append("the old primary is already read-only")
+    if new_vars["log_bin"] != "1":
+        problems.append("binary logging is off on the new primary")
+    if status.get("Replica_IO_Running") != "Yes" or status.get("Replica_SQL_Running") != "Yes":
+        problems.append("replication threads are not running on the new primary")
+    old_set = GtidSet.parse(old_vars["gtid_executed"])
+    new_set = GtidSet.parse(new_vars["gtid_executed"])
+    errant = new_set - old_set
+    if errant:
+        problems.append(f"errant transactions on the new primary ({errant}); "
+                        f"the old primary could not replicate from it")
+    backlog = (old_set - new_set).count()
+    if backlog > Config.SWITCHOVER_MAX_BACKLOG:
+        problems.append(f"the new primary is {backlog:,} transactions behind "
+                        f"(limit {Config.SWITCHOVER_MAX_BACKLOG:,}); wait with --watch-lag")
+    
+    if problems:
+        for problem in problems:
+            logger.error(f"   ❌ {problem}")
+        raise RuntimeError("Switchover pre-check failed: " + "; ".join(problems))
+    logger.info(f"   ✅ Pre-check passed; {backlog:,} transactions to apply")
+    return old_vars
+
+
+def _release_old_primary(old: SQLExecutor, old_vars: Row, started: float):
+    """Make the old primary writable again (switchover rolled back)."""
+    statements = ["SET PERSIST super_read_only = OFF", "SET PERSIST read_only = OFF"]
+    if old_vars["event_scheduler"] == "ON":
+        statements.append("SET GLOBAL event_scheduler = ON")
+    old.execute_many(statements)
+    logger.warning(f"   ⏮️  Old primary is writable again after "
+                   f"{(time.monotonic() - started) * 1000:.0f}ms; roles unchanged")
+
+
+def switchover() -> SwitchoverResult:
+    """
+    Swap roles: the secondary becomes the primary, the primary its replica.
+    
+    failover.md done online - no restarts, both servers keep their binlogs
+    and GTID history (no RESET MASTER), over the pooled sessions opened by
+    the pre-check:
+    
+        -- old primary: freeze
+        SET SESSION lock_wait_timeout = 2;
+        SET GLOBAL event_scheduler = OFF;
+        SET PERSIST super_read_only = ON;
+        SELECT @@GLOBAL.gtid_executed;
+        -- new primary: sync and promote
+        SELECT WAIT_FOR_EXECUTED_GTID_SET('<gtid_executed above>', 10);
+        STOP REPLICA; RESET REPLICA ALL;
+        SET PERSIST super_read_only = OFF; SET PERSIST read_only = OFF;
+        -- old primary: demote (writes are already back)
+        CHANGE REPLICATION SOURCE TO SOURCE_HOST='192.168.2.1', ...;
+        START REPLICA;
+    
+    super_read_only is the write barrier instead of FLUSH TABLES WITH READ
+    LOCK: it blocks SUPER accounts too, survives the session, and with
+    lock_wait_timeout cannot queue behind a long query. Writes are
+    unavailable from the freeze until the new primary is writable; that
+    window is measured and reported. If the new primary has not applied
+    everything within Config.SWITCHOVER_SYNC_TIMEOUT, the old primary is
+    made writable again.
+    
+    Raises:
+        RuntimeError: Pre-check failed, freeze or sync timed out (rolled
+        back), or promotion failed (both servers left read-only)
+    """
+    print_section("SWITCHOVER")
+    
+    old, new = get_source_executor(), get_executor()
+    new_address = f"{Config.SECONDARY_HOST}:{Config.SECONDARY_PORT}"
+    logger.info(f"🔁 {Config.PRIMARY_HOST}:{Config.PRIMARY_PORT} → replica, "
+                f"{new_address} → primary")
+    old_vars = switchover_precheck(old, new)
+    if not confirm_action(f"Make {Config.PRIMARY_HOST}:{Config.PRIMARY_PORT} read-only "
+                          f"and promote {new_address}?"):
+        raise RuntimeError("Switchover cancelled")
+    
+    result = SwitchoverResult()
+    freeze = [f"SET SESSION lock_wait_timeout = {Config.SWITCHOVER_LOCK_TIMEOUT}"]
+    if old_vars["event_scheduler"] == "ON":
+        freeze.append("SET GLOBAL event_scheduler = OFF")
+    freeze += ["SET PERSIST super_read_only = ON",
+               "SELECT @@GLOBAL.gtid_executed AS gtid_executed"]
+    
+    # ── Write-unavailability window starts ───────────────────────────────
+    started = time.monotonic()
+    try:
+        frozen = old.execute_many(freeze)[-1][0]["gtid_executed"]
+    except Exception as e:
+        logger.error(f"   ❌ Could not make the old primary read-only: {e}")
+        _release_old_primary(old, old_vars, started)
+        raise RuntimeError(f"Switchover aborted: {e}") from e
+    result.phases["freeze"] = time.monotonic() - started
+    
+    mark = time.monotonic()
+    before, waited = new.execute_many([
+        "SELECT @@GLOBAL.gtid_executed AS gtid_executed",
+        f"SELECT WAIT_FOR_EXECUTED_GTID_SET('{frozen}', "
+        f"{Config.SWITCHOVER_SYNC_TIMEOUT}) AS timed_out",
+    ])
+    result.phases["sync"] = time.monotonic() - mark
+    timed_out = waited[0]["timed_out"]
+    if timed_out != "0":
+        logger.error(f"   ❌ New primary did not catch up within "
+                     f"{Config.SWITCHOVER_SYNC_TIMEOUT}s")
+        _release_old_primary(old, old_vars, started)
+        raise RuntimeError("Switchover aborted: sync timed out")
+    result.synced = (GtidSet.parse(frozen) - GtidSet.parse(before[0]["gtid_executed"])).count()
+    
+    promote = ["STOP REPLICA", "RESET REPLICA ALL",
+               "SET PERSIST super_read_only = OFF", "SET PERSIST read_only = OFF"]
+    if old_vars["event_scheduler"] == "ON":
+        promote.append("SET GLOBAL event_scheduler = ON")
+    mark = time.monotonic()
+    try:
+        new.execute_many(promote)
+    except Exception as e:
+        logger.critical(f"   ❌ Promotion failed, BOTH servers are read-only: {e}")
+        logger.critical("   Fix and finish on the new primary, or undo on the old one with "
+                        "SET PERSIST super_read_only = OFF; SET PERSIST read_only = OFF")
+        raise RuntimeError(f"Switchover promotion failed: {e}") from e
+    ended = time.monotonic()
+    result.phases["promote"] = ended - mark
+    result.window = ended - started
+    # ── Write-unavailability window ends ─────────────────────────────────
+    
+    logger.info(f"   ✅ {new_address} is the primary; writes were unavailable for "
+                f"{result.window * 1000:.0f}ms")
+    
+    mark = time.monotonic()
+    old.execute_many([
+        "RESET REPLICA ALL",
+        f"""CHANGE REPLICATION SOURCE TO
+            SOURCE_HOST='{Config.SECONDARY_HOST}',
+            SOURCE_PORT={Config.SECONDARY_PORT},
+            SOURCE_USER='{Config.REPLICATION_USER}',
+            SOURCE_PASSWORD='{Config.REPLICATION_PASSWORD}',
+            SOURCE_AUTO_POSITION=1,
+            GET_SOURCE_PUBLIC_KEY=1""",
+        "START REPLICA",
+    ])
+    
+    def _replicating() -> bool:
+        status = replica_status(old)
+        return (status.get("Replica_IO_Running") == "Yes"
+                and status.get("Replica_SQL_Running") == "Yes")
+    
+    wait_for(_replicating, f"{Config.PRIMARY_HOST} replicating from {new_address}",
+             timeout=Config.SWITCHOVER_SYNC_TIMEOUT, interval=0.1)
+    result.phases["demote"] = time.monotonic() - mark
+    
+    print_switchover_result(result)
+    logger.info("⚠️  Swap PRIMARY_* and SECONDARY_* in the configuration for later runs")
+    return result
+
+
+def print_switchover_result(result: SwitchoverResult):
+    """Print the write-unavailability window and its phases."""
+    print_section("SWITCHOVER TIMING")
+    labels = {
+        "freeze": "Old primary read-only",
+        "sync": f"Apply remaining ({result.synced:,} GTIDs)",
+        "promote": "Promote new primary",
+        "demote": "Old primary replicating",
+    }
+    for phase, seconds in result.phases.items():
+        inside = "" if phase == "demote" else "  ◀ writes blocked"
+        print(f"  {labels[phase]:<34} {seconds * 1000:>9.1f}ms{inside}")
+    print("  " + "-" * 46)
+    print(f"  {'Write-unavailability window':<34} {result.window * 1000:>9.1f}ms")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      BINLOG ANALYZER
+# ══════════════════════════════════════════════════════════════════════════════
+
+_BINLOG_MAGIC = b"\xfebin"
+_EVENT_HEADER = struct.Struct("<IBIIIH")    # timestamp, type, server_id, size, next pos, flags
+
+# Event type codes (libbinlogevents/include/binlog_event.h)
+_QUERY_EVENT = 2
+_FORMAT_DESCRIPTION_EVENT = 15
+_XID_EVENT = 16
+_TABLE_MAP_EVENT = 19
+_ROWS_EVENTS = {23: "write", 24: "update", 25: "delete",        # v1
+                30: "write", 31: "update", 32: "delete",        # v2
+                39: "update"}                                   # partial JSON update
+_GTID_EVENTS = (33, 34)                                         # GTID, anonymous GTID
+_TRANSACTION_PAYLOAD_EVENT = 40
+_ROW_KINDS = ("write", "update", "delete")
+
+
+def _packed_int(buf, pos: int) -> Tuple[int, int]:
+    """Length-encoded integer at pos: (value, position after it)."""
+    first = buf[pos]
+    if first < 251:
+        return first, pos + 1
+    width = {252: 2, 253: 3, 254: 8}[first]
+    return int.from_bytes(buf[pos + 1:pos + 1 + width], "little"), pos + 1 + width
+
+
+def _size_bucket(size: int) -> int:
+    """Quarter-power-of-two histogram bucket (upper bound within 19%)."""
+    return math.ceil(math.log2(max(size, 1)) * 4)
+
+
+@dataclass
+class BinlogStats:
+    """
+    Write volume found in binary/relay logs.
+    
+    tables maps "schema.table" to [row events, row bytes, write bytes,
+    update bytes, delete bytes]; transaction sizes are kept as a
+    histogram (see _size_bucket) and the largest ones individually.
+    """
+    files: int = 0
+    bytes: int = 0
+    events: int = 0
+    transactions: int = 0
+    transaction_bytes: int = 0
+    size_histogram: Dict[int, int] = field(default_factory=dict)
+    largest: List[Tuple[int, str, str, int, Tuple[str, ...]]] = field(default_factory=list)
+    tables: Dict[str, List[int]] = field(default_factory=dict)
+    ddl: Dict[str, int] = field(default_factory=dict)   # Statements per schema
+    first_timestamp: int = 0
+    last_timestamp: int = 0
+    parallel_window: int = 0        # Sum of sequence_number - last_committed
+    serial: int = 0                 # Transactions depending on their predecessor
+    clocked: int = 0                # Transactions with logical clock values
+    compressed_bytes: int = 0       # Payload events not decoded (no zstandard)
+    truncated: List[str] = field(default_factory=list)
+    
+    def add_transaction(self, size: int, gtid: str, path: str, pos: int,
+                        tables: Tuple[str, ...], top: int):
+        self.transactions += 1
+        self.transaction_bytes += size
+        bucket = _size_bucket(size)
+        self.size_histogram[bucket] = self.size_histogram.get(bucket, 0) + 1
+        entry = (size, gtid, path, pos, tables)
+        if len(self.largest) < top:
+            heapq.heappush(self.largest, entry)
+        elif size > self.largest[0][0]:
+            heapq.heapreplace(self.largest, entry)
+    
+    def merge(self, other: "BinlogStats", top: int):
+        for name in ("files", "bytes", "events", "transactions", "transaction_bytes",
+                     "parallel_window", "serial", "clocked", "compressed_bytes"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for bucket, count in other.size_histogram.items():
+            self.size_histogram[bucket] = self.size_histogram.get(bucket, 0) + count
+        self.largest = heapq.nlargest(top, self.largest + other.largest)
+        heapq.heapify(self.largest)
+        for name, counters in other.tables.items():
+            mine = self.tables.setdefault(name, [0] * 5)
+            for i, value in enumerate(counters):
+                mine[i] += value
+        for schema, count in other.ddl.items():
+            self.ddl[schema] = self.ddl.get(schema, 0) + count
+        stamps = [t for t in (self.first_timestamp, other.first_timestamp) if t]
+        self.first_timestamp = min(stamps, default=0)
+        self.last_timestamp = max(self.last_timestamp, other.last_timestamp)
+        self.truncated += other.truncated
+    
+    def size_percentile(self, fraction: float) -> int:
+        """Approximate transaction size at a percentile (bucket upper bound)."""
+        rank, seen = fraction * self.transactions, 0
+        for bucket in sorted(self.size_histogram):
+            seen += self.size_histogram[bucket]
+            if seen >= rank:
+                return int(2 ** (bucket / 4))
+        return 0
+    
+    def schemas(self) -> Dict[str, int]:
+        """Row bytes per schema."""
+        totals: Dict[str, int] = {}
+        for name, counters in self.tables.items():
+            schema = name.split(".", 1)[0]
+            totals[schema] = totals.get(schema, 0) + counters[1]
+        return totals
+
+
+class _BinlogScanner:
+    """Walks the events of one file, tracking table maps and transactions."""
+    
+    def __init__(self, path: str, stats: BinlogStats, top: int):
+        self.path = path
+        self.stats = stats
+        self.top = top
+        self.checksum = 0
+        self.post_header = bytes(50)
+        self.table_map: Dict[int, str] = {}
+        self.gtid = ""
+        self.txn_start = 0
+        self.txn_bytes = 0
+        self.txn_tables: Dict[str, None] = {}
+        self.txn_open = False           # Since a GTID event
+        self.in_transaction = False     # Inside BEGIN ... COMMIT
+    
+    def _table_id(self, buf, body: int, type_code: int) -> int:
+        width = 4 if self.post_header[type_code - 1] == 6 else 6
+        return int.from_bytes(buf[body:body + width], "little")
+    
+    def _end_transaction(self):
+        if self.txn_open:
+            self.stats.add_transaction(self.txn_bytes, self.gtid or "anonymous", self.path,
+                                       self.txn_start, tuple(self.txn_tables), self.top)
+        self.gtid, self.txn_bytes, self.txn_tables = "", 0, {}
+        self.txn_open = self.in_transaction = False
+    
+    def _format_description(self, buf, body: int, end: int):
+        version = bytes(buf[body + 2:body + 52]).split(b"\0", 1)[0].decode(errors="replace")
+        numbers = tuple(int(n) for n in re.findall(r"\d+", version)[:3])
+        has_checksum = numbers >= (5, 6, 1)
+        self.checksum = 4 if has_checksum and buf[end - 5] == 1 else 0
+        self.post_header = bytes(buf[body + 57:end - (5 if has_checksum else 0)]) + bytes(50)
+    
+    def _gtid(self, buf, body: int):
+        sid = bytes(buf[body + 1:body + 17]).hex()
+        gno = int.from_bytes(buf[body + 17:body + 25], "little", signed=True)
+        if gno > 0:
+            self.gtid = f"{sid[:8]}-{sid[8:12]}-{sid[12:16]}-{sid[16:20]}-{sid[20:]}:{gno}"
+        if buf[body + 25] == 2:         # LOGICAL_TIMESTAMP_TYPECODE
+            last_committed, sequence = struct.unpack_from("<qq", buf, body + 26)
+            window = sequence - last_committed
+            self.stats.parallel_window += window
+            self.stats.serial += window <= 1
+            self.stats.clocked += 1
+    
+    def _query(self, buf, body: int, end: int):
+        db_len = buf[body + 8]
+        status_len = struct.unpack_from("<H", buf, body + 11)[0]
+        db_start = body + 13 + status_len
+        query = bytes(buf[db_start + db_len + 1:min(end, db_start + db_len + 65)]).lstrip()
+        keyword = query.split(None, 1)[0].upper() if query else b""
+        if keyword == b"BEGIN":
+            self.in_transaction = True
+        elif keyword in (b"COMMIT", b"ROLLBACK"):
+            self._end_transaction()
+        else:
+            schema = bytes(buf[db_start:db_start + db_len]).decode(errors="replace") or "(none)"
+            self.stats.ddl[schema] = self.stats.ddl.get(schema, 0) + 1
+            if not self.in_transaction:
+                self._end_transaction()
+    
+    def _payload(self, buf, body: int, end: int, size: int):
+        pos, fields = body, {}
+        while pos < end:
+            kind, pos = _packed_int(buf, pos)
+            if kind == 0:                   # End of the payload header
+                break
+            length, pos = _packed_int(buf, pos)
+            fields[kind], _ = _packed_int(buf, pos)
+            pos += length
+        compression, uncompressed = fields.get(2, 0), fields.get(3, 0)
+        payload = buf[pos:pos + fields.get(1, end - pos)]
+        if compression == 255:              # NONE
+            self.scan(bytes(payload), 0, len(payload), nested=True)
+        elif zstandard is not None:
+            inner = zstandard.ZstdDecompressor().decompress(
+                bytes(payload), max_output_size=uncompressed or 64 * len(payload))
+            self.scan(inner, 0, len(inner), nested=True)
+        else:
+            self.stats.compressed_bytes += size
+            self._end_transaction()
+    
+    def scan(self, buf, pos: int, end: int, nested: bool = False) -> int:
+        """Process events in buf[pos:end]; returns where the last whole event ends."""
+        checksum = 0 if nested else self.checksum
+        stats = self.stats
+        while pos + _EVENT_HEADER.size <= end:
+            timestamp, type_code, _, size, _, _ = _EVENT_HEADER.unpack_from(buf, pos)
+            if size < _EVENT_HEADER.size or pos + size > end:
+                break                       # Being written, or not a binlog
+            body, body_end = pos + _EVENT_HEADER.size, pos + size
+            if not nested:
+                stats.events += 1
+                if timestamp:
+                    stats.first_timestamp = stats.first_timestamp or timestamp
+                    stats.last_timestamp = max(stats.last_timestamp, timestamp)
+                if type_code in _GTID_EVENTS:
+                    self._end_transaction()
+                    self.txn_open, self.txn_start = True, pos
+                if self.txn_open:
+                    self.txn_bytes += size
+            if type_code == _FORMAT_DESCRIPTION_EVENT:
+                self._format_description(buf, body, body_end)
+                checksum = self.checksum
+            body_end -= checksum
+            
+            if type_code in _ROWS_EVENTS:
+                name = self.table_map.get(self._table_id(buf, body, type_code), "(unknown)")
+                counters = stats.tables.setdefault(name, [0] * 5)
+                counters[0] += 1
+                counters[1] += size
+                counters[2 + _ROW_KINDS.index(_ROWS_EVENTS[type_code])] += size
+                self.txn_tables[name] = None
+            elif type_code == _TABLE_MAP_EVENT:
+                table_id = self._table_id(buf, body, type_code)
+                pos_name = body + self.post_header[type_code - 1]
+                db_len = buf[pos_name]
+                db = bytes(buf[pos_name + 1:pos_name + 1 + db_len])
+                table_len = buf[pos_name + 2 + db_len]
+                table = bytes(buf[pos_name + 3 + db_len:pos_name + 3 + db_len + table_len])
+                self.table_map[table_id] = (f"{db.decode(errors='replace')}."
+                                            f"{table.decode(errors='replace')}")
+            elif type_code in _GTID_EVENTS:
+                self._gtid(buf, body)
+            elif type_code == _XID_EVENT:
+                self._end_transaction()
+            elif type_code == _QUERY_EVENT:
+                self._query(buf, body, body_end)
+            elif type_code == _TRANSACTION_PAYLOAD_EVENT:
+                self._payload(buf, body, body_end, size)
+            pos += size
+        return pos
+
+
+def analyze_binlog_file(path: str, top: Optional[int] = None) -> BinlogStats:
+    """
+    Aggregate one binary or relay log, mapped with mmap (never read whole).
+    
+    Reads binlog format v4 (MySQL 5.0+): row events are attributed to their
+    table through the preceding TABLE_MAP_EVENT; transactions run from a
+    GTID event to XID/COMMIT (or their DDL statement). Compressed
+    transaction payloads (binlog_transaction_compression) are decoded when
+    the zstandard package is installed. A partially written last event
+    (the active binlog) is ignored and reported.
+    
+    Raises:
+        ValueError: If the file is not a binary log
+    """
+    top = top or Config.BINLOG_TOP_TRANSACTIONS
+    stats = BinlogStats(files=1)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < len(_BINLOG_MAGIC):
+            raise ValueError(f"{path}: not a binary log (too short)")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if buf[:4] != _BINLOG_MAGIC:
+                raise ValueError(f"{path}: not a binary log (bad magic)")
+            scanner = _BinlogScanner(path, stats, top)
+            end = scanner.scan(buf, len(_BINLOG_MAGIC), size)
+    stats.bytes = size
+    if end < size:
+        stats.truncated.append(f"{path}@{end}")
+    return stats
+
+
+def binlog_files(paths: Sequence[str]) -> List[str]:
+    """
+    Expand directories into their numbered logs (mysql-bin.000001,
+    relay.000002, ...); default: Config.BINLOG_DIR.
+    """
+    files = []
+    for path in paths or [Config.BINLOG_DIR]:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(glob.escape(path), "*.[0-9]" + "[0-9]" * 5)))
+        else:
+            files.append(path)
+    return files
+
+
+def analyze_binlogs(paths: Sequence[str], workers: Optional[int] = None) -> BinlogStats:
+    """
+    Analyze several logs in parallel, one process per file (the parser is
+    CPU-bound, so threads would serialize on the GIL).
+    """
+    top = Config.BINLOG_TOP_TRANSACTIONS
+    workers = min(workers or Config.BINLOG_ANALYZE_WORKERS, len(paths)) or 1
+    total = BinlogStats()
+    logger.info(f"🔍 Analyzing {len(paths)} binlog file(s) with {workers} process(es)")
+    if workers == 1:
+        results = map(analyze_binlog_file, paths)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(analyze_binlog_file, paths)
+    try:
+        for path, stats in zip(paths, results):
+            logger.info(f"   {os.path.basename(path)}: {_human_bytes(stats.bytes)}, "
+                        f"{stats.transactions:,} transactions")
+            total.merge(stats, top)
+    finally:
+        if workers > 1:
+            pool.shutdown()
+    return total
+
+
+def print_binlog_stats(stats: BinlogStats, limit: int = 15):
+    """Print the analysis: totals, transaction sizes, hot tables, outliers."""
+    print_section(f"BINLOG ANALYSIS: {stats.files} file(s), {_human_bytes(stats.bytes)}")
+    span = stats.last_timestamp - stats.first_timestamp
+    if stats.first_timestamp:
+        print(f"  Period:        {datetime.fromtimestamp(stats.first_timestamp):%Y-%m-%d %H:%M:%S}"
+              f" - {datetime.fromtimestamp(stats.last_timestamp):%Y-%m-%d %H:%M:%S}")
+    print(f"  Events:        {stats.events:,}")
+    print(f"  Transactions:  {stats.transactions:,}"
+          + (f" ({stats.transactions / span:,.1f}/s, {_human_bytes(stats.bytes / span)}/s)"
+             if span > 0 else ""))
+    if stats.transactions:
+        print(f"  Txn size:      mean {_human_bytes(stats.transaction_bytes / stats.transactions)}"
+              f"  p50 ≤{_human_bytes(stats.size_percentile(0.5))}"
+              f"  p99 ≤{_human_bytes(stats.size_percentile(0.99))}"
+              f"  max {_human_bytes(max(stats.largest)[0] if stats.largest else 0)}")
+    if stats.clocked:
+        print(f"  Parallelism:   mean window {stats.parallel_window / stats.clocked:.1f} txns, "
+              f"{stats.serial / stats.clocked:.0%} must wait for their predecessor "
+              f"(single-threaded apply)")
+    if stats.compressed_bytes:
+        print(f"  Compressed:    {_human_bytes(stats.compressed_bytes)} not decoded "
+              f"(pip install zstandard)")
+    for location in stats.truncated:
+        print(f"  Incomplete:    {location} (file still being written)")
+    
+    row_bytes = sum(counters[1] for counters in stats.tables.values()) or 1
+    print(f"\n  {'Table':<40} {'Events':>9} {'Bytes':>9} {'Share':>6} "
+          f"{'Write':>9} {'Update':>9} {'Delete':>9}")
+    print("  " + "-" * 96)
+    for name, counters in sorted(stats.tables.items(), key=lambda item: -item[1][1])[:limit]:
+        events, total, write, update, delete = counters
+        print(f"  {name[:40]:<40} {events:>9,} {_human_bytes(total):>9} "
+              f"{total / row_bytes:>6.1%} {_human_bytes(write):>9} "
+              f"{_human_bytes(update):>9} {_human_bytes(delete):>9}")
+    
+    schemas = sorted(stats.schemas().items(), key=lambda item: -item[1])
+    if schemas:
+        print("\n  Schemas: " + ", ".join(
+            f"{schema} {_human_bytes(total)} ({total / row_bytes:.0%})"
+            for schema, total in schemas[:limit]))
+    if stats.ddl:
+        print("  Statements (DDL/statement-based): " + ", ".join(
+            f"{schema} {count:,}" for schema, count in sorted(stats.ddl.items())))
+    
+    if stats.largest:
+        print(f"\n  {'Largest transactions':<50} {'Size':>9}  Location / tables")
+        print("  " + "-" * 96)
+        for size, gtid, path, pos, tables in sorted(stats.largest, reverse=True):
+            print(f"  {gtid[:50]:<50} {_human_bytes(size):>9}  "
+                  f"{os.path.basename(path)}:{pos} {', '.join(tables[:3])}"
+                  f"{' …' if len(tables) > 3 else ''}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      SLOW QUERY LOG DIGEST
+# ══════════════════════════════════════════════════════════════════════════════
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error (DDSketch).
+    
+    Values are counted in logarithmic buckets of ratio
+    (1 + ACCURACY) / (1 - ACCURACY), so every quantile is within ACCURACY
+    (1%) of the true value and memory grows with the logarithm of the
+    value range, not with the number of values: about 700 buckets cover
+    1 µs to 1 day.
+    """
+    __slots__ = ("buckets", "zeros", "count")
+    
+    ACCURACY = 0.01
+    MIN_VALUE = 1e-6                # Smaller values count as zero
+    _LOG_GAMMA = math.log((1 + ACCURACY) / (1 - ACCURACY))
+    
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+    
+    def add(self, value: float):
+        self.count += 1
+        if value <= self.MIN_VALUE:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._LOG_GAMMA)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+    
+    def merge(self, other: "QuantileSketch"):
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+    
+    def quantile(self, q: float) -> float:
+        """Value at quantile q (0..1); 0.0 for an empty sketch."""
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if self.count == 0 or rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * math.exp(key * self._LOG_GAMMA) / (1 + math.exp(self._LOG_GAMMA))
+        return 0.0
+
+
+class QueryDigest:
+    """Totals and distributions of one query fingerprint."""
+    __slots__ = ("count", "query_time", "lock_time", "rows_sent", "rows_examined",
+                 "max_time", "times", "examined", "db", "sample")
+    
+    def __init__(self):
+        self.count = 0
+        self.query_time = self.lock_time = self.max_time = 0.0
+        self.rows_sent = self.rows_examined = 0
+        self.times = QuantileSketch()
+        self.examined = QuantileSketch()
+        self.db = ""
+        self.sample = ""                # Slowest statement, truncated
+    
+    def add(self, query_time: float, lock_time: float, rows_sent: int, rows_examined: int,
+            db: str, statement: str):
+        self.count += 1
+        self.query_time += query_time
+        self.lock_time += lock_time
+        self.rows_sent += rows_sent
+        self.rows_examined += rows_examined
+        self.times.add(query_time)
+        self.examined.add(rows_examined)
+        if query_time >= self.max_time:
+            self.max_time, self.sample = query_time, statement[:500]
+        self.db = self.db or db
+    
+    def merge(self, other: "QueryDigest"):
+        for name in ("count", "query_time", "lock_time", "rows_sent", "rows_examined"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.times.merge(other.times)
+        self.examined.merge(other.examined)
+        if other.max_time >= self.max_time:
+            self.max_time, self.sample = other.max_time, other.sample
+        self.db = self.db or other.db
+
+
+_SLOW_ENTRY = b"# User@Host:"
+_SLOW_METRICS = re.compile(rb"# Query_time: ([\d.]+)\s+Lock_time: ([\d.]+)"
+                           rb"\s+Rows_sent: (\d+)\s+Rows_examined: (\d+)")
+_SLOW_NOISE = re.compile(rb"# |SET timestamp=|\S+, Version: .* started with:|Tcp port: |"
+                         rb"Time\s+Id\s+Command")
+_SLOW_USE = re.compile(rb"use ([^;\s]+);", re.I)
+_SLOW_STATEMENT_CAP = 64 << 10      # Statement bytes kept for fingerprinting
+_OTHER_FINGERPRINTS = "(other fingerprints)"
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"", re.S), "?"),
+    (re.compile(r"/\*.*?\*/|(?:-- |#)[^\n]*", re.S), " "),
+    (re.compile(r"\b0x[0-9a-f]+\b|\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b"), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\b(in|values) ?\( ?\?(?: ?, ?\?)* ?\)(?: ?, ?\( ?\?(?: ?, ?\?)* ?\))*"),
+     r"\1 (?+)"),
+]
+
+
+def fingerprint_query(statement: str) -> str:
+    """
+    Normalize a statement so executions with different literals group
+    together (the pt-query-digest convention).
+    
+    Example:
+        >>> fingerprint_query("SELECT * FROM t1 WHERE id IN (1, 2,3) AND name = 'x' /* app */;")
+        'select * from t1 where id in (?+) and name = ?'
+    """
+    text = statement.strip().lower()
+    for pattern, replacement in _FINGERPRINT_RULES:
+        text = pattern.sub(replacement, text)
+    return text.strip(" ;")
+
+
+@dataclass
+class SlowLogDigest:
+    """Fingerprint -> QueryDigest for one slow log (or byte range of it)."""
+    queries: Dict[str, QueryDigest] = field(default_factory=dict)
+    entries: int = 0
+    bytes: int = 0
+    
+    def add(self, fingerprint: str, *sample):
+        digest = self.queries.get(fingerprint)
+        if digest is None:
+            if len(self.queries) >= Config.SLOW_LOG_MAX_FINGERPRINTS:
+                fingerprint = _OTHER_FINGERPRINTS
+                digest = self.queries.get(fingerprint)
+            if digest is None:
+                digest = self.queries[fingerprint] = QueryDigest()
+        digest.add(*sample)
+        self.entries += 1
+    
+    def merge(self, other: "SlowLogDigest"):
+        self.entries += other.entries
+        self.bytes += other.bytes
+        for fingerprint, digest in other.queries.items():
+            if fingerprint not in self.queries and \
+                    len(self.queries) >= Config.SLOW_LOG_MAX_FINGERPRINTS:
+                fingerprint = _OTHER_FINGERPRINTS
+            if fingerprint in self.queries:
+                self.queries[fingerprint].merge(digest)
+            else:
+                self.queries[fingerprint] = digest
+
+
+def digest_slow_log_range(path: str, start: int, end: int) -> SlowLogDigest:
+    """
+    Digest the entries of a slow log whose "# User@Host:" line begins in
+    [start, end). The last one is read to its end, past `end` if needed,
+    so adjacent ranges together see every entry exactly once.
+    """
+    result = SlowLogDigest(bytes=end - start)
+    with open(path, "rb", buffering=1 << 20) as f:
+        f.seek(start)
+        if start:
+            f.readline()                # Partial line: belongs to the previous range
+        pos, line = f.tell(), f.readline()
+        while line and not line.startswith(_SLOW_ENTRY):
+            pos, line = f.tell(), f.readline()
+        
+        while line and pos < end:
+            metrics, db, statement, kept = None, b"", [], 0
+            pos, line = f.tell(), f.readline()
+            while line and not line.startswith(_SLOW_ENTRY):
+                if line.startswith(b"# Query_time:"):
+                    metrics = _SLOW_METRICS.match(line)
+                elif _SLOW_USE.match(line):
+                    db = _SLOW_USE.match(line).group(1)
+                elif not _SLOW_NOISE.match(line) and kept < _SLOW_STATEMENT_CAP:
+                    statement.append(line)
+                    kept += len(line)
+                pos, line = f.tell(), f.readline()
+            if metrics and statement:
+                text = b"".join(statement).decode(errors="replace")
+                result.add(fingerprint_query(text), float(metrics.group(1)),
+                           float(metrics.group(2)), int(metrics.group(3)),
+                           int(metrics.group(4)), db.decode(errors="replace"), text.strip())
+    return result
+
+
+def digest_slow_log(path: str, workers: Optional[int] = None) -> SlowLogDigest:
+    """
+    Digest a slow query log, split into byte ranges (at least
+    Config.SLOW_LOG_CHUNK_BYTES each) that run in a process pool.
+    
+    Memory stays bounded: per fingerprint a QueryDigest with two
+    QuantileSketches, and at most Config.SLOW_LOG_MAX_FINGERPRINTS
+    fingerprints (the rest are pooled).
+    """
+    size = os.path.getsize(path)
+    workers = workers or Config.SLOW_LOG_WORKERS
+    chunks = max(1, min(workers, -(-size // Config.SLOW_LOG_CHUNK_BYTES)))
+    bounds = [size * i // chunks for i in range(chunks + 1)]
+    logger.info(f"🔍 Digesting {path} ({_human_bytes(size)}) in {chunks} range(s)")
+    
+    total = SlowLogDigest()
+    if chunks == 1:
+        total.merge(digest_slow_log_range(path, 0, size))
+        return total
+    with ProcessPoolExecutor(max_workers=chunks) as pool:
+        for part in pool.map(digest_slow_log_range, [path] * chunks, bounds[:-1], bounds[1:]):
+            total.merge(part)
+    return total
+
+
+def print_slow_log_digest(digest: SlowLogDigest, limit: Optional[int] = None):
+    """Print the fingerprints with the most total Query_time."""
+    limit = limit or Config.SLOW_LOG_TOP
+    print_section(f"SLOW QUERY DIGEST: {digest.entries:,} queries, "
+                  f"{len(digest.queries):,} fingerprints")
+    ranked = sorted(digest.queries.items(), key=lambda item: -item[1].query_time)
+    grand_total = sum(d.query_time for d in digest.queries.values()) or 1.0
+    print(f"  {'#':>3} {'Total':>9} {'Share':>6} {'Count':>8} {'p95':>8} {'p99':>8} "
+          f"{'Max':>8} {'Lock':>8} {'Rows exam p95':>13}  Fingerprint")
+    print("  " + "-" * 110)
+    for rank, (fingerprint, d) in enumerate(ranked[:limit], 1):
+        print(f"  {rank:>3} {d.query_time:>8.1f}s {d.query_time / grand_total:>6.1%} "
+              f"{d.count:>8,} {d.times.quantile(0.95):>7.3f}s {d.times.quantile(0.99):>7.3f}s "
+              f"{d.max_time:>7.3f}s {d.lock_time:>7.3f}s {d.examined.quantile(0.95):>13,.0f}  "
+              f"{fingerprint[:60]}")
+    for rank, (fingerprint, d) in enumerate(ranked[:min(limit, 5)], 1):
+        print(f"\n  #{rank} {('(' + d.db + ') ') if d.db else ''}slowest "
+              f"({d.max_time:.3f}s, {d.rows_examined / d.count:,.0f} rows examined avg):")
+        print(f"     {' '.join(d.sample.split())[:300]}")
+
+
+def report_slow_log(path: str):
+    """Digest and print a slow log, through the sudo helper if it is unreadable."""
+    if _needs_sudo() and not os.access(path, os.R_OK):
+        _, output, _ = run_command(
+            _privileged_helper_argv("--digest-slow-log", path, settings=(
+                "SLOW_LOG_WORKERS", "SLOW_LOG_CHUNK_BYTES", "SLOW_LOG_MAX_FINGERPRINTS",
+                "SLOW_LOG_TOP")),
+            "Digesting slow query log (privileged helper)")
+        print(output, end="")
+        return
+    print_slow_log_digest(digest_slow_log(path))
+
+
+def digest_slow_log_step():
+    """
+    Post-start step (Config.SLOW_LOG_DIGEST): digest the instance's slow
+    query log (Config.SLOW_LOG_FILE, or the server's slow_query_log_file)
+    to show which statements are slow on the rebuilt replica.
+    
+    Analysis only: problems are logged, never fail the rebuild.
+    """
+    print_section("SLOW QUERY LOG DIGEST")
+    
+    path = Config.SLOW_LOG_FILE
+    try:
+        if not path:
+            rows = get_executor().query(
+                "SELECT @@GLOBAL.slow_query_log_file AS slow_query_log_file")
+            path = rows[0]["slow_query_log_file"] if rows else ""
+            if path and not os.path.isabs(path):
+                path = os.path.join(Config.DATA_DIR, path)
+        if planned("read", "Digest slow query log", path or "slow_query_log_file"):
+            return
+        if not path or not _path_exists(path):
+            logger.warning(f"⚠️  No slow query log at {path or '(not configured)'}; see "
+                           f"slow-query-log.md to enable it")
+            return
+        report_slow_log(path)
+    except Exception as e:
+        logger.warning(f"⚠️  Slow log digest failed: {e}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      PRIMARY REACHABILITY CHECK
+# ══════════════════════════════════════════════════════════════════════════════
+
+def check_primary_reachable() -> bool:
+    """
+    Verify the primary accepts TCP connections on its MySQL port.
+    
+    Runs while the secondary is being wiped so a network or firewall problem
+    is reported before the replica is rebuilt, not after.
+    
+    Equivalent:
+        telnet 192.168.1.1 3301
+    """
+    print_section("PRE-CHECK: PRIMARY REACHABILITY")
+    
+    address = (Config.PRIMARY_HOST, Config.PRIMARY_PORT)
+    if planned("connect", "Check primary reachability", f"{address[0]}:{address[1]}"):
+        return True
+    logger.info(f"🔧 Connecting to primary {address[0]}:{address[1]}")
+    
+    try:
+        with socket.create_connection(address, timeout=Config.CONNECT_TIMEOUT):
+            pass
+    except OSError as e:
+        logger.warning(f"   ⚠️  Primary not reachable: {e}")
+        logger.warning("   Check network connectivity and firewall rules (see guide)")
+        return False
+    
+    logger.info("   ✅ Primary is reachable")
+    return True
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      STEP JOURNAL (RESUME)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _sha256_file(path: str) -> Optional[str]:
+    """Hex SHA-256 of a file, or None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def backup_identity() -> Dict[str, object]:
+    """
+    Identify the restore source without reading it: size and mtime of a
+    backup file, a checksum of xtrabackup_info (unchanged by --prepare) or
+    of a dump directory's file list. A --backup manifest is identified
+    by its checksum (it holds the checksums of every chunk).
+    """
+    engine = Config.RESTORE_ENGINE
+    path = _backup_source()
+    identity: Dict[str, object] = {"engine": engine, "path": path}
+    if os.path.isfile(path):
+        st = os.stat(path)
+        identity.update(size=st.st_size, mtime=int(st.st_mtime))
+    elif engine == "xtrabackup":
+        identity["xtrabackup_info_sha256"] = _sha256_file(
+            os.path.join(path, "xtrabackup_info"))
+    elif os.path.isdir(path):
+        listing = "\n".join(sorted(os.listdir(path))).encode()
+        identity["listing_sha256"] = hashlib.sha256(listing).hexdigest()
+    if Config.BACKUP_MANIFEST:
+        identity["manifest_sha256"] = _sha256_file(manifest_file(Config.BACKUP_MANIFEST))
+    return identity
+
+
+def run_fingerprint() -> Dict[str, object]:
+    """Inputs a journal is only valid for; a resume with others is refused."""
+    return {
+        "instance": Config.MYSQL_INSTANCE,
+        "data_dir": Config.DATA_DIR,
+        "binlog_dir": Config.BINLOG_DIR,
+        "staged": Config.STAGED_RESTORE,
+        "meb_phased": Config.MEB_PHASED_RESTORE,
+        "source": backup_identity(),
+    }
+
+
+def journal_path() -> str:
+    """Journal file of the configured instance."""
+    instance = re.sub(r"[^\w.-]", "_", Config.MYSQL_INSTANCE)
+    return os.path.join(Config.JOURNAL_DIR, f"{instance}.journal.json")
+
+
+class StepJournal:
+    """
+    Persisted record of a workflow run: per step status ("started", "done",
+    "failed"), start time, duration, error, artifacts, and per restore phase
+    the same. Every change is written atomically (temp file + rename), so
+    the file is valid whenever the script dies.
+    """
+    
+    def __init__(self, path: str, data: Dict[str, object]):
+        self.path = path
+        self.data = data
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def create(cls, path: str, fingerprint: Dict[str, object]) -> "StepJournal":
+        journal = cls(path, {
+            "version": 1,
+            "run_id": datetime.now().strftime("%Y%m%d-%H%M%S"),
+            "status": "running",
+            "fingerprint": fingerprint,
+            "steps": {},
+        })
+        journal._save()
+        return journal
+    
+    @classmethod
+    def load(cls, path: str) -> Optional["StepJournal"]:
+        try:
+            with open(path) as f:
+                return cls(path, json.load(f))
+        except FileNotFoundError:
+            return None
+    
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+    
+    def changed_inputs(self, fingerprint: Dict[str, object]) -> List[str]:
+        """Fingerprint keys that differ from the journal's."""
+        recorded = self.data.get("fingerprint", {})
+        return sorted(key for key in set(recorded) | set(fingerprint)
+                      if recorded.get(key) != fingerprint.get(key))
+    
+    def _entry(self, step: str, phase: Optional[str] = None) -> Dict[str, object]:
+        entry = self.data["steps"].setdefault(step, {})
+        if phase is not None:
+            entry = entry.setdefault("phases", {}).setdefault(phase, {})
+        return entry
+    
+    def status(self, step: str, phase: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            entry = self.data["steps"].get(step, {})
+            if phase is not None:
+                entry = entry.get("phases", {}).get(phase, {})
+            return entry.get("status")
+    
+    def is_done(self, step: str, phase: Optional[str] = None) -> bool:
+        return self.status(step, phase) == "done"
+    
+    def start(self, step: str, phase: Optional[str] = None):
+        with self._lock:
+            entry = self._entry(step, phase)
+            entry.update(status="started", started=datetime.now().isoformat(timespec="seconds"))
+            entry.pop("error", None)
+            self._save()
+    
+    def finish(self, step: str, duration: float, phase: Optional[str] = None,
+               **artifacts: object):
+        with self._lock:
+            entry = self._entry(step, phase)
+            entry.update(status="done", duration=round(duration, 3))
+            entry.setdefault("artifacts", {}).update(artifacts)
+            self._save()
+    
+    def fail(self, step: str, error: str, phase: Optional[str] = None):
+        with self._lock:
+            self._entry(step, phase).update(status="failed", error=error)
+            self._save()
+    
+    def record(self, step: str, **artifacts: object):
+        """Attach artifacts (checksums, paths, inputs) to a step."""
+        with self._lock:
+            self._entry(step).setdefault("artifacts", {}).update(artifacts)
+            self._save()
+    
+    def invalidate(self, *steps: str):
+        """Forget steps so a resume runs them again."""
+        with self._lock:
+            for step in steps:
+                self.data["steps"].pop(step, None)
+            self._save()
+    
+    def set_status(self, status: str):
+        with self._lock:
+            self.data["status"] = status
+            self._save()
+    
+    def done_steps(self) -> List[str]:
+        with self._lock:
+            return [name for name, entry in self.data["steps"].items()
+                    if entry.get("status") == "done"]
+
+
+_journal: Optional[StepJournal] = None
+
+
+def get_journal() -> Optional[StepJournal]:
+    """Journal of the current run (None outside --full/--step)."""
+    return _journal
+
+
+def open_journal(resume: bool = False, continue_run: bool = False) -> StepJournal:
+    """
+    Open the journal for this run and make it current.
+    
+    Args:
+        resume: Continue the previous run; refused if its inputs differ
+        continue_run: Keep adding to a matching previous run without being
+            asked to (single --step runs); start over if it does not match
+        
+    Raises:
+        RuntimeError: On --resume with changed inputs
+    """
+    global _journal
+    path = journal_path()
+    fingerprint = run_fingerprint()
+    previous = StepJournal.load(path)
+    
+    if previous is not None and (resume or continue_run):
+        changed = previous.changed_inputs(fingerprint)
+        if not changed:
+            done = previous.done_steps()
+            logger.info(f"📒 Continuing run {previous.data['run_id']} from {path}"
+                        f"{' (done: ' + ', '.join(done) + ')' if done else ''}")
+            previous.set_status("running")
+            _journal = previous
+            return previous
+        if resume:
+            raise RuntimeError(f"Cannot resume {path}: inputs changed "
+                               f"({', '.join(changed)}); run without --resume to start over")
+    elif resume:
+        logger.info(f"📒 No journal at {path}; starting a fresh run")
+    
+    if previous is not None and previous.data.get("status") != "completed":
+        logger.warning(f"⚠️  Run {previous.data['run_id']} in {path} did not complete; "
+                       f"starting over (use --resume to continue it)")
+    _journal = StepJournal.create(path, fingerprint)
+    logger.info(f"📒 Journal: {path}")
+    return _journal
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                      WORKFLOW STEP SCHEDULER (DAG)
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class WorkflowStep:
+    """
+    A single workflow step and the steps it must wait for.
+    
+    Steps whose dependencies have all finished are started together, so
+    independent work (e.g. deleting the binlog and data directories, or
+    checking the primary while the secondary is wiped) overlaps.
+    """
+    name: str
+    func: Callable[[], object]
+    depends_on: Tuple[str, ...] = ()
+    always_run: bool = False        # Not skipped on --resume (probes)
+    started: float = 0.0
+    finished: float = 0.0
+    resumed: bool = False           # Skipped: done in an earlier run
+    
+    @property
+    def duration(self) -> float:
+        return max(self.finished - self.started, 0.0)
+
+
+def _topological_order(steps: List[WorkflowStep]) -> List[WorkflowStep]:
+    """Return steps in dependency order; raise ValueError on bad graphs."""
+    by_name = {step.name: step for step in steps}
+    if len(by_name) != len(steps):
+        raise ValueError("Duplicate step names in workflow")
+    
+    for step in steps:
+        for dep in step.depends_on:
+            if dep not in by_name:
+                raise ValueError(f"Step '{step.name}' depends on unknown step '{dep}'")
+    
+    ordered = []
+    remaining = {step.name: set(step.depends_on) for step in steps}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between steps: {sorted(remaining)}")
+        for name in ready:
+            ordered.append(by_name[name])
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return ordered
+
+
+def critical_path(steps: List[WorkflowStep]) -> List[WorkflowStep]:
+    """
+    Return the chain of steps that determined the total wall-clock time.
+    
+    Walks back from the last step to finish, following at each step the
+    dependency that finished last (the one it actually waited for).
+    """
+    by_name = {step.name: step for step in steps}
+    finished = [step for step in steps if step.finished]
+    if not finished:
+        return []
+    
+    path = [max(finished, key=lambda s: s.finished)]
+    while path[-1].depends_on:
+        deps = [by_name[d] for d in path[-1].depends_on if by_name[d].finished]
+        if not deps:
+            break
+        path.append(max(deps, key=lambda s: s.finished))
+    return list(reversed(path))
+
+
+def print_timing_breakdown(steps: List[WorkflowStep], t0: float):
+    """Print per-step start offset/duration and the critical path."""
+    on_path = {step.name for step in critical_path(steps)}
+    wall = max((step.finished for step in steps), default=t0) - t0
+    
+    print_section("TIMING BREAKDOWN")
+    print(f"  {'Step':<28} {'Start':>9} {'Duration':>10}  Critical")
+    print("  " + "-" * 58)
+    for step in sorted(steps, key=lambda s: (s.started or float("inf"), s.name)):
+        if not step.started:
+            print(f"  {step.name:<28} {'-':>9} {'not run':>10}")
+            continue
+        marker = "★" if step.name in on_path else ""
+        duration = "earlier" if step.resumed else f"{step.duration:.1f}s"
+        print(f"  {step.name:<28} {step.started - t0:>8.1f}s "
+              f"{duration:>10}  {marker}")
+    print("  " + "-" * 58)
+    
+    path = critical_path(steps)
+    busy = sum(step.duration for step in path)
+    print(f"  Critical path: {' → '.join(step.name for step in path)}")
+    print(f"  Critical path time: {busy:.1f}s of {wall:.1f}s wall-clock")
+
+
+def summarize_workflow(steps: List[WorkflowStep]) -> Dict[str, object]:
+    """Return step offsets/durations and the critical path as plain data."""
+    ran = [step for step in steps if step.started]
+    if not ran:
+        return {"wall": 0.0, "critical_path": [], "critical_path_time": 0.0, "steps": {}}
+    t0 = min(step.started for step in ran)
+    path = critical_path(steps)
+    return {
+        "wall": round(max(step.finished for step in ran) - t0, 3),
+        "critical_path": [step.name for step in path],
+        "critical_path_time": round(sum(step.duration for step in path), 3),
+        "steps": {step.name: {"start": round(step.started - t0, 3),
+                              "duration": round(step.duration, 3),
+                              "resumed": step.resumed}
+                  for step in ran},
+    }
+
+
+def run_workflow_dag(steps: List[WorkflowStep],
+                     max_workers: Optional[int] = None,
+                     journal: Optional[StepJournal] = None) -> float:
     """
-    print_section("STEP 7: CONFIGURE REPLICATION")
+    Run steps concurrently as soon as their dependencies have finished.
     
-    sql = generate_replication_sql()
+    Args:
+        steps: Workflow steps with declared dependencies
+        max_workers: Maximum number of steps running at the same time
+            (default: Config.MAX_PARALLEL_STEPS)
+        journal: Records each step; steps it lists as done are skipped
+            (unless always_run)
+        
+    Returns:
+        Total wall-clock time in seconds
+        
+    Raises:
+        The first exception raised by any step. Steps already running are
+        allowed to finish; nothing new is started after a failure.
+    """
+    ordered = _topological_order(steps)
+    done = set()
+    running = {}
+    failure = None
+    t0 = time.monotonic()
     
-    print("\n📋 SQL Commands to run on Secondary server:\n")
-    print("-" * 70)
-    print(sql)
-    print("-" * 70)
+    def _run(step: WorkflowStep):
+        step.started = time.monotonic()
+        if journal and not step.always_run and journal.is_done(step.name):
+            logger.info(f"⏭️  {step.name}: completed in an earlier run")
+            step.resumed = True
+            step.finished = step.started
+            return None
+        if journal:
+            journal.start(step.name)
+        try:
+            with instrument_step(step.name):
+                result = step.func()
+        except Exception as e:
+            if journal:
+                journal.fail(step.name, str(e))
+            raise
+        finally:
+            step.finished = time.monotonic()
+        if journal:
+            journal.finish(step.name, step.duration)
+        return result
     
-    # Save SQL to file
-    sql_file = "/tmp/configure_replication.sql"
-    with open(sql_file, 'w') as f:
-        f.write(sql)
-    logger.info(f"📄 SQL script saved to: {sql_file}")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers or Config.MAX_PARALLEL_STEPS),
+                            thread_name_prefix="step") as pool:
+        pending = list(ordered)
+        while pending or running:
+            if failure is None:
+                for step in [s for s in pending if set(s.depends_on) <= done]:
+                    pending.remove(step)
+                    logger.debug(f"Scheduling step: {step.name}")
+                    running[pool.submit(_run, step)] = step
+            elif not running:
+                break
+            
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                exc = future.exception()
+                if exc is not None:
+                    logger.error(f"💥 Step '{step.name}' failed: {exc}")
+                    failure = failure or exc
+                else:
+                    done.add(step.name)
     
-    print("\n" + "=" * 70)
-    print("  MANUAL STEPS REQUIRED:")
-    print("=" * 70)
-    print("""
-    1. Login to MySQL Workbench or mysql CLI on secondary server
-    2. Connect to: 127.0.0.1:3301
-    3. Run the SQL commands above
-    4. Verify replication is working with: SHOW REPLICA STATUS\\G
+    print_timing_breakdown(steps, t0)
+    if failure is not None:
+        raise failure
+    return time.monotonic() - t0
+
+
+def plan_workflow(steps: List[WorkflowStep],
+                  journal: Optional[StepJournal] = None) -> ExecutionPlan:
+    """
+    Record what running steps would do, without doing it.
     
-    Expected result:
-    - Replica_IO_Running: Yes
-    - Replica_SQL_Running: Yes
-    """)
+    The steps run one at a time in dependency order with an ExecutionPlan
+    active, so every command, file operation, SQL statement and wait they
+    would issue is recorded instead of executed, and prompts count as
+    answered "yes". Their console output is suppressed (warnings still
+    show). Steps the journal lists as done are planned as skipped, as a
+    resumed run would skip them.
+    """
+    global _plan
+    ordered = _topological_order(steps)
+    plan = ExecutionPlan()
+    plan.depends = {step.name: list(step.depends_on) for step in ordered}
+    level = logger.level
+    _plan = plan
+    logger.setLevel(logging.WARNING)
+    try:
+        with redirect_stdout(io.StringIO()):
+            for step in ordered:
+                with instrument_step(step.name):
+                    if journal and not step.always_run and journal.is_done(step.name):
+                        planned("skip", "Completed in an earlier run")
+                    else:
+                        step.func()
+    finally:
+        _plan = None
+        logger.setLevel(level)
+    return plan
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#                      EXECUTE REPLICATION SQL
+#                           FULL WORKFLOW
 # ══════════════════════════════════════════════════════════════════════════════
 
-def execute_replication_sql(mysql_password: str):
+def _skipped(message: str) -> Callable[[], None]:
+    """Return a no-op step body that logs why the step was skipped."""
+    return lambda: logger.info(f"⏭️  {message}")
+
+
+def build_workflow_steps(skip_delete: bool = False,
+                         skip_restore: bool = False) -> List[WorkflowStep]:
     """
-    Execute replication SQL commands directly via mysql CLI.
+    Build the workflow DAG.
     
-    Args:
-        mysql_password: MySQL root/admin password
+    Dependency graph:
+        verify_backup ── stop ──┬── delete_binlog ──┬── create_dirs ── restore ── permissions ── start ──┐
+                                └── delete_data ────┤                                                     ├── gtid_preflight ── replication
+                                                    └── purge_tombstones                                  │
+        check_primary ────────────────────────────────────────────────────────────────────────────────────┘
+    
+    With Config.VERIFY_BACKUP the backup is read and checked while mysqld
+    still serves; nothing is stopped or deleted unless it passes.
+    Config.BUFFER_POOL_WARMUP adds transfer_buffer_pool between
+    permissions and start (after load_backup for clone) and
+    warm_buffer_pool after the server is up. With
+    Config.DELETE_TOMBSTONE the delete steps only rename, and the
+    throttled purge runs alongside the restore. Without
+    Config.GTID_PREFLIGHT replication follows start and check_primary
+    directly.
+    
+    Engines that need a running server add a load_backup step between
+    start and the GTID pre-flight. Config.SLOW_LOG_DIGEST adds a
+    digest_slow_log step after the server is up, Config.APPLIER_TUNE_STEP
+    a tune_applier step after configure_replication. With Config.STAGED_RESTORE the graph from
+    build_staged_workflow_steps() is used instead.
     """
-    print_section("EXECUTING REPLICATION SQL")
+    if Config.STAGED_RESTORE and not skip_restore:
+        return build_staged_workflow_steps()
     
-    commands = [
-        "STOP REPLICA;",
-        "RESET REPLICA ALL;",
-        f"""CHANGE REPLICATION SOURCE TO
-            SOURCE_HOST='{Config.PRIMARY_HOST}',
-            SOURCE_PORT={Config.PRIMARY_PORT},
-            SOURCE_USER='{Config.REPLICATION_USER}',
-            SOURCE_PASSWORD='{Config.REPLICATION_PASSWORD}',
-            SOURCE_AUTO_POSITION=1,
-            GET_SOURCE_PUBLIC_KEY=1;""",
-        "START REPLICA;",
-        "SHOW REPLICA STATUS\\G"
-    ]
+    if skip_delete:
+        delete_binlog = _skipped("Skipping binlog directory deletion")
+        delete_data = _skipped("Skipping data directory deletion")
+    else:
+        delete_binlog = delete_binlog_directory
+        delete_data = delete_data_directory
     
-    for cmd in commands:
-        mysql_cmd = f'mysql -h 127.0.0.1 -P {Config.SECONDARY_PORT} -u root -p"{mysql_password}" -e "{cmd}"'
-        run_command(
-            mysql_cmd,
-            f"Executing: {cmd[:50]}...",
-            sudo=False
-        )
+    restore = _skipped("Skipping backup restore") if skip_restore else restore_backup
+    needs_load = not skip_restore and get_restore_engine().requires_running_server
+    ready = "load_backup" if needs_load else "start_mysql"
+    warmup = (Config.BUFFER_POOL_WARMUP and not skip_restore
+              and get_restore_engine().preserves_space_ids)
+    # The dump goes into the datadir before startup, or into the cloned one
+    warm_before_start = warmup and not needs_load
+    
+    verify = Config.VERIFY_BACKUP and not skip_restore
+    steps = [
+        WorkflowStep("stop_mysql", stop_mysql_instance, ("verify_backup",) if verify else ()),
+        WorkflowStep("check_primary", check_primary_reachable, always_run=True),
+        WorkflowStep("delete_binlog", delete_binlog, ("stop_mysql",)),
+        WorkflowStep("delete_data", delete_data, ("stop_mysql",)),
+        WorkflowStep("create_directories", create_directories,
+                     ("delete_binlog", "delete_data")),
+        WorkflowStep("restore_backup", restore, ("create_directories",)),
+        WorkflowStep("set_permissions", set_permissions, ("restore_backup",)),
+        WorkflowStep("start_mysql", start_mysql_instance,
+                     ("set_permissions", "transfer_buffer_pool") if warm_before_start
+                     else ("set_permissions",)),
+        WorkflowStep("configure_replication", configure_replication,
+                     ("gtid_preflight",) if Config.GTID_PREFLIGHT else (ready, "check_primary")),
+    ]
+    if verify:
+        steps.append(WorkflowStep("verify_backup", verify_restore_source))
+    if Config.GTID_PREFLIGHT:
+        steps.append(WorkflowStep("gtid_preflight", gtid_preflight,
+                                  (ready, "check_primary"), always_run=True))
+    if not skip_delete:
+        steps.append(WorkflowStep("purge_tombstones", purge_tombstones,
+                                  ("delete_binlog", "delete_data")))
+    if needs_load:
+        steps.append(WorkflowStep("load_backup", load_backup, ("start_mysql",)))
+    if Config.SLOW_LOG_DIGEST:
+        steps.append(WorkflowStep("digest_slow_log", digest_slow_log_step, (ready,)))
+    if Config.APPLIER_TUNE_STEP:
+        steps.append(WorkflowStep("tune_applier", tune_applier_step,
+                                  ("configure_replication",)))
+    if warm_before_start:
+        steps.append(WorkflowStep("transfer_buffer_pool", transfer_buffer_pool,
+                                  ("set_permissions",)))
+        steps.append(WorkflowStep("warm_buffer_pool", warm_buffer_pool, ("start_mysql",)))
+    elif warmup:
+        steps.append(WorkflowStep("transfer_buffer_pool", transfer_buffer_pool, (ready,)))
+        steps.append(WorkflowStep("warm_buffer_pool", lambda: warm_buffer_pool(load_now=True),
+                                  ("transfer_buffer_pool",)))
+    return steps
 
 
-# ══════════════════════════════════════════════════════════════════════════════
-#                           FULL WORKFLOW
-# ══════════════════════════════════════════════════════════════════════════════
+def build_staged_workflow_steps() -> List[WorkflowStep]:
+    """
+    Build the staged-restore DAG: mysqld keeps serving until the restored
+    tree is ready, so the outage is only stop + swap + start.
+    
+    Dependency graph:
+        prepare_staging ── restore ── permissions ── stop ── swap ── start ──┐
+        check_primary ───────────────────────────────────────────────────────┴── gtid_preflight ── replication ── remove_previous
+    
+    Config.BUFFER_POOL_WARMUP adds transfer_buffer_pool (into the staging
+    datadir) before stop and warm_buffer_pool after start;
+    Config.APPLIER_TUNE_STEP adds tune_applier after configure_replication.
+    """
+    steps = [
+        WorkflowStep("check_primary", check_primary_reachable, always_run=True),
+        WorkflowStep("prepare_staging", prepare_staging),
+        WorkflowStep("restore_backup", restore_staged_backup, ("prepare_staging",)),
+        WorkflowStep("set_permissions", set_staged_permissions, ("restore_backup",)),
+        WorkflowStep("stop_mysql", stop_mysql_instance,
+                     ("set_permissions", "transfer_buffer_pool") if Config.BUFFER_POOL_WARMUP
+                     else ("set_permissions",)),
+        WorkflowStep("swap_datadir", swap_datadir, ("stop_mysql",)),
+        WorkflowStep("start_mysql", start_staged_instance, ("swap_datadir",)),
+        WorkflowStep("configure_replication", configure_replication,
+                     ("gtid_preflight",) if Config.GTID_PREFLIGHT
+                     else ("start_mysql", "check_primary")),
+        WorkflowStep("remove_previous", remove_previous_datadir,
+                     ("configure_replication",)),
+    ]
+    if Config.GTID_PREFLIGHT:
+        steps.append(WorkflowStep("gtid_preflight", gtid_preflight,
+                                  ("start_mysql", "check_primary"), always_run=True))
+    if Config.SLOW_LOG_DIGEST:
+        steps.append(WorkflowStep("digest_slow_log", digest_slow_log_step, ("start_mysql",)))
+    if Config.APPLIER_TUNE_STEP:
+        steps.append(WorkflowStep("tune_applier", tune_applier_step,
+                                  ("configure_replication",)))
+    if Config.BUFFER_POOL_WARMUP:
+        steps.append(WorkflowStep(
+            "transfer_buffer_pool",
+            lambda: transfer_buffer_pool(staged_restore_targets()[0]), ("set_permissions",)))
+        steps.append(WorkflowStep("warm_buffer_pool", warm_buffer_pool, ("start_mysql",)))
+    return steps
+
 
-def run_full_workflow(skip_delete: bool = False, skip_restore: bool = False):
+def run_full_workflow(skip_delete: bool = False, skip_restore: bool = False,
+                      max_workers: Optional[int] = None,
+                      on_result: Optional[Callable[[Dict[str, object]], None]] = None,
+                      resume: bool = False) -> Dict[str, object]:
     """
     Execute the complete MySQL replication setup workflow.
     
+    Independent steps run concurrently (see build_workflow_steps); use
+    max_workers=1 for strictly serial execution.
+    
     Args:
         skip_delete: Skip directory deletion step
         skip_restore: Skip backup restore step
+        max_workers: Maximum number of steps running at the same time
+        on_result: Called with the result, also when the workflow fails
+        resume: Skip the steps (and restore phases) the journal of the
+            previous run lists as done
+        
+    Returns:
+        {"status": "ok"|"cancelled", "target": ..., plus summarize_workflow()}
     """
+    result = {"status": "cancelled", "target": f"{Config.SECONDARY_HOST}:"
+              f"{Config.SECONDARY_PORT}/{Config.MYSQL_INSTANCE}"}
     print("\n" + "█" * 70)
     print("  MYSQL REPLICATION SETUP - FULL WORKFLOW")
     print("█" * 70)
@@ -566,40 +6855,36 @@ def run_full_workflow(skip_delete: bool = False, skip_restore: bool = False):
     ├── MySQL Instance:   {Config.MYSQL_INSTANCE}
     ├── Data Directory:   {Config.DATA_DIR}
     ├── Binlog Directory: {Config.BINLOG_DIR}
-    └── Backup Image:     {Config.BACKUP_IMAGE}
+    ├── Backup Image:     {Config.BACKUP_IMAGE}
+    ├── Restore Engine:   {Config.RESTORE_ENGINE}
+    ├── Staged Restore:   {"yes" if Config.STAGED_RESTORE else "no"}
+    └── Parallel Steps:   {max_workers or Config.MAX_PARALLEL_STEPS}
     """)
     
     if not confirm_action("Proceed with replication setup?"):
         logger.info("Operation cancelled by user")
-        return
+        if on_result:
+            on_result(result)
+        return result
+    
+    journal = open_journal(resume)
+    report = open_report()
+    result["report"] = report.path
+    
+    # Ask up front: prompts cannot be answered from concurrently running steps
+    if (not skip_delete and not (Config.STAGED_RESTORE and not skip_restore)
+            and not journal.is_done("delete_data")):
+        logger.warning("⚠️  This will DELETE all existing MySQL data!")
+        if not confirm_action("Delete all data in binlog and data directories?"):
+            logger.info("Skipping deletion - user cancelled")
+            skip_delete = True
     
+    steps = build_workflow_steps(skip_delete, skip_restore)
+    result["status"] = "failed"
     try:
-        # Step 1: Stop MySQL
-        stop_mysql_instance()
-        
-        # Step 2: Delete old directories
-        if not skip_delete:
-            delete_old_directories()
-        else:
-            logger.info("⏭️  Skipping directory deletion")
-        
-        # Step 3: Create directories
-        create_directories()
-        
-        # Step 4: Restore backup
-        if not skip_restore:
-            restore_backup()
-        else:
-            logger.info("⏭️  Skipping backup restore")
-        
-        # Step 5: Set permissions
-        set_permissions()
-        
-        # Step 6: Start MySQL
-        start_mysql_instance()
-        
-        # Step 7: Configure replication (display SQL)
-        configure_replication()
+        run_workflow_dag(steps, max_workers=max_workers, journal=journal)
+        result["status"] = "ok"
+        journal.set_status("completed")
         
         print("\n" + "█" * 70)
         print("  ✅ WORKFLOW COMPLETED SUCCESSFULLY")
@@ -608,33 +6893,318 @@ def run_full_workflow(skip_delete: bool = False, skip_restore: bool = False):
         
     except Exception as e:
         logger.error(f"💥 Workflow failed: {e}")
+        result["error"] = str(e)
+        journal.set_status("failed")
+        logger.info(f"📒 Continue with --resume (journal: {journal.path})")
         raise
+    finally:
+        close_executors()
+        report.finish(result["status"])
+        result.update(summarize_workflow(steps))
+        if on_result:
+            on_result(result)
+    return result
+
+
+def build_plan(step_number: Optional[int] = None, skip_delete: bool = False,
+               skip_restore: bool = False, resume: bool = False) -> ExecutionPlan:
+    """
+    Plan `--full` (or one `--step`) without side effects: nothing is run,
+    written, renamed or deleted, and no server is contacted.
+    
+    Args:
+        step_number: Plan only this step (default: the full workflow)
+        skip_delete: As for run_full_workflow()
+        skip_restore: As for run_full_workflow()
+        resume: Plan steps the existing journal lists as done as skipped
+    """
+    if step_number:
+        _, func, journal_names = STEP_RUNNERS[step_number]
+        steps = [WorkflowStep(journal_names[0] if len(journal_names) == 1
+                              else func.__name__, func)]
+    else:
+        steps = build_workflow_steps(skip_delete, skip_restore)
+    journal = StepJournal.load(journal_path()) if resume else None
+    return plan_workflow(steps, journal)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#                              FLEET MODE
+# ══════════════════════════════════════════════════════════════════════════════
+
+FLEET_RESULT_MARKER = "FLEET-RESULT "
+
+
+def emit_fleet_result(result: Dict[str, object]):
+    """Print the workflow result as one machine-readable line for --fleet."""
+    print(FLEET_RESULT_MARKER + json.dumps(result, sort_keys=True), flush=True)
+
+
+@dataclass
+class FleetTarget:
+    """
+    One replica to rebuild: its Config overrides and how to launch the run.
+    
+    host and source are the concurrency keys: at most FLEET_PER_HOST runs
+    share a secondary host and at most FLEET_PER_SOURCE runs read from the
+    same primary/backup store at once.
+    """
+    name: str
+    config: Dict[str, object]
+    launcher: List[str]
+    args: List[str]
+    host: str
+    source: str
+    
+    def argv(self) -> List[str]:
+        return self.launcher + ["--full", "--yes", "--emit-result",
+                                "--config", "-"] + self.args
+
+
+@dataclass
+class FleetResult:
+    """Outcome of one fleet target, parsed from its FLEET-RESULT line."""
+    target: FleetTarget
+    status: str
+    returncode: Optional[int] = None
+    queued: float = 0.0
+    elapsed: float = 0.0
+    workflow: Optional[Dict[str, object]] = None
+    log_path: str = ""
+    error: str = ""
+    
+    @property
+    def slowest_step(self) -> str:
+        steps = (self.workflow or {}).get("steps") or {}
+        if not steps:
+            return "-"
+        name = max(steps, key=lambda n: steps[n]["duration"])
+        return f"{name} ({steps[name]['duration']:.1f}s)"
+
+
+def load_inventory(path: str) -> Tuple[List[FleetTarget], Dict[str, int]]:
+    """
+    Read a fleet inventory.
+    
+    Format (JSON):
+        {
+          "limits":   {"total": 8, "per_host": 2, "per_source": 4},
+          "defaults": {"PRIMARY_HOST": "192.168.1.1", ...},
+          "launcher": ["ssh", "{host}", "python3", "/opt/mysql_replication_setup.py"],
+          "targets": [
+            {"name": "db2-mysql1",
+             "config": {"SECONDARY_HOST": "192.168.2.1", "MYSQL_INSTANCE": "mysqld@mysql1", ...},
+             "source": "backup-nfs1",
+             "args": ["--engine", "xtrabackup"]}
+          ]
+        }
+    
+    "config" is merged over "defaults" and sent to the run as Config
+    overrides. "launcher" (per target or inventory-wide) defaults to this
+    script on the local machine; "{host}" and "{name}" are substituted.
+    "source" defaults to PRIMARY_HOST:PRIMARY_PORT.
+    
+    Raises:
+        ValueError: On duplicate names or unknown settings
+    """
+    with open(path) as f:
+        inventory = json.load(f)
+    
+    limits = {"total": Config.FLEET_MAX_PARALLEL,
+              "per_host": Config.FLEET_PER_HOST,
+              "per_source": Config.FLEET_PER_SOURCE}
+    limits.update(inventory.get("limits", {}))
+    limits = {key: max(1, int(value)) for key, value in limits.items()}
+    defaults = inventory.get("defaults", {})
+    default_launcher = inventory.get("launcher",
+                                     [sys.executable, os.path.abspath(__file__)])
+    
+    targets = []
+    for entry in inventory.get("targets", []):
+        name = entry["name"]
+        config = {**defaults, **entry.get("config", {})}
+        for key in config:
+            if not key.isupper() or not hasattr(Config, key):
+                raise ValueError(f"{path}: target '{name}': unknown setting '{key}'")
+        host = config.get("SECONDARY_HOST", Config.SECONDARY_HOST)
+        source = entry.get("source") or (f"{config.get('PRIMARY_HOST', Config.PRIMARY_HOST)}:"
+                                         f"{config.get('PRIMARY_PORT', Config.PRIMARY_PORT)}")
+        launcher = [part.format(host=host, name=name)
+                    for part in entry.get("launcher", default_launcher)]
+        targets.append(FleetTarget(name, config, launcher, list(entry.get("args", [])),
+                                   host, source))
+    
+    names = [target.name for target in targets]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: duplicate target names")
+    return targets, limits
+
+
+def _run_fleet_target(target: FleetTarget, log_dir: str) -> FleetResult:
+    """Run one target's full workflow as a child process, output to a log."""
+    log_path = os.path.join(log_dir, f"{target.name}.log")
+    start = time.monotonic()
+    with open(log_path, "w") as log:
+        log.write(f"$ {_format_argv(target.argv())}\n")
+        log.flush()
+        proc = subprocess.run(target.argv(), input=json.dumps(target.config),
+                              stdout=log, stderr=subprocess.STDOUT, text=True)
+    result = FleetResult(target, "failed", proc.returncode,
+                         elapsed=time.monotonic() - start, log_path=log_path)
+    
+    with open(log_path) as log:
+        for line in log:
+            if line.startswith(FLEET_RESULT_MARKER):
+                result.workflow = json.loads(line[len(FLEET_RESULT_MARKER):])
+    if result.workflow:
+        result.status = result.workflow["status"]
+        result.error = result.workflow.get("error", "")
+    else:
+        result.error = f"exit code {proc.returncode}, no result line"
+    if proc.returncode != 0 and result.status == "ok":
+        result.status = "failed"
+        result.error = f"exit code {proc.returncode}"
+    return result
+
+
+def print_fleet_results(results: List[FleetResult], wall: float, dry_run: bool = False):
+    """Print the aggregated per-target result and timing table."""
+    print_section("FLEET PLAN (estimated windows)" if dry_run else "FLEET RESULTS")
+    print(f"  {'Target':<20} {'Host':<16} {'Status':<9} {'Queued':>8} "
+          f"{'Wall':>8} {'Crit.path':>9}  Slowest step")
+    print("  " + "-" * 96)
+    for r in sorted(results, key=lambda r: r.target.name):
+        workflow = r.workflow or {}
+        print(f"  {r.target.name:<20} {r.target.host:<16} {r.status:<9} "
+              f"{r.queued:>7.1f}s {workflow.get('wall', r.elapsed):>7.1f}s "
+              f"{workflow.get('critical_path_time', 0.0):>8.1f}s  {r.slowest_step}")
+    print("  " + "-" * 96)
+    
+    ok = sum(1 for r in results if r.status == "ok")
+    print(f"  {ok}/{len(results)} targets succeeded in {wall:.1f}s wall-clock")
+    for r in results:
+        if r.status != "ok":
+            print(f"  ❌ {r.target.name}: {r.error or r.status} (log: {r.log_path})")
+
+
+def run_fleet(inventory_path: str, resume: bool = False, dry_run: bool = False) -> int:
+    """
+    Rebuild every target in an inventory concurrently.
+    
+    A target starts as soon as the total, per-host and per-source limits
+    all have room; later targets may overtake one that is waiting for a
+    busy host or source. Each target runs `--full --yes` in its own
+    process with its settings on stdin and output in FLEET_LOG_DIR; with
+    resume every target continues from its own journal. With dry_run the
+    targets only plan (--dry-run) and the table shows estimated windows.
+    
+    Returns:
+        Exit code: 0 if every target succeeded, 1 otherwise
+    """
+    targets, limits = load_inventory(inventory_path)
+    for target in targets:
+        target.args += (["--resume"] if resume else []) + (["--dry-run"] if dry_run else [])
+    os.makedirs(Config.FLEET_LOG_DIR, exist_ok=True)
+    print_section(f"FLEET: {len(targets)} targets from {inventory_path}")
+    logger.info(f"Limits: {limits['total']} total, {limits['per_host']} per host, "
+                f"{limits['per_source']} per source; logs in {Config.FLEET_LOG_DIR}")
+    
+    per_host: Dict[str, int] = {}
+    per_source: Dict[str, int] = {}
+    running = {}
+    results = []
+    pending = list(targets)
+    t0 = time.monotonic()
+    
+    def _admissible(target: FleetTarget) -> bool:
+        return (len(running) < limits["total"]
+                and per_host.get(target.host, 0) < limits["per_host"]
+                and per_source.get(target.source, 0) < limits["per_source"])
+    
+    with ThreadPoolExecutor(max_workers=limits["total"],
+                            thread_name_prefix="fleet") as pool:
+        while pending or running:
+            for target in list(pending):
+                if not _admissible(target):
+                    continue
+                pending.remove(target)
+                per_host[target.host] = per_host.get(target.host, 0) + 1
+                per_source[target.source] = per_source.get(target.source, 0) + 1
+                logger.info(f"▶️  {target.name} ({target.host}, source {target.source})")
+                future = pool.submit(_run_fleet_target, target, Config.FLEET_LOG_DIR)
+                running[future] = (target, time.monotonic() - t0)
+            
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                target, queued = running.pop(future)
+                per_host[target.host] -= 1
+                per_source[target.source] -= 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = FleetResult(target, "failed", error=str(e))
+                result.queued = queued
+                results.append(result)
+                icon = "✅" if result.status == "ok" else "❌"
+                logger.info(f"{icon} {target.name}: {result.status} "
+                            f"after {result.elapsed:.1f}s")
+    
+    print_fleet_results(results, time.monotonic() - t0, dry_run)
+    return 0 if all(r.status == "ok" for r in results) else 1
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 #                         INDIVIDUAL STEP RUNNERS
 # ══════════════════════════════════════════════════════════════════════════════
 
-def run_step(step_number: int):
-    """Run a specific step by number."""
-    steps = {
-        1: ("Stop MySQL Instance", stop_mysql_instance),
-        2: ("Delete Old Directories", delete_old_directories),
-        3: ("Create Directories", create_directories),
-        4: ("Restore Backup", restore_backup),
-        5: ("Set Permissions", set_permissions),
-        6: ("Start MySQL Instance", start_mysql_instance),
-        7: ("Configure Replication", configure_replication),
-    }
+STEP_RUNNERS = {
+    1: ("Stop MySQL Instance", stop_mysql_instance, ("stop_mysql",)),
+    2: ("Delete Old Directories", delete_old_directories,
+        ("delete_binlog", "delete_data", "purge_tombstones")),
+    3: ("Create Directories", create_directories, ("create_directories",)),
+    4: ("Restore Backup", restore_backup, ("restore_backup",)),
+    5: ("Set Permissions", set_permissions, ("set_permissions",)),
+    6: ("Start MySQL Instance", start_mysql_instance, ("start_mysql",)),
+    7: ("Configure Replication", configure_replication, ("configure_replication",)),
+}
+
+
+def run_step(step_number: int, resume: bool = False):
+    """
+    Run a specific step by number.
     
-    if step_number not in steps:
+    The step is recorded in the instance's journal under its workflow step
+    name(s), so a later `--full --resume` knows it is done; with resume a
+    step the journal lists as done is skipped.
+    """
+    if step_number not in STEP_RUNNERS:
         print(f"❌ Invalid step number: {step_number}")
-        print(f"   Valid steps: 1-7")
+        print("   Valid steps: 1-7")
+        return
+    
+    name, func, journal_names = STEP_RUNNERS[step_number]
+    journal = open_journal(resume, continue_run=True)
+    if resume and all(journal.is_done(step) for step in journal_names):
+        logger.info(f"⏭️  Step {step_number} ({name}) completed in an earlier run")
         return
     
-    name, func = steps[step_number]
     print(f"\n🔧 Running Step {step_number}: {name}")
-    func()
+    for step in journal_names:
+        journal.start(step)
+    report = open_report()
+    start = time.monotonic()
+    try:
+        with instrument_step(journal_names[0] if len(journal_names) == 1 else func.__name__):
+            result = func()
+    except Exception as e:
+        for step in journal_names:
+            journal.fail(step, str(e))
+        report.finish("failed")
+        raise
+    report.finish("ok")
+    if result is not False:
+        for step in journal_names:
+            journal.finish(step, time.monotonic() - start)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -658,9 +7228,65 @@ Examples:
   # Skip deletion and restore
   python mysql_replication_setup.py --full --skip-delete --skip-restore
   
+  # Run steps strictly one after another
+  python mysql_replication_setup.py --full --workers 1
+  
+  # Show what a run would do and how long it would take; review, then run that plan
+  python mysql_replication_setup.py --full --dry-run --save-plan plan.json
+  python mysql_replication_setup.py --full --plan plan.json
+  
+  # Where did the time go? (also: --report /var/tmp/mysql_replication/reports/<run>.jsonl)
+  python mysql_replication_setup.py --full --report
+  
+  # Continue a failed run where it stopped (journal in /var/tmp/mysql_replication)
+  python mysql_replication_setup.py --full --resume
+  
+  # Restore next to the live datadir, swap during a short stop; undo the swap
+  python mysql_replication_setup.py --full --staged
+  python mysql_replication_setup.py --rollback
+  
+  # Seed from a logical dump / load a dump into the running secondary
+  python mysql_replication_setup.py --full --engine logical --dump /backups/app.sql.gz
+  python mysql_replication_setup.py --load-dump classicmodels.sql
+  
+  # Watch replication catch up (exit 0 caught up, 2 diverging)
+  python mysql_replication_setup.py --watch-lag --watch-timeout 7200
+  
+  # Check the restored replica's GTID position against the backup and the source
+  python mysql_replication_setup.py --gtid-check
+  
+  # Swap roles with the primary (prints the write-unavailability window)
+  python mysql_replication_setup.py --switchover
+  
+  # Per-table write volume and large transactions in the binlogs
+  python mysql_replication_setup.py --analyze-binlogs
+  python mysql_replication_setup.py --analyze-binlogs /u01/data/mysql1_binlog/mysql-bin.000042
+  
+  # Top statements by total time in the slow query log
+  python mysql_replication_setup.py --digest-slow-log /var/log/mysql/slow-logs/slow-logs.log
+  
+  # Compressed hot backup of this host's instance, then seed a replica from it
+  python mysql_replication_setup.py --backup --engine xtrabackup
+  python mysql_replication_setup.py --full --engine xtrabackup --from-backup /u01/backup/mysqld_mysql1-20250101-020000
+  
+  # Verify the configured backup (also runs before any destructive step);
+  # record checksums for it where the backup was taken
+  python mysql_replication_setup.py --verify-backup --engine xtrabackup
+  python mysql_replication_setup.py --write-checksums /u01/data/mysqldata/ebackup.mbi
+  
+  # Tune the parallel applier (optionally benchmark worker counts)
+  python mysql_replication_setup.py --tune-applier --benchmark-applier
+  
   # Generate SQL only
   python mysql_replication_setup.py --sql-only
   
+  # Settings for another instance, non-interactive
+  python mysql_replication_setup.py --full --yes --config mysql2.json
+  
+  # Rebuild every replica in an inventory (see the Setup Guide); estimate first
+  python mysql_replication_setup.py --fleet inventory.json --dry-run
+  python mysql_replication_setup.py --fleet inventory.json
+  
 Steps:
   1. Stop MySQL Instance
   2. Delete Old Directories
@@ -688,23 +7314,266 @@ Steps:
         "--skip-restore", action="store_true",
         help="Skip backup restore step"
     )
+    parser.add_argument(
+        "--workers", type=int,
+        help=f"Maximum steps run concurrently in --full "
+             f"(default: {Config.MAX_PARALLEL_STEPS})"
+    )
+    parser.add_argument(
+        "--engine", choices=sorted(RESTORE_ENGINES),
+        help=f"Restore engine for step 4 (default: {Config.RESTORE_ENGINE})"
+    )
+    parser.add_argument(
+        "--dump", metavar="PATH",
+        help="Dump file or directory for --engine logical "
+             f"(default: {Config.LOGICAL_DUMP_PATH})"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="With --full/--step/--fleet: skip steps and restore phases the "
+             "journal lists as done"
+    )
+    parser.add_argument(
+        "--report", nargs="?", const="", metavar="REPORT.jsonl",
+        help="Print the per-step resource summary after --full/--step, or of "
+             "an earlier run's JSONL report"
+    )
+    parser.add_argument(
+        "--staged", action="store_true",
+        help="With --full: restore into a sibling directory while mysqld keeps "
+             "running, then swap it in"
+    )
+    parser.add_argument(
+        "--rollback", action="store_true",
+        help="Swap the previous datadir of a staged restore back in"
+    )
+    parser.add_argument(
+        "--load-dump", metavar="FILE",
+        help="Load a .sql/.sql.gz dump into the running secondary in parallel"
+    )
+    parser.add_argument(
+        "--watch-lag", action="store_true",
+        help="Sample replication lag until caught up (exit 2 if diverging)"
+    )
+    parser.add_argument(
+        "--watch-timeout", type=float,
+        help="Give up --watch-lag after this many seconds"
+    )
+    parser.add_argument(
+        "--gtid-check", action="store_true",
+        help="Compare backup/replica/source GTID sets and seed gtid_purged "
+             "(exit 1 if replication cannot start)"
+    )
+    parser.add_argument(
+        "--switchover", action="store_true",
+        help="Promote this secondary and make the primary its replica "
+             "(online, GTID-synchronized, timed)"
+    )
+    parser.add_argument(
+        "--analyze-binlogs", nargs="*", metavar="PATH",
+        help="Summarize write volume per table/schema, transaction sizes and "
+             "outliers in binary/relay logs (default: BINLOG_DIR)"
+    )
+    parser.add_argument(
+        "--digest-slow-log", metavar="FILE",
+        help="Group slow query log entries by fingerprint: count, total/p95/p99 "
+             "Query_time, lock time, rows examined"
+    )
+    parser.add_argument(
+        "--backup", nargs="?", const="", metavar="DIR",
+        help="Stream a hot backup of the local instance (meb/xtrabackup engine) "
+             "through parallel chunked compression into DIR "
+             "(default: BACKUP_OUTPUT_DIR) and write a manifest"
+    )
+    parser.add_argument(
+        "--from-backup", metavar="MANIFEST",
+        help="Restore from a --backup manifest (or its directory): verify and "
+             "unpack it before the engine's restore"
+    )
+    parser.add_argument(
+        "--verify-backup", action="store_true",
+        help="Read and check the configured backup in parallel chunks "
+             "(exit 1 if it is missing, truncated or corrupt)"
+    )
+    parser.add_argument(
+        "--write-checksums", nargs="?", const="", metavar="PATH",
+        help="Write per-chunk SHA-256 checksums of a backup file/directory "
+             "(default: the configured backup) for --verify-backup"
+    )
+    parser.add_argument(
+        "--tune-applier", action="store_true",
+        help="Inspect settings and configure the replica's parallel applier"
+    )
+    parser.add_argument(
+        "--benchmark-applier", action="store_true",
+        help="With --tune-applier: measure several worker counts, keep the fastest"
+    )
+    parser.add_argument(
+        "--stop-timeout", type=float,
+        help=f"Seconds to wait for shutdown (default: {Config.STOP_TIMEOUT})"
+    )
+    parser.add_argument(
+        "--start-timeout", type=float,
+        help=f"Seconds to wait for startup (default: {Config.START_TIMEOUT})"
+    )
+    parser.add_argument(
+        "--config", metavar="FILE",
+        help="JSON object of Config overrides, e.g. {\"MYSQL_INSTANCE\": \"mysqld@mysql2\"} "
+             "(\"-\" reads stdin)"
+    )
+    parser.add_argument(
+        "--config-json", metavar="JSON",
+        help="Config overrides given inline (applied after --config)"
+    )
+    parser.add_argument(
+        "--yes", action="store_true",
+        help="Answer all confirmation prompts with yes"
+    )
+    parser.add_argument(
+        "--emit-result", action="store_true",
+        help="With --full: print a FLEET-RESULT JSON line (used by --fleet)"
+    )
+    parser.add_argument(
+        "--fleet", metavar="INVENTORY",
+        help="Run the full workflow against every target in an inventory file"
+    )
+    parser.add_argument(
+        "--fix-permissions", nargs="+", metavar="PATH",
+        help="Privileged helper: recursively fix mysql ownership on PATHs"
+    )
+    parser.add_argument(
+        "--purge", nargs="+", metavar="PATH",
+        help="Privileged helper: delete directory trees, throttled (also "
+             "for leftover *.deleting-* tombstones)"
+    )
+    parser.add_argument(
+        "--create", action="store_true",
+        help="With --fix-permissions: create the directories first"
+    )
     parser.add_argument(
         "--sql-only", action="store_true",
         help="Only generate replication SQL"
     )
     parser.add_argument(
         "--dry-run", action="store_true",
-        help="Print commands without executing"
+        help="With --full/--step/--fleet: print every command, file operation and "
+             "SQL statement the run would issue, with a size/time estimate, "
+             "without executing anything"
+    )
+    parser.add_argument(
+        "--save-plan", metavar="FILE",
+        help="With --dry-run: save the plan as JSON"
+    )
+    parser.add_argument(
+        "--diff-plan", metavar="FILE",
+        help="With --dry-run: show what changed since a saved plan"
+    )
+    parser.add_argument(
+        "--plan", metavar="FILE",
+        help="With --full/--step: run only if the run still matches this saved "
+             "(reviewed) plan"
     )
     
     args = parser.parse_args()
     
-    print("""
+    if args.config:
+        apply_config_overrides(load_config_file(args.config), args.config)
+    if args.config_json:
+        apply_config_overrides(json.loads(args.config_json), "--config-json")
+    if args.engine:
+        Config.RESTORE_ENGINE = args.engine
+    if args.dump:
+        Config.LOGICAL_DUMP_PATH = args.dump
+    if args.from_backup:
+        Config.BACKUP_MANIFEST = args.from_backup
+    if args.stop_timeout is not None:
+        Config.STOP_TIMEOUT = args.stop_timeout
+    if args.start_timeout is not None:
+        Config.START_TIMEOUT = args.start_timeout
+    if args.yes:
+        Config.ASSUME_YES = True
+    if args.staged:
+        Config.STAGED_RESTORE = True
+    
+    if args.fix_permissions:
+        result = apply_mysql_permissions(args.fix_permissions, create=args.create)
+        print(f"Ownership: {result.summary()}")
+        return
+    
+    if args.purge:
+        def _report(event: ProgressEvent):
+            print(f"PURGE-PROGRESS {event.bytes_done} {event.bytes_total}", flush=True)
+            log_progress_event(event)
+        
+        errors = 0
+        for path in args.purge:
+            result = purge_tree(path, on_progress=_report, interval=min(5, Config.PROGRESS_INTERVAL))
+            errors += result.errors
+            print(f"Purge {path}: {result.summary()}")
+        sys.exit(1 if errors else 0)
+    
+    if args.analyze_binlogs is not None:
+        files = binlog_files(args.analyze_binlogs)
+        if not files:
+            logger.error(f"❌ No binary logs in {args.analyze_binlogs or Config.BINLOG_DIR}")
+            sys.exit(1)
+        if _needs_sudo() and not all(os.access(path, os.R_OK) for path in files):
+            _, output, _ = run_command(
+                _privileged_helper_argv("--analyze-binlogs", *files, settings=(
+                    "BINLOG_ANALYZE_WORKERS", "BINLOG_TOP_TRANSACTIONS")),
+                "Analyzing binlogs (privileged helper)")
+            print(output, end="")
+            return
+        try:
+            print_binlog_stats(analyze_binlogs(files))
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        return
+    
+    if args.digest_slow_log:
+        try:
+            report_slow_log(args.digest_slow_log)
+        except OSError as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        return
+    
+    if args.backup is not None:
+        try:
+            take_backup(args.backup or None)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            logger.error(f"❌ Backup failed: {e}")
+            sys.exit(1)
+        return
+    
+    if args.verify_backup:
+        try:
+            verify_restore_source()
+        except (OSError, ValueError, RuntimeError, subprocess.CalledProcessError) as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        return
+    
+    if args.write_checksums is not None:
+        try:
+            write_backup_checksums(args.write_checksums or _backup_source())
+        except OSError as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        return
+    
+    if args.fleet:
+        sys.exit(run_fleet(args.fleet, resume=args.resume, dry_run=args.dry_run))
+    
+    primary = f"{Config.PRIMARY_HOST}:{Config.PRIMARY_PORT}"
+    secondary = f"{Config.SECONDARY_HOST}:{Config.SECONDARY_PORT} ({Config.MYSQL_INSTANCE})"
+    print(f"""
     ╔══════════════════════════════════════════════════════════════════════╗
     ║         MySQL Primary-Secondary Replication Setup Script             ║
     ║                                                                      ║
-    ║  Primary:   192.168.1.1:3301                                         ║
-    ║  Secondary: 192.168.2.1:3301                                         ║
+    ║  Primary:   {primary:<57}║
+    ║  Secondary: {secondary:<57}║
     ╚══════════════════════════════════════════════════════════════════════╝
     """)
     
@@ -712,17 +7581,97 @@ Steps:
         print(generate_replication_sql())
         return
     
-    if args.step:
-        run_step(args.step)
+    if args.report and not (args.full or args.step):
+        print_run_report(load_run_report(args.report))
         return
     
-    if args.full:
-        run_full_workflow(
-            skip_delete=args.skip_delete,
-            skip_restore=args.skip_restore
-        )
+    if args.dry_run and (args.full or args.step):
+        plan = build_plan(args.step, args.skip_delete, args.skip_restore, args.resume)
+        print_plan(plan)
+        if args.diff_plan:
+            print_plan_diff(plan, ExecutionPlan.load(args.diff_plan))
+        if args.save_plan:
+            plan.save(args.save_plan)
+            logger.info(f"📄 Plan saved to: {args.save_plan}")
+        if args.emit_result:
+            summary = plan.to_dict()
+            emit_fleet_result({"status": "ok", "dry_run": True,
+                               "target": summary["target"], **summary["estimate"]})
         return
     
+    if args.plan and (args.full or args.step):
+        plan = build_plan(args.step, args.skip_delete, args.skip_restore, args.resume)
+        if print_plan_diff(plan, ExecutionPlan.load(args.plan)):
+            logger.error(f"❌ The run no longer matches the reviewed plan {args.plan}; "
+                         f"review a new --dry-run")
+            sys.exit(1)
+        logger.info(f"✅ Run matches the reviewed plan {args.plan}")
+    
+    if args.switchover:
+        try:
+            switchover()
+        except RuntimeError as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        finally:
+            close_executors()
+        return
+    
+    if args.gtid_check:
+        try:
+            gtid_preflight()
+        except RuntimeError:
+            sys.exit(1)
+        finally:
+            close_executors()
+        return
+    
+    if args.tune_applier:
+        try:
+            tune_parallel_applier(benchmark=args.benchmark_applier)
+        finally:
+            close_executors()
+        return
+    
+    if args.watch_lag:
+        try:
+            sys.exit(watch_replication_lag(timeout=args.watch_timeout))
+        finally:
+            close_executors()
+    
+    if args.rollback:
+        if confirm_action(f"Stop {Config.MYSQL_INSTANCE} and roll back to the previous datadir?"):
+            try:
+                rollback_datadir()
+            finally:
+                close_executors()
+        return
+    
+    if args.load_dump:
+        try:
+            load_dump_file(args.load_dump)
+        finally:
+            close_executors()
+        return
+    
+    try:
+        if args.step:
+            run_step(args.step, resume=args.resume)
+            return
+        
+        if args.full:
+            run_full_workflow(
+                skip_delete=args.skip_delete,
+                skip_restore=args.skip_restore,
+                max_workers=args.workers,
+                on_result=emit_fleet_result if args.emit_result else None,
+                resume=args.resume
+            )
+            return
+    finally:
+        if args.report is not None and get_report():
+            print_run_report(get_report().records)
+    
     # No arguments - show help
     parser.print_help()
 
@@ -0,0 +1,92 @@
+"""
+Time GtidSet operations on synthetic sets.
+
+    python tests/bench/bench_gtid.py            # 100,000 intervals
+    python tests/bench/bench_gtid.py 1000000
+"""
+
+import os
+import random
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mysql_replication_setup import GtidSet, print_section  # noqa: E402
+
+
+def benchmark_gtid_sets(intervals: int = 100_000, uuids: int = 1_000,
+                        rounds: int = 3) -> Dict[str, float]:
+    """
+    Time GtidSet operations on synthetic gtid_executed values shaped like
+    a long-lived primary (`intervals` fragments over `uuids` source UUIDs)
+    and a replica missing a tenth of its fragments.
+    
+    Returns:
+        Best of `rounds` wall-clock seconds per operation
+        
+    Raises:
+        RuntimeError: If the results are inconsistent (self-check)
+    """
+    rng = random.Random(42)
+    per_uuid = max(1, intervals // uuids)
+    source_members, replica_members, gnos = [], [], {}
+    for _ in range(uuids):
+        digits = f"{rng.getrandbits(128):032x}"
+        uuid = f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+        gno, source_parts, replica_parts = 1, [], []
+        for _ in range(per_uuid):
+            length = rng.randint(1, 50)
+            part = f"{gno}-{gno + length - 1}"
+            source_parts.append(part)
+            if rng.random() >= 0.1:
+                replica_parts.append(part)
+            gno += length + rng.randint(1, 5)
+        gnos[uuid] = gno
+        source_members.append(f"{uuid}:" + ":".join(source_parts))
+        if replica_parts:
+            replica_members.append(f"{uuid}:" + ":".join(replica_parts))
+    source_text, replica_text = ",\n".join(source_members), ",\n".join(replica_members)
+    
+    source, replica = GtidSet.parse(source_text), GtidSet.parse(replica_text)
+    probes = [(uuid, rng.randint(1, gno)) for uuid, gno in rng.choices(list(gnos.items()), k=10_000)]
+    missing = source - replica
+    if (not replica <= source or missing.count() != source.count() - replica.count()
+            or (replica | missing) != source or (source & replica) != replica):
+        raise RuntimeError("GtidSet self-check failed")
+    
+    operations = {
+        "parse (source)": lambda: GtidSet.parse(source_text),
+        "union": lambda: replica | missing,
+        "subtract (source - replica)": lambda: source - replica,
+        "intersect": lambda: source & replica,
+        "subset (replica <= source)": lambda: replica <= source,
+        "contains (10k GTIDs)": lambda: [source.contains(u, g) for u, g in probes],
+        "count": source.count,
+        "format": lambda: str(source),
+    }
+    timings = {}
+    for name, operation in operations.items():
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            operation()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def print_gtid_benchmark(timings: Dict[str, float], intervals: int, uuids: int = 1_000):
+    """Print benchmark_gtid_sets() results."""
+    print_section(f"GTID SET BENCHMARK: {intervals:,} intervals, {uuids:,} UUIDs")
+    print(f"  {'Operation':<30} {'Time':>10} {'Intervals/s':>14}")
+    print("  " + "-" * 56)
+    for name, seconds in timings.items():
+        rate = f"{intervals / seconds:,.0f}" if seconds > 0 else "-"
+        print(f"  {name:<30} {seconds * 1000:>8.1f}ms {rate:>14}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print_gtid_benchmark(benchmark_gtid_sets(count), count)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Stand-in for one fleet target's run: fleet_target.py NAME [args...].
+
+Reads the Config overrides from stdin, sleeps FLEET_STUB_SLEEP seconds
+and records its argv, settings and start/end times in
+$FLEET_STUB_DIR/NAME.json. The name prefix picks the outcome:
+
+    ok-      FLEET-RESULT status ok, exit 0
+    fail-    FLEET-RESULT status failed, exit 1
+    silent-  no result line, exit 2
+    liar-    FLEET-RESULT status ok, but exit 3
+"""
+
+import json
+import os
+import sys
+import time
+
+name = sys.argv[1]
+config = json.loads(sys.stdin.read())
+start = time.time()
+time.sleep(float(os.environ.get("FLEET_STUB_SLEEP", "0.3")))
+with open(os.path.join(os.environ["FLEET_STUB_DIR"], f"{name}.json"), "w") as f:
+    json.dump({"argv": sys.argv[2:], "config": config, "start": start, "end": time.time()}, f)
+
+print(f"rebuilding {name}")
+outcome = name.split("-", 1)[0]
+if outcome in ("ok", "liar"):
+    print("FLEET-RESULT " + json.dumps({"status": "ok", "wall": 1.5, "critical_path_time": 1.2,
+                                        "steps": {"restore_backup": {"duration": 1.0}}}))
+elif outcome == "fail":
+    print("FLEET-RESULT " + json.dumps({"status": "failed", "error": "step restore_backup failed",
+                                        "wall": 0.5, "steps": {}}))
+sys.exit({"ok": 0, "fail": 1, "silent": 2, "liar": 3}[outcome])
@@ -0,0 +1,96 @@
+"""Parallel applier tuning and the optional tune_applier workflow step."""
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (Config, SQLExecutor, build_workflow_steps,
+                                     recommended_applier_workers, tune_applier_step,
+                                     tune_parallel_applier)
+
+
+class FakeExecutor(SQLExecutor):
+    """Answers SHOW statements from a dict of rows; records every statement."""
+
+    def __init__(self, answers, error=None):
+        super().__init__("127.0.0.1", 3306, "admin", "secret")
+        self.answers = answers
+        self.error = error
+        self.statements = []
+
+    def execute_many(self, statements):
+        if self.error:
+            raise self.error
+        self.statements.extend(statements)
+        return [self.answers.get(statement, []) for statement in statements]
+
+
+def variables(**values):
+    return {f"SHOW GLOBAL VARIABLES LIKE '{name}'": [{"Variable_name": name, "Value": value}]
+            for name, value in values.items()}
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Install fake replica and source executors; returns a setup function."""
+    monkeypatch.setattr(script.os, "cpu_count", lambda: 8)
+
+    def setup(sql_running="Yes", tracking="WRITESET", error=None):
+        answers = variables(replica_parallel_workers="4", replica_preserve_commit_order="ON",
+                            replica_parallel_type="LOGICAL_CLOCK")
+        if sql_running:
+            answers["SHOW REPLICA STATUS"] = [{"Replica_SQL_Running": sql_running}]
+        replica = FakeExecutor(answers, error)
+        source = FakeExecutor(variables(binlog_transaction_dependency_tracking=tracking))
+        monkeypatch.setattr(script, "get_executor", lambda *args, **kwargs: replica)
+        monkeypatch.setattr(script, "get_source_executor", lambda: source)
+        return replica
+    return setup
+
+
+@pytest.mark.parametrize("cores, workers", [(1, 4), (8, 8), (64, 32)])
+def test_recommended_applier_workers(cores, workers):
+    assert recommended_applier_workers(cores) == workers
+
+
+def test_running_sql_thread_is_restarted(replica):
+    executor = replica()
+    assert tune_parallel_applier() == 8
+    assert executor.statements[-4:] == [
+        "STOP REPLICA SQL_THREAD",
+        "SET PERSIST replica_parallel_workers = 8",
+        "SET PERSIST replica_preserve_commit_order = ON",
+        "START REPLICA SQL_THREAD",
+    ]
+
+
+@pytest.mark.parametrize("sql_running", ["No", None])
+def test_stopped_replica_only_persists(replica, sql_running):
+    """Before START REPLICA the tuner must not start the SQL thread itself."""
+    executor = replica(sql_running=sql_running)
+    tune_parallel_applier(benchmark=True)
+    assert executor.statements[-2:] == ["SET PERSIST replica_parallel_workers = 8",
+                                        "SET PERSIST replica_preserve_commit_order = ON"]
+    assert not [statement for statement in executor.statements if "SQL_THREAD" in statement]
+
+
+def test_commit_order_tracking_is_flagged(replica, caplog):
+    replica(tracking="COMMIT_ORDER")
+    tune_parallel_applier()
+    assert "binlog_transaction_dependency_tracking = COMMIT_ORDER" in caplog.text
+
+
+def test_step_never_fails_the_rebuild(replica, caplog):
+    replica(error=RuntimeError("Access denied"))
+    tune_applier_step()
+    assert "Parallel applier tuning failed: Access denied" in caplog.text
+
+
+@pytest.mark.parametrize("staged", [False, True])
+def test_step_follows_configure_replication(monkeypatch, staged):
+    monkeypatch.setattr(Config, "STAGED_RESTORE", staged)
+    monkeypatch.setattr(Config, "APPLIER_TUNE_STEP", False)
+    assert "tune_applier" not in [step.name for step in build_workflow_steps()]
+    monkeypatch.setattr(Config, "APPLIER_TUNE_STEP", True)
+    steps = {step.name: step for step in build_workflow_steps()}
+    assert steps["tune_applier"].depends_on == ("configure_replication",)
+    assert steps["tune_applier"].func is tune_applier_step
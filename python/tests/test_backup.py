@@ -0,0 +1,118 @@
+"""Compressed hot backups (--backup) with tests/stubs/xtrabackup, and unpacking them."""
+
+import gzip
+import json
+import os
+import subprocess
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (Config, backup_codec, load_backup_manifest, take_backup,
+                                     unpack_backup)
+
+STUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+SIZE = 1_000_000
+
+
+@pytest.fixture
+def xtrabackup(monkeypatch, tmp_path):
+    """xtrabackup is the stub; small chunks so a backup has many of them."""
+    monkeypatch.setenv("PATH", STUBS + os.pathsep + os.environ["PATH"])
+    monkeypatch.setenv("XTRABACKUP_STUB_BYTES", str(SIZE))
+    monkeypatch.setenv("XTRABACKUP_STUB_ARGV", str(tmp_path / "argv.json"))
+    for name, value in {"USE_SUDO": False, "RESTORE_ENGINE": "xtrabackup",
+                        "BACKUP_COMPRESSION": "gzip", "BACKUP_COMPRESSION_LEVEL": None,
+                        "BACKUP_CHUNK_BYTES": 64 << 10, "BACKUP_WORKERS": 4,
+                        "MYSQL_INSTANCE": "mysqld@mysql1"}.items():
+        monkeypatch.setattr(Config, name, value)
+    return tmp_path
+
+
+def stream():
+    """The bytes the stub writes."""
+    return subprocess.run([os.path.join(STUBS, "xtrabackup")], capture_output=True,
+                          check=True).stdout
+
+
+def test_backup_writes_chunks_and_manifest(xtrabackup):
+    manifest_path = take_backup(str(xtrabackup / "backups"))
+    run_dir = os.path.dirname(manifest_path)
+    assert os.path.basename(run_dir).startswith("mysqld_mysql1-")
+    assert sorted(os.listdir(run_dir)) == ["backup.xbstream.gz", "manifest.json"]
+    manifest = load_backup_manifest(run_dir)
+    assert (manifest["tool"], manifest["compression"], manifest["level"]) == (
+        "xtrabackup", "gzip", 1)
+    assert manifest["raw_bytes"] == SIZE
+    chunks = manifest["chunks"]
+    assert len(chunks) == -(-SIZE // (64 << 10))
+    assert [c["offset"] for c in chunks] == [sum(c["size"] for c in chunks[:i])
+                                             for i in range(len(chunks))]
+    assert manifest["stored_bytes"] == os.path.getsize(manifest["data_path"]) < SIZE
+    # Independent gzip members: the data file is one valid stream
+    with gzip.open(manifest["data_path"]) as f:
+        assert f.read() == stream()
+
+
+def test_backup_command(xtrabackup, monkeypatch):
+    monkeypatch.setattr(Config, "SOURCE_ADMIN_PASSWORD", "s3cret")
+    run_dir = os.path.dirname(take_backup(str(xtrabackup / "backups")))
+    argv = json.loads((xtrabackup / "argv.json").read_text())
+    assert argv[0].startswith("--defaults-extra-file=")
+    assert not os.path.exists(argv[0].split("=", 1)[1])
+    assert "s3cret" not in " ".join(argv)
+    assert {"--backup", "--stream=xbstream", f"--parallel={Config.XTRABACKUP_PARALLEL}",
+            f"--target-dir={run_dir}/tmp"} <= set(argv)
+
+
+def test_failed_backup_has_no_manifest(xtrabackup, monkeypatch):
+    monkeypatch.setenv("XTRABACKUP_STUB_EXIT", "1")
+    with pytest.raises(subprocess.CalledProcessError) as raised:
+        take_backup(str(xtrabackup / "backups"))
+    assert "No space left on device" in raised.value.stderr
+    (run_dir,) = (xtrabackup / "backups").iterdir()
+    assert sorted(os.listdir(run_dir)) == ["backup.xbstream.gz"]
+
+
+def test_unsupported_engine(xtrabackup, monkeypatch):
+    monkeypatch.setattr(Config, "RESTORE_ENGINE", "clone")
+    with pytest.raises(ValueError, match="not 'clone'"):
+        take_backup(str(xtrabackup / "backups"))
+
+
+def test_missing_codec_falls_back_to_gzip(monkeypatch, caplog):
+    monkeypatch.setattr(script, "zstandard", None)
+    assert backup_codec("zstd") == "gzip"
+    assert "pip install zstandard" in caplog.text
+    with pytest.raises(ValueError, match="Unknown compression 'bzip2'"):
+        backup_codec("bzip2")
+
+
+def test_unpack_round_trip(xtrabackup):
+    manifest_path = take_backup(str(xtrabackup / "backups"))
+    target = xtrabackup / "restored.xbstream"
+    unpack_backup(manifest_path, "xtrabackup", ["sh", "-c", f"cat > {target}"], "Unpacking")
+    assert target.read_bytes() == stream()
+
+
+def test_unpack_needs_the_same_tool(xtrabackup):
+    manifest_path = take_backup(str(xtrabackup / "backups"))
+    with pytest.raises(ValueError, match="is a xtrabackup backup, not meb"):
+        unpack_backup(manifest_path, "meb", ["true"], "Unpacking")
+
+
+def test_unpack_detects_a_corrupt_chunk(xtrabackup):
+    manifest_path = take_backup(str(xtrabackup / "backups"))
+    manifest = load_backup_manifest(manifest_path)
+    corrupt = manifest["chunks"][5]
+    with open(manifest["data_path"], "r+b") as f:
+        f.seek(corrupt["offset"] + corrupt["size"] // 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    target = xtrabackup / "restored.xbstream"
+    with pytest.raises(RuntimeError, match="chunk 5 is corrupt"):
+        unpack_backup(manifest_path, "xtrabackup", ["sh", "-c", f"cat > {target}"], "Unpacking")
+    # At most the chunks before the bad one reach the (killed) command, in order
+    unpacked = target.read_bytes()
+    assert len(unpacked) <= 5 * (64 << 10) and stream().startswith(unpacked)
@@ -0,0 +1,104 @@
+"""Binlog analyzer on the fixtures in tests/fixtures/binlog (see make_binlogs.py)."""
+
+import os
+import shutil
+
+import pytest
+
+from mysql_replication_setup import (analyze_binlog_file, analyze_binlogs, binlog_files,
+                                     print_binlog_stats)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "binlog")
+ROW_BASED = os.path.join(FIXTURES, "mysql-bin.000001")
+RELAY_LOG = os.path.join(FIXTURES, "relay-bin.000002")
+ACTIVE = os.path.join(FIXTURES, "mysql-bin.000003")
+
+SOURCE = "3e11fa47-71ca-11e1-9e33-c80aa9429562"
+OTHER = "4f22ab58-82db-22f2-af44-d91bb0530673"
+
+
+def test_row_based_table_bytes():
+    stats = analyze_binlog_file(ROW_BASED, top=3)
+    # [row events, row bytes, write bytes, update bytes, delete bytes]
+    assert stats.tables == {
+        "shop.orders": [21, 2295, 1220, 0, 1075],
+        "shop.customers": [20, 1760, 0, 1760, 0],
+        "archive.orders_2023": [20, 41900, 41900, 0, 0],
+    }
+    assert stats.schemas() == {"shop": 4055, "archive": 41900}
+    assert stats.ddl == {"shop": 2}
+
+
+def test_row_based_transactions():
+    stats = analyze_binlog_file(ROW_BASED, top=3)
+    assert (stats.files, stats.bytes, stats.events) == (1, 51726, 173)
+    assert (stats.transactions, stats.transaction_bytes) == (23, 51522)
+    assert (stats.first_timestamp, stats.last_timestamp) == (1_700_000_000, 1_700_000_023)
+    assert (stats.clocked, stats.parallel_window, stats.serial) == (23, 93, 3)
+    assert stats.truncated == []
+
+
+def test_row_based_outlier():
+    stats = analyze_binlog_file(ROW_BASED, top=3)
+    largest = sorted(stats.largest, reverse=True)
+    assert len(largest) == 3
+    size, gtid, path, pos, tables = largest[0]
+    assert (size, gtid, path, pos) == (43229, f"{SOURCE}:23", ROW_BASED, 8450)
+    assert tables == ("archive.orders_2023", "shop.orders")
+    assert [entry[0] for entry in largest[1:]] == [398, 398]
+    # The median sits with the small transactions, p99 with the outlier
+    assert stats.size_percentile(0.5) == 430
+    assert stats.size_percentile(0.99) >= 43229
+
+
+def test_relay_log():
+    stats = analyze_binlog_file(RELAY_LOG, top=3)
+    assert stats.tables == {
+        "crm.accounts": [5, 1260, 0, 1260, 0],
+        "crm.sessions": [1, 3635, 0, 0, 3635],
+    }
+    assert (stats.events, stats.transactions, stats.transaction_bytes) == (34, 6, 6065)
+    assert sorted(stats.largest, reverse=True)[0][:2] == (3830, f"{OTHER}:6")
+    assert stats.ddl == {}
+
+
+def test_active_binlog_is_truncated():
+    stats = analyze_binlog_file(ACTIVE, top=3)
+    assert stats.tables == {"shop.orders": [3, 261, 261, 0, 0]}
+    # The open transaction is not counted
+    assert (stats.transactions, stats.transaction_bytes) == (3, 843)
+    assert stats.truncated == [f"{ACTIVE}@1065"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_analyze_binlogs_merges_files(workers):
+    stats = analyze_binlogs(binlog_files([FIXTURES]), workers=workers)
+    assert (stats.files, stats.bytes, stats.transactions) == (3, 51726 + 6391 + 1101, 32)
+    assert stats.tables["shop.orders"] == [24, 2556, 1481, 0, 1075]
+    assert stats.schemas() == {"shop": 4316, "archive": 41900, "crm": 4895}
+    assert [entry[1] for entry in sorted(stats.largest, reverse=True)[:2]] == [
+        f"{SOURCE}:23", f"{OTHER}:6"]
+    assert stats.truncated == [f"{ACTIVE}@1065"]
+
+
+def test_binlog_files_expands_directories(tmp_path):
+    for name in ("mysql-bin.000001", "mysql-bin.index"):
+        shutil.copy(os.path.join(FIXTURES, "mysql-bin.000001"), tmp_path / name)
+    assert binlog_files([str(tmp_path), RELAY_LOG]) == [
+        str(tmp_path / "mysql-bin.000001"), RELAY_LOG]
+
+
+@pytest.mark.parametrize("content", [b"", b"\xfebi", b"-- MySQL dump\n"])
+def test_not_a_binlog(tmp_path, content):
+    path = tmp_path / "dump.sql"
+    path.write_bytes(content)
+    with pytest.raises(ValueError, match="not a binary log"):
+        analyze_binlog_file(str(path))
+
+
+def test_print_binlog_stats(capsys):
+    print_binlog_stats(analyze_binlog_file(ROW_BASED, top=3))
+    out = capsys.readouterr().out
+    assert "Transactions:  23" in out
+    assert "archive.orders_2023" in out and "91.2%" in out
+    assert f"{SOURCE}:23" in out and "mysql-bin.000001:8450" in out
@@ -0,0 +1,214 @@
+"""Clone engine pre-flight and post_start() against fake SQL executors."""
+
+import re
+import subprocess
+import time
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (CloneRestoreEngine, Config, SQLExecutor,
+                                     clone_versions_compatible)
+
+UUID = "3e11fa47-71ca-11e1-9e33-c80aa9429562"
+DONOR = ("192.168.1.1", 3301)
+
+RESTART_FAILED = subprocess.CalledProcessError(
+    1, ["mysql"], "", "ERROR 3707 (HY000) at line 1: Restart server failed "
+                      "(mysqld is not managed by supervisor process).")
+ACCESS_DENIED = subprocess.CalledProcessError(
+    1, ["mysql"], "", "ERROR 1045 (28000): Access denied for user 'clone_user'@'192.168.2.1'")
+
+
+class FakeExecutor(SQLExecutor):
+    """
+    Answers statements from (regex, result) rules, first match wins, and
+    records every statement. A result is a list of rows, an exception to
+    raise, or a callable returning either.
+    """
+
+    def __init__(self, host, port, rules):
+        super().__init__(host, port, "admin", "secret")
+        self.rules = [(re.compile(pattern, re.I | re.S), result) for pattern, result in rules]
+        self.statements = []
+
+    def execute_many(self, statements):
+        results = []
+        for statement in statements:
+            self.statements.append(statement)
+            for pattern, result in self.rules:
+                if pattern.search(statement):
+                    result = result() if callable(result) else result
+                    if isinstance(result, BaseException):
+                        raise result
+                    results.append(result)
+                    break
+            else:
+                results.append([])
+        return results
+
+    def ran(self, text):
+        return [statement for statement in self.statements if text in statement]
+
+
+@pytest.fixture
+def clone(monkeypatch):
+    """Wire fake executors and commands into the clone engine; returns a setup function."""
+    monkeypatch.setattr(Config, "CLONE_DONOR", "")
+    monkeypatch.setattr(Config, "PRIMARY_HOST", DONOR[0])
+    monkeypatch.setattr(Config, "PRIMARY_PORT", DONOR[1])
+    monkeypatch.setattr(Config, "CLONE_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(Config, "PROGRESS_INTERVAL", 0)
+    monkeypatch.setattr(Config, "CLONE_PASSWORD", "clone'pw")
+    commands = []
+
+    def setup(donor_rules=(), local_rules=(), mysqld_version="8.0.36"):
+        donor = FakeExecutor(*DONOR, donor_rules)
+        local = FakeExecutor("127.0.0.1", Config.SECONDARY_PORT, local_rules)
+
+        def get_executor(host="127.0.0.1", port=None, user=None, password=None, pool_size=None):
+            return donor if (host, port) == DONOR else local
+
+        def run_command(cmd, description, **kwargs):
+            commands.append(list(cmd))
+            return 0, f"/usr/sbin/mysqld  Ver {mysqld_version} for Linux on x86_64", ""
+
+        monkeypatch.setattr(script, "get_executor", get_executor)
+        monkeypatch.setattr(script, "run_command", run_command)
+        monkeypatch.setattr(script, "wait_for_mysql_ready", lambda: 0.0)
+        return donor, local, commands
+    return setup
+
+
+def donor_rules(version="8.0.36", plugin="ACTIVE", max_allowed_packet=64 << 20):
+    return [
+        (r"SELECT @@version", [{"version": version, "os": "Linux", "machine": "x86_64",
+                                "max_allowed_packet": str(max_allowed_packet)}]),
+        (r"FROM information_schema.PLUGINS", [{"status": plugin}] if plugin else []),
+        (r"INNODB_TABLESPACES", [{"bytes": str(5 << 30)}]),
+    ]
+
+
+def local_rules(clone_result=None, status="Completed", plugin="ACTIVE"):
+    def _clone():
+        time.sleep(0.1)                 # Long enough for a few clone_progress polls
+        return clone_result if clone_result is not None else []
+    rows = [{"STATE": status, "ERROR_NO": "0" if status == "Completed" else "3862",
+             "ERROR_MESSAGE": "" if status == "Completed" else "Clone Donor Error: connection lost",
+             "GTID_EXECUTED": f"{UUID}:1-100"}]
+    progress = [{"STAGE": "FILE COPY", "STATE": "In Progress", "BEGIN_TIME": "2026-01-01 10:00:00",
+                 "END_TIME": None, "ESTIMATE": str(4 << 30), "DATA": str(1 << 30),
+                 "DATA_SPEED": str(100 << 20)}]
+    return [
+        (r"FROM information_schema.PLUGINS", [{"status": plugin}] if plugin else []),
+        (r"^CLONE INSTANCE", _clone),
+        (r"performance_schema.clone_status", rows if status else []),
+        (r"performance_schema.clone_progress", progress),
+    ]
+
+
+@pytest.mark.parametrize("donor, recipient, compatible", [
+    ("8.0.36", "8.0.36", True),
+    ("8.0.36-log", "8.0.36-commercial", True),
+    ("8.0.35", "8.0.36", False),
+    ("8.0.36", "8.0.37", False),            # Series compatibility starts at 8.0.37
+    ("8.0.37", "8.0.40", True),
+    ("8.0.41", "8.0.38", True),
+    ("8.0.40", "8.4.0", False),
+    ("8.4.0", "8.4.3", True),
+    ("9.1.0", "9.2.0", False),
+    ("5.7.44", "5.7.43", False),
+])
+def test_clone_versions_compatible(donor, recipient, compatible):
+    assert clone_versions_compatible(donor, recipient) is compatible
+    assert clone_versions_compatible(recipient, donor) is compatible
+
+
+def test_verify_refuses_version_mismatch(clone):
+    donor, _, _ = clone(donor_rules(version="8.0.36"), mysqld_version="8.0.35")
+    with pytest.raises(RuntimeError, match="donor runs 8.0.36, local mysqld is 8.0.35"):
+        CloneRestoreEngine().verify()
+    assert not donor.ran("CREATE USER")
+
+
+def test_verify_refuses_small_max_allowed_packet(clone):
+    clone(donor_rules(max_allowed_packet=1 << 20))
+    with pytest.raises(RuntimeError, match="max_allowed_packet is below 2MB"):
+        CloneRestoreEngine().verify()
+
+
+def test_verify_refuses_inactive_plugin_when_not_managing(clone, monkeypatch):
+    monkeypatch.setattr(Config, "CLONE_MANAGE_DONOR", False)
+    clone(donor_rules(plugin=None))
+    with pytest.raises(RuntimeError, match="clone plugin not active"):
+        CloneRestoreEngine().verify()
+
+
+def test_verify_is_read_only(clone, monkeypatch):
+    monkeypatch.setattr(Config, "CLONE_MANAGE_DONOR", True)
+    donor, _, _ = clone(donor_rules(plugin=None))
+    CloneRestoreEngine().verify()
+    assert all(statement.startswith("SELECT") for statement in donor.statements)
+
+
+def test_post_start_prepares_the_donor(clone, monkeypatch):
+    monkeypatch.setattr(Config, "CLONE_MANAGE_DONOR", True)
+    donor, local, _ = clone(donor_rules(plugin=None), local_rules())
+    CloneRestoreEngine().post_start()
+    assert donor.ran("INSTALL PLUGIN clone")
+    account = f"'{Config.CLONE_USER}'@'{Config.CLONE_USER_HOST}'"
+    assert donor.ran(f"CREATE USER IF NOT EXISTS {account} IDENTIFIED BY 'clone\\'pw'")
+    assert donor.ran(f"GRANT BACKUP_ADMIN ON *.* TO {account}")
+    assert local.ran("CLONE INSTANCE")
+
+
+def test_post_start_keeps_an_active_donor_plugin(clone, monkeypatch):
+    monkeypatch.setattr(Config, "CLONE_MANAGE_DONOR", True)
+    donor, _, _ = clone(donor_rules(), local_rules())
+    CloneRestoreEngine().post_start()
+    assert not donor.ran("INSTALL PLUGIN")
+    assert donor.ran("GRANT BACKUP_ADMIN")
+
+
+def test_post_start_leaves_an_unmanaged_donor_alone(clone, monkeypatch):
+    monkeypatch.setattr(Config, "CLONE_MANAGE_DONOR", False)
+    donor, _, _ = clone(donor_rules(plugin=None), local_rules())
+    CloneRestoreEngine().post_start()
+    assert donor.statements == []
+
+
+def test_post_start_supervised_restart(clone):
+    _, local, commands = clone(local_rules=local_rules())
+    CloneRestoreEngine().post_start()
+    assert local.ran(f"SET GLOBAL clone_valid_donor_list = '{DONOR[0]}:{DONOR[1]}'")
+    assert local.ran(f"CLONE INSTANCE FROM 'clone_user'@'{DONOR[0]}':{DONOR[1]} "
+                     f"IDENTIFIED BY 'clone\\'pw'")
+    assert local.ran("clone_progress")
+    assert not local.ran("INSTALL PLUGIN")
+    assert commands == []
+
+
+def test_post_start_installs_the_local_plugin(clone):
+    _, local, _ = clone(local_rules=local_rules(plugin=None))
+    CloneRestoreEngine().post_start()
+    assert local.ran("INSTALL PLUGIN clone SONAME 'mysql_clone.so'")
+
+
+def test_post_start_restarts_unsupervised_server(clone):
+    """Error 3707: the clone finished but nothing restarted mysqld."""
+    _, _, commands = clone(local_rules=local_rules(clone_result=RESTART_FAILED))
+    CloneRestoreEngine().post_start()
+    assert commands == [Config.SYSTEMCTL_CMD + ["start", Config.MYSQL_INSTANCE]]
+
+
+def test_post_start_reports_clone_status_error(clone):
+    clone(local_rules=local_rules(clone_result=RESTART_FAILED, status="Failed"))
+    with pytest.raises(RuntimeError, match="3862: Clone Donor Error: connection lost"):
+        CloneRestoreEngine().post_start()
+
+
+def test_post_start_other_error_is_not_a_restart(clone):
+    _, _, commands = clone(local_rules=local_rules(clone_result=ACCESS_DENIED, status=None))
+    with pytest.raises(RuntimeError, match="Access denied"):
+        CloneRestoreEngine().post_start()
+    assert commands == []
@@ -0,0 +1,101 @@
+"""--full --dry-run: the plan is printed and nothing is executed, written or contacted."""
+
+import json
+import os
+import subprocess
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import Config, StepJournal, journal_path, run_fingerprint
+
+
+def _refuse(*args, **kwargs):
+    raise AssertionError(f"executed during a dry run: {args[:1] or kwargs}")
+
+
+@pytest.fixture
+def target(monkeypatch, tmp_path):
+    """Data, binlog and backup under tmp_path; commands and connections fail."""
+    data, binlog = tmp_path / "data", tmp_path / "binlog"
+    (data / "shop").mkdir(parents=True)
+    (data / "ibdata1").write_bytes(b"\0" * 3000)
+    (data / "shop" / "orders.ibd").write_bytes(b"\0" * 2000)
+    binlog.mkdir()
+    (binlog / "mysql-bin.000001").write_bytes(b"\0" * 1000)
+    (tmp_path / "backup.mbi").write_bytes(b"\0" * 7000)
+    for name, value in {"DATA_DIR": str(data), "BINLOG_DIR": str(binlog),
+                        "BACKUP_IMAGE": str(tmp_path / "backup.mbi"),
+                        "RESTORE_ENGINE": "meb", "VERIFY_BACKUP": True,
+                        "DELETE_TOMBSTONE": True, "STAGED_RESTORE": False,
+                        "JOURNAL_DIR": str(tmp_path / "journal"),
+                        "REPLICATION_SQL_FILE": str(tmp_path / "replication.sql")}.items():
+        monkeypatch.setattr(Config, name, value)
+    monkeypatch.setattr(subprocess, "Popen", _refuse)
+    monkeypatch.setattr(subprocess, "run", _refuse)
+    monkeypatch.setattr(script.socket, "create_connection", _refuse)
+    return tmp_path
+
+
+def snapshot(root):
+    return sorted((os.path.relpath(os.path.join(path, name), root),
+                   os.path.getsize(os.path.join(path, name)))
+                  for path, _, files in os.walk(root) for name in files)
+
+
+def dry_run(monkeypatch, *args):
+    monkeypatch.setattr("sys.argv", ["mysql_replication_setup.py", "--full", "--dry-run", *args])
+    script.main()
+
+
+def test_dry_run_changes_nothing(target, monkeypatch):
+    before = snapshot(target)
+    dry_run(monkeypatch)
+    assert snapshot(target) == before
+    assert not (target / "journal").exists()
+    assert not (target / "replication.sql").exists()
+
+
+def test_dry_run_prints_the_plan(target, monkeypatch, capsys):
+    dry_run(monkeypatch)
+    out = capsys.readouterr().out
+    sections = ["[check_primary]", "[verify_backup]", "[stop_mysql] after verify_backup",
+                "[delete_binlog] after stop_mysql", "[delete_data] after stop_mysql",
+                "[create_directories] after delete_binlog, delete_data",
+                "[purge_tombstones] after delete_binlog, delete_data",
+                "[restore_backup] after create_directories",
+                "[set_permissions] after restore_backup", "[start_mysql] after set_permissions",
+                "[gtid_preflight] after start_mysql, check_primary",
+                "[configure_replication] after gtid_preflight"]
+    positions = [out.index(section) for section in sections]
+    assert positions == sorted(positions)
+    data = target / "data"
+    assert f"Renaming {data} to {data}{Config.TOMBSTONE_SUFFIX}-" in out
+    assert f"systemctl stop {Config.MYSQL_INSTANCE}" in out
+    assert "mysqlbackup --host=127.0.0.1" in out
+    assert str(target / "replication.sql") in out
+    assert "would delete 5.9KiB, copy 6.8KiB from the backup" in out
+    assert "Estimated window:" in out
+
+
+def test_saved_plan_lists_every_operation(target, monkeypatch):
+    dry_run(monkeypatch, "--save-plan", str(target / "plan.json"))
+    plan = json.loads((target / "plan.json").read_text())
+    kinds = {(op["step"], op["kind"]) for op in plan["ops"]}
+    assert {("stop_mysql", "command"), ("delete_data", "command"),
+            ("purge_tombstones", "delete"), ("restore_backup", "copy"),
+            ("configure_replication", "write")} <= kinds
+    assert plan["estimate"]["delete_bytes"] == 6000
+    assert plan["estimate"]["copy_bytes"] == 7000
+    assert plan["depends"]["restore_backup"] == ["create_directories"]
+
+
+def test_resume_plans_finished_steps_as_skipped(target, monkeypatch):
+    journal = StepJournal.create(journal_path(), run_fingerprint())
+    journal.finish("verify_backup", 1.0)
+    journal.finish("stop_mysql", 1.0)
+    dry_run(monkeypatch, "--resume", "--save-plan", str(target / "plan.json"))
+    ops = json.loads((target / "plan.json").read_text())["ops"]
+    assert [op["kind"] for op in ops if op["step"] in ("verify_backup", "stop_mysql")] == [
+        "skip", "skip"]
+    assert any(op["step"] == "check_primary" and op["kind"] == "connect" for op in ops)
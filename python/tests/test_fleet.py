@@ -0,0 +1,138 @@
+"""Fleet scheduling with tests/stubs/fleet_target.py as every target's launcher."""
+
+import json
+import os
+import sys
+
+import pytest
+
+from mysql_replication_setup import Config, load_inventory, run_fleet
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs", "fleet_target.py")
+
+
+@pytest.fixture
+def fleet(monkeypatch, tmp_path):
+    """Write an inventory; returns (inventory path, directory of stub records)."""
+    records = tmp_path / "records"
+    records.mkdir()
+    monkeypatch.setenv("FLEET_STUB_DIR", str(records))
+    monkeypatch.setattr(Config, "FLEET_LOG_DIR", str(tmp_path / "logs"))
+
+    def _write(targets, limits=None, **inventory):
+        inventory.setdefault("launcher", [sys.executable, STUB, "{name}"])
+        inventory["targets"] = targets
+        if limits:
+            inventory["limits"] = limits
+        path = tmp_path / "inventory.json"
+        path.write_text(json.dumps(inventory))
+        return str(path), records
+    return _write
+
+
+def records_of(records):
+    return {path.stem: json.loads(path.read_text()) for path in records.iterdir()}
+
+
+def max_concurrency(runs):
+    """Most runs in progress at once."""
+    return max(sum(1 for other in runs if other["start"] <= run["start"] < other["end"])
+               for run in runs)
+
+
+def target(name, host, source="backup-nfs1", **config):
+    return {"name": name, "source": source, "config": {"SECONDARY_HOST": host, **config}}
+
+
+def test_per_host_limit(fleet):
+    path, records = fleet([target(f"ok-{i}", "db2") for i in range(4)]
+                          + [target(f"ok-other-{i}", "db3") for i in range(2)],
+                          limits={"total": 8, "per_host": 2, "per_source": 8})
+    assert run_fleet(path) == 0
+    runs = records_of(records)
+    assert len(runs) == 6
+    assert max_concurrency([run for name, run in runs.items() if "other" not in name]) == 2
+    assert max_concurrency(list(runs.values())) == 4
+
+
+def test_per_source_limit(fleet):
+    path, records = fleet([target(f"ok-{i}", f"db{i}", source="nfs1") for i in range(4)]
+                          + [target(f"ok-{i}", f"db{i}", source="nfs2") for i in range(4, 6)],
+                          limits={"total": 8, "per_host": 2, "per_source": 1})
+    assert run_fleet(path) == 0
+    runs = records_of(records)
+    assert max_concurrency([runs[f"ok-{i}"] for i in range(4)]) == 1
+    assert max_concurrency(list(runs.values())) == 2
+
+
+def test_total_limit(fleet):
+    path, records = fleet([target(f"ok-{i}", f"db{i}") for i in range(5)],
+                          limits={"total": 2, "per_host": 2, "per_source": 8})
+    assert run_fleet(path) == 0
+    assert max_concurrency(list(records_of(records).values())) == 2
+
+
+def test_free_targets_overtake_a_busy_host(fleet):
+    path, records = fleet([target("ok-a1", "db2"), target("ok-a2", "db2"), target("ok-b", "db3")],
+                          limits={"total": 4, "per_host": 1, "per_source": 4})
+    assert run_fleet(path) == 0
+    runs = records_of(records)
+    assert runs["ok-b"]["start"] < runs["ok-a1"]["end"]
+    assert runs["ok-a2"]["start"] >= runs["ok-a1"]["end"]
+
+
+def test_settings_and_arguments(fleet):
+    path, records = fleet([dict(target("ok-1", "db2", MYSQL_INSTANCE="mysqld@mysql2"),
+                                args=["--engine", "xtrabackup"])],
+                          defaults={"PRIMARY_HOST": "10.0.0.1", "MYSQL_INSTANCE": "mysqld@mysql1"})
+    assert run_fleet(path, resume=True, dry_run=True) == 0
+    run = records_of(records)["ok-1"]
+    assert run["config"] == {"PRIMARY_HOST": "10.0.0.1", "MYSQL_INSTANCE": "mysqld@mysql2",
+                             "SECONDARY_HOST": "db2"}
+    assert run["argv"] == ["--full", "--yes", "--emit-result", "--config", "-",
+                           "--engine", "xtrabackup", "--resume", "--dry-run"]
+
+
+def test_result_status_and_exit_codes(fleet, capsys):
+    path, _ = fleet([target("ok-1", "db1"), target("fail-1", "db2"), target("silent-1", "db3"),
+                     target("liar-1", "db4")])
+    assert run_fleet(path) == 1
+    out = capsys.readouterr().out
+    assert "1/4 targets succeeded" in out
+    assert "fail-1: step restore_backup failed" in out
+    # A run that dies before printing its result line
+    assert "silent-1: exit code 2, no result line" in out
+    # A result line saying ok does not hide a failed exit
+    assert "liar-1: exit code 3" in out
+    assert "restore_backup (1.0s)" in out
+
+
+def test_target_logs(fleet):
+    path, _ = fleet([target("fail-1", "db2")])
+    run_fleet(path)
+    with open(os.path.join(Config.FLEET_LOG_DIR, "fail-1.log")) as log:
+        lines = log.read().splitlines()
+    assert lines[0].startswith("$ ") and lines[0].endswith("--config -")
+    assert "rebuilding fail-1" in lines
+
+
+def test_default_source_is_the_primary(fleet):
+    path, _ = fleet([{"name": "ok-1", "config": {"PRIMARY_HOST": "10.0.0.1"}},
+                     {"name": "ok-2", "launcher": ["ssh", "{host}", "run", "{name}"]}])
+    targets, limits = load_inventory(path)
+    assert targets[0].source == f"10.0.0.1:{Config.PRIMARY_PORT}"
+    assert targets[0].host == Config.SECONDARY_HOST
+    assert targets[1].launcher == ["ssh", Config.SECONDARY_HOST, "run", "ok-2"]
+    assert limits == {"total": Config.FLEET_MAX_PARALLEL, "per_host": Config.FLEET_PER_HOST,
+                      "per_source": Config.FLEET_PER_SOURCE}
+
+
+@pytest.mark.parametrize("targets, message", [
+    ([{"name": "ok-1", "config": {"NOT_A_SETTING": 1}}], "unknown setting 'NOT_A_SETTING'"),
+    ([{"name": "ok-1", "config": {"data_dir": "/u01"}}], "unknown setting 'data_dir'"),
+    ([{"name": "ok-1"}, {"name": "ok-1"}], "duplicate target names"),
+])
+def test_invalid_inventory(fleet, targets, message):
+    path, _ = fleet(targets)
+    with pytest.raises(ValueError, match=message):
+        load_inventory(path)
@@ -0,0 +1,128 @@
+"""GtidSet algebra checked against a naive set-of-integers reference."""
+
+import random
+
+import pytest
+
+from mysql_replication_setup import GtidSet
+
+UUID_A = "3e11fa47-71ca-11e1-9e33-c80aa9429562"
+UUID_B = "4f22ab58-82db-22f2-af44-d91bb0530673"
+UUID_C = "5a33bc69-93ec-33a3-b055-ea2cc1641784"
+KEYS = [(UUID_A, ""), (UUID_B, ""), (UUID_C, ""), (UUID_A, "blue")]
+
+
+def naive(gtids):
+    """(uuid, tag) -> set of GNOs"""
+    return {key: {gno for start, end in pairs for gno in range(start, end + 1)}
+            for key, pairs in gtids.intervals.items()}
+
+
+def from_naive(sets):
+    text = []
+    for (uuid, tag), gnos in sorted(sets.items()):
+        if gnos:
+            text.append(f"{uuid}{':' + tag if tag else ''}:" + ":".join(map(str, sorted(gnos))))
+    return GtidSet.parse(",".join(text))
+
+
+def random_text(rng):
+    """A GTID set text with adjacent, overlapping and repeated intervals."""
+    members = []
+    for uuid, tag in rng.sample(KEYS, rng.randint(0, len(KEYS))):
+        parts = []
+        for _ in range(rng.randint(1, 6)):
+            start = rng.randint(1, 60)
+            end = start + rng.choice([0, 0, 1, 4, 15])
+            parts.append(f"{start}-{end}" if end > start else str(start))
+        members.append(f"{uuid.upper() if rng.random() < 0.3 else uuid}"
+                       f"{':' + tag if tag else ''}:" + ":".join(parts))
+    return ",\n".join(members)
+
+
+def pairs_of(seed):
+    rng = random.Random(seed)
+    return GtidSet.parse(random_text(rng)), GtidSet.parse(random_text(rng))
+
+
+SEEDS = range(200)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_union_matches_reference(seed):
+    a, b = pairs_of(seed)
+    expected = {key: naive(a).get(key, set()) | naive(b).get(key, set())
+                for key in naive(a).keys() | naive(b).keys()}
+    assert naive(a | b) == {key: gnos for key, gnos in expected.items() if gnos}
+    assert (a | b) == from_naive(expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_subtract_matches_reference(seed):
+    a, b = pairs_of(seed)
+    expected = {key: gnos - naive(b).get(key, set()) for key, gnos in naive(a).items()}
+    assert naive(a - b) == {key: gnos for key, gnos in expected.items() if gnos}
+    assert (a - b).count() == sum(map(len, expected.values()))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_intersect_matches_reference(seed):
+    a, b = pairs_of(seed)
+    expected = {key: gnos & naive(b)[key] for key, gnos in naive(a).items() if key in naive(b)}
+    assert naive(a & b) == {key: gnos for key, gnos in expected.items() if gnos}
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_subset_matches_reference(seed):
+    a, b = pairs_of(seed)
+    expected = all(gnos <= naive(b).get(key, set()) for key, gnos in naive(a).items())
+    assert (a <= b) is expected
+    assert (a & b) <= a and (a & b) <= b
+    assert a <= (a | b) and (a - b) <= a
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_intervals_are_canonical(seed):
+    a, _ = pairs_of(seed)
+    for pairs in a.intervals.values():
+        assert all(start <= end for start, end in pairs)
+        # sorted, disjoint and non-adjacent
+        assert all(prev_end + 1 < start for (_, prev_end), (start, _) in zip(pairs, pairs[1:]))
+    assert GtidSet.parse(str(a)) == a
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_contains_matches_reference(seed):
+    a, _ = pairs_of(seed)
+    reference = naive(a)
+    for uuid, tag in KEYS:
+        for gno in range(1, 80):
+            assert a.contains(uuid, gno, tag) == (gno in reference.get((uuid, tag), set()))
+
+
+@pytest.mark.parametrize("a, b, union, subtract, intersect", [
+    # adjacent intervals coalesce
+    (f"{UUID_A}:1-5", f"{UUID_A}:6-10", f"{UUID_A}:1-10", f"{UUID_A}:1-5", ""),
+    # overlapping
+    (f"{UUID_A}:1-10", f"{UUID_A}:5-15", f"{UUID_A}:1-15", f"{UUID_A}:1-4", f"{UUID_A}:5-10"),
+    # hole punched in the middle
+    (f"{UUID_A}:1-10", f"{UUID_A}:4-6", f"{UUID_A}:1-10", f"{UUID_A}:1-3:7-10", f"{UUID_A}:4-6"),
+    # several UUIDs, one only on each side
+    (f"{UUID_A}:1-3,{UUID_B}:1-5", f"{UUID_B}:4-9,{UUID_C}:2",
+     f"{UUID_A}:1-3,{UUID_B}:1-9,{UUID_C}:2", f"{UUID_A}:1-3,{UUID_B}:1-3", f"{UUID_B}:4-5"),
+    # a tagged set is distinct from the untagged one
+    (f"{UUID_A}:1-5", f"{UUID_A}:blue:1-5", f"{UUID_A}:1-5,{UUID_A}:blue:1-5", f"{UUID_A}:1-5", ""),
+])
+def test_set_operations(a, b, union, subtract, intersect):
+    a, b = GtidSet.parse(a), GtidSet.parse(b)
+    assert str(a | b) == union
+    assert str(a - b) == subtract
+    assert str(a & b) == intersect
+
+
+@pytest.mark.parametrize("text", [
+    "not-a-uuid:1-5", f"{UUID_A}", f"{UUID_A}:0", f"{UUID_A}:5-3", f"{UUID_A}:1-x", f"{UUID_A}:Bad-Tag:1",
+])
+def test_parse_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        GtidSet.parse(text)
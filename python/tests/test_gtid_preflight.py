@@ -0,0 +1,63 @@
+"""gtid_preflight_decision(): one row per branch."""
+
+import pytest
+
+from mysql_replication_setup import GtidSet, gtid_preflight_decision
+
+SRC = "3e11fa47-71ca-11e1-9e33-c80aa9429562"
+OTHER = "4f22ab58-82db-22f2-af44-d91bb0530673"
+
+CASES = [
+    # (id, backup, replica gtid_executed, source gtid_executed, source gtid_purged,
+    #  action, gtid_purged to set, transactions to fetch)
+    ("backup-within-replica", f"{SRC}:1-100", f"{SRC}:1-100", f"{SRC}:1-150", f"{SRC}:1-50",
+     "ok", "", 50),
+    ("replica-ahead-of-backup", f"{SRC}:1-80", f"{SRC}:1-100", f"{SRC}:1-150", f"{SRC}:1-50",
+     "ok", "", 50),
+    ("backup-unknown", None, f"{SRC}:1-100", f"{SRC}:1-100", "",
+     "ok", "", 0),
+    ("empty-replica-is-seeded", f"{SRC}:1-100", "", f"{SRC}:1-150", f"{SRC}:1-50",
+     "seed", f"{SRC}:1-100", 50),
+    ("gap-is-appended", f"{SRC}:1-100", f"{SRC}:1-40", f"{SRC}:1-150", f"{SRC}:1-50",
+     "seed", f"+{SRC}:41-100", 50),
+    ("fragmented-backup", f"{SRC}:1-10:20-100", f"{SRC}:1-10", f"{SRC}:1-150", "",
+     "seed", f"+{SRC}:20-100", 59),
+    ("errant-on-replica", f"{SRC}:1-100", f"{SRC}:1-100,{OTHER}:1-3", f"{SRC}:1-150", "",
+     "refuse", "", 0),
+    ("backup-of-another-source", f"{OTHER}:1-100", "", f"{SRC}:1-150", "",
+     "refuse", "", 0),
+    ("backup-ahead-of-source", f"{SRC}:1-200", "", f"{SRC}:1-150", "",
+     "refuse", "", 0),
+    ("purged-on-source", f"{SRC}:1-100", f"{SRC}:1-100", f"{SRC}:1-150", f"{SRC}:1-120",
+     "refuse", "", 0),
+    ("purged-before-seed", f"{SRC}:1-100", "", f"{SRC}:1-150", f"{SRC}:1-101",
+     "refuse", "", 0),
+    ("purged-but-in-backup", f"{SRC}:1-100", "", f"{SRC}:1-150", f"{SRC}:1-100",
+     "seed", f"{SRC}:1-100", 50),
+]
+
+
+@pytest.mark.parametrize("backup, replica, source, purged, action, gtid_purged, to_fetch",
+                         [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_decision(backup, replica, source, purged, action, gtid_purged, to_fetch):
+    decision = gtid_preflight_decision(backup, replica, source, purged)
+    assert (decision.action, decision.gtid_purged, decision.to_fetch) == (action, gtid_purged, to_fetch)
+    assert decision.reason
+
+
+def test_refusal_names_the_errant_transactions():
+    decision = gtid_preflight_decision(f"{SRC}:1-100", f"{SRC}:1-100,{OTHER}:1-3", f"{SRC}:1-150", "")
+    assert f"{OTHER}:1-3" in decision.reason
+    assert "errant" in decision.reason
+
+
+def test_refusal_names_the_purged_transactions():
+    decision = gtid_preflight_decision(f"{SRC}:1-100", f"{SRC}:1-100", f"{SRC}:1-150", f"{SRC}:1-120")
+    assert f"{SRC}:101-120" in decision.reason
+    assert "newer backup" in decision.reason
+
+
+def test_accepts_gtid_sets():
+    decision = gtid_preflight_decision(GtidSet.parse(f"{SRC}:1-100"), GtidSet(),
+                                       GtidSet.parse(f"{SRC}:1-100"), GtidSet())
+    assert (decision.action, decision.gtid_purged, decision.to_fetch) == ("seed", f"{SRC}:1-100", 0)
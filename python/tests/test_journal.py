@@ -0,0 +1,130 @@
+"""Step journal: persistence, resume refusal on changed inputs, continue_run, invalidate."""
+
+import json
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (Config, StepJournal, WorkflowStep, get_journal,
+                                     journal_path, open_journal, run_workflow_dag)
+
+
+@pytest.fixture
+def backup(monkeypatch, tmp_path):
+    """A MEB image and a journal directory under tmp_path; returns the image path."""
+    image = tmp_path / "backup.mbi"
+    image.write_bytes(b"image")
+    monkeypatch.setattr(Config, "JOURNAL_DIR", str(tmp_path / "journal"))
+    monkeypatch.setattr(Config, "MYSQL_INSTANCE", "mysqld@replica 1")
+    monkeypatch.setattr(Config, "RESTORE_ENGINE", "meb")
+    monkeypatch.setattr(Config, "BACKUP_IMAGE", str(image))
+    monkeypatch.setattr(Config, "BACKUP_MANIFEST", "")
+    monkeypatch.setattr(script, "_journal", None)
+    return image
+
+
+def saved(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_journal_path_is_per_instance(backup, tmp_path):
+    assert journal_path() == str(tmp_path / "journal" / "mysqld_replica_1.journal.json")
+
+
+def test_every_change_is_persisted(backup):
+    journal = open_journal()
+    assert get_journal() is journal
+    journal.start("restore_backup")
+    journal.start("restore_backup", phase="apply_log")
+    journal.finish("restore_backup", 1.23456, phase="apply_log", lsn=42)
+    entry = saved(journal.path)["steps"]["restore_backup"]
+    assert entry["status"] == "started"
+    phase = entry["phases"]["apply_log"]
+    assert (phase["status"], phase["duration"], phase["artifacts"]) == ("done", 1.235, {"lsn": 42})
+    journal.fail("restore_backup", "copy-back failed")
+    reloaded = StepJournal.load(journal.path)
+    assert reloaded.status("restore_backup") == "failed"
+    assert reloaded.is_done("restore_backup", phase="apply_log")
+    assert not (backup.parent / "journal" / "mysqld_replica_1.journal.json.tmp").exists()
+
+
+def test_resume_continues_a_matching_run(backup):
+    first = open_journal()
+    first.start("stop_mysql")
+    first.finish("stop_mysql", 2.0)
+    resumed = open_journal(resume=True)
+    assert resumed.data["run_id"] == first.data["run_id"]
+    assert resumed.done_steps() == ["stop_mysql"]
+
+
+def test_resume_refuses_changed_inputs(backup, monkeypatch):
+    first = open_journal()
+    first.finish("stop_mysql", 2.0)
+    backup.write_bytes(b"a different, larger image")
+    monkeypatch.setattr(Config, "DATA_DIR", "/u02/data")
+    with pytest.raises(RuntimeError, match=r"inputs changed \(data_dir, source\)"):
+        open_journal(resume=True)
+    # The refused journal is left as it was
+    assert StepJournal.load(first.path).done_steps() == ["stop_mysql"]
+
+
+def test_continue_run_starts_over_when_inputs_changed(backup, monkeypatch):
+    first = open_journal()
+    first.finish("stop_mysql", 2.0)
+    monkeypatch.setattr(Config, "STAGED_RESTORE", not Config.STAGED_RESTORE)
+    fresh = open_journal(continue_run=True)
+    assert fresh.done_steps() == []
+    assert fresh.data["fingerprint"]["staged"] is Config.STAGED_RESTORE
+
+
+def test_continue_run_keeps_adding_to_a_matching_run(backup):
+    first = open_journal(continue_run=True)
+    first.finish("delete_data", 1.0)
+    second = open_journal(continue_run=True)
+    assert second.done_steps() == ["delete_data"]
+    second.finish("create_directories", 0.5)
+    assert sorted(StepJournal.load(first.path).done_steps()) == ["create_directories",
+                                                                 "delete_data"]
+
+
+def test_a_plain_run_starts_over(backup, caplog):
+    first = open_journal()
+    first.finish("stop_mysql", 2.0)
+    fresh = open_journal()
+    assert fresh.done_steps() == []
+    assert "did not complete" in caplog.text
+
+
+def test_invalidate_makes_a_resume_run_steps_again(backup):
+    journal = open_journal()
+    for name in ("stop_mysql", "swap_datadir", "start_mysql"):
+        journal.finish(name, 1.0)
+    journal.invalidate("swap_datadir", "start_mysql", "never_ran")
+    assert StepJournal.load(journal.path).done_steps() == ["stop_mysql"]
+
+    ran = []
+    steps = [WorkflowStep(name, lambda name=name: ran.append(name), deps)
+             for name, deps in (("stop_mysql", ()), ("swap_datadir", ("stop_mysql",)),
+                                ("start_mysql", ("swap_datadir",)))]
+    run_workflow_dag(steps, journal=open_journal(resume=True))
+    assert ran == ["swap_datadir", "start_mysql"]
+    assert steps[0].resumed and not steps[1].resumed
+
+
+def test_failed_step_is_recorded_and_rerun(backup):
+    journal = open_journal()
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("mysqld did not start")
+
+    steps = [WorkflowStep("start_mysql", flaky)]
+    with pytest.raises(RuntimeError):
+        run_workflow_dag(steps, journal=journal)
+    assert journal.data["steps"]["start_mysql"]["error"] == "mysqld did not start"
+    run_workflow_dag([WorkflowStep("start_mysql", flaky)], journal=open_journal(resume=True))
+    assert len(calls) == 2
+    assert "error" not in get_journal().data["steps"]["start_mysql"]
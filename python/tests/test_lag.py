@@ -0,0 +1,129 @@
+"""LagMonitor: sampling, rates, backlog, ETA and divergence."""
+
+import pytest
+
+from mysql_replication_setup import Config, LagMonitor, LagSample, SQLExecutor
+
+SOURCE = "3e11fa47-71ca-11e1-9e33-c80aa9429562"
+
+
+def sample(at, executed, source=None, retrieved=0, behind=0):
+    return LagSample(at=at, io_running="Yes", sql_running="Yes", seconds_behind=behind,
+                     retrieved=retrieved, executed=executed, source_executed=source,
+                     pending=None if source is None else source - executed)
+
+
+def monitor(*samples, ring_size=None):
+    lag = LagMonitor(replica=None, ring_size=ring_size)
+    lag.samples.extend(samples)
+    return lag
+
+
+class FakeExecutor(SQLExecutor):
+    """Answers each statement with the rows of the first key it contains."""
+
+    def __init__(self, answers):
+        super().__init__("127.0.0.1", 3306, "admin", "secret")
+        self.answers = answers
+
+    def execute_many(self, statements):
+        results = []
+        for statement in statements:
+            answer = next((rows for key, rows in self.answers.items() if key in statement), [])
+            if isinstance(answer, BaseException):
+                raise answer
+            results.append(answer)
+        return results
+
+
+def test_rates_with_source_counts():
+    lag = monitor(*(sample(t, executed=100 + 50 * t, source=1000 + 20 * t)
+                    for t in range(0, 61, 5)))
+    assert lag.rates(60) == (pytest.approx(50.0), pytest.approx(20.0))
+    # Only the last 10s of samples
+    assert lag.rates(10) == (pytest.approx(50.0), pytest.approx(20.0))
+    assert lag.backlog() == 1000 + 1200 - (100 + 3000)
+
+
+def test_rates_fall_back_to_retrieved_set():
+    lag = monitor(*(sample(t, executed=10 * t, retrieved=30 * t) for t in range(0, 31, 5)))
+    assert lag.rates(30) == (pytest.approx(10.0), pytest.approx(30.0))
+    # Growth of retrieved minus growth of executed since the first sample
+    assert lag.backlog() == 900 - 300
+
+
+def test_rates_need_two_samples():
+    assert monitor().rates() == (0.0, 0.0)
+    assert monitor(sample(0, 10, 20)).rates() == (0.0, 0.0)
+
+
+def test_eta_when_converging():
+    lag = monitor(sample(0, executed=0, source=6000), sample(60, executed=6000, source=9000))
+    # 3000 behind, closing at 100 - 50 = 50/s
+    assert lag.eta() == pytest.approx(60.0)
+
+
+def test_eta_none_when_not_converging():
+    lag = monitor(sample(0, executed=0, source=1000), sample(60, executed=600, source=2200))
+    assert lag.eta() is None
+
+
+def test_eta_zero_when_caught_up():
+    lag = monitor(sample(0, executed=500, source=500), sample(5, executed=500, source=500))
+    assert lag.eta() == 0.0
+    assert lag.is_caught_up()
+
+
+@pytest.mark.parametrize("behind, io, caught_up", [(0, "Yes", True), (None, "Yes", False),
+                                                   (Config.LAG_READY_SECONDS + 1, "Yes", False),
+                                                   (0, "Connecting", False)])
+def test_is_caught_up(behind, io, caught_up):
+    last = sample(5, executed=500, source=500, behind=behind)
+    last.io_running = io
+    assert monitor(sample(0, 500, 500), last).is_caught_up() is caught_up
+
+
+def test_is_diverging_over_a_full_window():
+    growing = [sample(t, executed=10 * t, source=1000 + 30 * t) for t in range(0, 61, 5)]
+    assert monitor(*growing).is_diverging(60)
+    # Less than 90% of the window observed: not enough to tell
+    assert not monitor(*growing[:10]).is_diverging(60)
+
+
+def test_catching_up_is_not_diverging():
+    shrinking = [sample(t, executed=30 * t, source=5000 + 10 * t) for t in range(0, 61, 5)]
+    assert not monitor(*shrinking).is_diverging(60)
+
+
+def test_ring_buffer_is_bounded():
+    lag = monitor(*(sample(t, executed=t, source=t) for t in range(100)), ring_size=10)
+    assert len(lag.samples) == 10 and lag.samples[0].at == 90
+
+
+def test_sample_reads_replica_and_source():
+    replica = FakeExecutor({
+        "SHOW REPLICA STATUS": [{"Replica_IO_Running": "Yes", "Replica_SQL_Running": "Yes",
+                                 "Seconds_Behind_Source": "12",
+                                 "Retrieved_Gtid_Set": f"{SOURCE}:1-150"}],
+        "gtid_executed": [{"gtid_executed": f"{SOURCE}:1-100"}],
+        "replication_applier_status_by_worker": [{"workers": "8", "busy": "3",
+                                                  "applier_lag": "1.5"}],
+    })
+    source = FakeExecutor({"gtid_executed": [{"gtid_executed": f"{SOURCE}:1-180"}]})
+    lag = LagMonitor(replica, source)
+    taken = lag.sample()
+    assert (taken.executed, taken.retrieved, taken.source_executed, taken.pending) == (
+        100, 150, 180, 80)
+    assert (taken.seconds_behind, taken.applier_lag, taken.workers, taken.busy_workers) == (
+        12, 1.5, 8, 3)
+    assert "backlog=       80 trx" in lag.format(taken)
+
+
+def test_unreachable_source_falls_back_to_retrieved():
+    replica = FakeExecutor({"gtid_executed": [{"gtid_executed": f"{SOURCE}:1-100"}]})
+    source = FakeExecutor({"gtid_executed": ConnectionRefusedError("source down")})
+    lag = LagMonitor(replica, source)
+    taken = lag.sample()
+    assert taken.pending is None and lag.source is None
+    assert (taken.io_running, taken.sql_running, taken.seconds_behind) == ("No", "No", None)
+    assert lag.backlog(lag.sample()) == 0
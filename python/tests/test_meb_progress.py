@@ -0,0 +1,106 @@
+"""mysqlbackup progress parsing and streaming, with tests/stubs/mysqlbackup."""
+
+import json
+import os
+import subprocess
+
+import pytest
+
+import mysql_replication_setup as setup
+from mysql_replication_setup import Config, MEBRestoreEngine, parse_meb_progress, stream_command
+
+STUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+MB = 1 << 20
+
+
+@pytest.fixture(autouse=True)
+def stub_path(monkeypatch):
+    monkeypatch.setenv("PATH", STUBS + os.pathsep + os.environ["PATH"])
+    monkeypatch.setattr(setup, "_needs_sudo", lambda: False)
+    monkeypatch.setattr(Config, "PROGRESS_INTERVAL", 0.1)
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("mysqlbackup: INFO: Progress: 191 of 1237 MB; state: Copying", (191 * MB, 1237 * MB)),
+    ("mysqlbackup: INFO: Progress: 0 of 12 GB; state: Applying", (0, 12 << 30)),
+    ("mysqlbackup: INFO: Progress: 1.5 of 2.25 gb; state: Copying", (3 << 29, 9 << 28)),
+    ("Progress: 512 of 4096 KB", (512 << 10, 4096 << 10)),
+    ("Progress:12 of 100 B", (12, 100)),
+    ("mysqlbackup: INFO: Copying /backups/ibdata1.", None),
+    ("mysqlbackup completed OK!", None),
+    ("", None),
+])
+def test_parse_meb_progress(line, expected):
+    assert parse_meb_progress(line) == expected
+
+
+def test_progress_events_carry_bytes_and_eta(monkeypatch):
+    monkeypatch.setenv("MEB_STUB_STEPS", "20")
+    events = []
+    returncode, output, _ = stream_command(["mysqlbackup", "copy-back-and-apply-log"], "Restore",
+                                           progress_parser=parse_meb_progress,
+                                           on_progress=events.append, interval=0.1)
+    assert returncode == 0
+    assert output.endswith("mysqlbackup completed OK!")
+    with_bytes = [event for event in events if event.bytes_done is not None]
+    assert len(with_bytes) >= 3
+    assert all(event.bytes_total == 1000 * MB for event in with_bytes)
+    done = [event.bytes_done for event in with_bytes]
+    assert done == sorted(done) and done[0] < done[-1]
+    for event in with_bytes:
+        assert event.throughput >= 0
+        if event.throughput:
+            assert event.eta == pytest.approx((event.bytes_total - event.bytes_done)
+                                              / event.throughput)
+        assert not event.stalled
+    assert any("ETA" in event.summary() for event in with_bytes)
+
+
+def test_stall_is_flagged(monkeypatch):
+    monkeypatch.setenv("MEB_STUB_STALL", "0.6")
+    monkeypatch.setattr(Config, "STALL_TIMEOUT", 0.3)
+    events = []
+    stream_command(["mysqlbackup", "apply-log"], "Apply log", progress_parser=parse_meb_progress,
+                   on_progress=events.append, interval=0.1)
+    # Output lines without progress during the pause do not count as progress
+    stalled = [event for event in events if event.stalled]
+    assert stalled
+    assert all(event.bytes_done == 400 * MB for event in stalled)
+    assert not events[-1].stalled
+
+
+def test_non_zero_exit_raises_with_output_tail(monkeypatch):
+    monkeypatch.setenv("MEB_STUB_EXIT", "3")
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        stream_command(["mysqlbackup", "copy-back"], "Copy back",
+                       progress_parser=parse_meb_progress, on_progress=lambda event: None)
+    assert error.value.returncode == 3
+    assert error.value.output.splitlines()[-2:] == [
+        "mysqlbackup: ERROR: Write failed: No space left on device",
+        "mysqlbackup failed with errors!"]
+
+
+def test_non_zero_exit_without_check(monkeypatch):
+    monkeypatch.setenv("MEB_STUB_EXIT", "1")
+    returncode, output, _ = stream_command(["mysqlbackup", "copy-back"], "Copy back",
+                                           on_progress=lambda event: None, check=False)
+    assert returncode == 1
+    assert "Progress: 500 of 1000 MB" in output
+
+
+def test_meb_engine_runs_mysqlbackup(monkeypatch, tmp_path):
+    argv_file = tmp_path / "argv.json"
+    monkeypatch.setenv("MEB_STUB_ARGV", str(argv_file))
+    monkeypatch.setattr(Config, "BACKUP_IMAGE", "/backups/ebackup.mbi")
+    monkeypatch.setattr(Config, "BACKUP_DIR", "/backups/tmp")
+    MEBRestoreEngine(datadir="/u01/data", binlog_dir="/u01/data/binlog").restore()
+    assert json.loads(argv_file.read_text()) == [
+        "--host=127.0.0.1", f"--port={Config.SECONDARY_PORT}", "--datadir=/u01/data",
+        "--log_bin=/u01/data/binlog/mysql-bin", "--backup-image=/backups/ebackup.mbi",
+        "--backup-dir=/backups/tmp", "--show-progress=stdout", "copy-back-and-apply-log"]
+
+
+def test_meb_engine_failure_propagates(monkeypatch):
+    monkeypatch.setenv("MEB_STUB_EXIT", "2")
+    with pytest.raises(subprocess.CalledProcessError):
+        MEBRestoreEngine(datadir="/u01/data", binlog_dir="/u01/data/binlog").apply_log()
@@ -0,0 +1,129 @@
+"""fix_ownership(): one parallel pass that chowns only what differs."""
+
+import os
+
+import pytest
+
+from mysql_replication_setup import Config, dedupe_roots, fix_ownership
+
+UID, GID = 4242, 4343
+
+needs_root = pytest.mark.skipif(os.geteuid() != 0, reason="chown to another user needs root")
+
+
+def make_datadir(root, files=10):
+    """A datadir with a schema directory, a nested binlog directory and a symlink."""
+    (root / "shop").mkdir(parents=True)
+    (root / "binlog").mkdir()
+    for i in range(files):
+        (root / "shop" / f"t{i}.ibd").write_bytes(b"x")
+    (root / "ibdata1").write_bytes(b"x")
+    (root / "binlog" / "mysql-bin.000001").write_bytes(b"x")
+    return root
+
+
+def entries(root):
+    """Every path under root, root included (symlinks not followed)."""
+    paths = [str(root)]
+    for path, dirs, files in os.walk(root):
+        paths += [os.path.join(path, name) for name in dirs + files]
+    return paths
+
+
+def owners(paths):
+    return {(os.lstat(path).st_uid, os.lstat(path).st_gid) for path in paths}
+
+
+@pytest.mark.parametrize("paths, roots", [
+    (["/u01/data", "/u01/data/binlog"], ["/u01/data"]),
+    (["/u01/data/", "/u01/data"], ["/u01/data"]),
+    (["/u01/data", "/u01/data2"], ["/u01/data", "/u01/data2"]),
+    (["/u01/binlog", "/u01/data"], ["/u01/binlog", "/u01/data"]),
+])
+def test_dedupe_roots(paths, roots):
+    assert dedupe_roots(paths) == roots
+
+
+@needs_root
+def test_changes_only_what_differs(tmp_path):
+    data = make_datadir(tmp_path / "data")
+    already = [str(data / "shop" / "t0.ibd"), str(data / "ibdata1")]
+    for path in already:
+        os.chown(path, UID, GID)
+    result = fix_ownership([str(data)], UID, GID, workers=4)
+    paths = entries(data)
+    assert owners(paths) == {(UID, GID)}
+    assert (result.scanned, result.changed, result.errors) == (len(paths),
+                                                               len(paths) - 2, 0)
+    # A second pass finds nothing to do
+    again = fix_ownership([str(data)], UID, GID, workers=4)
+    assert (again.scanned, again.changed) == (len(paths), 0)
+
+
+@needs_root
+def test_group_alone_differs(tmp_path):
+    data = make_datadir(tmp_path / "data", files=1)
+    fix_ownership([str(data)], UID, GID)
+    result = fix_ownership([str(data)], UID, GID + 1)
+    assert result.changed == len(entries(data))
+    assert owners(entries(data)) == {(UID, GID + 1)}
+
+
+@needs_root
+def test_nested_roots_are_walked_once(tmp_path):
+    data = make_datadir(tmp_path / "data")
+    result = fix_ownership([str(data / "binlog"), str(data)], UID, GID)
+    assert result.scanned == result.changed == len(entries(data))
+
+
+@needs_root
+def test_big_directories_are_chunked(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "PERMISSION_CHUNK", 3)
+    data = make_datadir(tmp_path / "data", files=100)
+    result = fix_ownership([str(data)], UID, GID, workers=8)
+    assert result.changed == len(entries(data)) == 100 + 5
+    assert owners(entries(data)) == {(UID, GID)}
+
+
+@needs_root
+def test_symlinks_are_chowned_not_followed(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "keep.ibd").write_bytes(b"x")
+    data = make_datadir(tmp_path / "data", files=1)
+    os.symlink(outside, data / "linked_dir")
+    os.symlink(outside / "keep.ibd", data / "linked_file")
+    fix_ownership([str(data)], UID, GID)
+    assert owners([data / "linked_dir", data / "linked_file"]) == {(UID, GID)}
+    assert owners([outside, outside / "keep.ibd"]) == {(os.getuid(), os.getgid())}
+
+
+@needs_root
+def test_a_root_that_is_a_file(tmp_path):
+    path = tmp_path / "mysql-bin.index"
+    path.write_bytes(b"x")
+    result = fix_ownership([str(path)], UID, GID)
+    assert (result.scanned, result.changed) == (1, 1)
+
+
+def test_errors_are_counted_and_the_pass_continues(tmp_path, monkeypatch):
+    data = make_datadir(tmp_path / "data", files=3)
+    chown, failed = os.chown, str(data / "shop" / "t1.ibd")
+
+    def flaky_chown(path, uid, gid, follow_symlinks=True):
+        assert follow_symlinks is False
+        if path == failed:
+            raise PermissionError(1, "Operation not permitted", path)
+        chown(path, os.getuid(), os.getgid(), follow_symlinks=False)
+
+    monkeypatch.setattr(os, "chown", flaky_chown)
+    result = fix_ownership([str(data)], UID, GID)
+    assert result.errors == 1
+    assert result.scanned == len(entries(data))
+    assert result.changed == len(entries(data)) - 1
+    assert "errors 1" in result.summary()
+
+
+def test_missing_root_is_an_error(tmp_path):
+    result = fix_ownership([str(tmp_path / "missing")], UID, GID)
+    assert (result.scanned, result.errors) == (1, 1)
@@ -0,0 +1,185 @@
+"""Throttled deletion: the token bucket, purge_tree() and tombstones."""
+
+import os
+import types
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (Config, RateLimiter, delete_data_directory, purge_tombstones,
+                                     purge_tree, tombstones_of)
+
+MB = 1 << 20
+
+
+class Clock:
+    """Fake monotonic clock; sleep() advances it and records the delay."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(script, "time", types.SimpleNamespace(monotonic=clock.monotonic,
+                                                              sleep=clock.sleep))
+    return clock
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    """Unthrottled purge with 1MB truncate steps; returns a setter."""
+    monkeypatch.setattr(Config, "USE_SUDO", False)
+    monkeypatch.setattr(Config, "DELETE_TRUNCATE_STEP", MB)
+
+    def set_limits(bytes_per_sec=0, ops_per_sec=0):
+        monkeypatch.setattr(Config, "DELETE_BYTES_PER_SEC", bytes_per_sec)
+        monkeypatch.setattr(Config, "DELETE_OPS_PER_SEC", ops_per_sec)
+    set_limits()
+    return set_limits
+
+
+def make_tree(root, sizes):
+    """Create files {relative path: size} (sparse) under root."""
+    for name, size in sizes.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.truncate(size)
+    return root
+
+
+def test_rate_limiter_burst_then_rate(clock):
+    limiter = RateLimiter(10)
+    for _ in range(10):                     # A full bucket passes without waiting
+        limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire(5)
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_rate_limiter_average_rate(clock):
+    limiter = RateLimiter(100)
+    start = clock.now
+    for _ in range(50):
+        limiter.acquire(10)
+    # 500 units at 100/s, less the initial burst of 100
+    assert clock.now - start == pytest.approx(4.0)
+
+
+def test_rate_limiter_refills_while_idle(clock):
+    limiter = RateLimiter(10)
+    limiter.acquire(10)
+    clock.now += 100                        # Idle time refills, but only up to the rate
+    limiter.acquire(10)
+    assert clock.sleeps == []
+    limiter.acquire(10)
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_rate_limiter_zero_is_unlimited(clock):
+    limiter = RateLimiter(0)
+    limiter.acquire(1 << 40)
+    assert clock.sleeps == []
+
+
+def test_purge_tree_truncates_big_files(tmp_path, limits):
+    tree = make_tree(tmp_path / "data", {"ibdata1": 3 * MB + 100, "db/t1.ibd": 5 * MB,
+                                        "db/t1.frm": 100, "empty/.keep": 0})
+    result = purge_tree(str(tree), on_progress=lambda event: None)
+    assert not tree.exists()
+    assert (result.files, result.dirs, result.errors) == (4, 3, 0)
+    assert result.bytes == 8 * MB + 200
+    # 3 steps for ibdata1 (100 bytes left to unlink), 4 for t1.ibd (the last 1MB is unlinked)
+    assert result.truncations == 3 + 4
+
+
+def test_purge_tree_hard_links_are_only_unlinked(tmp_path, limits):
+    tree = make_tree(tmp_path / "data", {"t1.ibd": 4 * MB})
+    os.link(tree / "t1.ibd", tmp_path / "kept.ibd")
+    result = purge_tree(str(tree), on_progress=lambda event: None)
+    assert (result.truncations, result.bytes) == (0, 0)
+    assert os.path.getsize(tmp_path / "kept.ibd") == 4 * MB
+
+
+def test_purge_tree_does_not_follow_symlinks(tmp_path, limits):
+    outside = make_tree(tmp_path / "outside", {"keep.ibd": 2 * MB})
+    tree = make_tree(tmp_path / "data", {"t1.ibd": 10})
+    os.symlink(outside, tree / "linked_dir")
+    os.symlink(outside / "keep.ibd", tree / "linked_file")
+    purge_tree(str(tree), on_progress=lambda event: None)
+    assert not tree.exists()
+    assert os.path.getsize(outside / "keep.ibd") == 2 * MB
+
+
+def test_purge_tree_bytes_limit(tmp_path, limits, clock):
+    limits(bytes_per_sec=2 * MB)
+    tree = make_tree(tmp_path / "data", {"t1.ibd": 8 * MB})
+    events = []
+    purge_tree(str(tree), on_progress=events.append, interval=1)
+    # 8MB at 2MB/s after a 2MB burst
+    assert sum(clock.sleeps) == pytest.approx(3.0)
+    assert events and events[-1].bytes_total == 8 * MB
+    done = [event.bytes_done for event in events]
+    assert done == sorted(done) and done[-1] <= 8 * MB
+
+
+def test_purge_tree_ops_limit(tmp_path, limits, clock):
+    limits(ops_per_sec=10)
+    tree = make_tree(tmp_path / "data", {f"db/t{i}.frm": 10 for i in range(29)})
+    result = purge_tree(str(tree), on_progress=lambda event: None)
+    # 29 unlinks and 2 rmdirs, the first 10 from the full bucket
+    assert (result.files, result.dirs) == (29, 2)
+    assert sum(clock.sleeps) == pytest.approx(2.1)
+
+
+def test_purge_tree_keeps_going_after_errors(tmp_path, limits, monkeypatch):
+    tree = make_tree(tmp_path / "data", {"a.ibd": 10, "b.ibd": 10})
+    unlink = os.unlink
+
+    def flaky_unlink(path):
+        if path.endswith("a.ibd"):
+            raise PermissionError(13, "Permission denied", path)
+        unlink(path)
+
+    monkeypatch.setattr(script.os, "unlink", flaky_unlink)
+    result = purge_tree(str(tree), on_progress=lambda event: None)
+    # a.ibd stays, so its directory cannot be removed either
+    assert (result.files, result.errors) == (1, 2)
+    assert os.listdir(tree) == ["a.ibd"]
+
+
+def test_delete_renames_to_a_tombstone_and_purges_it(tmp_path, limits, monkeypatch):
+    data = make_tree(tmp_path / "data", {"ibdata1": 2 * MB, "db/t1.ibd": 10})
+    monkeypatch.setattr(Config, "DATA_DIR", str(data))
+    monkeypatch.setattr(Config, "BINLOG_DIR", str(tmp_path / "binlog"))
+    monkeypatch.setattr(Config, "DELETE_TOMBSTONE", True)
+    # Left over by an interrupted earlier run
+    earlier = make_tree(tmp_path / "data.deleting-20260101120000", {"ibdata1": 10})
+
+    delete_data_directory()
+    assert not data.exists()
+    tombstones = tombstones_of(str(data))
+    assert len(tombstones) == 2 and str(earlier) in tombstones
+    assert sorted(os.listdir(tombstones[-1])) == ["db", "ibdata1"]
+
+    purge_tombstones()
+    assert tombstones_of(str(data)) == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_delete_without_tombstone_purges_in_place(tmp_path, limits, monkeypatch):
+    data = make_tree(tmp_path / "data", {"ibdata1": 2 * MB})
+    monkeypatch.setattr(Config, "DATA_DIR", str(data))
+    monkeypatch.setattr(Config, "DELETE_TOMBSTONE", False)
+    delete_data_directory()
+    assert os.listdir(tmp_path) == []
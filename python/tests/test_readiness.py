@@ -0,0 +1,128 @@
+"""Readiness polling against a real listener on 127.0.0.1."""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from mysql_replication_setup import (Config, port_closed, port_open, wait_for,
+                                     wait_for_mysql_ready, wait_for_mysql_stopped)
+
+HOST = "127.0.0.1"
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "POLL_INITIAL_INTERVAL", 0.02)
+    monkeypatch.setattr(Config, "POLL_MAX_INTERVAL", 0.1)
+    monkeypatch.setattr(Config, "CONNECT_TIMEOUT", 1)
+    monkeypatch.setattr(Config, "READY_CHECKS", ["pid_file", "port"])
+    monkeypatch.setattr(Config, "PID_FILE", str(tmp_path / "mysqld.pid"))
+    monkeypatch.setattr(Config, "SOCKET_FILE", str(tmp_path / "mysql.sock"))
+
+
+def listener(port=0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, port))
+    sock.listen(8)
+    return sock
+
+
+def free_port():
+    with listener() as sock:
+        return sock.getsockname()[1]
+
+
+def later(delay, action):
+    """Run action in delay seconds; join the returned thread."""
+    thread = threading.Timer(delay, action)
+    thread.start()
+    return thread
+
+
+def test_listener_present():
+    with listener() as sock:
+        port = sock.getsockname()[1]
+        assert port_open(HOST, port)()
+        assert not port_closed(HOST, port)()
+        open(Config.PID_FILE, "w").close()
+        assert wait_for_mysql_ready(HOST, port, timeout=2) < 1
+
+
+def test_no_listener():
+    port = free_port()
+    assert not port_open(HOST, port)()
+    assert port_closed(HOST, port)()
+
+
+def test_listener_appears_late():
+    port = free_port()
+    sockets = []
+    threads = [later(0.3, lambda: open(Config.PID_FILE, "w").close()),
+               later(0.6, lambda: sockets.append(listener(port)))]
+    try:
+        waited = wait_for_mysql_ready(HOST, port, timeout=5)
+        assert 0.5 <= waited < 5
+    finally:
+        for thread in threads:
+            thread.join()
+        for sock in sockets:
+            sock.close()
+
+
+def test_listener_never_appears():
+    port = free_port()
+    open(Config.PID_FILE, "w").close()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError, match=f"port {port}"):
+        wait_for_mysql_ready(HOST, port, timeout=0.5)
+    assert time.monotonic() - start < 2
+
+
+def test_timeout_is_shared_between_checks():
+    port = free_port()
+    timeout = 1.0
+    # The pid file check uses up ~60% of the timeout; the port check gets the rest
+    thread = later(0.6 * timeout, lambda: open(Config.PID_FILE, "w").close())
+    start = time.monotonic()
+    try:
+        with pytest.raises(TimeoutError, match=f"port {port}"):
+            wait_for_mysql_ready(HOST, port, timeout=timeout)
+        elapsed = time.monotonic() - start
+    finally:
+        thread.join()
+    # One overall deadline: a fresh timeout per check would take 1.6s
+    assert timeout * 0.9 <= elapsed < timeout * 1.3
+
+
+def test_stopped_once_listener_closes():
+    sock = listener()
+    port = sock.getsockname()[1]
+    thread = later(0.3, sock.close)
+    try:
+        waited = wait_for_mysql_stopped(HOST, port, timeout=5)
+        assert 0.2 <= waited < 5
+    finally:
+        thread.join()
+        sock.close()
+
+
+def test_stop_times_out_while_listening():
+    with listener() as sock:
+        with pytest.raises(TimeoutError, match="closed"):
+            wait_for_mysql_stopped(HOST, sock.getsockname()[1], timeout=0.3)
+
+
+def test_failing_condition_counts_as_not_yet():
+    calls = []
+
+    def condition():
+        calls.append(None)
+        if len(calls) < 3:
+            raise OSError("not yet")
+        return True
+
+    wait_for(condition, "flaky", timeout=2)
+    assert len(calls) == 3
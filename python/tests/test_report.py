@@ -0,0 +1,120 @@
+"""Run report: JSONL records, the printed summary and the Prometheus textfile."""
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (Config, RunReport, instrument_step, load_run_report,
+                                     print_run_report, run_command, write_prometheus_textfile)
+
+
+def usage(cpu_user=0.0, cpu_sys=0.0, max_rss_kb=0, bytes_read=0, bytes_written=0, wall=0.0):
+    return {"wall": wall, "cpu_user": cpu_user, "cpu_sys": cpu_sys, "max_rss_kb": max_rss_kb,
+            "inblock": bytes_read // 512, "oublock": bytes_written // 512,
+            "bytes_read": bytes_read, "bytes_written": bytes_written}
+
+
+RECORDS = [
+    {"type": "step", "name": "stop_mysql", "status": "ok", "start": 0.0, "wall": 10.0,
+     "self": usage(0.1, 0.1), "children": usage(0.2, 0.1, max_rss_kb=2048)},
+    {"type": "command", "step": "stop_mysql", "description": "Stopping MySQL instance",
+     "command": "systemctl stop mysqld@mysql1", "returncode": 0, "start": 0.5,
+     **usage(0.2, 0.1, max_rss_kb=2048, wall=9.0)},
+    {"type": "step", "name": "restore_backup", "status": "failed", "start": 10.0, "wall": 30.0,
+     "self": usage(1.0, 0.5, bytes_written=1024),
+     "children": usage(20.0, 5.0, max_rss_kb=512 << 10, bytes_read=1 << 30,
+                       bytes_written=3 << 30)},
+    {"type": "command", "step": "restore_backup", "description": "Restoring backup",
+     "command": "mysqlbackup copy-back-and-apply-log", "returncode": 1, "start": 10.0,
+     **usage(20.0, 5.0, max_rss_kb=512 << 10, bytes_written=3 << 30, wall=30.0)},
+    {"type": "command", "step": None, "description": "Checking sudo", "command": "sudo -n true",
+     "returncode": 0, "start": 0.0, **usage(wall=0.1)},
+    {"type": "run", "status": "failed", "wall": 40.0, "ts": 1760000000.0,
+     "self": usage(2.0, 1.0, bytes_written=1024), "children": usage(25.0, 5.5)},
+]
+
+
+@pytest.fixture
+def target(monkeypatch):
+    monkeypatch.setattr(Config, "MYSQL_INSTANCE", "mysqld@mysql1")
+    monkeypatch.setattr(Config, "SECONDARY_HOST", "db2")
+
+
+def test_print_run_report(capsys):
+    print_run_report(RECORDS, width=8)
+    lines = capsys.readouterr().out.splitlines()
+    rows = {line.split()[0]: line for line in lines if line.startswith("  ") and "█" in line}
+    # 0-10s of 40s and 10-40s on an 8-cell timeline
+    assert "██······" in rows["stop_mysql"]
+    assert "··██████" in rows["restore_backup"]
+    assert "restore_backup ✗" in rows["restore_backup"]
+    assert "26.5s" in rows["restore_backup"] and "512.0MiB" in rows["restore_backup"]
+    assert "3.0GiB" in rows["restore_backup"]
+    restore = next(i for i, line in enumerate(lines) if "restore_backup" in line)
+    assert "└ Restoring backup" in lines[restore + 1]
+    outside = lines.index("  (outside steps)")
+    assert "└ Checking sudo" in lines[outside + 1]
+    assert lines[-1] == ("  Run failed: 40.0s wall, 3.0s CPU in this process, "
+                         "30.5s in commands, 1.0KiB written")
+
+
+def test_print_run_report_without_run_record(capsys):
+    print_run_report(RECORDS[:2])
+    out = capsys.readouterr().out
+    assert "Timeline (0 - 10s)" in out and "Run " not in out
+
+
+def test_prometheus_textfile(tmp_path, target):
+    path = tmp_path / "mysql_rebuild.prom"
+    write_prometheus_textfile(str(path), RECORDS)
+    lines = path.read_text().splitlines()
+    labels = 'instance="mysqld@mysql1",host="db2"'
+    assert "# TYPE mysql_rebuild_step_seconds gauge" in lines
+    assert f'mysql_rebuild_step_seconds{{{labels},step="restore_backup"}} 30.0' in lines
+    assert f'mysql_rebuild_step_success{{{labels},step="restore_backup"}} 0' in lines
+    assert f'mysql_rebuild_step_success{{{labels},step="stop_mysql"}} 1' in lines
+    assert (f'mysql_rebuild_step_cpu_seconds{{{labels},step="restore_backup",mode="user"}} 21.0'
+            in lines)
+    assert (f'mysql_rebuild_step_written_bytes{{{labels},step="restore_backup"}} '
+            f'{(3 << 30) + 1024}' in lines)
+    assert f'mysql_rebuild_step_max_rss_bytes{{{labels},step="stop_mysql"}} 2097152' in lines
+    assert f"mysql_rebuild_run_success{{{labels}}} 0" in lines
+    assert f"mysql_rebuild_run_timestamp_seconds{{{labels}}} 1760000000.0" in lines
+    # Commands are not exported; every sample has HELP and TYPE lines
+    assert not any("Restoring" in line for line in lines)
+    names = {line.split("{")[0] for line in lines if not line.startswith("#")}
+    assert all(f"# TYPE {name} gauge" in lines for name in names)
+    assert not (tmp_path / "mysql_rebuild.prom.tmp").exists()
+
+
+def test_prometheus_labels_are_escaped(tmp_path, target, monkeypatch):
+    monkeypatch.setattr(Config, "MYSQL_INSTANCE", 'my"sql\\1')
+    path = tmp_path / "out.prom"
+    write_prometheus_textfile(str(path), RECORDS[:1])
+    assert 'instance="my\\"sql\\\\1"' in path.read_text()
+    assert "mysql_rebuild_run_seconds" not in path.read_text()
+
+
+def test_run_report_end_to_end(tmp_path, target, monkeypatch):
+    """Commands and steps of a real run end up in the JSONL file and the textfile."""
+    monkeypatch.setattr(Config, "USE_SUDO", False)
+    monkeypatch.setattr(Config, "PROMETHEUS_TEXTFILE", str(tmp_path / "rebuild.prom"))
+    report = RunReport(str(tmp_path / "reports" / "run.jsonl"))
+    monkeypatch.setattr(script, "_report", report)
+    with instrument_step("create_directories"):
+        run_command(["mkdir", "-p", str(tmp_path / "data")], "Creating data directory")
+    with pytest.raises(RuntimeError):
+        with instrument_step("restore_backup"):
+            raise RuntimeError("backup image truncated")
+    report.finish("failed")
+
+    records = load_run_report(report.path)
+    assert [r["type"] for r in records] == ["command", "step", "step", "run"]
+    command, created, restore, run = records
+    assert (command["step"], command["returncode"]) == ("create_directories", 0)
+    assert command["command"].startswith("mkdir -p")
+    assert created["status"] == "ok" and restore["status"] == "failed"
+    assert created["children"]["wall"] == command["wall"]
+    assert (run["status"], run["instance"], run["host"]) == ("failed", "mysqld@mysql1", "db2")
+    prom = (tmp_path / "rebuild.prom").read_text()
+    assert 'mysql_rebuild_step_success{instance="mysqld@mysql1",host="db2",' \
+           'step="restore_backup"} 0' in prom
@@ -0,0 +1,134 @@
+"""Workflow DAG scheduler: ordering, concurrency, failure handling, critical path."""
+
+import threading
+import time
+
+import pytest
+
+from mysql_replication_setup import (WorkflowStep, _topological_order, critical_path,
+                                     run_workflow_dag, summarize_workflow)
+
+
+def step(name, *depends_on, func=None):
+    return WorkflowStep(name, func or (lambda: None), tuple(depends_on))
+
+
+def names(steps):
+    return [s.name for s in steps]
+
+
+def test_topological_order():
+    steps = [step("configure", "start", "probe"), step("start", "restore"),
+             step("restore", "wipe_a", "wipe_b"), step("wipe_a", "stop"),
+             step("wipe_b", "stop"), step("stop"), step("probe")]
+    order = names(_topological_order(steps))
+    assert sorted(order) == sorted(names(steps))
+    for s in steps:
+        assert all(order.index(dep) < order.index(s.name) for dep in s.depends_on)
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([step("a", "b"), step("b", "a")], r"cycle between steps: \['a', 'b'\]"),
+    ([step("a", "a")], "cycle"),
+    ([step("root"), step("a", "root", "c"), step("b", "a"), step("c", "b")],
+     r"cycle between steps: \['a', 'b', 'c'\]"),
+    ([step("a", "missing")], "'a' depends on unknown step 'missing'"),
+    ([step("a"), step("a")], "Duplicate step names"),
+])
+def test_bad_graphs_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=message):
+        _topological_order(steps)
+
+
+def test_bad_graph_runs_nothing():
+    ran = []
+    with pytest.raises(ValueError):
+        run_workflow_dag([step("a", func=lambda: ran.append("a")), step("b", "c")])
+    assert ran == []
+
+
+def test_independent_steps_run_concurrently():
+    """Two steps that each wait for the other can only finish if they overlap."""
+    barrier = threading.Barrier(2, timeout=5)
+    steps = [step("stop"), step("wipe_a", "stop", func=barrier.wait),
+             step("wipe_b", "stop", func=barrier.wait), step("restore", "wipe_a", "wipe_b")]
+    run_workflow_dag(steps, max_workers=4)
+    by_name = {s.name: s for s in steps}
+    assert by_name["wipe_a"].started < by_name["wipe_b"].finished
+    assert by_name["wipe_b"].started < by_name["wipe_a"].finished
+    assert by_name["restore"].started >= max(by_name["wipe_a"].finished,
+                                             by_name["wipe_b"].finished)
+
+
+def test_max_workers_one_is_serial():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    run_workflow_dag([step(f"s{i}", func=work) for i in range(4)], max_workers=1)
+    assert peak[0] == 1
+
+
+def test_failure_stops_scheduling_and_skips_dependents():
+    ran = []
+    release = threading.Event()
+
+    def fail():
+        raise RuntimeError("restore failed")
+
+    def slow():
+        release.wait(5)
+        ran.append("probe")
+
+    def record(name):
+        return lambda: ran.append(name)
+
+    steps = [step("restore", func=fail), step("probe", func=slow),
+             step("start", "restore", func=record("start")),
+             step("late", "probe", func=record("late"))]
+    threading.Timer(0.2, release.set).start()
+    with pytest.raises(RuntimeError, match="restore failed"):
+        run_workflow_dag(steps, max_workers=4)
+    # The running probe finishes; nothing new starts after the failure
+    assert ran == ["probe"]
+    by_name = {s.name: s for s in steps}
+    assert not by_name["start"].started and not by_name["late"].started
+
+
+def test_critical_path_follows_the_dependency_waited_for():
+    steps = [step("stop"), step("wipe_binlog", "stop"), step("wipe_data", "stop"),
+             step("restore", "wipe_binlog", "wipe_data"), step("probe"),
+             step("configure", "restore", "probe")]
+    timings = {"stop": (0, 1), "wipe_binlog": (1, 2), "wipe_data": (1, 5),
+               "restore": (5, 9), "probe": (0, 3), "configure": (9, 10)}
+    for s in steps:
+        s.started, s.finished = (100 + t for t in timings[s.name])
+    assert names(critical_path(steps)) == ["stop", "wipe_data", "restore", "configure"]
+    summary = summarize_workflow(steps)
+    assert summary["wall"] == 10
+    assert summary["critical_path_time"] == 1 + 4 + 4 + 1
+    assert summary["steps"]["probe"] == {"start": 0, "duration": 3, "resumed": False}
+
+
+def test_critical_path_stops_at_steps_that_did_not_run():
+    steps = [step("a"), step("b", "a"), step("c", "b")]
+    steps[1].started, steps[1].finished = 1.0, 2.0
+    steps[2].started, steps[2].finished = 2.0, 4.0
+    assert names(critical_path(steps)) == ["b", "c"]
+    assert critical_path([step("x")]) == []
+
+
+def test_run_workflow_dag_critical_path():
+    steps = [step("short", func=lambda: time.sleep(0.01)),
+             step("long", func=lambda: time.sleep(0.15)),
+             step("last", "short", "long")]
+    wall = run_workflow_dag(steps, max_workers=2)
+    assert names(critical_path(steps)) == ["long", "last"]
+    assert wall >= 0.15
@@ -0,0 +1,195 @@
+"""Slow query log digest: fingerprints, sketches and byte-range splitting."""
+
+import random
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (Config, QuantileSketch, digest_slow_log,
+                                     digest_slow_log_range, digest_slow_log_step,
+                                     fingerprint_query, print_slow_log_digest)
+
+HEADER = """/usr/sbin/mysqld, Version: 8.0.36 (MySQL Community Server - GPL). started with:
+Tcp port: 3306  Unix socket: /var/lib/mysql/mysql.sock
+Time                 Id Command    Argument
+"""
+
+
+def entry(statement, query_time, lock_time=0.0, rows_sent=1, rows_examined=10, db=None):
+    use = f"use {db};\n" if db else ""
+    return (f"# Time: 2024-05-01T10:00:00.000000Z\n"
+            f"# User@Host: app[app] @  [10.0.0.5]  Id:    42\n"
+            f"# Query_time: {query_time:.6f}  Lock_time: {lock_time:.6f} "
+            f"Rows_sent: {rows_sent}  Rows_examined: {rows_examined}\n"
+            f"{use}SET timestamp=1714557600;\n{statement}\n")
+
+
+def write_log(path, entries):
+    path.write_text(HEADER + "".join(entries))
+    return str(path)
+
+
+def workload(count=600, seed=7):
+    """Three fingerprints with known totals; returns (entries, expected counts)."""
+    rng = random.Random(seed)
+    entries, counts = [], {}
+    for i in range(count):
+        kind = rng.choice(("point", "range", "insert"))
+        counts[kind] = counts.get(kind, 0) + 1
+        if kind == "point":
+            statement = f"SELECT * FROM orders WHERE id = {i};"
+        elif kind == "range":
+            statement = f"SELECT id,\n  total FROM orders\n  WHERE id IN ({i}, {i + 1}, {i + 2});"
+        else:
+            statement = f"INSERT INTO audit VALUES ({i}, 'note {i}'), ({i + 1}, 'x');"
+        entries.append(entry(statement, (i % 10 + 1) / 10, db="shop"))
+    return entries, counts
+
+
+FINGERPRINTS = {
+    "point": "select * from orders where id = ?",
+    "range": "select id, total from orders where id in (?+)",
+    "insert": "insert into audit values (?+)",
+}
+
+
+@pytest.mark.parametrize("statement, fingerprint", [
+    ("SELECT * FROM t1 WHERE id IN (1, 2,3) AND name = 'x' /* app */;",
+     "select * from t1 where id in (?+) and name = ?"),
+    ("select 'it''s', \"a \\\" b\", 0xFF, 1.5e3 -- trailing\n from dual",
+     "select ?, ?, ?, ? from dual"),
+    ("INSERT INTO t VALUES (1, 'a'), (2, 'b');", "insert into t values (?+)"),
+    ("UPDATE   t\n\tSET  v = v + 1 # comment\nWHERE k = 42", "update t set v = v + ? where k = ?"),
+    ("SELECT c1 FROM t2", "select c1 from t2"),
+])
+def test_fingerprint_query(statement, fingerprint):
+    assert fingerprint_query(statement) == fingerprint
+
+
+def test_sketch_quantiles_within_accuracy():
+    rng = random.Random(1)
+    values = sorted(rng.lognormvariate(0, 2) for _ in range(20000))
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=QuantileSketch.ACCURACY * 1.01)
+    assert len(sketch.buckets) < 2000
+
+
+def test_sketch_merge_and_zeros():
+    left, right = QuantileSketch(), QuantileSketch()
+    for value in (0.0, 0.0, 1.0):
+        left.add(value)
+    for value in (2.0, 4.0):
+        right.add(value)
+    left.merge(right)
+    assert (left.count, left.zeros) == (5, 2)
+    assert left.quantile(0.0) == 0.0
+    assert left.quantile(1.0) == pytest.approx(4.0, rel=0.01)
+    assert QuantileSketch().quantile(0.5) == 0.0
+
+
+def test_digest_groups_by_fingerprint(tmp_path):
+    entries, counts = workload()
+    path = write_log(tmp_path / "slow.log", entries)
+    digest = digest_slow_log(path)
+    assert digest.entries == 600
+    assert {kind: digest.queries[fp].count for kind, fp in FINGERPRINTS.items()} == counts
+    point = digest.queries[FINGERPRINTS["point"]]
+    assert point.db == "shop" and point.max_time == pytest.approx(1.0)
+    assert point.sample.startswith("SELECT * FROM orders WHERE id = ")
+    assert point.rows_examined == 10 * point.count
+    assert point.times.quantile(0.99) == pytest.approx(1.0, rel=0.01)
+
+
+def test_metrics_are_parsed(tmp_path):
+    path = write_log(tmp_path / "slow.log", [
+        entry("SELECT SLEEP(2);", 2.000135, lock_time=0.25, rows_sent=1, rows_examined=0),
+        entry("SELECT SLEEP(1);", 1.0, rows_sent=3, rows_examined=7),
+    ])
+    digest = digest_slow_log(path).queries["select sleep(?)"]
+    assert (digest.count, digest.rows_sent, digest.rows_examined) == (2, 4, 7)
+    assert digest.query_time == pytest.approx(3.000135)
+    assert digest.lock_time == pytest.approx(0.25)
+    assert digest.sample == "SELECT SLEEP(2);" and digest.db == ""
+
+
+def test_entries_without_metrics_or_statement_are_skipped(tmp_path):
+    no_metrics = "# User@Host: app[app] @  [10.0.0.5]  Id:    42\nSELECT 1;\n"
+    no_statement = entry("", 0.5).rstrip("\n") + "\n"
+    path = write_log(tmp_path / "slow.log", [entry("SELECT 2;", 0.5), no_metrics, no_statement])
+    assert digest_slow_log(path).entries == 1
+
+
+@pytest.mark.parametrize("cuts", [1, 2, 3, 7, 50])
+def test_ranges_see_every_entry_once(tmp_path, cuts):
+    entries, counts = workload(200)
+    path = write_log(tmp_path / "slow.log", entries)
+    size = (tmp_path / "slow.log").stat().st_size
+    bounds = [size * i // cuts for i in range(cuts + 1)]
+    parts = [digest_slow_log_range(path, start, end) for start, end in zip(bounds, bounds[1:])]
+    assert sum(part.entries for part in parts) == 200
+    assert sum(part.bytes for part in parts) == size
+    for kind, fp in FINGERPRINTS.items():
+        assert sum(part.queries[fp].count for part in parts if fp in part.queries) == counts[kind]
+
+
+def test_parallel_digest_matches_serial(tmp_path, monkeypatch):
+    entries, _ = workload(2000)
+    path = write_log(tmp_path / "slow.log", entries)
+    serial = digest_slow_log(path, workers=1)
+    monkeypatch.setattr(Config, "SLOW_LOG_CHUNK_BYTES", 4096)
+    parallel = digest_slow_log(path, workers=4)
+    assert parallel.entries == serial.entries == 2000
+    assert parallel.bytes == serial.bytes
+    for fp, digest in serial.queries.items():
+        other = parallel.queries[fp]
+        assert (other.count, other.rows_examined) == (digest.count, digest.rows_examined)
+        assert other.query_time == pytest.approx(digest.query_time)
+        assert other.times.buckets == digest.times.buckets
+
+
+def test_fingerprints_beyond_the_limit_are_pooled(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SLOW_LOG_MAX_FINGERPRINTS", 3)
+    path = write_log(tmp_path / "slow.log",
+                     [entry(f"SELECT * FROM t{i} WHERE id = 1;", 0.1) for i in range(10)])
+    digest = digest_slow_log(path)
+    assert len(digest.queries) == 4
+    assert digest.queries["(other fingerprints)"].count == 7
+
+
+def test_print_ranks_by_total_time(tmp_path, capsys):
+    path = write_log(tmp_path / "slow.log", [entry("SELECT 1;", 0.1)] * 50
+                     + [entry("SELECT * FROM big;", 9.0, db="shop")])
+    print_slow_log_digest(digest_slow_log(path), limit=1)
+    out = capsys.readouterr().out
+    assert "51 queries, 2 fingerprints" in out
+    ranked = [line for line in out.splitlines() if line.strip().startswith("1 ")]
+    assert len(ranked) == 1 and ranked[0].endswith("select * from big")
+    assert "#1 (shop) slowest (9.000s" in out and "select ?" not in out
+
+
+def test_step_reads_the_configured_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(Config, "SLOW_LOG_FILE", write_log(tmp_path / "slow.log",
+                                                           [entry("SELECT 1;", 0.5)]))
+    digest_slow_log_step()
+    assert "1 queries, 1 fingerprints" in capsys.readouterr().out
+
+
+def test_step_never_fails(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(Config, "SLOW_LOG_FILE", "")
+    monkeypatch.setattr(Config, "DATA_DIR", str(tmp_path))
+
+    class Executor:
+        def query(self, sql):
+            return [{"slow_query_log_file": "host-slow.log"}]
+
+    monkeypatch.setattr(script, "get_executor", Executor)
+    digest_slow_log_step()
+    assert f"No slow query log at {tmp_path}/host-slow.log" in caplog.text
+
+    monkeypatch.setattr(script, "get_executor", lambda: 1 / 0)
+    digest_slow_log_step()
+    assert "Slow log digest failed: division by zero" in caplog.text
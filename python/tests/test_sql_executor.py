@@ -0,0 +1,253 @@
+"""SQLExecutor: the connection pool (fake PyMySQL) and the mysql --xml fallback."""
+
+import json
+import os
+import subprocess
+import threading
+import types
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import Config, SQLExecutor, parse_mysql_xml
+
+STUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+
+
+class MySQLError(Exception):
+    pass
+
+
+class OperationalError(MySQLError):
+    pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if self.conn.dead:
+            raise OperationalError(2013, "Lost connection to MySQL server during query")
+        self.conn.statements.append(sql)
+        self.rows = [{"id": 1, "name": b"alice", "note": None}] if sql.startswith("SELECT") else []
+        self.description = [("id",), ("name",), ("note",)] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.dead = False
+        self.closed = False
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def ping(self, reconnect=True):
+        assert reconnect is False
+        if self.dead:
+            raise OperationalError(2006, "MySQL server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    """A fake pymysql module; .connections lists every connection opened."""
+    connections = []
+
+    def connect(**kwargs):
+        assert kwargs["autocommit"] is True and kwargs["cursorclass"] is fake.cursors.DictCursor
+        if fake.refuse:
+            raise OperationalError(2003, "Can't connect to MySQL server")
+        connections.append(FakeConnection(len(connections)))
+        return connections[-1]
+
+    fake = types.SimpleNamespace(
+        connect=connect, connections=connections, refuse=False,
+        cursors=types.SimpleNamespace(DictCursor=object()),
+        err=types.SimpleNamespace(OperationalError=OperationalError, MySQLError=MySQLError))
+    monkeypatch.setattr(script, "pymysql", fake)
+    monkeypatch.setattr(SQLExecutor, "POOL_WAIT", 0.05)
+    return fake
+
+
+def executor(pool_size=2):
+    return SQLExecutor("127.0.0.1", 3306, "admin", "secret", pool_size=pool_size)
+
+
+def test_driver_rows_are_text(driver):
+    assert executor().execute_many(["SELECT id, name, note FROM t;", "DO 1"]) == [
+        [{"id": "1", "name": "alice", "note": None}], []]
+    assert driver.connections[0].statements == ["SELECT id, name, note FROM t", "DO 1"]
+
+
+def test_connections_are_reused(driver):
+    sql = executor()
+    for _ in range(5):
+        sql.query("SELECT 1")
+    assert len(driver.connections) == 1
+
+
+def test_pool_opens_up_to_pool_size(driver):
+    sql = executor(pool_size=2)
+    with sql.connection() as first, sql.connection() as second:
+        assert first is not second
+    assert len(driver.connections) == 2
+    assert sql._opened == 2
+
+
+def test_waiter_gets_a_returned_connection(driver):
+    sql = executor(pool_size=1)
+    results = []
+    with sql.connection() as held:
+        thread = threading.Thread(target=lambda: results.append(sql.query("SELECT 1")))
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()            # Waiting: the only connection is in use
+    thread.join(2)
+    assert not thread.is_alive() and results
+    assert driver.connections == [held]
+
+
+def test_waiter_opens_a_connection_after_a_discard(driver):
+    """A slot freed by a broken connection is noticed by a waiting thread."""
+    sql = executor(pool_size=1)
+    results = []
+    with pytest.raises(OperationalError):
+        with sql.connection():
+            thread = threading.Thread(target=lambda: results.append(sql.query("SELECT 1")))
+            thread.start()
+            thread.join(0.2)
+            assert thread.is_alive()
+            raise OperationalError(2013, "Lost connection to MySQL server during query")
+    thread.join(2)
+    assert not thread.is_alive() and results
+    assert len(driver.connections) == 2 and driver.connections[0].closed
+    assert sql._opened == 1
+
+
+def test_other_errors_return_the_connection(driver):
+    sql = executor(pool_size=1)
+    with pytest.raises(ValueError):
+        with sql.connection():
+            raise ValueError("not a connection problem")
+    sql.query("SELECT 1")
+    assert len(driver.connections) == 1
+
+
+def test_stale_idle_connection_is_replaced(driver):
+    """After a server restart the idle connection fails its ping; a new one is opened."""
+    sql = executor(pool_size=1)
+    sql.query("SELECT 1")
+    driver.connections[0].dead = True
+    assert sql.query("SELECT 1") == [{"id": "1", "name": "alice", "note": None}]
+    assert len(driver.connections) == 2
+    assert driver.connections[0].closed
+    assert sql._opened == 1
+
+
+def test_failed_connect_frees_the_slot(driver):
+    sql = executor(pool_size=1)
+    driver.refuse = True
+    with pytest.raises(OperationalError):
+        sql.query("SELECT 1")
+    assert sql._opened == 0
+    driver.refuse = False
+    sql.query("SELECT 1")
+    assert sql._opened == 1
+
+
+def test_close_discards_idle_connections(driver):
+    sql = executor()
+    with sql.connection(), sql.connection():
+        pass
+    sql.close()
+    assert all(conn.closed for conn in driver.connections)
+    assert sql._opened == 0
+
+
+# ── mysql --xml fallback ─────────────────────────────────────────────────
+
+XML = """<?xml version="1.0"?>
+
+<resultset statement="SELECT @@server_id AS id, @@gtid_mode AS mode, NULL AS n"
+ xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <row>
+\t<field name="id">2</field>
+\t<field name="mode">ON</field>
+\t<field name="n" xsi:nil="true" />
+  </row>
+</resultset>
+
+<resultset statement="SHOW REPLICAS" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+</resultset>
+"""
+
+
+@pytest.fixture
+def cli(monkeypatch, tmp_path):
+    """Run the CLI path against tests/stubs/mysql; returns the stub's log reader."""
+    monkeypatch.setattr(script, "pymysql", None)
+    monkeypatch.setenv("PATH", STUBS + os.pathsep + os.environ["PATH"])
+    output, log = tmp_path / "output.xml", tmp_path / "log.json"
+    output.write_text(XML)
+    monkeypatch.setenv("MYSQL_STUB_OUTPUT", str(output))
+    monkeypatch.setenv("MYSQL_STUB_LOG", str(log))
+    return lambda: json.loads(log.read_text())
+
+
+def test_parse_mysql_xml():
+    assert parse_mysql_xml(XML) == [[{"id": "2", "mode": "ON", "n": None}], []]
+    assert parse_mysql_xml("") == []
+
+
+def test_cli_maps_result_sets_to_row_statements(cli):
+    results = executor().execute_many([
+        "SELECT @@server_id AS id, @@gtid_mode AS mode, NULL AS n",
+        "SET GLOBAL super_read_only = ON;",
+        "SHOW REPLICAS\\G",
+    ])
+    assert results == [[{"id": "2", "mode": "ON", "n": None}], [], []]
+    call = cli()
+    assert call["stdin"] == ("SELECT @@server_id AS id, @@gtid_mode AS mode, NULL AS n;\n"
+                             "SET GLOBAL super_read_only = ON;\n"
+                             "SHOW REPLICAS;\n")
+    assert call["argv"][-2:] == ["--xml", "--batch"]
+
+
+def test_cli_keeps_the_password_off_the_command_line(cli):
+    SQLExecutor("127.0.0.1", 3306, "admin", 'pa"ss\\word').query("DO 1")
+    call = cli()
+    assert not any("pa" in arg and "word" in arg for arg in call["argv"])
+    assert call["defaults"] == '[client]\npassword="pa\\"ss\\\\word"\n'
+    assert f"--connect-timeout={Config.CONNECT_TIMEOUT}" in call["argv"]
+
+
+def test_cli_wraps_compound_statements_in_delimiter(cli):
+    trigger = ("CREATE TRIGGER orders_ai AFTER INSERT ON orders FOR EACH ROW "
+               "BEGIN UPDATE totals SET n = n + 1; END")
+    executor().execute_many(["SET foreign_key_checks = 0", trigger + ";"])
+    assert cli()["stdin"] == ("SET foreign_key_checks = 0;\n"
+                              f"DELIMITER $$\n{trigger}$$\nDELIMITER ;\n")
+
+
+def test_cli_error_raises_with_stderr(cli, monkeypatch):
+    monkeypatch.setenv("MYSQL_STUB_EXIT", "1")
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        executor().query("SELECT * FROM shop.missing")
+    assert error.value.returncode == 1
+    assert "doesn't exist" in error.value.stderr
@@ -0,0 +1,121 @@
+"""Staged restore: swap_datadir() and rollback_datadir() on trees in tmp_path."""
+
+import shutil
+import subprocess
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (Config, StepJournal, rollback_datadir, run_fingerprint,
+                                     start_staged_instance, swap_datadir)
+
+
+@pytest.fixture
+def dirs(monkeypatch, tmp_path):
+    """Live and staged data/binlog trees; returns a setup function (nested binlog or not)."""
+    monkeypatch.setattr(Config, "USE_SUDO", False)
+    monkeypatch.setattr(Config, "SYSTEMCTL_CMD", ["true"])
+    monkeypatch.setattr(Config, "JOURNAL_DIR", str(tmp_path / "journal"))
+    monkeypatch.setattr(script, "wait_for_mysql_stopped", lambda: None)
+    monkeypatch.setattr(script, "_journal", None)
+
+    def setup(nested=False):
+        data = tmp_path / "data"
+        binlog = data / "binlog" if nested else tmp_path / "binlog"
+        monkeypatch.setattr(Config, "DATA_DIR", str(data))
+        monkeypatch.setattr(Config, "BINLOG_DIR", str(binlog))
+        for root, label in ((data, "old"), (tmp_path / "data.staged", "new")):
+            (root / "shop").mkdir(parents=True)
+            (root / "ibdata1").write_text(label)
+        staged_binlog = (tmp_path / "data.staged" / "binlog" if nested
+                         else tmp_path / "binlog.staged")
+        for directory, label in ((binlog, "old"), (staged_binlog, "new")):
+            directory.mkdir()
+            (directory / "mysql-bin.000001").write_text(label)
+            (directory / "mysql-bin.index").write_text(f"{directory}/mysql-bin.000001\n")
+        return data, binlog
+    return setup
+
+
+def test_swap_separate_binlog_dir(dirs, tmp_path):
+    data, binlog = dirs()
+    swap_datadir()
+    assert (data / "ibdata1").read_text() == "new"
+    assert (binlog / "mysql-bin.000001").read_text() == "new"
+    assert (tmp_path / "data.previous" / "ibdata1").read_text() == "old"
+    assert (tmp_path / "binlog.previous" / "mysql-bin.000001").read_text() == "old"
+    assert not (tmp_path / "data.staged").exists() and not (tmp_path / "binlog.staged").exists()
+    # The index lists the files under their final path
+    assert (binlog / "mysql-bin.index").read_text() == f"{binlog}/mysql-bin.000001\n"
+
+
+def test_swap_nested_binlog_moves_with_the_datadir(dirs, tmp_path):
+    data, binlog = dirs(nested=True)
+    swap_datadir()
+    assert (binlog / "mysql-bin.000001").read_text() == "new"
+    assert (tmp_path / "data.previous" / "binlog" / "mysql-bin.000001").read_text() == "old"
+    assert not (tmp_path / "binlog.previous").exists()
+    assert (binlog / "mysql-bin.index").read_text() == f"{binlog}/mysql-bin.000001\n"
+
+
+def test_swap_without_a_live_datadir(dirs, tmp_path):
+    data, _ = dirs(nested=True)
+    shutil.rmtree(data)
+    swap_datadir()
+    assert (data / "ibdata1").read_text() == "new"
+    assert not (tmp_path / "data.previous").exists()
+
+
+def test_failed_swap_puts_the_live_datadir_back(dirs, tmp_path):
+    data, _ = dirs(nested=True)
+    shutil.rmtree(tmp_path / "data.staged")
+    with pytest.raises(subprocess.CalledProcessError):
+        swap_datadir()
+    assert (data / "ibdata1").read_text() == "old"
+    assert not (tmp_path / "data.previous").exists()
+
+
+def test_rollback_restores_the_previous_datadir(dirs, tmp_path, monkeypatch):
+    data, binlog = dirs()
+    starts = []
+    monkeypatch.setattr(script, "start_mysql_instance", lambda: starts.append(1))
+    journal = StepJournal.create(str(tmp_path / "journal" / "run.json"), run_fingerprint())
+    for step in ("stop_mysql", "swap_datadir", "start_mysql", "restore_backup"):
+        journal.finish(step, 1.0)
+    monkeypatch.setattr(script, "_journal", journal)
+
+    swap_datadir()
+    rollback_datadir()
+    assert (data / "ibdata1").read_text() == "old"
+    assert (binlog / "mysql-bin.000001").read_text() == "old"
+    # The rejected tree is kept under the staging name for inspection
+    assert (tmp_path / "data.staged" / "ibdata1").read_text() == "new"
+    assert (tmp_path / "binlog.staged" / "mysql-bin.000001").read_text() == "new"
+    assert not (tmp_path / "data.previous").exists()
+    assert starts == [1]
+    # A resume has to stop and swap again, but not restore again
+    assert journal.done_steps() == ["restore_backup"]
+
+
+def test_rollback_needs_a_previous_datadir(dirs):
+    dirs()
+    with pytest.raises(RuntimeError, match=r"Nothing to roll back to: .*data\.previous"):
+        rollback_datadir()
+
+
+def test_failed_start_rolls_back(dirs, tmp_path, monkeypatch):
+    data, _ = dirs(nested=True)
+    attempts = []
+
+    def start():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise TimeoutError("mysqld did not come up")
+
+    monkeypatch.setattr(script, "start_mysql_instance", start)
+    swap_datadir()
+    with pytest.raises(TimeoutError):
+        start_staged_instance()
+    assert len(attempts) == 2
+    assert (data / "ibdata1").read_text() == "old"
+    assert (tmp_path / "data.staged" / "ibdata1").read_text() == "new"
@@ -0,0 +1,154 @@
+"""Switchover: the pre-check, the freeze/sync/promote sequence and its rollback."""
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import Config, SQLExecutor, switchover, switchover_precheck
+
+SOURCE = "3e11fa47-71ca-11e1-9e33-c80aa9429562"
+OTHER = "8a94f357-aab4-11df-86ab-c80aa9429562"
+
+
+class FakeExecutor(SQLExecutor):
+    """Answers each statement with the rows of the first key it contains; records statements."""
+
+    def __init__(self, answers):
+        super().__init__("127.0.0.1", 3306, "admin", "secret")
+        self.answers = answers
+        self.statements = []
+
+    def execute_many(self, statements):
+        results = []
+        for statement in statements:
+            self.statements.append(" ".join(statement.split()))
+            answer = next((rows for key, rows in self.answers.items() if key in statement), [])
+            if isinstance(answer, BaseException):
+                raise answer
+            results.append(answer)
+        return results
+
+
+def settings(gtid_executed, gtid_mode="ON", log_bin="1", read_only="0", event_scheduler="ON"):
+    return [{"gtid_executed": gtid_executed, "gtid_mode": gtid_mode, "log_bin": log_bin,
+             "read_only": read_only, "event_scheduler": event_scheduler}]
+
+
+RUNNING = [{"Replica_IO_Running": "Yes", "Replica_SQL_Running": "Yes"}]
+
+
+def servers(old=None, new=None, status=RUNNING):
+    """An old primary at SOURCE:1-100 and a new primary (replica) at SOURCE:1-90."""
+    old = {"gtid_executed": f"{SOURCE}:1-100", **(old or {})}
+    new = {"gtid_executed": f"{SOURCE}:1-90", **(new or {})}
+    old = FakeExecutor({"@@GLOBAL.gtid_mode": settings(**old),
+                        "SHOW REPLICA STATUS": RUNNING,
+                        "AS gtid_executed": [{"gtid_executed": f"{SOURCE}:1-105"}]})
+    new = FakeExecutor({"@@GLOBAL.gtid_mode": settings(**new),
+                        "SHOW REPLICA STATUS": status,
+                        "WAIT_FOR_EXECUTED_GTID_SET": [{"timed_out": "0"}],
+                        "AS gtid_executed": [{"gtid_executed": f"{SOURCE}:1-100"}]})
+    return old, new
+
+
+def test_precheck_passes():
+    old, new = servers()
+    assert switchover_precheck(old, new)["event_scheduler"] == "ON"
+
+
+@pytest.mark.parametrize("old_settings, new_settings, status, problem", [
+    ({"gtid_mode": "OFF"}, {}, RUNNING, "gtid_mode is OFF on the old primary"),
+    ({}, {"gtid_mode": "ON_PERMISSIVE"}, RUNNING, "gtid_mode is ON_PERMISSIVE on the new"),
+    ({"read_only": "1"}, {}, RUNNING, "already read-only"),
+    ({}, {"log_bin": "0"}, RUNNING, "binary logging is off"),
+    ({}, {}, [], "replication threads are not running"),
+    ({}, {}, [{"Replica_IO_Running": "Connecting", "Replica_SQL_Running": "Yes"}],
+     "replication threads are not running"),
+])
+def test_precheck_refuses(old_settings, new_settings, status, problem):
+    old, new = servers(old_settings, new_settings, status)
+    with pytest.raises(RuntimeError, match=problem):
+        switchover_precheck(old, new)
+
+
+def test_precheck_refuses_errant_transactions():
+    old, new = servers(new={"gtid_executed": f"{SOURCE}:1-90,\n{OTHER}:1-3"})
+    with pytest.raises(RuntimeError, match=f"errant transactions on the new primary .{OTHER}:1-3"):
+        switchover_precheck(old, new)
+
+
+def test_precheck_limits_the_backlog(monkeypatch):
+    old, new = servers()
+    monkeypatch.setattr(Config, "SWITCHOVER_MAX_BACKLOG", 9)
+    with pytest.raises(RuntimeError, match=r"10 transactions behind \(limit 9\)"):
+        switchover_precheck(old, new)
+    monkeypatch.setattr(Config, "SWITCHOVER_MAX_BACKLOG", 10)
+    switchover_precheck(old, new)
+
+
+def test_precheck_reports_every_problem():
+    old, new = servers({"read_only": "1"}, {"log_bin": "0"}, [])
+    with pytest.raises(RuntimeError) as raised:
+        switchover_precheck(old, new)
+    assert str(raised.value).count(";") == 2
+
+
+@pytest.fixture
+def roles(monkeypatch):
+    """Install the two fake servers; returns them."""
+    old, new = servers()
+    monkeypatch.setattr(script, "get_source_executor", lambda: old)
+    monkeypatch.setattr(script, "get_executor", lambda: new)
+    monkeypatch.setattr(Config, "ASSUME_YES", True)
+    return old, new
+
+
+def test_switchover_sequence(roles):
+    old, new = roles
+    result = switchover()
+    assert result.synced == 5
+    assert list(result.phases) == ["freeze", "sync", "promote", "demote"]
+    assert result.window >= result.phases["freeze"] + result.phases["sync"]
+    freeze = old.statements.index("SET PERSIST super_read_only = ON")
+    assert old.statements[freeze - 1] == "SET GLOBAL event_scheduler = OFF"
+    assert f"SELECT WAIT_FOR_EXECUTED_GTID_SET('{SOURCE}:1-105', " \
+           f"{Config.SWITCHOVER_SYNC_TIMEOUT}) AS timed_out" in new.statements
+    promote = new.statements.index("RESET REPLICA ALL")
+    assert new.statements[promote:] == ["RESET REPLICA ALL", "SET PERSIST super_read_only = OFF",
+                                        "SET PERSIST read_only = OFF",
+                                        "SET GLOBAL event_scheduler = ON"]
+    assert any(s.startswith(f"CHANGE REPLICATION SOURCE TO SOURCE_HOST='{Config.SECONDARY_HOST}'")
+               for s in old.statements)
+    assert "START REPLICA" in old.statements
+    # No RESET MASTER anywhere: both servers keep their GTID history
+    assert not any("RESET MASTER" in s for s in old.statements + new.statements)
+
+
+def test_sync_timeout_releases_the_old_primary(roles):
+    old, new = roles
+    new.answers["WAIT_FOR_EXECUTED_GTID_SET"] = [{"timed_out": "1"}]
+    with pytest.raises(RuntimeError, match="sync timed out"):
+        switchover()
+    assert old.statements[-3:] == ["SET PERSIST super_read_only = OFF",
+                                   "SET PERSIST read_only = OFF",
+                                   "SET GLOBAL event_scheduler = ON"]
+    assert "STOP REPLICA" not in new.statements
+
+
+def test_failed_freeze_releases_the_old_primary(roles):
+    old, new = roles
+    old.answers = {"super_read_only = ON": TimeoutError("Lock wait timeout exceeded"),
+                   **old.answers}
+    with pytest.raises(RuntimeError, match="Switchover aborted: Lock wait timeout"):
+        switchover()
+    assert old.statements[-2:] == ["SET PERSIST read_only = OFF",
+                                   "SET GLOBAL event_scheduler = ON"]
+    assert not any("WAIT_FOR" in s for s in new.statements)
+
+
+def test_cancelled_switchover_changes_nothing(roles, monkeypatch):
+    old, new = roles
+    monkeypatch.setattr(Config, "ASSUME_YES", False)
+    monkeypatch.setattr("builtins.input", lambda prompt: "n")
+    with pytest.raises(RuntimeError, match="cancelled"):
+        switchover()
+    assert not any(s.startswith("SET") for s in old.statements + new.statements)
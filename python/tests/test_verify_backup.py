@@ -0,0 +1,160 @@
+"""Backup pre-flight: verify_backup_source() against checksums, manifests and plain reads."""
+
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+
+from mysql_replication_setup import (Config, checksums_file, verify_backup, verify_backup_source,
+                                     write_backup_checksums)
+
+CHUNK = 4096
+
+
+@pytest.fixture
+def backup(monkeypatch, tmp_path):
+    """An XtraBackup directory (the configured backup) with small verify chunks."""
+    root = tmp_path / "xtrabackup"
+    (root / "shop").mkdir(parents=True)
+    (root / "ibdata1").write_bytes(os.urandom(5 * CHUNK + 100))
+    (root / "shop" / "orders.ibd").write_bytes(os.urandom(3 * CHUNK))
+    (root / "shop" / "empty.ibd").write_bytes(b"")
+    (root / "xtrabackup_checkpoints").write_text("backup_type = full-backuped\n")
+    (root / "xtrabackup_info.gz").write_bytes(gzip.compress(b"uuid = 1\n" * 1000))
+    for name, value in {"RESTORE_ENGINE": "xtrabackup", "XTRABACKUP_DIR": str(root),
+                        "BACKUP_MANIFEST": "", "VERIFY_CHUNK_BYTES": CHUNK,
+                        "VERIFY_WORKERS": 4, "USE_SUDO": False}.items():
+        monkeypatch.setattr(Config, name, value)
+    return root
+
+
+def flip_byte(path, offset):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+def test_checksums_of_an_intact_backup(backup):
+    path = write_backup_checksums(str(backup))
+    assert path == str(backup / "backup-checksums.json") == checksums_file(str(backup))
+    sums = json.loads((backup / "backup-checksums.json").read_text())
+    assert sums["chunk_bytes"] == CHUNK and sums["xtrabackup_prepared"] is False
+    assert len(sums["files"]["ibdata1"]["sha256"]) == 6
+    assert sums["files"]["shop/empty.ibd"] == {"size": 0, "sha256": []}
+    result = verify_backup_source()
+    assert result.ok, result.problems
+    assert (result.method, result.files, result.chunks) == ("checksums", 5, 6 + 3 + 1 + 1)
+    assert result.bytes == sum(info["size"] for info in sums["files"].values())
+
+
+def test_checksum_mismatch_names_the_chunk(backup):
+    write_backup_checksums(str(backup))
+    flip_byte(backup / "ibdata1", 2 * CHUNK + 10)
+    result = verify_backup_source()
+    assert result.problems == ["ibdata1 chunk 2: checksum mismatch"]
+
+
+def test_missing_and_resized_files(backup, caplog):
+    write_backup_checksums(str(backup))
+    (backup / "shop" / "orders.ibd").unlink()
+    with open(backup / "ibdata1", "r+b") as f:
+        f.truncate(2 * CHUNK)
+    (backup / "shop" / "new.ibd").write_bytes(b"x")
+    problems = verify_backup_source().problems
+    assert "shop/orders.ibd: missing" in problems
+    assert f"ibdata1: {2 * CHUNK} bytes, expected {5 * CHUNK + 100}" in problems
+    assert len(problems) == 2
+    assert "shop/new.ibd: not in backup-checksums.json" in caplog.text
+
+
+def test_prepared_after_checksumming_falls_back_to_reading(backup, caplog):
+    write_backup_checksums(str(backup))
+    (backup / "xtrabackup_checkpoints").write_text("backup_type = full-prepared\n")
+    flip_byte(backup / "ibdata1", 0)          # --prepare rewrites pages
+    result = verify_backup_source()
+    assert result.ok and result.method == "read"
+    assert "prepared after it was checksummed" in caplog.text
+
+
+def test_single_file_backup(tmp_path):
+    image = tmp_path / "ebackup.mbi"
+    image.write_bytes(os.urandom(3 * CHUNK))
+    assert write_backup_checksums(str(image), CHUNK) == str(image) + ".checksums.json"
+    assert verify_backup_source(str(image)).ok
+    flip_byte(image, 3 * CHUNK - 1)
+    assert verify_backup_source(str(image)).problems == ["ebackup.mbi chunk 2: checksum mismatch"]
+
+
+def test_read_checks_without_checksums(backup):
+    result = verify_backup_source()
+    assert result.ok and result.method == "read"
+    (backup / "xtrabackup_info.gz").write_bytes(
+        gzip.compress(b"uuid = 1\n" * 1000)[:-20])
+    (backup / "xtrabackup_checkpoints").unlink()
+    problems = verify_backup_source().problems
+    assert problems == [f"{backup}: no xtrabackup_checkpoints",
+                        "xtrabackup_info.gz: truncated gzip stream"]
+
+
+def test_concatenated_gzip_members_are_intact(backup):
+    (backup / "dump.sql.gz").write_bytes(gzip.compress(b"a" * 10000) + gzip.compress(b"b"))
+    assert verify_backup_source().ok
+
+
+def test_missing_source(tmp_path):
+    result = verify_backup_source(str(tmp_path / "nowhere"))
+    assert result.problems == [f"{tmp_path}/nowhere: does not exist"]
+
+
+@pytest.fixture
+def manifest(monkeypatch, tmp_path):
+    """A --backup data file of three chunks and its manifest (Config.BACKUP_MANIFEST)."""
+    chunks = [gzip.compress(os.urandom(size)) for size in (CHUNK, CHUNK, 100)]
+    data = tmp_path / "backup.xbstream.gz"
+    data.write_bytes(b"".join(chunks))
+    offsets = [sum(len(c) for c in chunks[:i]) for i in range(len(chunks))]
+    (tmp_path / "manifest.json").write_text(json.dumps({
+        "format": 1, "tool": "xtrabackup", "data_file": data.name, "compression": "gzip",
+        "raw_bytes": 2 * CHUNK + 100, "stored_bytes": data.stat().st_size,
+        "chunks": [{"offset": offset, "size": len(chunk),
+                    "sha256": hashlib.sha256(chunk).hexdigest()}
+                   for offset, chunk in zip(offsets, chunks)]}))
+    monkeypatch.setattr(Config, "BACKUP_MANIFEST", str(tmp_path))
+    return data, offsets
+
+
+def test_manifest_verification(manifest):
+    data, offsets = manifest
+    result = verify_backup_source()
+    assert result.ok and (result.method, result.chunks) == ("manifest", 3)
+    assert result.bytes == data.stat().st_size
+    flip_byte(data, offsets[1] + 5)
+    assert verify_backup_source().problems == ["chunk 1: checksum mismatch"]
+
+
+def test_truncated_manifest_data_file(manifest):
+    data, offsets = manifest
+    size = data.stat().st_size
+    with open(data, "r+b") as f:
+        f.truncate(offsets[2] + 3)
+    problems = verify_backup_source().problems
+    assert problems == [f"{data.name}: {offsets[2] + 3} bytes, manifest says {size}",
+                        f"chunk 2: truncated (3 of {size - offsets[2]} bytes)"]
+
+
+def test_verify_backup_raises_on_problems(backup):
+    write_backup_checksums(str(backup))
+    verify_backup()
+    flip_byte(backup / "shop" / "orders.ibd", CHUNK)
+    with pytest.raises(RuntimeError, match=r"Backup verification failed \(checksums: 5 files"):
+        verify_backup()
+
+
+def test_verify_backup_needs_the_backup(backup, monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "XTRABACKUP_DIR", str(tmp_path / "gone"))
+    with pytest.raises(RuntimeError, match="Backup not found"):
+        verify_backup()
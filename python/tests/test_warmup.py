@@ -0,0 +1,182 @@
+"""Buffer pool warm-up: donor dump, transfer into the datadir and the tracked load."""
+
+import grp
+import os
+import pwd
+
+import pytest
+
+import mysql_replication_setup as script
+from mysql_replication_setup import (Config, SQLExecutor, buffer_pool_load_finished,
+                                     dump_donor_buffer_pool, transfer_buffer_pool,
+                                     warm_buffer_pool, warmup_donor)
+
+LOAD_STATUS = "SHOW GLOBAL STATUS LIKE 'Innodb_buffer_pool_load_status'"
+DUMP_STATUS = "SHOW GLOBAL STATUS LIKE 'Innodb_buffer_pool_dump_status'"
+
+
+class FakeExecutor(SQLExecutor):
+    """
+    Scripted server: each SHOW STATUS answers the next value of its list
+    (the last one repeats); SET statements are recorded and may unlock
+    the next script through `after`.
+    """
+
+    def __init__(self, statuses, variables=None, after=None):
+        super().__init__("10.0.0.1", 3306, "admin", "secret")
+        self.statuses = statuses
+        self.variables = variables or {}
+        self.after = after or {}
+        self.statements = []
+
+    def execute_many(self, statements):
+        results = []
+        for statement in statements:
+            self.statements.append(statement)
+            if statement in self.after:
+                self.statuses.update(self.after.pop(statement))
+            if statement in self.statuses:
+                values = self.statuses[statement]
+                value = values.pop(0) if len(values) > 1 else values[0]
+                results.append([] if value is None else [{"Value": value}])
+            elif statement.startswith("SELECT @@GLOBAL"):
+                results.append([self.variables])
+            else:
+                results.append([])
+        return results
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(Config, "POLL_INITIAL_INTERVAL", 0.001)
+    monkeypatch.setattr(Config, "POLL_MAX_INTERVAL", 0.001)
+    monkeypatch.setattr(Config, "USE_SUDO", False)
+
+
+@pytest.mark.parametrize("status, finished", [
+    (None, False), ("", False),
+    ("Loading buffer pool(s) from /u01/data/ib_buffer_pool", False),
+    ("Buffer pool(s) load completed at 240501 10:00:00", True),
+    ("Buffer pool(s) load aborted on request", True),
+    ("Buffer pool(s) load not started", True),
+])
+def test_buffer_pool_load_finished(status, finished):
+    assert buffer_pool_load_finished(status) is finished
+
+
+def test_warmup_donor(monkeypatch):
+    monkeypatch.setattr(Config, "WARMUP_DONOR", "")
+    assert warmup_donor() == (Config.PRIMARY_HOST, Config.PRIMARY_PORT)
+    monkeypatch.setattr(Config, "WARMUP_DONOR", "db3.example.com:3307")
+    assert warmup_donor() == ("db3.example.com", 3307)
+
+
+def donor(datadir):
+    """A donor whose previous dump completed; a new one completes two polls after dump_now."""
+    previous = "Buffer pool(s) dump completed at 240501 09:00:00"
+    return FakeExecutor(
+        {DUMP_STATUS: [previous]},
+        {"datadir": f"{datadir}/", "filename": "ib_buffer_pool"},
+        after={"SET GLOBAL innodb_buffer_pool_dump_now = ON": {DUMP_STATUS: [
+            previous, "Dumping buffer pool(s) to /u01/data/ib_buffer_pool",
+            "Buffer pool(s) dump completed at 240501 10:00:00"]}})
+
+
+def test_dump_waits_for_a_new_dump(tmp_path):
+    executor = donor(tmp_path)
+    assert dump_donor_buffer_pool(executor) == f"{tmp_path}/ib_buffer_pool"
+    assert executor.statements.count(DUMP_STATUS) == 4
+    assert executor.statuses[DUMP_STATUS] == ["Buffer pool(s) dump completed at 240501 10:00:00"]
+
+
+@pytest.fixture
+def transfer(monkeypatch, tmp_path):
+    """Donor datadir with a dump, an empty restored datadir, `cat` as the fetch command."""
+    (tmp_path / "donor").mkdir()
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(Config, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(Config, "WARMUP_FETCH_CMD", ["cat", "{path}"])
+    monkeypatch.setattr(Config, "MYSQL_USER", pwd.getpwuid(os.getuid()).pw_name)
+    monkeypatch.setattr(Config, "MYSQL_GROUP", grp.getgrgid(os.getgid()).gr_name)
+    executor = donor(tmp_path / "donor")
+    monkeypatch.setattr(script, "get_executor", lambda *args: executor)
+    return tmp_path
+
+
+def test_transfer_installs_the_donor_dump(transfer, caplog):
+    pages = "".join(f"{space},{page}\n" for space in (0, 12) for page in range(50))
+    (transfer / "donor" / "ib_buffer_pool").write_text(pages)
+    transfer_buffer_pool()
+    target = transfer / "data" / "ib_buffer_pool"
+    assert target.read_text() == pages
+    assert oct(target.stat().st_mode & 0o777) == "0o640"
+    assert "100 page ids from" in caplog.text
+
+
+def test_empty_dump_is_not_installed(transfer, caplog):
+    (transfer / "donor" / "ib_buffer_pool").write_text("")
+    transfer_buffer_pool()
+    assert not (transfer / "data" / "ib_buffer_pool").exists()
+    assert "dumped no pages; the replica starts cold" in caplog.text
+
+
+def test_transfer_problems_never_fail(transfer, caplog):
+    transfer_buffer_pool()              # The fetch command fails: no dump file
+    assert not (transfer / "data" / "ib_buffer_pool").exists()
+    assert "Buffer pool dump not transferred" in caplog.text
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Install a replica with 16KiB pages; returns a setup function taking the load statuses."""
+    def setup(*statuses):
+        executor = FakeExecutor({LOAD_STATUS: list(statuses)}, {"page_size": "16384"})
+        monkeypatch.setattr(script, "get_executor", lambda *args: executor)
+        return executor
+    return setup
+
+
+def test_load_is_tracked_until_complete(replica, monkeypatch, caplog):
+    monkeypatch.setattr(Config, "PROGRESS_INTERVAL", 0)
+    executor = replica("Loading buffer pool(s) from /u01/data/ib_buffer_pool",
+                       "Buffer pool(s) load: Loaded 250/1000 pages",
+                       "Buffer pool(s) load: Loaded 750/1000 pages",
+                       "Buffer pool(s) load completed at 240501 10:00:00")
+    warm_buffer_pool()
+    assert executor.statements.count(LOAD_STATUS) == 4
+    assert "SET GLOBAL innodb_buffer_pool_load_now = ON" not in executor.statements
+    # Pages converted to bytes: progress in % of the page list
+    assert "(25.0%)" in caplog.text and "(75.0%)" in caplog.text
+    assert "✅ Buffer pool(s) load completed" in caplog.text
+
+
+@pytest.mark.parametrize("load_now, status", [
+    (True, "Buffer pool(s) load completed at 240501 09:00:00"),
+    (False, "Buffer pool(s) load not started"),
+])
+def test_load_now(replica, load_now, status):
+    executor = replica(status, "Buffer pool(s) load completed at 240501 10:00:00")
+    warm_buffer_pool(load_now=load_now)
+    assert "SET GLOBAL innodb_buffer_pool_load_now = ON" in executor.statements
+    assert executor.statements.count(LOAD_STATUS) == 2
+
+
+def test_aborted_load_warns(replica, caplog):
+    replica("Loading buffer pool(s)", "Buffer pool(s) load aborted on request")
+    warm_buffer_pool()
+    assert "⚠️  Buffer pool(s) load aborted on request" in caplog.text
+
+
+def test_load_timeout_warns(replica, monkeypatch, caplog):
+    monkeypatch.setattr(Config, "WARMUP_TIMEOUT", 0.05)
+    replica("Buffer pool(s) load: Loaded 1/1000 pages")
+    warm_buffer_pool()
+    assert "Buffer pool still loading after 0.05s" in caplog.text
+
+
+def test_load_problems_never_fail(monkeypatch, caplog):
+    executor = FakeExecutor({})
+    executor.execute_many = lambda statements: 1 / 0
+    monkeypatch.setattr(script, "get_executor", lambda *args: executor)
+    warm_buffer_pool()
+    assert "Buffer pool warm-up not tracked: division by zero" in caplog.text